@@ -28,6 +28,7 @@ from models.dispute import (
 from models.invoice import Invoice
 from models.supplier import Supplier
 from services.dispute_archival_service import DisputeArchivalService
+from services.pagination import decode_cursor, keyset_after, paginate, want_total
 
 
 def generate_public_hash() -> str:
@@ -164,84 +165,79 @@ async def get_disputes(
     opened_date: Optional[date] = None,
     limit: int = 50,
     offset: int = 0,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get disputes with filters"""
+    """Get disputes with filters
 
-    # Build base query
-    query = select(InvoiceDispute).options(
-        selectinload(InvoiceDispute.invoice).selectinload(Invoice.supplier),
-        selectinload(InvoiceDispute.opened_by_user),
-        selectinload(InvoiceDispute.resolved_by_user),
-        selectinload(InvoiceDispute.closed_by_user),
-        selectinload(InvoiceDispute.line_items),
-        selectinload(InvoiceDispute.attachments).selectinload(DisputeAttachment.uploaded_by_user),
-        selectinload(InvoiceDispute.activity_log).selectinload(DisputeActivity.created_by_user)
-    ).where(InvoiceDispute.kitchen_id == current_user.kitchen_id)
+    Page with `after` (the previous page's next_cursor) instead of offset; the
+    total is only counted for the first page unless include_total.
+    """
+
+    conditions = [InvoiceDispute.kitchen_id == current_user.kitchen_id]
 
-    # Join with Invoice for supplier filtering
+    # Supplier filter via the dispute's invoice
     if supplier_id:
-        query = query.join(Invoice, InvoiceDispute.invoice_id == Invoice.id).where(Invoice.supplier_id == supplier_id)
+        conditions.append(InvoiceDispute.invoice_id.in_(
+            select(Invoice.id).where(Invoice.supplier_id == supplier_id)
+        ))
 
     if status:
         try:
             status_enum = DisputeStatus(status)
-            query = query.where(InvoiceDispute.status == status_enum)
+            conditions.append(InvoiceDispute.status == status_enum)
         except ValueError:
             pass
 
     if priority:
         try:
             priority_enum = DisputePriority(priority)
-            query = query.where(InvoiceDispute.priority == priority_enum)
+            conditions.append(InvoiceDispute.priority == priority_enum)
         except ValueError:
             pass
 
     if invoice_id:
-        query = query.where(InvoiceDispute.invoice_id == invoice_id)
+        conditions.append(InvoiceDispute.invoice_id == invoice_id)
 
     if opened_date:
         day_start = datetime.combine(opened_date, datetime.min.time())
         day_end = datetime.combine(opened_date + timedelta(days=1), datetime.min.time())
-        query = query.where(InvoiceDispute.opened_at >= day_start, InvoiceDispute.opened_at < day_end)
+        conditions.append(InvoiceDispute.opened_at >= day_start)
+        conditions.append(InvoiceDispute.opened_at < day_end)
 
     # Count total (before pagination)
-    count_query = select(func.count()).select_from(InvoiceDispute).where(InvoiceDispute.kitchen_id == current_user.kitchen_id)
-    if supplier_id:
-        count_query = count_query.join(Invoice, InvoiceDispute.invoice_id == Invoice.id).where(Invoice.supplier_id == supplier_id)
-    if status:
-        try:
-            status_enum = DisputeStatus(status)
-            count_query = count_query.where(InvoiceDispute.status == status_enum)
-        except ValueError:
-            pass
-    if priority:
-        try:
-            priority_enum = DisputePriority(priority)
-            count_query = count_query.where(InvoiceDispute.priority == priority_enum)
-        except ValueError:
-            pass
-    if invoice_id:
-        count_query = count_query.where(InvoiceDispute.invoice_id == invoice_id)
-    if opened_date:
-        day_start = datetime.combine(opened_date, datetime.min.time())
-        day_end = datetime.combine(opened_date + timedelta(days=1), datetime.min.time())
-        count_query = count_query.where(InvoiceDispute.opened_at >= day_start, InvoiceDispute.opened_at < day_end)
-
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    total = None
+    if want_total(include_total, after):
+        total_result = await db.execute(
+            select(func.count()).select_from(InvoiceDispute).where(*conditions)
+        )
+        total = total_result.scalar()
 
-    # Apply pagination
-    query = query.order_by(InvoiceDispute.opened_at.desc())
-    query = query.limit(limit).offset(offset)
+    # Apply pagination - (opened_at, id) descending, idx_invoice_disputes_kitchen_opened_id
+    query = select(InvoiceDispute).options(
+        selectinload(InvoiceDispute.invoice).selectinload(Invoice.supplier),
+        selectinload(InvoiceDispute.opened_by_user),
+        selectinload(InvoiceDispute.resolved_by_user),
+        selectinload(InvoiceDispute.closed_by_user),
+        selectinload(InvoiceDispute.line_items),
+        selectinload(InvoiceDispute.attachments).selectinload(DisputeAttachment.uploaded_by_user),
+        selectinload(InvoiceDispute.activity_log).selectinload(DisputeActivity.created_by_user)
+    ).where(*conditions)
+    if after:
+        query = query.where(keyset_after((InvoiceDispute.opened_at, InvoiceDispute.id), decode_cursor(after, 2)))
+    else:
+        query = query.offset(offset)
+    query = query.order_by(InvoiceDispute.opened_at.desc(), InvoiceDispute.id.desc()).limit(limit + 1)
 
     result = await db.execute(query)
-    disputes = result.scalars().all()
+    disputes, next_cursor = paginate(result.scalars().all(), limit, lambda d: (d.opened_at, d.id))
 
     return {
         "disputes": [_format_dispute(dispute) for dispute in disputes],
-        "total": total
+        "total": total,
+        "next_cursor": next_cursor
     }
 
 
@@ -20,6 +20,7 @@ from models.ingredient import Ingredient
 from models.food_flag import FoodFlagCategory, FoodFlag
 from api.food_flags import compute_recipe_flags
 from api.menus import _compute_staleness
+from services.recipe_costing import RecipeCostEngine
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +76,12 @@ async def list_dish_recipes(
     if exclude_flags:
         exclude_flag_ids = {int(x.strip()) for x in exclude_flags.split(",") if x.strip().isdigit()}
 
+    # Cost all listed dishes from one bulk-loaded recipe graph
+    costs = {}
+    if include_costs:
+        cost_engine = await RecipeCostEngine(db).load_recipes([r.id for r in recipes])
+        costs = cost_engine.cost_all()
+
     items = []
     for r in recipes:
         # Get flags
@@ -116,8 +123,7 @@ async def list_dish_recipes(
 
         # Include costs if requested
         if include_costs:
-            from api.recipes import _calc_recipe_cost
-            cost_data = await _calc_recipe_cost(r.id, db)
+            cost_data = costs.get(r.id, {})
             item["cost_per_portion"] = cost_data.get("cost_per_portion")
             item["total_cost"] = cost_data.get("total_cost_recent")
 
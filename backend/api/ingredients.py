@@ -921,6 +921,8 @@ async def backfill_product_codes_for_source(
     )
     count = result.rowcount
     if count > 0:
+        from services.price_points import refresh_supplier_price_points
+        await refresh_supplier_price_points(db, kitchen_id, source.supplier_id)
         logger.info(f"Backfilled product_code '{source.product_code}' on {count} line items for source {source.id}")
     return count
 
@@ -1271,6 +1273,9 @@ async def add_description_alias(
         },
     )
     renamed_count = rename_result.rowcount
+    if renamed_count > 0:
+        from services.price_points import refresh_supplier_price_points
+        await refresh_supplier_price_points(db, user.kitchen_id, source.supplier_id)
 
     await db.commit()
     logger.info(f"Added alias '{alias}' to source {source_id}, renamed {renamed_count} line items")
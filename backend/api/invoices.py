@@ -1,12 +1,15 @@
 import os
 import re
 import uuid
+import asyncio
+import hashlib
+import shutil
 import logging
 from datetime import date, timedelta
 from decimal import Decimal
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Header, BackgroundTasks
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, text
@@ -20,21 +23,27 @@ from models.line_item import LineItem
 from models.product_definition import ProductDefinition
 from models.settings import KitchenSettings
 from auth.jwt import get_current_user
-from ocr.extractor import process_invoice_image
+from ocr.extractor import process_invoice_image, complete_invoice_extraction
+from ocr.azure_extractor import has_stored_azure_result
 from ocr.azure_extractor import parse_pack_size
 from services.duplicate_detector import DuplicateDetector
+from services.price_points import refresh_invoice_price_points
+from services.purchase_totals import refresh_invoice_purchase_totals, refresh_purchase_totals
+from services.ocr_queue import ocr_queue, enqueue_ocr_job
+from services.ocr_reparse import reparse_stored_ocr, REPARSE_BATCH_SIZE
+from services.ocr_geometry import (
+    build_ocr_geometry, get_ocr_geometry, load_ocr_raw_json, has_ocr_data,
+    page_size, box_to_percent,
+)
+from services.pdf_jobs import highlight_invoice_pdf, pdf_job_stats
+from services.product_definitions import get_definition_matcher, normalize_description
+from services.preview_cache import preview_cache, LINE_PAD_INCHES, FIELD_PAD_INCHES, CACHE_CONTROL as PREVIEW_CACHE_CONTROL
+from models.ocr_job import OCR_PRIORITY_INTERACTIVE, OCR_PRIORITY_BULK
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-def normalize_description(text: str | None) -> str:
-    """Normalize description for matching - lowercase, collapse whitespace, strip"""
-    if not text:
-        return ""
-    return " ".join(text.lower().strip().split())
-
-
 # Reuse the unit normalization map from parse_pack_size for unit field detection
 from ocr.azure_extractor import _UNIT_NORMALIZE as UNIT_FIELD_MAP
 
@@ -70,9 +79,12 @@ def detect_pack_size(item) -> tuple:
 
 
 def get_total_pages_from_ocr(invoice: Invoice) -> int:
-    """Extract total page count from OCR raw JSON."""
+    """Total page count from the OCR geometry index (or raw JSON for older invoices, if loaded)."""
     import json
-    if not invoice.ocr_raw_json:
+    from sqlalchemy import inspect
+    if invoice.ocr_geometry:
+        return len(invoice.ocr_geometry.get('pages') or []) or 1
+    if "ocr_raw_json" in inspect(invoice).unloaded or not invoice.ocr_raw_json:
         return 1
     try:
         ocr_data = json.loads(invoice.ocr_raw_json)
@@ -82,40 +94,14 @@ def get_total_pages_from_ocr(invoice: Invoice) -> int:
         return 1
 
 
-def get_line_item_page_numbers_by_line_number(invoice: Invoice) -> dict[int, int]:
+def get_line_item_page_numbers_by_line_number(geometry: Optional[dict]) -> dict[int, int]:
     """
-    Parse ocr_raw_json to extract page numbers for each line item.
+    Page numbers for each OCR line item from the invoice's OCR geometry index.
     Returns dict mapping line_number (1-based) -> page_number (1-based)
     """
-    import json
-    if not invoice.ocr_raw_json:
-        return {}
-
-    try:
-        ocr_data = json.loads(invoice.ocr_raw_json)
-        documents = ocr_data.get('documents', [])
-        if not documents:
-            return {}
-
-        items_field = documents[0].get('fields', {}).get('Items', {})
-        ocr_items = items_field.get('value', [])
-
-        # Build mapping: line_number (1-based) -> page_number
-        result = {}
-        for idx, ocr_item in enumerate(ocr_items):
-            bounding_regions = ocr_item.get('bounding_regions', [])
-            if bounding_regions:
-                page_num = bounding_regions[0].get('page_number', 1)
-            else:
-                page_num = 1
-
-            # line_number is 1-based (idx + 1)
-            result[idx + 1] = page_num
-
-        return result
-    except Exception as e:
-        logger.warning(f"Failed to parse page numbers from OCR: {e}")
+    if not geometry:
         return {}
+    return {idx + 1: item['page'] for idx, item in enumerate(geometry.get('items') or [])}
 
 
 DATA_DIR = "/app/data"
@@ -278,7 +264,8 @@ class InvoiceUpdate(BaseModel):
 
 class InvoiceListResponse(BaseModel):
     invoices: list[InvoiceResponse]
-    total: int
+    total: Optional[int]  # None when not requested (cursor pages)
+    next_cursor: Optional[str] = None
 
 
 class DuplicateCompareResponse(BaseModel):
@@ -520,7 +507,6 @@ def invoice_to_response(
 # Invoice endpoints
 @router.post("/upload", response_model=InvoiceResponse)
 async def upload_invoice(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -546,18 +532,17 @@ async def upload_invoice(
     invoice = Invoice(
         kitchen_id=current_user.kitchen_id,
         image_path=filepath,
-        status=InvoiceStatus.PENDING
+        status=InvoiceStatus.PENDING,
+        content_sha256=hashlib.sha256(content).hexdigest()
     )
     db.add(invoice)
+    await db.flush()
+
+    # Same transaction as the invoice, so there's never a PENDING invoice without a job
+    await enqueue_ocr_job(db, invoice.id, current_user.kitchen_id, filepath, OCR_PRIORITY_INTERACTIVE)
     await db.commit()
     await db.refresh(invoice)
-
-    background_tasks.add_task(
-        process_invoice_background,
-        invoice.id,
-        filepath,
-        current_user.kitchen_id
-    )
+    ocr_queue.notify()
 
     return invoice_to_response(invoice)
 
@@ -577,88 +562,22 @@ async def apply_product_definitions(
     1. product_code (exact match)
     2. description_pattern (normalized contains match) - used when no product_code or no code match
     """
-    from sqlalchemy import or_
-
     logger.info(f"apply_product_definitions: kitchen_id={kitchen_id}, supplier_id={supplier_id}, line_items_count={len(line_items)}")
 
-    # Build query to get definitions - supplier-specific OR kitchen-wide (supplier_id IS NULL)
-    conditions = [
-        ProductDefinition.kitchen_id == kitchen_id,
-    ]
+    # Supplier-specific and kitchen-wide definitions (kitchen-wide only without a supplier)
+    matcher = await get_definition_matcher(db, kitchen_id, supplier_id)
 
-    if supplier_id:
-        # Get both supplier-specific and kitchen-wide definitions
-        conditions.append(
-            or_(
-                ProductDefinition.supplier_id == supplier_id,
-                ProductDefinition.supplier_id.is_(None)
-            )
-        )
-    else:
-        # Only get kitchen-wide definitions
-        conditions.append(ProductDefinition.supplier_id.is_(None))
-
-    result = await db.execute(
-        select(ProductDefinition).where(*conditions)
-    )
-    all_definitions = result.scalars().all()
-    logger.info(f"apply_product_definitions: found {len(all_definitions)} definitions")
-
-    # Build lookup dicts - prefer supplier-specific over kitchen-wide
-    # 1. By product_code (for items with codes)
-    definitions_by_code = {}
-    # 2. By description_pattern (for items without codes, or as fallback)
-    definitions_by_desc = []  # List of (normalized_pattern, definition) tuples
-
-    for d in all_definitions:
-        # Add to code lookup if has product_code
-        if d.product_code:
-            if d.product_code in definitions_by_code:
-                existing = definitions_by_code[d.product_code]
-                if existing.supplier_id and not d.supplier_id:
-                    continue  # Keep supplier-specific
-            definitions_by_code[d.product_code] = d
-
-        # Add to description lookup if has description_pattern
-        if d.description_pattern:
-            norm_pattern = normalize_description(d.description_pattern)
-            if norm_pattern:
-                definitions_by_desc.append((norm_pattern, d))
-
-    # Sort description patterns: prefer supplier-specific first, then by length (longer = more specific)
-    definitions_by_desc.sort(key=lambda x: (0 if x[1].supplier_id else 1, -len(x[0])))
-
-    if not definitions_by_code and not definitions_by_desc:
+    if matcher.is_empty():
         logger.info("apply_product_definitions: no definitions found after filtering")
         return line_items
 
-    logger.info(f"apply_product_definitions: {len(definitions_by_code)} code definitions, {len(definitions_by_desc)} description definitions")
-
-    def find_definition(item: dict) -> ProductDefinition | None:
-        """Find matching definition for a line item"""
-        product_code = item.get("product_code")
-        description = item.get("description")
-
-        # Priority 1: Match by product_code
-        if product_code and product_code in definitions_by_code:
-            return definitions_by_code[product_code]
-
-        # Priority 2: Match by description_pattern (for items without codes, or when no code match)
-        if description:
-            item_desc_norm = normalize_description(description)
-            for pattern, defn in definitions_by_desc:
-                # Check if pattern is contained in item description
-                if pattern in item_desc_norm:
-                    return defn
-
-        return None
+    logger.info(f"apply_product_definitions: {matcher.code_count} code definitions, {matcher.pattern_count} description definitions")
 
     for item in line_items:
-        defn = find_definition(item)
+        defn, match_type = matcher.match(item.get("product_code"), item.get("description"))
         if not defn:
             continue
 
-        match_type = "product_code" if item.get("product_code") and item.get("product_code") in definitions_by_code else "description"
         logger.info(f"apply_product_definitions: applying to item (matched by {match_type}): code={item.get('product_code')}, desc={item.get('description', '')[:50]}")
 
         # Apply portions_per_unit if not already set
@@ -689,17 +608,71 @@ async def apply_product_definitions(
     return line_items
 
 
-async def process_invoice_background(invoice_id: int, image_path: str, kitchen_id: int):
-    """Background task to process invoice OCR, save line items, and detect duplicates"""
+def apply_latest_definition(item: LineItem, defn) -> None:
+    """
+    Bring a stored line item up to date with its product definition: the
+    definition's portions_per_unit always wins, pack quantity and unit size
+    only fill in values the line item doesn't have.
+    """
+    if defn.portions_per_unit:
+        item.portions_per_unit = defn.portions_per_unit
+
+        # Recalculate cost_per_portion
+        if item.pack_quantity and item.unit_price:
+            item.cost_per_portion = Decimal(str(
+                round(float(item.unit_price) / (item.pack_quantity * defn.portions_per_unit), 4)
+            ))
+
+    # Also re-apply pack_quantity if definition has it but line item doesn't
+    if item.pack_quantity is None and defn.pack_quantity:
+        item.pack_quantity = defn.pack_quantity
+        if item.unit_price:
+            item.cost_per_item = Decimal(str(round(float(item.unit_price) / defn.pack_quantity, 4)))
+            if item.portions_per_unit:
+                item.cost_per_portion = Decimal(str(
+                    round(float(item.unit_price) / (defn.pack_quantity * item.portions_per_unit), 4)
+                ))
+
+    # Re-apply unit_size and unit_size_type if definition has them
+    if item.unit_size is None and defn.unit_size:
+        item.unit_size = defn.unit_size
+    if item.unit_size_type is None and defn.unit_size_type:
+        item.unit_size_type = defn.unit_size_type
+
+
+class OCRCallFailed(Exception):
+    """Azure OCR call failed; raised instead of recording the error so the job can be retried."""
+
+
+async def process_invoice_background(
+    invoice_id: int,
+    image_path: str,
+    kitchen_id: int,
+    raise_ocr_errors: bool = False,
+    stored_extraction: Optional[dict] = None
+):
+    """Background task to process invoice OCR, save line items, and detect duplicates
+
+    With raise_ocr_errors, a failed Azure call raises OCRCallFailed and leaves
+    the invoice untouched (used by the OCR queue for attempts it will retry).
+    stored_extraction is a result re-parsed from the stored ocr_raw_json
+    (services/ocr_reparse.py); it is saved the same way without calling Azure.
+    """
     from database import AsyncSessionLocal
 
     async with AsyncSessionLocal() as db:
         try:
-            result = await process_invoice_image(image_path, kitchen_id, db)
+            if stored_extraction is not None:
+                result = await complete_invoice_extraction(stored_extraction, kitchen_id, db)
+            else:
+                result = await process_invoice_image(image_path, kitchen_id, db)
+            if raise_ocr_errors and result.get("error"):
+                raise OCRCallFailed(result["error"])
 
             stmt = select(Invoice).where(Invoice.id == invoice_id)
             db_result = await db.execute(stmt)
             invoice = db_result.scalar_one()
+            previous_date = invoice.invoice_date
 
             # Update basic fields
             invoice.invoice_number = result.get("invoice_number")
@@ -719,6 +692,7 @@ async def process_invoice_background(invoice_id: int, image_path: str, kitchen_i
             if raw_json:
                 import json
                 invoice.ocr_raw_json = json.dumps(raw_json)
+                invoice.ocr_geometry = build_ocr_geometry(raw_json)
 
             # Delete existing line items before creating new ones
             from sqlalchemy import text
@@ -773,6 +747,10 @@ async def process_invoice_background(invoice_id: int, image_path: str, kitchen_i
                 except Exception as e:
                     logger.warning(f"Auto-normalize failed (non-critical): {e}")
 
+            await db.flush()
+            await refresh_invoice_price_points(db, invoice_id)
+            await refresh_invoice_purchase_totals(db, invoice_id, previous_date)
+
             await db.commit()
             await db.refresh(invoice)
 
@@ -781,14 +759,12 @@ async def process_invoice_background(invoice_id: int, image_path: str, kitchen_i
                 from api.ingredients import update_ingredient_prices_for_invoice
                 updated_ingredients = await update_ingredient_prices_for_invoice(invoice_id, kitchen_id, db)
                 if updated_ingredients:
-                    from api.recipes import snapshot_recipes_using_ingredient
-                    for ing_id, price_info in updated_ingredients.items():
-                        await snapshot_recipes_using_ingredient(
-                            ing_id, db,
-                            trigger_source=f"ingredient_price_update: invoice #{invoice_id}",
-                            price_info=price_info,
-                            invoice_id=invoice_id,
-                        )
+                    from api.recipes import snapshot_recipes_using_ingredients
+                    await snapshot_recipes_using_ingredients(
+                        updated_ingredients, db,
+                        trigger_source=f"ingredient_price_update: invoice #{invoice_id}",
+                        invoice_id=invoice_id,
+                    )
                     await db.commit()
                     logger.info(f"Auto-updated ingredient prices for {len(updated_ingredients)} ingredients from invoice {invoice_id}")
             except Exception as e:
@@ -811,9 +787,14 @@ async def process_invoice_background(invoice_id: int, image_path: str, kitchen_i
             invoice.status = InvoiceStatus.PROCESSED
             await db.commit()
 
+            # Warm the line item preview crops before the invoice is opened for review
+            preview_cache.schedule_prerender(invoice_id)
+
             logger.info(f"Invoice {invoice_id} processed: number={invoice.invoice_number}, "
                         f"duplicate_status={invoice.duplicate_status}")
 
+        except OCRCallFailed:
+            raise
         except Exception as e:
             logger.error(f"OCR processing error for invoice {invoice_id}: {e}")
             stmt = select(Invoice).where(Invoice.id == invoice_id)
@@ -824,6 +805,67 @@ async def process_invoice_background(invoice_id: int, image_path: str, kitchen_i
             await db.commit()
 
 
+async def reuse_same_content_analysis(invoice_id: int, image_path: str, kitchen_id: int) -> bool:
+    """Save the OCR analysis of an earlier copy of the same file, without calling Azure
+
+    Looks for the oldest other invoice in the kitchen with the same
+    content_sha256 and a stored Azure response, re-parses that response and
+    saves it through process_invoice_background (whose DuplicateDetector then
+    flags this invoice as a firm duplicate of it). Returns False when there is
+    nothing to reuse, or the invoice already has its own analysis, and it needs
+    a normal OCR run. Jobs queued with force_azure (reprocess-all mode=azure,
+    resend to Azure) don't call this.
+    """
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Invoice.content_sha256, Invoice.ocr_raw_json).where(Invoice.id == invoice_id)
+        )
+        invoice = result.first()
+        # Only first analyses: an invoice with its own stored response is being
+        # explicitly re-sent to Azure
+        if invoice is None or not invoice.content_sha256 or invoice.ocr_raw_json:
+            return False
+        content_hash = invoice.content_sha256
+
+        result = await db.execute(
+            select(Invoice.id, Invoice.image_path, Invoice.file_storage_location, Invoice.ocr_raw_json)
+            .where(
+                Invoice.kitchen_id == kitchen_id,
+                Invoice.content_sha256 == content_hash,
+                Invoice.id != invoice_id,
+                Invoice.ocr_raw_json.is_not(None)
+            )
+            .order_by(Invoice.id)
+            .limit(1)
+        )
+        original = result.first()
+        if original is None or not has_stored_azure_result(original.ocr_raw_json):
+            return False
+
+        settings_result = await db.execute(
+            select(KitchenSettings).where(KitchenSettings.kitchen_id == kitchen_id)
+        )
+        settings = settings_result.scalar_one_or_none()
+
+    if image_path.lower().endswith(".pdf"):
+        # The earlier PDF may have had pages rotated on disk to match its stored
+        # coordinates, so this copy takes the same pages or is analysed afresh
+        if original.file_storage_location != "local" or not os.path.exists(original.image_path):
+            return False
+        await asyncio.to_thread(shutil.copyfile, original.image_path, image_path)
+
+    [extraction] = await reparse_stored_ocr([original.ocr_raw_json], settings)
+    if isinstance(extraction, Exception):
+        logger.warning(f"Could not reuse OCR of invoice {original.id} for invoice {invoice_id}: {extraction}")
+        return False
+
+    await process_invoice_background(invoice_id, image_path, kitchen_id, stored_extraction=extraction)
+    logger.info(f"Invoice {invoice_id}: reused OCR analysis of invoice {original.id} (same file content)")
+    return True
+
+
 @router.get("/", response_model=InvoiceListResponse)
 async def list_invoices(
     status: Optional[str] = None,
@@ -832,6 +874,8 @@ async def list_invoices(
     date_to: Optional[date] = None,
     limit: int = 50,
     offset: int = 0,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -840,60 +884,60 @@ async def list_invoices(
     Status filter supports:
     - pending, processed, reviewed, confirmed: filter by specific status
     - pending_confirmation: filter by processed OR reviewed (awaiting confirmation)
+
+    Paging: pass next_cursor from the previous page as `after` (instead of
+    offset). The total is only counted for the first page unless include_total.
     """
     from sqlalchemy.orm import selectinload
     from sqlalchemy import or_
+    from services.pagination import decode_cursor, keyset_after, paginate, want_total
 
-    # Only load supplier for list view - line_items not needed and slows query significantly
-    query = select(Invoice).options(
-        selectinload(Invoice.supplier)
-    ).where(Invoice.kitchen_id == current_user.kitchen_id)
+    conditions = [Invoice.kitchen_id == current_user.kitchen_id]
 
     # Handle special "pending_confirmation" filter (all non-confirmed: pending, processed, reviewed)
     if status == "pending_confirmation":
-        query = query.where(or_(
+        conditions.append(or_(
             Invoice.status == InvoiceStatus.PENDING,
             Invoice.status == InvoiceStatus.PROCESSED,
             Invoice.status == InvoiceStatus.REVIEWED
         ))
     elif status:
-        query = query.where(Invoice.status == status)
+        conditions.append(Invoice.status == status)
     if supplier_id:
-        query = query.where(Invoice.supplier_id == supplier_id)
+        conditions.append(Invoice.supplier_id == supplier_id)
     if date_from:
-        query = query.where(Invoice.created_at >= date_from)
+        conditions.append(Invoice.created_at >= date_from)
     if date_to:
         # Add one day to include the entire end date
-        query = query.where(Invoice.created_at < date_to + timedelta(days=1))
+        conditions.append(Invoice.created_at < date_to + timedelta(days=1))
 
-    query = query.order_by(Invoice.created_at.desc()).offset(offset).limit(limit)
+    # Only load supplier for list view - line_items not needed and slows query significantly
+    query = select(Invoice).options(
+        selectinload(Invoice.supplier)
+    ).where(*conditions)
+
+    # (created_at, id) descending - idx_invoices_kitchen_created_id
+    if after:
+        query = query.where(keyset_after((Invoice.created_at, Invoice.id), decode_cursor(after, 2)))
+    else:
+        query = query.offset(offset)
+    query = query.order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(limit + 1)
 
     result = await db.execute(query)
-    invoices = result.scalars().all()
+    invoices, next_cursor = paginate(result.scalars().all(), limit, lambda inv: (inv.created_at, inv.id))
 
-    # Count query with same filters
-    count_query = select(func.count(Invoice.id)).where(Invoice.kitchen_id == current_user.kitchen_id)
-    if status == "pending_confirmation":
-        count_query = count_query.where(or_(
-            Invoice.status == InvoiceStatus.PENDING,
-            Invoice.status == InvoiceStatus.PROCESSED,
-            Invoice.status == InvoiceStatus.REVIEWED
-        ))
-    elif status:
-        count_query = count_query.where(Invoice.status == status)
-    if supplier_id:
-        count_query = count_query.where(Invoice.supplier_id == supplier_id)
-    if date_from:
-        count_query = count_query.where(Invoice.created_at >= date_from)
-    if date_to:
-        # Add one day to include the entire end date
-        count_query = count_query.where(Invoice.created_at < date_to + timedelta(days=1))
-    count_result = await db.execute(count_query)
-    total = count_result.scalar() or 0
+    total = None
+    if want_total(include_total, after):
+        if not after and len(invoices) < limit and (offset == 0 or invoices):
+            total = offset + len(invoices)
+        else:
+            count_result = await db.execute(select(func.count(Invoice.id)).where(*conditions))
+            total = count_result.scalar() or 0
 
     return InvoiceListResponse(
         invoices=[invoice_to_response(inv) for inv in invoices],
-        total=total
+        total=total,
+        next_cursor=next_cursor
     )
 
 
@@ -1033,6 +1077,19 @@ async def search_line_items(
     )
 
 
+@router.get("/ocr-queue")
+async def get_ocr_queue_status(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """OCR queue depth (queued, running, awaiting retry, failed) and throughput for the kitchen."""
+    return {
+        **await ocr_queue.status(db, current_user.kitchen_id),
+        "preview_cache": preview_cache.stats(),
+        "pdf_jobs": pdf_job_stats(),
+    }
+
+
 @router.get("/{invoice_id}", response_model=InvoiceResponse)
 async def get_invoice(
     invoice_id: int,
@@ -1041,10 +1098,10 @@ async def get_invoice(
 ):
     """
     Get a single invoice by ID.
-    Re-applies latest product definitions to ensure users see current defaults.
+    Read-only: the latest product definitions are applied to the line items
+    in GET /{invoice_id}/line-items, and saved when the invoice is confirmed.
     """
     from sqlalchemy.orm import selectinload
-    from sqlalchemy import or_
 
     result = await db.execute(
         select(Invoice).options(
@@ -1059,93 +1116,8 @@ async def get_invoice(
     invoice = result.scalar_one_or_none()
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
-
-    # Re-apply latest product definitions when opening invoice
-    # This ensures users always see the most current defaults
-    if invoice.supplier_id and invoice.line_items:
-        logger.info(f"get_invoice: Re-applying latest product definitions for invoice {invoice_id}")
-
-        # Fetch current product definitions
-        conditions = [ProductDefinition.kitchen_id == current_user.kitchen_id]
-        conditions.append(
-            or_(
-                ProductDefinition.supplier_id == invoice.supplier_id,
-                ProductDefinition.supplier_id.is_(None)
-            )
-        )
-
-        result = await db.execute(
-            select(ProductDefinition).where(*conditions)
-        )
-        all_definitions = result.scalars().all()
-
-        if all_definitions:
-            # Build lookup dicts
-            definitions_by_code = {}
-            definitions_by_desc = []
-
-            for d in all_definitions:
-                if d.product_code:
-                    if d.product_code in definitions_by_code:
-                        existing = definitions_by_code[d.product_code]
-                        if existing.supplier_id and not d.supplier_id:
-                            continue
-                    definitions_by_code[d.product_code] = d
-                if d.description_pattern:
-                    norm_pattern = normalize_description(d.description_pattern)
-                    if norm_pattern:
-                        definitions_by_desc.append((norm_pattern, d))
-
-            definitions_by_desc.sort(key=lambda x: (0 if x[1].supplier_id else 1, -len(x[0])))
-
-            def find_definition_for_item(item: LineItem) -> ProductDefinition | None:
-                if item.product_code and item.product_code in definitions_by_code:
-                    return definitions_by_code[item.product_code]
-                if item.description:
-                    item_desc_norm = normalize_description(item.description)
-                    for pattern, defn in definitions_by_desc:
-                        if pattern in item_desc_norm:
-                            return defn
-                return None
-
-            # Apply definitions to line items
-            updated_count = 0
-            for item in invoice.line_items:
-                defn = find_definition_for_item(item)
-                if not defn:
-                    continue
-
-                # Re-apply portions_per_unit from latest definition
-                if defn.portions_per_unit:
-                    item.portions_per_unit = defn.portions_per_unit
-                    updated_count += 1
-
-                    # Recalculate cost_per_portion
-                    if item.pack_quantity and item.unit_price:
-                        item.cost_per_portion = Decimal(str(
-                            round(float(item.unit_price) / (item.pack_quantity * defn.portions_per_unit), 4)
-                        ))
-
-                # Also re-apply pack_quantity if definition has it but line item doesn't
-                if item.pack_quantity is None and defn.pack_quantity:
-                    item.pack_quantity = defn.pack_quantity
-                    if item.unit_price:
-                        item.cost_per_item = Decimal(str(round(float(item.unit_price) / defn.pack_quantity, 4)))
-                        if item.portions_per_unit:
-                            item.cost_per_portion = Decimal(str(
-                                round(float(item.unit_price) / (defn.pack_quantity * item.portions_per_unit), 4)
-                            ))
-
-                # Re-apply unit_size and unit_size_type if definition has them
-                if item.unit_size is None and defn.unit_size:
-                    item.unit_size = defn.unit_size
-                if item.unit_size_type is None and defn.unit_size_type:
-                    item.unit_size_type = defn.unit_size_type
-
-            if updated_count > 0:
-                logger.info(f"get_invoice: Re-applied definitions to {updated_count} line items")
-                await db.commit()
-                await db.refresh(invoice)
+    if not invoice.ocr_geometry:
+        await load_ocr_raw_json(db, invoice)  # Page count for invoices OCR'd before the geometry index
 
     # Query disputes for this invoice
     from models.dispute import InvoiceDispute, DisputeStatus
@@ -1324,13 +1296,13 @@ async def update_invoice(
     db: AsyncSession = Depends(get_db)
 ):
     """Update invoice data (for manual corrections)"""
-    from sqlalchemy import or_
     from models.dispute import InvoiceDispute, DisputeStatus
 
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
     # Track if supplier is being changed
     old_supplier_id = invoice.supplier_id
+    previous_date = invoice.invoice_date
     update_data = update.model_dump(exclude_unset=True)
     new_supplier_id = update_data.get("supplier_id")
     supplier_changed = new_supplier_id is not None and new_supplier_id != old_supplier_id
@@ -1380,6 +1352,27 @@ async def update_invoice(
         else:
             setattr(invoice, field, value)
 
+    # Price points carry a copy of these invoice fields
+    if {"supplier_id", "invoice_date", "invoice_number", "document_type"} & set(update_data.keys()):
+        await db.flush()
+        await refresh_invoice_price_points(db, invoice_id)
+
+    # Save the product definitions the review screen showed (GET line-items applies them in memory)
+    if update_data.get("status") == "CONFIRMED" and invoice.supplier_id and not supplier_changed:
+        matcher = await get_definition_matcher(db, current_user.kitchen_id, invoice.supplier_id)
+        if not matcher.is_empty():
+            result = await db.execute(select(LineItem).where(LineItem.invoice_id == invoice_id))
+            for item in result.scalars().all():
+                defn = matcher.find(item.product_code, item.description)
+                if defn:
+                    apply_latest_definition(item, defn)
+
+    # Daily purchase totals only count confirmed invoices, by date, supplier and category.
+    # Last before commit: the refresh holds the kitchen's totals lock until then
+    if {"status", "supplier_id", "invoice_date", "category", "document_type"} & set(update_data.keys()):
+        await db.flush()
+        await refresh_invoice_purchase_totals(db, invoice_id, previous_date)
+
     await db.commit()
     await db.refresh(invoice)
 
@@ -1395,58 +1388,17 @@ async def update_invoice(
         line_items = result.scalars().all()
 
         if line_items:
-            # Get definitions for the new supplier (or kitchen-wide)
-            conditions = [
-                ProductDefinition.kitchen_id == current_user.kitchen_id,
-                or_(
-                    ProductDefinition.supplier_id == new_supplier_id,
-                    ProductDefinition.supplier_id.is_(None)
-                )
-            ]
+            # Definitions for the new supplier (or kitchen-wide)
+            matcher = await get_definition_matcher(db, current_user.kitchen_id, new_supplier_id)
 
-            result = await db.execute(
-                select(ProductDefinition).where(*conditions)
-            )
-            all_definitions = result.scalars().all()
-
-            # Build lookup dicts - prefer supplier-specific over kitchen-wide
-            definitions_by_code = {}
-            definitions_by_desc = []  # List of (normalized_pattern, definition) tuples
-
-            for d in all_definitions:
-                if d.product_code:
-                    if d.product_code in definitions_by_code:
-                        existing = definitions_by_code[d.product_code]
-                        if existing.supplier_id and not d.supplier_id:
-                            continue
-                    definitions_by_code[d.product_code] = d
-                if d.description_pattern:
-                    norm_pattern = normalize_description(d.description_pattern)
-                    if norm_pattern:
-                        definitions_by_desc.append((norm_pattern, d))
-
-            # Sort description patterns: prefer supplier-specific first, then by length
-            definitions_by_desc.sort(key=lambda x: (0 if x[1].supplier_id else 1, -len(x[0])))
-
-            logger.info(f"update_invoice: found {len(definitions_by_code)} code definitions, {len(definitions_by_desc)} description definitions for supplier {new_supplier_id}")
-
-            def find_definition_for_item(item: LineItem) -> ProductDefinition | None:
-                if item.product_code and item.product_code in definitions_by_code:
-                    return definitions_by_code[item.product_code]
-                if item.description:
-                    item_desc_norm = normalize_description(item.description)
-                    for pattern, defn in definitions_by_desc:
-                        if pattern in item_desc_norm:
-                            return defn
-                return None
+            logger.info(f"update_invoice: found {matcher.code_count} code definitions, {matcher.pattern_count} description definitions for supplier {new_supplier_id}")
 
             # Apply definitions to line items
             for item in line_items:
-                defn = find_definition_for_item(item)
+                defn, match_type = matcher.match(item.product_code, item.description)
                 if not defn:
                     continue
 
-                match_type = "product_code" if item.product_code and item.product_code in definitions_by_code else "description"
                 logger.info(f"update_invoice: applying definition (matched by {match_type}) to item: code={item.product_code}, desc={item.description[:50] if item.description else ''}")
 
                 # Only update if portions_per_unit is not already set
@@ -1481,10 +1433,8 @@ async def update_invoice(
     # Auto-update PDF highlights/notes overlay when notes change (if annotations enabled)
     if "notes" in update_data:
         try:
-            from services.pdf_highlighter import PDFHighlighter, parse_azure_ocr_line_items
             from sqlalchemy.orm import selectinload
             from models.settings import KitchenSettings
-            import json
 
             # Check if PDF annotations are enabled in settings
             settings_result = await db.execute(
@@ -1501,9 +1451,9 @@ async def update_invoice(
                 )
                 full_invoice = invoice_result.scalar_one_or_none()
 
-                if full_invoice and full_invoice.ocr_raw_json and os.path.exists(full_invoice.image_path):
-                    ocr_data = json.loads(full_invoice.ocr_raw_json)
-                    ocr_line_items = parse_azure_ocr_line_items(ocr_data)
+                if full_invoice and await has_ocr_data(db, full_invoice) and os.path.exists(full_invoice.image_path):
+                    ocr_data = await get_ocr_geometry(db, full_invoice) or {}
+                    ocr_line_items = ocr_data.get("line_items", [])
 
                     non_stock_items = [item for item in full_invoice.line_items if item.is_non_stock]
 
@@ -1515,8 +1465,8 @@ async def update_invoice(
 
                     # Regenerate all highlights/notes (clears existing annotations first)
                     # This works even with empty ocr_line_items - notes overlay still gets added
-                    highlighter = PDFHighlighter(full_invoice.image_path)
-                    highlighter.highlight_items_with_ocr_data(
+                    await highlight_invoice_pdf(
+                        pdf_path=full_invoice.image_path,
                         ocr_line_items=ocr_line_items,
                         non_stock_line_items=non_stock_items,
                         output_path=full_invoice.image_path,
@@ -1561,11 +1511,8 @@ async def update_invoice(
                         # Update PDF highlights if annotations enabled
                         if settings.dext_include_annotations:
                             try:
-                                from services.pdf_highlighter import PDFHighlighter, parse_azure_ocr_line_items
-                                import json
-
-                                ocr_data = json.loads(full_invoice.ocr_raw_json) if full_invoice.ocr_raw_json else {}
-                                ocr_line_items = parse_azure_ocr_line_items(ocr_data)
+                                ocr_data = await get_ocr_geometry(db, full_invoice) or {}
+                                ocr_line_items = ocr_data.get("line_items", [])
 
                                 if ocr_line_items:
                                     non_stock_items = [item for item in full_invoice.line_items if item.is_non_stock]
@@ -1575,8 +1522,8 @@ async def update_invoice(
                                     if not os.path.exists(backup_path):
                                         shutil.copy2(full_invoice.image_path, backup_path)
 
-                                    highlighter = PDFHighlighter(full_invoice.image_path)
-                                    highlighter.highlight_items_with_ocr_data(
+                                    await highlight_invoice_pdf(
+                                        pdf_path=full_invoice.image_path,
                                         ocr_line_items=ocr_line_items,
                                         non_stock_line_items=non_stock_items,
                                         output_path=full_invoice.image_path,
@@ -1689,7 +1636,10 @@ async def delete_invoice(
     archival_service = FileArchivalService(db, current_user.kitchen_id)
     await archival_service.handle_invoice_deletion(invoice)
 
+    invoice_date = invoice.invoice_date
     await db.delete(invoice)
+    await db.flush()
+    await refresh_purchase_totals(db, current_user.kitchen_id, [invoice_date])
     await db.commit()
 
     return {"message": "Invoice deleted"}
@@ -1724,7 +1674,7 @@ async def get_line_items(
     db: AsyncSession = Depends(get_db)
 ):
     """Get line items for an invoice with price change detection"""
-    from services.price_history import PriceHistoryService
+    from services.price_history import PriceHistoryService, PriceStatusRequest
 
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
@@ -1738,10 +1688,42 @@ async def get_line_items(
     items = result.scalars().all()
 
     # Get page numbers from OCR data (maps line_number -> page_number)
-    page_numbers = get_line_item_page_numbers_by_line_number(invoice)
+    page_numbers = get_line_item_page_numbers_by_line_number(await get_ocr_geometry(db, invoice))
 
-    # Initialize price history service for price status calculation
-    price_service = PriceHistoryService(db, current_user.kitchen_id)
+    # Resolve price status for every priced item in one batch
+    # (constant number of queries regardless of line count)
+    statuses = {}
+    if invoice.supplier_id:
+        priced_items = [item for item in items if item.unit_price]
+        price_service = PriceHistoryService(db, current_user.kitchen_id)
+        try:
+            batch = await price_service.get_price_statuses(
+                supplier_id=invoice.supplier_id,
+                requests=[
+                    PriceStatusRequest(
+                        product_code=item.product_code,
+                        description=item.description,
+                        unit=item.unit,
+                        current_price=item.unit_price,
+                    )
+                    for item in priced_items
+                ],
+                current_invoice_id=invoice_id,
+                reference_date=invoice.invoice_date
+            )
+            statuses = {item.id: status for item, status in zip(priced_items, batch)}
+        except Exception as e:
+            logger.warning(f"Failed to get price statuses for invoice {invoice_id}: {e}")
+
+    # Show the latest product definitions. Applied in memory only - nothing
+    # commits after this point, and the values are saved on confirm.
+    if invoice.supplier_id and items:
+        matcher = await get_definition_matcher(db, current_user.kitchen_id, invoice.supplier_id)
+        if not matcher.is_empty():
+            for item in items:
+                defn = matcher.find(item.product_code, item.description)
+                if defn:
+                    apply_latest_definition(item, defn)
 
     responses = []
     for item in items:
@@ -1752,24 +1734,13 @@ async def get_line_items(
         future_price = None
         future_change_percent = None
 
-        if item.unit_price and invoice.supplier_id:
-            try:
-                status = await price_service.get_price_status(
-                    supplier_id=invoice.supplier_id,
-                    product_code=item.product_code,
-                    description=item.description,
-                    current_price=item.unit_price,
-                    unit=item.unit,
-                    current_invoice_id=invoice_id,
-                    reference_date=invoice.invoice_date
-                )
-                price_change_status = status.status
-                price_change_percent = status.change_percent
-                previous_price = float(status.previous_price) if status.previous_price else None
-                future_price = float(status.future_price) if status.future_price else None
-                future_change_percent = status.future_change_percent
-            except Exception as e:
-                logger.warning(f"Failed to get price status for line item {item.id}: {e}")
+        status = statuses.get(item.id)
+        if status:
+            price_change_status = status.status
+            price_change_percent = status.change_percent
+            previous_price = float(status.previous_price) if status.previous_price else None
+            future_price = float(status.future_price) if status.future_price else None
+            future_change_percent = status.future_change_percent
 
         # Auto-detect pack size from description/raw_content/unit field
         pq, us, ust = detect_pack_size(item)
@@ -1857,6 +1828,9 @@ async def add_line_item(
         cost_per_portion=Decimal(str(cost_per_portion)) if cost_per_portion else None
     )
     db.add(line_item)
+    await db.flush()
+    await refresh_invoice_price_points(db, invoice_id)
+    await refresh_invoice_purchase_totals(db, invoice_id)
     await db.commit()
     await db.refresh(line_item)
 
@@ -1937,6 +1911,9 @@ async def update_line_item(
             else:
                 line_item.cost_per_portion = None
 
+    await db.flush()
+    await refresh_invoice_price_points(db, invoice_id)
+    await refresh_invoice_purchase_totals(db, invoice_id)
     await db.commit()
     await db.refresh(line_item)
 
@@ -1944,16 +1921,14 @@ async def update_line_item(
     if "unit_price" in update_data:
         try:
             from api.ingredients import update_ingredient_prices_for_invoice
-            from api.recipes import snapshot_recipes_using_ingredient
+            from api.recipes import snapshot_recipes_using_ingredients
             updated_ingredients = await update_ingredient_prices_for_invoice(invoice_id, current_user.kitchen_id, db)
             if updated_ingredients:
-                for ing_id, price_info in updated_ingredients.items():
-                    await snapshot_recipes_using_ingredient(
-                        ing_id, db,
-                        trigger_source=f"line_item_update: #{item_id}",
-                        price_info=price_info,
-                        invoice_id=invoice_id,
-                    )
+                await snapshot_recipes_using_ingredients(
+                    updated_ingredients, db,
+                    trigger_source=f"line_item_update: #{item_id}",
+                    invoice_id=invoice_id,
+                )
                 await db.commit()
         except Exception as e:
             logger.warning(f"Ingredient price auto-update failed: {e}")
@@ -1961,10 +1936,8 @@ async def update_line_item(
     # Auto-update PDF highlights when is_non_stock status changes (if annotations enabled)
     if "is_non_stock" in update_data:
         try:
-            from services.pdf_highlighter import PDFHighlighter, parse_azure_ocr_line_items
             from sqlalchemy.orm import selectinload
             from models.settings import KitchenSettings
-            import json
 
             # Check if PDF annotations are enabled in settings
             settings_result = await db.execute(
@@ -1981,9 +1954,9 @@ async def update_line_item(
                 )
                 invoice = invoice_result.scalar_one_or_none()
 
-                if invoice and invoice.ocr_raw_json and os.path.exists(invoice.image_path):
-                    ocr_data = json.loads(invoice.ocr_raw_json)
-                    ocr_line_items = parse_azure_ocr_line_items(ocr_data)
+                if invoice and await has_ocr_data(db, invoice) and os.path.exists(invoice.image_path):
+                    ocr_data = await get_ocr_geometry(db, invoice) or {}
+                    ocr_line_items = ocr_data.get("line_items", [])
 
                     non_stock_items = [item for item in invoice.line_items if item.is_non_stock]
 
@@ -1995,8 +1968,8 @@ async def update_line_item(
 
                     # Regenerate all highlights (clears existing, adds for current non-stock items)
                     # Works even with empty ocr_line_items - notes overlay still preserved
-                    highlighter = PDFHighlighter(invoice.image_path)
-                    highlighter.highlight_items_with_ocr_data(
+                    await highlight_invoice_pdf(
+                        pdf_path=invoice.image_path,
                         ocr_line_items=ocr_line_items,
                         non_stock_line_items=non_stock_items,
                         output_path=invoice.image_path,
@@ -2057,6 +2030,8 @@ async def delete_line_item(
         raise HTTPException(status_code=404, detail="Line item not found")
 
     await db.delete(line_item)
+    await db.flush()
+    await refresh_invoice_purchase_totals(db, invoice_id)
     await db.commit()
 
     return {"message": "Line item deleted"}
@@ -2075,9 +2050,10 @@ async def get_invoice_ocr_data(
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
     raw_json = None
-    if invoice.ocr_raw_json:
+    stored_json = await load_ocr_raw_json(db, invoice)
+    if stored_json:
         try:
-            raw_json = json_module.loads(invoice.ocr_raw_json)
+            raw_json = json_module.loads(stored_json)
         except json_module.JSONDecodeError:
             raw_json = None
 
@@ -2089,19 +2065,69 @@ async def get_invoice_ocr_data(
     }
 
 
+async def _serve_preview_crop(
+    db: AsyncSession,
+    invoice: Invoice,
+    kitchen_id: int,
+    geometry: dict,
+    page_number: int,
+    box: list,
+    pad: float,
+    if_none_match: Optional[str]
+):
+    """
+    PNG crop of box (inches, plus pad) on a page of the invoice file, served from
+    the preview cache. The cache key is the ETag; a matching If-None-Match gets
+    a 304 without the invoice file being read when its hash is already known.
+    """
+    from starlette.responses import Response
+    from services.file_archival_service import FileArchivalService
+
+    size = page_size(geometry, page_number)
+    file_bytes = None
+    file_hash = preview_cache.known_file_hash(invoice)
+    if file_hash is None:
+        archival_service = FileArchivalService(db, kitchen_id)
+        success, file_bytes = await archival_service.get_file_content(invoice)
+        if not success:
+            raise HTTPException(status_code=404, detail="File not found")
+        file_hash = preview_cache.remember_file_hash(invoice, file_bytes)
+
+    key = preview_cache.crop_key(file_hash, page_number, box, pad, size)
+    headers = {"ETag": f'"{key}"', "Cache-Control": PREVIEW_CACHE_CONTROL}
+    if if_none_match and key in if_none_match:
+        preview_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    png = await asyncio.to_thread(preview_cache.get, key)
+    if png is not None:
+        preview_cache.hits += 1
+        return Response(content=png, media_type="image/png", headers=headers)
+
+    preview_cache.misses += 1
+    if file_bytes is None:
+        archival_service = FileArchivalService(db, kitchen_id)
+        success, file_bytes = await archival_service.get_file_content(invoice)
+        if not success:
+            raise HTTPException(status_code=404, detail="File not found")
+
+    is_pdf = invoice.image_path.split(".")[-1].lower() == "pdf"
+    png = await asyncio.to_thread(
+        preview_cache.render_crop, file_bytes, is_pdf, file_hash, page_number, box, pad, size
+    )
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
 @router.get("/{invoice_id}/line-items/{line_number}/preview")
 async def get_line_item_preview(
     invoice_id: int,
     line_number: int,
     token: str,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
     """Get a cropped image preview of a specific line item from the invoice OCR bounding box."""
-    import json as json_module
-    import io
     from auth.jwt import get_current_user_from_token
-    from starlette.responses import Response
-    from services.file_archival_service import FileArchivalService
 
     current_user = await get_current_user_from_token(token, db)
     if not current_user:
@@ -2109,87 +2135,24 @@ async def get_line_item_preview(
 
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
-    # Parse OCR JSON to get bounding box
-    if not invoice.ocr_raw_json:
+    # Look up the line item's bounding box in the OCR geometry index
+    if not await has_ocr_data(db, invoice):
         raise HTTPException(status_code=404, detail="No OCR data")
 
-    try:
-        ocr_json = json_module.loads(invoice.ocr_raw_json)
-    except json_module.JSONDecodeError:
+    geometry = await get_ocr_geometry(db, invoice)
+    if geometry is None:
         raise HTTPException(status_code=404, detail="Invalid OCR data")
 
-    # Navigate to line item bounding box
-    try:
-        items = ocr_json["documents"][0]["fields"]["Items"]["value"]
-        if line_number < 0 or line_number >= len(items):
-            raise HTTPException(status_code=404, detail="Line number out of range")
-        region = items[line_number].get("bounding_regions", [{}])[0]
-        polygon = region.get("polygon")
-        page_number = region.get("page_number", 1)
-        if not polygon or len(polygon) < 4:
-            raise HTTPException(status_code=404, detail="No bounding box")
-    except (KeyError, IndexError):
-        raise HTTPException(status_code=404, detail="No bounding box data")
-
-    # Calculate bounding box from polygon
-    xs = [p[0] for p in polygon]
-    ys = [p[1] for p in polygon]
-    x0_inches, x1_inches = min(xs), max(xs)
-    y0_inches, y1_inches = min(ys), max(ys)
-
-    # Get page dimensions
-    pages = ocr_json.get("pages", [])
-    page_info = pages[page_number - 1] if page_number <= len(pages) else {}
-    page_w_inches = page_info.get("width", 8.5)
-    page_h_inches = page_info.get("height", 11)
-
-    # Padding in inches
-    pad = 0.15
-
-    # Get the file content
-    archival_service = FileArchivalService(db, current_user.kitchen_id)
-    success, file_bytes = await archival_service.get_file_content(invoice)
-    if not success:
-        raise HTTPException(status_code=404, detail="File not found")
+    items = geometry["items"]
+    if line_number < 0 or line_number >= len(items):
+        raise HTTPException(status_code=404, detail="Line number out of range")
+    if not items[line_number]["box"]:
+        raise HTTPException(status_code=404, detail="No bounding box")
 
-    ext = invoice.image_path.split(".")[-1].lower()
-
-    if ext == "pdf":
-        # PDF: use PyMuPDF to render page crop
-        import fitz
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        page = doc[page_number - 1]
-
-        # Convert inches to points (72 pts/inch)
-        rect = fitz.Rect(
-            (x0_inches - pad) * 72,
-            (y0_inches - pad) * 72,
-            (x1_inches + pad) * 72,
-            (y1_inches + pad) * 72,
-        )
-        rect = rect & page.rect  # clip to page bounds
-
-        pixmap = page.get_pixmap(clip=rect, dpi=200)
-        img_bytes = pixmap.tobytes("png")
-        doc.close()
-        return Response(content=img_bytes, media_type="image/png", headers={"Cache-Control": "max-age=3600"})
-    else:
-        # Image: use Pillow to crop
-        from PIL import Image
-        img = Image.open(io.BytesIO(file_bytes))
-        w, h = img.size
-
-        # Convert inch percentages to pixels
-        crop_box = (
-            max(0, int((x0_inches / page_w_inches - pad / page_w_inches) * w)),
-            max(0, int((y0_inches / page_h_inches - pad / page_h_inches) * h)),
-            min(w, int((x1_inches / page_w_inches + pad / page_w_inches) * w)),
-            min(h, int((y1_inches / page_h_inches + pad / page_h_inches) * h)),
-        )
-        cropped = img.crop(crop_box)
-        buf = io.BytesIO()
-        cropped.save(buf, format="PNG")
-        return Response(content=buf.getvalue(), media_type="image/png", headers={"Cache-Control": "max-age=3600"})
+    return await _serve_preview_crop(
+        db, invoice, current_user.kitchen_id, geometry,
+        items[line_number]["page"], items[line_number]["box"], LINE_PAD_INCHES, if_none_match
+    )
 
 
 # Field name mapping: URL param -> Azure OCR field key
@@ -2208,14 +2171,11 @@ async def get_line_item_field_preview(
     line_number: int,
     field_name: str,
     token: str,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
     """Get a cropped image preview of a specific field within a line item (e.g. product_code)."""
-    import json as json_module
-    import io
     from auth.jwt import get_current_user_from_token
-    from starlette.responses import Response
-    from services.file_archival_service import FileArchivalService
 
     azure_key = _FIELD_KEY_MAP.get(field_name)
     if not azure_key:
@@ -2227,79 +2187,25 @@ async def get_line_item_field_preview(
 
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
-    if not invoice.ocr_raw_json:
+    if not await has_ocr_data(db, invoice):
         raise HTTPException(status_code=404, detail="No OCR data")
 
-    try:
-        ocr_json = json_module.loads(invoice.ocr_raw_json)
-    except json_module.JSONDecodeError:
+    geometry = await get_ocr_geometry(db, invoice)
+    if geometry is None:
         raise HTTPException(status_code=404, detail="Invalid OCR data")
 
-    # Navigate to the specific field's bounding box within the line item
-    try:
-        items = ocr_json["documents"][0]["fields"]["Items"]["value"]
-        if line_number < 0 or line_number >= len(items):
-            raise HTTPException(status_code=404, detail="Line number out of range")
-        item_value = items[line_number].get("value", {})
-        field_data = item_value.get(azure_key)
-        if not field_data:
-            raise HTTPException(status_code=404, detail=f"Field '{field_name}' not found in line item")
-        region = field_data.get("bounding_regions", [{}])[0]
-        polygon = region.get("polygon")
-        page_number = region.get("page_number", 1)
-        if not polygon or len(polygon) < 4:
-            raise HTTPException(status_code=404, detail="No bounding box for field")
-    except (KeyError, IndexError):
-        raise HTTPException(status_code=404, detail="No bounding box data")
-
-    xs = [p[0] for p in polygon]
-    ys = [p[1] for p in polygon]
-    x0_inches, x1_inches = min(xs), max(xs)
-    y0_inches, y1_inches = min(ys), max(ys)
-
-    pages = ocr_json.get("pages", [])
-    page_info = pages[page_number - 1] if page_number <= len(pages) else {}
-    page_w_inches = page_info.get("width", 8.5)
-    page_h_inches = page_info.get("height", 11)
-
-    pad = 0.05  # smaller padding for individual fields
-
-    archival_service = FileArchivalService(db, current_user.kitchen_id)
-    success, file_bytes = await archival_service.get_file_content(invoice)
-    if not success:
-        raise HTTPException(status_code=404, detail="File not found")
-
-    ext = invoice.image_path.split(".")[-1].lower()
-
-    if ext == "pdf":
-        import fitz
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        page = doc[page_number - 1]
-        rect = fitz.Rect(
-            (x0_inches - pad) * 72,
-            (y0_inches - pad) * 72,
-            (x1_inches + pad) * 72,
-            (y1_inches + pad) * 72,
-        )
-        rect = rect & page.rect
-        pixmap = page.get_pixmap(clip=rect, dpi=200)
-        img_bytes = pixmap.tobytes("png")
-        doc.close()
-        return Response(content=img_bytes, media_type="image/png", headers={"Cache-Control": "max-age=3600"})
-    else:
-        from PIL import Image
-        img = Image.open(io.BytesIO(file_bytes))
-        w, h = img.size
-        crop_box = (
-            max(0, int((x0_inches / page_w_inches - pad / page_w_inches) * w)),
-            max(0, int((y0_inches / page_h_inches - pad / page_h_inches) * h)),
-            min(w, int((x1_inches / page_w_inches + pad / page_w_inches) * w)),
-            min(h, int((y1_inches / page_h_inches + pad / page_h_inches) * h)),
-        )
-        cropped = img.crop(crop_box)
-        buf = io.BytesIO()
-        cropped.save(buf, format="PNG")
-        return Response(content=buf.getvalue(), media_type="image/png", headers={"Cache-Control": "max-age=3600"})
+    # The specific field's bounding box within the line item
+    items = geometry["items"]
+    if line_number < 0 or line_number >= len(items):
+        raise HTTPException(status_code=404, detail="Line number out of range")
+    field_geometry = items[line_number]["fields"].get(azure_key)
+    if not field_geometry:
+        raise HTTPException(status_code=404, detail=f"No bounding box for field '{field_name}'")
+
+    return await _serve_preview_crop(
+        db, invoice, current_user.kitchen_id, geometry,
+        field_geometry["page"], field_geometry["box"], FIELD_PAD_INCHES, if_none_match
+    )
 
 
 @router.get("/{invoice_id}/parse-dates")
@@ -2309,18 +2215,12 @@ async def parse_dates_from_ocr(
     db: AsyncSession = Depends(get_db)
 ):
     """Parse potential dates from invoice OCR raw text content"""
-    import json as _json
     from datetime import datetime
 
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
     raw_text = invoice.ocr_raw_text or ""
-    raw_json: dict = {}
-    if invoice.ocr_raw_json:
-        try:
-            raw_json = _json.loads(invoice.ocr_raw_json)
-        except Exception:
-            pass
+    geometry = await get_ocr_geometry(db, invoice) or {}
 
     # Date patterns to look for (UK/EU formats primarily)
     # DD.MM.YYYY, DD/MM/YYYY, DD-MM-YYYY, YYYY-MM-DD
@@ -2358,7 +2258,7 @@ async def parse_dates_from_ocr(
                             "date": date_str,
                             "original": match.group(0),
                             "context": context,
-                            "bbox": _find_word_bbox(raw_json, match.group(0)),
+                            "bbox": _find_word_bbox(geometry, match.group(0)),
                         })
             except (ValueError, IndexError):
                 continue
@@ -2409,64 +2309,24 @@ def _generalize_invoice_number_pattern(sample: str) -> str:
     return r'\b' + ''.join(parts) + r'\b'
 
 
-def _find_word_bbox(raw_json: dict, text: str) -> dict | None:
+def _find_word_bbox(geometry: dict, text: str) -> dict | None:
     """
-    Search Azure OCR page words for a token exactly matching `text`.
+    Look up a page word exactly matching `text` in the OCR geometry word index.
     Returns bbox as percentages of page dimensions so it can be used with
     the same canvas-crop logic as field bounding boxes.
-    Handles both flat polygon [x1,y1,x2,y2,...] and nested [[x1,y1],...] formats.
     """
-    text_norm = text.strip().upper()
-    for page_idx, page in enumerate(raw_json.get('pages', [])):
-        page_width = page.get('width', 8.5) or 8.5
-        page_height = page.get('height', 11.0) or 11.0
-        for word in page.get('words', []):
-            if word.get('content', '').strip().upper() != text_norm:
-                continue
-            polygon = word.get('polygon', [])
-            if not polygon:
-                continue
-            # Flat: [x1,y1,x2,y2,...] vs nested: [[x1,y1],[x2,y2],...]
-            if isinstance(polygon[0], (int, float)):
-                xs = polygon[0::2]
-                ys = polygon[1::2]
-            else:
-                xs = [p[0] for p in polygon]
-                ys = [p[1] for p in polygon]
-            if not xs or not ys:
-                continue
-            return {
-                'x': (min(xs) / page_width) * 100,
-                'y': (min(ys) / page_height) * 100,
-                'width': ((max(xs) - min(xs)) / page_width) * 100,
-                'height': ((max(ys) - min(ys)) / page_height) * 100,
-                'pageNumber': page_idx + 1,
-            }
-    return None
-
-
-def _field_bbox(raw_json: dict, field_name: str) -> dict | None:
-    """Extract bbox from an Azure structured document field."""
-    try:
-        region = raw_json['documents'][0]['fields'][field_name]['bounding_regions'][0]
-        polygon = region['polygon']
-        page_number = region.get('page_number', 1)
-        page = raw_json['pages'][page_number - 1]
-        page_width = page.get('width', 8.5) or 8.5
-        page_height = page.get('height', 11.0) or 11.0
-        if isinstance(polygon[0], (int, float)):
-            xs = polygon[0::2]; ys = polygon[1::2]
-        else:
-            xs = [p[0] for p in polygon]; ys = [p[1] for p in polygon]
-        return {
-            'x': (min(xs) / page_width) * 100,
-            'y': (min(ys) / page_height) * 100,
-            'width': ((max(xs) - min(xs)) / page_width) * 100,
-            'height': ((max(ys) - min(ys)) / page_height) * 100,
-            'pageNumber': page_number,
-        }
-    except (KeyError, IndexError, TypeError):
+    word = (geometry.get('words') or {}).get(text.strip().upper())
+    if not word:
         return None
+    return box_to_percent(geometry, word['page'], word['box'])
+
+
+def _field_bbox(geometry: dict, field_name: str) -> dict | None:
+    """Bbox of an Azure structured document field from the OCR geometry index."""
+    field = (geometry.get('fields') or {}).get(field_name)
+    if not field or not field.get('box'):
+        return None
+    return box_to_percent(geometry, field['page'], field['box'])
 
 
 # Context signals that indicate a match is NOT an invoice number
@@ -2491,19 +2351,12 @@ async def parse_invoice_number_from_ocr(
     a format pattern, then scans the raw text for matches.
     Falls back to keyword-proximity heuristics when no history is available.
     """
-    import json as _json
-
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
     raw_text = invoice.ocr_raw_text or ""
 
     candidates = []
     seen = set()
-    raw_json: dict = {}
-    if invoice.ocr_raw_json:
-        try:
-            raw_json = _json.loads(invoice.ocr_raw_json)
-        except Exception:
-            pass
+    geometry = await get_ocr_geometry(db, invoice) or {}
 
     def add_candidate(value: str, context: str, source: str, bbox=None):
         value = value.strip()
@@ -2516,16 +2369,15 @@ async def parse_invoice_number_from_ocr(
         candidates.append(entry)
 
     # ── 1. Check Azure OCR structured fields that might contain the number ──────
-    if raw_json:
+    if geometry:
         try:
-            docs = raw_json.get("documents", [{}])
-            fields = docs[0].get("fields", {}) if docs else {}
+            fields = geometry.get("fields") or {}
             for field_name in ("InvoiceId", "TransactionId", "PurchaseOrder", "PaymentRef",
                                "OrderId", "DocumentNumber", "BillingReference"):
                 field = fields.get(field_name)
                 if field and field.get("value"):
                     val = str(field["value"]).strip()
-                    bbox = _field_bbox(raw_json, field_name) or _find_word_bbox(raw_json, val)
+                    bbox = _field_bbox(geometry, field_name) or _find_word_bbox(geometry, val)
                     add_candidate(val, f"Azure OCR field: {field_name}", "ocr_field", bbox)
         except Exception:
             pass
@@ -2573,7 +2425,7 @@ async def parse_invoice_number_from_ocr(
                     start = max(0, match.start() - 50)
                     end = min(len(raw_text), match.end() + 30)
                     context = raw_text[start:end].replace('\n', ' ').strip()
-                    bbox = _find_word_bbox(raw_json, val)
+                    bbox = _find_word_bbox(geometry, val)
                     add_candidate(val, context, "supplier_pattern", bbox)
             except re.error:
                 continue
@@ -2590,7 +2442,7 @@ async def parse_invoice_number_from_ocr(
         start = max(0, match.start() - 10)
         end = min(len(raw_text), match.end() + 20)
         context = raw_text[start:end].replace('\n', ' ').strip()
-        bbox = _find_word_bbox(raw_json, val)
+        bbox = _find_word_bbox(geometry, val)
         add_candidate(val, context, "keyword_match", bbox)
 
     return {
@@ -2601,16 +2453,73 @@ async def parse_invoice_number_from_ocr(
     }
 
 
+async def reparse_stored_invoices_background(kitchen_id: int, invoices: list[tuple[int, str]]):
+    """
+    Re-parse the stored Azure responses of (invoice_id, image_path) in the
+    process pool, then save each one the same way as a fresh OCR result
+    (supplier match, product definitions, price points, duplicate detection).
+    """
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        settings_result = await db.execute(
+            select(KitchenSettings).where(KitchenSettings.kitchen_id == kitchen_id)
+        )
+        settings = settings_result.scalar_one_or_none()
+
+    reparsed = 0
+    failed = 0
+    for start in range(0, len(invoices), REPARSE_BATCH_SIZE):
+        batch = invoices[start:start + REPARSE_BATCH_SIZE]
+        # Load the stored responses a batch at a time
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Invoice.id, Invoice.ocr_raw_json).where(Invoice.id.in_([i for i, _ in batch]))
+            )
+            raw_by_id = dict(result.all())
+        batch = [(invoice_id, image_path) for invoice_id, image_path in batch if raw_by_id.get(invoice_id)]
+
+        extractions = await reparse_stored_ocr([raw_by_id[invoice_id] for invoice_id, _ in batch], settings)
+        for (invoice_id, image_path), extraction in zip(batch, extractions):
+            if isinstance(extraction, Exception):
+                logger.error(f"Re-parsing stored OCR failed for invoice {invoice_id}: {extraction}")
+                failed += 1
+                continue
+            try:
+                await process_invoice_background(
+                    invoice_id, image_path, kitchen_id,
+                    stored_extraction=extraction
+                )
+                reparsed += 1
+            except Exception as e:
+                logger.error(f"Saving re-parsed OCR failed for invoice {invoice_id}: {e}")
+                failed += 1
+
+    logger.info(
+        f"Kitchen {kitchen_id}: reprocessed {reparsed} of {len(invoices)} invoices from stored OCR data"
+        + (f", {failed} failed" if failed else "")
+    )
+
+
 @router.post("/reprocess-all")
 async def reprocess_all_invoices(
     background_tasks: BackgroundTasks,
+    mode: str = "stored",
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Reprocess all non-confirmed invoices through OCR.
-    Clears existing extracted data and line items, then re-runs OCR processing.
+    Reprocess all non-confirmed invoices.
+
+    mode=stored (default) rebuilds fields and line items from each invoice's
+    stored Azure response (ocr_raw_json) with the current OCR post-processing
+    settings, without calling Azure; only invoices with no stored response are
+    queued for OCR. mode=azure clears every invoice and queues it for OCR at
+    bulk priority (rate limited per kitchen by the OCR queue).
     """
+    if mode not in ("stored", "azure"):
+        raise HTTPException(status_code=400, detail="mode must be 'stored' or 'azure'")
+
     # Get all non-confirmed invoices
     result = await db.execute(
         select(Invoice).where(
@@ -2624,14 +2533,28 @@ async def reprocess_all_invoices(
     if count == 0:
         return {"message": "No invoices to reprocess", "count": 0}
 
-    # Queue each invoice for reprocessing
-    for invoice in invoices:
-        # Clear existing line items
-        await db.execute(
-            select(LineItem).where(LineItem.invoice_id == invoice.id)
+    stored_ids = set()
+    if mode == "stored":
+        # Same test as has_stored_azure_result, without fetching every response
+        stored_result = await db.execute(
+            select(Invoice.id).where(
+                Invoice.kitchen_id == current_user.kitchen_id,
+                Invoice.status != InvoiceStatus.CONFIRMED,
+                Invoice.ocr_raw_json.contains('"documents"')
+            )
         )
+        stored_ids = set(stored_result.scalars().all())
+    # (id, image_path) - read now, the session is committed below
+    stored = [(invoice.id, invoice.image_path) for invoice in invoices if invoice.id in stored_ids]
+
+    # Queue invoices without stored OCR data (or all, for mode=azure)
+    queued = 0
+    from sqlalchemy import delete
+    for invoice in invoices:
+        if invoice.id in stored_ids:
+            continue
+
         # Delete line items for this invoice
-        from sqlalchemy import delete
         await db.execute(
             delete(LineItem).where(LineItem.invoice_id == invoice.id)
         )
@@ -2647,23 +2570,37 @@ async def reprocess_all_invoices(
         invoice.vendor_name = None
         invoice.ocr_raw_text = None
         invoice.ocr_raw_json = None
+        invoice.ocr_geometry = None
         invoice.ocr_confidence = None
         invoice.document_type = None
         invoice.order_number = None
         invoice.duplicate_status = None
         invoice.duplicate_of_id = None
 
-        # Queue background processing
-        background_tasks.add_task(
-            process_invoice_background,
-            invoice.id,
-            invoice.image_path,
-            current_user.kitchen_id
+        # Queue for OCR behind interactive uploads
+        await enqueue_ocr_job(
+            db, invoice.id, current_user.kitchen_id, invoice.image_path, OCR_PRIORITY_BULK,
+            force_azure=mode == "azure",
         )
+        queued += 1
 
     await db.commit()
+    if queued:
+        ocr_queue.notify()
 
-    return {"message": f"Queued {count} invoices for reprocessing", "count": count}
+    # Re-parse the stored responses after responding: saving each one is a
+    # full OCR save, too slow to run inside the request for a large kitchen
+    if stored:
+        background_tasks.add_task(reparse_stored_invoices_background, current_user.kitchen_id, stored)
+
+    if mode == "azure":
+        message = f"Queued {queued} invoices for reprocessing"
+    else:
+        message = f"Reprocessing {len(stored)} invoices from stored OCR data in the background"
+        if queued:
+            message += f", queued {queued} without OCR data for Azure"
+
+    return {"message": message, "count": count, "reparsing": len(stored), "queued": queued}
 
 
 # Product Definition endpoints
@@ -2779,8 +2716,6 @@ async def apply_definitions_to_invoice(
     Useful after manually setting/changing the supplier on an invoice.
     Only updates line items where portions_per_unit is not already set.
     """
-    from sqlalchemy import or_
-
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
 
     if not invoice.supplier_id:
@@ -2797,63 +2732,20 @@ async def apply_definitions_to_invoice(
     if not line_items:
         return {"message": "No line items on invoice", "updated": 0}
 
-    # Get definitions for this supplier (or kitchen-wide)
-    conditions = [
-        ProductDefinition.kitchen_id == current_user.kitchen_id,
-        or_(
-            ProductDefinition.supplier_id == invoice.supplier_id,
-            ProductDefinition.supplier_id.is_(None)
-        )
-    ]
+    # Definitions for this supplier (or kitchen-wide)
+    matcher = await get_definition_matcher(db, current_user.kitchen_id, invoice.supplier_id)
 
-    result = await db.execute(
-        select(ProductDefinition).where(*conditions)
-    )
-    all_definitions = result.scalars().all()
-
-    logger.info(f"apply_definitions_to_invoice: invoice_id={invoice_id}, supplier_id={invoice.supplier_id}, found {len(all_definitions)} definitions")
-
-    # Build lookup dicts - prefer supplier-specific over kitchen-wide
-    definitions_by_code = {}
-    definitions_by_desc = []  # List of (normalized_pattern, definition) tuples
-
-    for d in all_definitions:
-        if d.product_code:
-            if d.product_code in definitions_by_code:
-                existing = definitions_by_code[d.product_code]
-                if existing.supplier_id and not d.supplier_id:
-                    continue
-            definitions_by_code[d.product_code] = d
-        if d.description_pattern:
-            norm_pattern = normalize_description(d.description_pattern)
-            if norm_pattern:
-                definitions_by_desc.append((norm_pattern, d))
-
-    # Sort description patterns: prefer supplier-specific first, then by length
-    definitions_by_desc.sort(key=lambda x: (0 if x[1].supplier_id else 1, -len(x[0])))
-
-    if not definitions_by_code and not definitions_by_desc:
+    if matcher.is_empty():
         return {"message": "No product definitions found for this supplier", "updated": 0}
 
-    logger.info(f"apply_definitions_to_invoice: {len(definitions_by_code)} code definitions, {len(definitions_by_desc)} description definitions")
-
-    def find_definition_for_item(item: LineItem) -> ProductDefinition | None:
-        if item.product_code and item.product_code in definitions_by_code:
-            return definitions_by_code[item.product_code]
-        if item.description:
-            item_desc_norm = normalize_description(item.description)
-            for pattern, defn in definitions_by_desc:
-                if pattern in item_desc_norm:
-                    return defn
-        return None
+    logger.info(f"apply_definitions_to_invoice: invoice_id={invoice_id}, supplier_id={invoice.supplier_id}, {matcher.code_count} code definitions, {matcher.pattern_count} description definitions")
 
     updated_count = 0
     for item in line_items:
-        defn = find_definition_for_item(item)
+        defn, match_type = matcher.match(item.product_code, item.description)
         if not defn:
             continue
 
-        match_type = "product_code" if item.product_code and item.product_code in definitions_by_code else "description"
         logger.info(f"apply_definitions_to_invoice: applying definition (matched by {match_type}) to item: code={item.product_code}, desc={item.description[:50] if item.description else ''}")
 
         # Only update if portions_per_unit is not already set
@@ -3027,7 +2919,6 @@ async def get_line_item_definition(
     Returns null if no definition exists.
     Used by frontend to compare current values with saved values.
     """
-    from sqlalchemy import or_
     from sqlalchemy.orm import selectinload
 
     invoice = await get_invoice_or_404(invoice_id, current_user, db)
@@ -3042,54 +2933,18 @@ async def get_line_item_definition(
     if not line_item:
         raise HTTPException(status_code=404, detail="Line item not found")
 
-    # Get definitions for this supplier (or kitchen-wide)
-    conditions = [ProductDefinition.kitchen_id == current_user.kitchen_id]
-    if invoice.supplier_id:
-        conditions.append(
-            or_(
-                ProductDefinition.supplier_id == invoice.supplier_id,
-                ProductDefinition.supplier_id.is_(None)
-            )
-        )
-    else:
-        conditions.append(ProductDefinition.supplier_id.is_(None))
-
-    result = await db.execute(
-        select(ProductDefinition).options(
-            selectinload(ProductDefinition.saved_by_user),
-            selectinload(ProductDefinition.source_invoice)
-        ).where(*conditions)
-    )
-    all_definitions = result.scalars().all()
-
-    # Build lookup dicts - prefer supplier-specific over kitchen-wide
-    definitions_by_code = {}
-    definitions_by_desc = []
-
-    for d in all_definitions:
-        if d.product_code:
-            if d.product_code in definitions_by_code:
-                existing = definitions_by_code[d.product_code]
-                if existing.supplier_id and not d.supplier_id:
-                    continue
-            definitions_by_code[d.product_code] = d
-        if d.description_pattern:
-            norm_pattern = normalize_description(d.description_pattern)
-            if norm_pattern:
-                definitions_by_desc.append((norm_pattern, d))
-
-    definitions_by_desc.sort(key=lambda x: (0 if x[1].supplier_id else 1, -len(x[0])))
-
-    # Find matching definition
+    # Find the matching definition (supplier-specific or kitchen-wide), then load it for the response
+    matcher = await get_definition_matcher(db, current_user.kitchen_id, invoice.supplier_id)
+    match = matcher.find(line_item.product_code, line_item.description)
     defn = None
-    if line_item.product_code and line_item.product_code in definitions_by_code:
-        defn = definitions_by_code[line_item.product_code]
-    elif line_item.description:
-        item_desc_norm = normalize_description(line_item.description)
-        for pattern, d in definitions_by_desc:
-            if pattern in item_desc_norm:
-                defn = d
-                break
+    if match:
+        result = await db.execute(
+            select(ProductDefinition).options(
+                selectinload(ProductDefinition.saved_by_user),
+                selectinload(ProductDefinition.source_invoice)
+            ).where(ProductDefinition.id == match.id)
+        )
+        defn = result.scalar_one_or_none()
 
     if not defn:
         return None
@@ -3233,12 +3088,9 @@ async def send_invoice_to_dext(
     # Highlights are annotations (overlays) - not burnt in - so can be updated anytime
     if settings.dext_include_annotations:
         try:
-            from services.pdf_highlighter import PDFHighlighter, parse_azure_ocr_line_items
-            import json
-
-            # Parse OCR JSON to get line items with bounding regions
-            ocr_data = json.loads(invoice.ocr_raw_json) if invoice.ocr_raw_json else {}
-            ocr_line_items = parse_azure_ocr_line_items(ocr_data)
+            # Line items with bounding regions from the OCR geometry index
+            ocr_data = await get_ocr_geometry(db, invoice) or {}
+            ocr_line_items = ocr_data.get("line_items", [])
 
             if ocr_line_items:
                 non_stock_items = [item for item in invoice.line_items if item.is_non_stock]
@@ -3250,8 +3102,8 @@ async def send_invoice_to_dext(
                     shutil.copy2(invoice.image_path, backup_path)
 
                 # Regenerate highlights (clears existing, adds current non-stock items)
-                highlighter = PDFHighlighter(invoice.image_path)
-                highlighter.highlight_items_with_ocr_data(
+                await highlight_invoice_pdf(
+                    pdf_path=invoice.image_path,
                     ocr_line_items=ocr_line_items,
                     non_stock_line_items=non_stock_items,
                     output_path=invoice.image_path,
@@ -3345,7 +3197,6 @@ async def regenerate_highlights(
     """
     from sqlalchemy.orm import selectinload
     from models.settings import KitchenSettings
-    import json
 
     # Check if PDF annotations are enabled in settings
     settings_result = await db.execute(
@@ -3376,15 +3227,13 @@ async def regenerate_highlights(
         raise HTTPException(status_code=404, detail="Invoice file not found")
 
     # Check OCR data exists
-    if not invoice.ocr_raw_json:
+    if not await has_ocr_data(db, invoice):
         raise HTTPException(status_code=400, detail="No OCR data available for this invoice")
 
     try:
-        from services.pdf_highlighter import PDFHighlighter, parse_azure_ocr_line_items
-
-        # Parse OCR JSON using Azure format parser
-        ocr_data = json.loads(invoice.ocr_raw_json)
-        ocr_line_items = parse_azure_ocr_line_items(ocr_data)
+        # Line items with bounding regions from the OCR geometry index
+        ocr_data = await get_ocr_geometry(db, invoice) or {}
+        ocr_line_items = ocr_data.get("line_items", [])
 
         if not ocr_line_items:
             raise HTTPException(status_code=400, detail="No line items with bounding regions in OCR data")
@@ -3405,8 +3254,8 @@ async def regenerate_highlights(
             logger.info(f"Restored from original backup before regenerating highlights")
 
         # Regenerate highlights
-        highlighter = PDFHighlighter(invoice.image_path)
-        result_path = highlighter.highlight_items_with_ocr_data(
+        result_path = await highlight_invoice_pdf(
+            pdf_path=invoice.image_path,
             ocr_line_items=ocr_line_items,
             non_stock_line_items=non_stock_items,
             output_path=invoice.image_path,
@@ -3575,7 +3424,7 @@ async def reprocess_invoice(
         raise HTTPException(status_code=404, detail="Invoice not found")
 
     # Check if we have OCR data
-    if not invoice.ocr_raw_json:
+    if not await load_ocr_raw_json(db, invoice):
         raise HTTPException(
             status_code=400,
             detail="No OCR data available. Use 'Resend to Azure' instead."
@@ -3775,6 +3624,8 @@ async def reprocess_invoice(
             except Exception as e:
                 logger.warning(f"Auto-normalize failed on remap (non-critical): {e}")
 
+        await refresh_invoice_price_points(db, invoice.id)
+
         # Re-run duplicate detection
         detector = DuplicateDetector(db, current_user.kitchen_id)
         duplicates = await detector.check_duplicates(invoice)
@@ -3792,6 +3643,8 @@ async def reprocess_invoice(
         if duplicates["related_documents"]:
             invoice.related_document_id = duplicates["related_documents"][0].id
 
+        await db.flush()
+        await refresh_invoice_purchase_totals(db, invoice.id)
         await db.commit()
 
         logger.info(f"Invoice {invoice_id} reprocessed by admin {current_user.id}")
@@ -3813,7 +3666,6 @@ async def reprocess_invoice(
 @router.post("/{invoice_id}/resend-to-azure")
 async def resend_to_azure(
     invoice_id: int,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -3844,17 +3696,16 @@ async def resend_to_azure(
     if not os.path.exists(invoice.image_path):
         raise HTTPException(status_code=404, detail="Invoice file not found")
 
-    # Reset status to processing
+    # Reset status to processing and queue for OCR
     invoice.status = InvoiceStatus.PENDING
-    await db.commit()
-
-    # Run background processing
-    background_tasks.add_task(
-        process_invoice_background,
-        invoice_id,
-        invoice.image_path,
-        current_user.kitchen_id
+    await enqueue_ocr_job(
+        db, invoice_id, current_user.kitchen_id, invoice.image_path, OCR_PRIORITY_INTERACTIVE,
+        force_azure=True,
     )
+    await db.flush()
+    await refresh_invoice_purchase_totals(db, invoice_id)
+    await db.commit()
+    ocr_queue.notify()
 
     logger.info(f"Invoice {invoice_id} re-sent to Azure by admin {current_user.id}")
 
@@ -20,21 +20,21 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import select, update, and_, or_, text, case, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from pydantic import BaseModel
 
-from database import get_db
-from auth.jwt import get_current_user
+from database import get_db, AsyncSessionLocal
+from auth.jwt import get_current_user, get_current_user_from_token
 from models.user import User
 from models.settings import KitchenSettings
 from models.kds import KDSTicket, KDSCourseBump
 from services.kds_graphql import (
     SambaPOSGraphQLClient,
-    transform_ticket_for_kds,
     parse_kitchen_course
 )
-from services.signalr_listener import kds_event_bus
+from services.kds_events import kds_event_bus
+from services.kds_snapshot import kds_snapshots
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -356,63 +356,218 @@ def migrate_old_course_states(course_states: dict) -> dict:
     return migrated
 
 
-async def get_or_create_kds_ticket(
-    db: AsyncSession,
-    kitchen_id: int,
-    sambapos_ticket: dict,
-    course_order: list
-) -> KDSTicket:
-    """Get existing KDS ticket or create new one from SambaPOS data."""
-    # Check if ticket already exists
-    result = await db.execute(
-        select(KDSTicket).where(
-            and_(
-                KDSTicket.kitchen_id == kitchen_id,
-                KDSTicket.sambapos_ticket_id == sambapos_ticket["id"],
-                KDSTicket.is_active == True
-            )
-        )
+def build_kds_ticket_response(kds_ticket: KDSTicket, now: datetime) -> KDSTicketResponse:
+    """Render a KDS ticket for the screens (orders grouped by course, sent/addition flags)."""
+    elapsed = (now - kds_ticket.received_at).total_seconds()
+    orders = kds_ticket.orders_data or []
+
+    # Group orders by course
+    orders_by_course = {}
+    for order in orders:
+        course = order.get("kitchen_course", "Uncategorized")
+        if course not in orders_by_course:
+            orders_by_course[course] = []
+        orders_by_course[course].append(order)
+
+    # Annotate orders with is_sent and is_addition flags
+    initial_ids = set(kds_ticket.initial_order_ids or [])
+    ticket_course_states = kds_ticket.course_states or {}
+    annotated_orders = []
+    for o in orders:
+        course_name = o.get("kitchen_course", "Uncategorized")
+        sent_ids = set(ticket_course_states.get(course_name, {}).get("sent_order_ids", []))
+        order_is_sent = o.get("id") in sent_ids
+        annotated_orders.append(KDSOrderResponse(
+            **o,
+            is_sent=order_is_sent,
+            # Clear addition flag once the order has been sent
+            is_addition=False if order_is_sent else (o.get("id") not in initial_ids if initial_ids else False),
+        ))
+
+    return KDSTicketResponse(
+        id=kds_ticket.id,
+        sambapos_ticket_id=kds_ticket.sambapos_ticket_id,
+        ticket_number=kds_ticket.ticket_number,
+        table_name=kds_ticket.table_name,
+        covers=kds_ticket.covers,
+        received_at=kds_ticket.received_at,
+        time_elapsed_seconds=int(elapsed),
+        orders=annotated_orders,
+        orders_by_course=orders_by_course,
+        course_states=kds_ticket.course_states or {},
+        is_bumped=kds_ticket.is_bumped
     )
-    kds_ticket = result.scalar_one_or_none()
 
-    if kds_ticket:
-        # Detect new orders BEFORE overwriting orders_data
-        old_order_ids = {o.get("id") for o in (kds_ticket.orders_data or [])}
-        incoming_orders = sambapos_ticket.get("orders", [])
-        new_order_ids = {o.get("id") for o in incoming_orders}
-        added_order_ids = new_order_ids - old_order_ids
 
-        if added_order_ids:
-            logger.info(f"KDS: Ticket {sambapos_ticket.get('number')} — detected {len(added_order_ids)} new order(s): {added_order_ids}")
+def _ticket_event(event_type: str, kitchen_id: int, kds_ticket: KDSTicket, now: datetime, **extra) -> dict:
+    return {
+        "type": event_type,
+        "kitchen_id": kitchen_id,
+        "ticket_id": kds_ticket.id,
+        **extra,
+        "ticket": build_kds_ticket_response(kds_ticket, now).model_dump(mode="json"),
+    }
+
+
+def course_state_events(kitchen_id: int, ticket_id: int, old_states: dict, new_states: dict) -> list[dict]:
+    """One course_state event per course whose state changed."""
+    return [
+        {
+            "type": "course_state",
+            "kitchen_id": kitchen_id,
+            "ticket_id": ticket_id,
+            "course_name": course_name,
+            "state": state,
+        }
+        for course_name, state in new_states.items()
+        if (old_states or {}).get(course_name) != state
+    ]
 
-        # Update with latest data
-        kds_ticket.table_name = sambapos_ticket.get("table")
-        kds_ticket.covers = sambapos_ticket.get("covers")
-        kds_ticket.orders_data = incoming_orders
-        kds_ticket.last_sambapos_update = datetime.utcnow()
-        kds_ticket.updated_at = datetime.utcnow()
 
-        # Un-bump completed tickets if new orders were added
-        if added_order_ids and kds_ticket.is_bumped:
-            kds_ticket.is_bumped = False
-            kds_ticket.bumped_at = None
-            logger.info(f"KDS: Ticket {kds_ticket.ticket_number} un-bumped — {len(added_order_ids)} new order(s) added")
+def course_change_events(kitchen_id: int, kds_ticket: KDSTicket, old_states: dict, now: datetime) -> list[dict]:
+    """
+    Events for a change to a ticket's course states. Orders' is_sent / is_addition
+    flags are rendered from sent_order_ids, so when those change the whole ticket
+    goes out (ticket_updated); otherwise just the course_state deltas.
+    """
+    old_states = old_states or {}
+    new_states = kds_ticket.course_states or {}
+    sent_ids_changed = any(
+        set((old_states.get(course_name) or {}).get("sent_order_ids", []))
+        != set((state or {}).get("sent_order_ids", []))
+        for course_name, state in new_states.items()
+    )
+    if sent_ids_changed:
+        return [_ticket_event("ticket_updated", kitchen_id, kds_ticket, now)]
+    return course_state_events(kitchen_id, kds_ticket.id, old_states, new_states)
+
+
+def diff_kds_ticket_row(
+    kitchen_id: int,
+    kds_id: int,
+    existing: Optional[KDSTicket],
+    row: dict,
+    now: datetime
+) -> list[dict]:
+    """SSE events describing how an upserted row differs from what screens last saw."""
+    if row["is_bumped"]:
+        return []  # Not on screen
+
+    current = KDSTicket(id=kds_id, **row)
+    if existing is None:
+        return [_ticket_event("ticket_added", kitchen_id, current, now)]
+
+    old_order_ids = {o.get("id") for o in (existing.orders_data or [])}
+    added_order_ids = [o.get("id") for o in row["orders_data"] if o.get("id") not in old_order_ids]
+    if added_order_ids or existing.is_bumped:
+        # Includes a bumped ticket coming back because orders were added
+        return [_ticket_event("order_added", kitchen_id, current, now, order_ids=added_order_ids)]
+
+    if (
+        existing.orders_data != row["orders_data"]
+        or existing.table_name != row["table_name"]
+        or existing.covers != row["covers"]
+    ):
+        # e.g. an order voided or the ticket moved table
+        return [_ticket_event("ticket_updated", kitchen_id, current, now)]
+
+    return course_change_events(kitchen_id, current, existing.course_states, now)
+
+
+async def publish_kds_events(events: list[dict]):
+    """Push delta events to the SSE bus (call after the change is committed)."""
+    for event in events:
+        await kds_event_bus.publish(event)
+
+
+def _parse_submitted_at(sambapos_ticket: dict, default: datetime) -> datetime:
+    """SambaPOS first-kitchen-order time as naive UTC (the ticket timer start)."""
+    submitted_at_str = sambapos_ticket.get("submitted_at")
+    if submitted_at_str:
+        try:
+            parsed = datetime.fromisoformat(submitted_at_str.replace("Z", "+00:00"))
+            # Convert to naive UTC for consistency with DB
+            return parsed.replace(tzinfo=None)
+        except (ValueError, AttributeError):
+            logger.warning(f"Failed to parse submitted_at: {submitted_at_str}, using current time")
+    return default
+
+
+def build_kds_ticket_row(
+    kitchen_id: int,
+    sambapos_ticket: dict,
+    course_order: list,
+    existing: Optional[KDSTicket],
+    now: datetime
+) -> dict:
+    """Compute the kds_tickets row for an incoming SambaPOS ticket.
+
+    New tickets get initial course states (first course away). Existing tickets
+    keep their course progress: new courses are added as pending, courses that
+    receive new orders are reopened, and a bumped ticket is un-bumped when
+    orders are added.
+    """
+    incoming_orders = sambapos_ticket.get("orders", [])
+    ordered_courses = get_ordered_courses_for_ticket(incoming_orders, course_order)
+
+    row = {
+        "kitchen_id": kitchen_id,
+        "sambapos_ticket_id": sambapos_ticket["id"],
+        "table_name": sambapos_ticket.get("table"),
+        "covers": sambapos_ticket.get("covers"),
+        "orders_data": incoming_orders,
+        "is_active": True,
+        "last_sambapos_update": now,
+        "updated_at": now,
+    }
 
+    if existing is None:
+        # Use SambaPOS ticket creation time as the timer start
+        # (when the first order was submitted), falling back to now
+        submitted_at = _parse_submitted_at(sambapos_ticket, now)
+        row.update({
+            "sambapos_ticket_uid": sambapos_ticket.get("uid"),
+            "ticket_number": str(sambapos_ticket.get("number", "")),
+            "total_amount": sambapos_ticket.get("total_amount"),
+            "initial_order_ids": [o.get("id") for o in incoming_orders],
+            "course_states": initialize_course_states(ordered_courses, submitted_at),
+            "received_at": submitted_at,
+            "is_bumped": False,
+            "bumped_at": None,
+            "created_at": now,
+        })
+        return row
+
+    # Detect new orders BEFORE overwriting orders_data
+    old_order_ids = {o.get("id") for o in (existing.orders_data or [])}
+    added_order_ids = {o.get("id") for o in incoming_orders} - old_order_ids
+
+    if added_order_ids:
+        logger.info(f"KDS: Ticket {sambapos_ticket.get('number')} — detected {len(added_order_ids)} new order(s): {added_order_ids}")
+
+    # Un-bump completed tickets if new orders were added
+    is_bumped, bumped_at = existing.is_bumped, existing.bumped_at
+    if added_order_ids and is_bumped:
+        is_bumped, bumped_at = False, None
+        logger.info(f"KDS: Ticket {existing.ticket_number} un-bumped — {len(added_order_ids)} new order(s) added")
+
+    if not existing.course_states:
+        # If no course states exist at all, initialize (first course as away)
+        course_states = initialize_course_states(ordered_courses, existing.received_at)
+    else:
+        course_states = existing.course_states
         # Migrate old course_states format if needed
-        if kds_ticket.course_states:
-            first_state = next(iter(kds_ticket.course_states.values()), None)
-            if isinstance(first_state, dict) and "bumped" in first_state and "status" not in first_state:
-                kds_ticket.course_states = migrate_old_course_states(kds_ticket.course_states)
+        first_state = next(iter(course_states.values()), None)
+        if isinstance(first_state, dict) and "bumped" in first_state and "status" not in first_state:
+            course_states = migrate_old_course_states(course_states)
+
+        # Copy each state so the stored JSONB isn't mutated in place
+        course_states = {name: dict(state) for name, state in course_states.items()}
 
         # Ensure course_states covers all courses in ticket
-        ordered_courses = get_ordered_courses_for_ticket(incoming_orders, course_order)
-        # IMPORTANT: dict() creates a shallow copy so SQLAlchemy detects the change
-        # when we reassign kds_ticket.course_states later (same-object assignment
-        # is silently ignored by SQLAlchemy's JSONB dirty tracking)
-        current_states = dict(kds_ticket.course_states or {})
         for course in ordered_courses:
-            if course not in current_states:
-                current_states[course] = {
+            if course not in course_states:
+                course_states[course] = {
                     "status": "pending",
                     "called_away_at": None,
                     "sent_at": None,
@@ -421,9 +576,8 @@ async def get_or_create_kds_ticket(
                 }
 
         # Backfill sent_order_ids for existing course states that don't have it
-        for course_name in current_states:
-            if "sent_order_ids" not in current_states[course_name]:
-                current_states[course_name]["sent_order_ids"] = []
+        for state in course_states.values():
+            state.setdefault("sent_order_ids", [])
 
         # Reactivate cleared/sent courses that received new orders
         if added_order_ids:
@@ -431,69 +585,178 @@ async def get_or_create_kds_ticket(
                 o.get("kitchen_course", "Uncategorized")
                 for o in incoming_orders if o.get("id") in added_order_ids
             }
-            now_iso = datetime.utcnow().isoformat()
+            now_iso = now.isoformat()
             for course_name in courses_with_new_orders:
-                if course_name in current_states:
-                    status = current_states[course_name].get("status")
+                if course_name in course_states:
+                    status = course_states[course_name].get("status")
                     if status in ("cleared", "sent"):
-                        logger.info(f"KDS: Reopening course '{course_name}' on ticket {kds_ticket.ticket_number} — new orders added")
-                        current_states[course_name] = {
+                        logger.info(f"KDS: Reopening course '{course_name}' on ticket {existing.ticket_number} — new orders added")
+                        course_states[course_name] = {
                             "status": "away",
                             "called_away_at": now_iso,
                             "sent_at": None,
                             "sent_by": None,
-                            "sent_order_ids": current_states[course_name].get("sent_order_ids", []),
+                            "sent_order_ids": course_states[course_name].get("sent_order_ids", []),
                         }
 
-        # If no course states exist at all, initialize (first course as away)
-        if not kds_ticket.course_states or len(kds_ticket.course_states) == 0:
-            kds_ticket.course_states = initialize_course_states(
-                ordered_courses, kds_ticket.received_at
+    row.update({
+        # Insert-only columns: carried over (never overwritten on conflict)
+        "sambapos_ticket_uid": existing.sambapos_ticket_uid,
+        "ticket_number": existing.ticket_number,
+        "total_amount": existing.total_amount,
+        "initial_order_ids": existing.initial_order_ids,
+        "received_at": existing.received_at,
+        "created_at": existing.created_at,
+        # Updated columns
+        "course_states": course_states,
+        "is_bumped": is_bumped,
+        "bumped_at": bumped_at,
+    })
+    return row
+
+
+# Columns refreshed from SambaPOS (or merged) when an active ticket already exists;
+# course_states is merged into the stored value (see upsert_kds_tickets)
+_KDS_UPSERT_COLUMNS = (
+    "table_name", "covers", "orders_data",
+    "is_bumped", "bumped_at", "last_sambapos_update", "updated_at",
+)
+
+
+async def upsert_kds_tickets(
+    db: AsyncSession,
+    kitchen_id: int,
+    sambapos_tickets: list[dict],
+    course_order: list
+) -> tuple[dict[int, int], list[dict]]:
+    """Create or update active KDS tickets in one INSERT ... ON CONFLICT DO UPDATE.
+
+    Existing rows are locked while their course states are merged, so a course
+    action arriving mid-poll isn't overwritten. Does not commit.
+    Returns ({sambapos_ticket_id: kds_ticket_id}, SSE delta events to publish
+    once committed).
+    """
+    if not sambapos_tickets:
+        return {}, []
+
+    incoming_ids = [t["id"] for t in sambapos_tickets]
+    result = await db.execute(
+        select(KDSTicket).where(
+            and_(
+                KDSTicket.kitchen_id == kitchen_id,
+                KDSTicket.sambapos_ticket_id.in_(incoming_ids),
+                KDSTicket.is_active == True
             )
-        else:
-            kds_ticket.course_states = current_states
+        ).with_for_update()
+    )
+    existing = {t.sambapos_ticket_id: t for t in result.scalars().all()}
 
-        # Ensure SQLAlchemy persists JSONB changes (belt-and-braces)
-        flag_modified(kds_ticket, "course_states")
-        flag_modified(kds_ticket, "orders_data")
-    else:
-        # Create new ticket
-        now = datetime.utcnow()
+    now = datetime.utcnow()
+    rows = [
+        build_kds_ticket_row(kitchen_id, t, course_order, existing.get(t["id"]), now)
+        for t in {t["id"]: t for t in sambapos_tickets}.values()
+    ]
 
-        # Use SambaPOS ticket creation time as the timer start
-        # (when the first order was submitted), falling back to now
-        submitted_at = now
-        submitted_at_str = sambapos_ticket.get("submitted_at")
-        if submitted_at_str:
-            try:
-                parsed = datetime.fromisoformat(submitted_at_str.replace("Z", "+00:00"))
-                # Convert to naive UTC for consistency with DB
-                submitted_at = parsed.replace(tzinfo=None)
-            except (ValueError, AttributeError):
-                logger.warning(f"Failed to parse submitted_at: {submitted_at_str}, using current time")
-
-        orders = sambapos_ticket.get("orders", [])
-        ordered_courses = get_ordered_courses_for_ticket(orders, course_order)
-
-        kds_ticket = KDSTicket(
-            kitchen_id=kitchen_id,
-            sambapos_ticket_id=sambapos_ticket["id"],
-            sambapos_ticket_uid=sambapos_ticket.get("uid"),
-            ticket_number=str(sambapos_ticket.get("number", "")),
-            table_name=sambapos_ticket.get("table"),
-            covers=sambapos_ticket.get("covers"),
-            total_amount=sambapos_ticket.get("total_amount"),
-            orders_data=orders,
-            initial_order_ids=[o.get("id") for o in orders],
-            course_states=initialize_course_states(ordered_courses, submitted_at),
-            received_at=submitted_at,
-            last_sambapos_update=now
-        )
-        db.add(kds_ticket)
+    stmt = pg_insert(KDSTicket)
+    stored_states = func.coalesce(KDSTicket.course_states, text("'{}'::jsonb"))
+    incoming_states = func.coalesce(stmt.excluded.course_states, text("'{}'::jsonb"))
+    course_states = case(
+        # Locked above and merged in build_kds_ticket_row: the merged states win
+        (KDSTicket.id.in_([t.id for t in existing.values()]), stored_states.op("||")(incoming_states)),
+        # Inserted by another request since the read (e.g. the SignalR listener):
+        # keep any course action already taken on it
+        else_=incoming_states.op("||")(stored_states),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[KDSTicket.kitchen_id, KDSTicket.sambapos_ticket_id],
+        index_where=text("is_active"),
+        set_={**{col: stmt.excluded[col] for col in _KDS_UPSERT_COLUMNS}, "course_states": course_states},
+    ).returning(KDSTicket.sambapos_ticket_id, KDSTicket.id)
+    result = await db.execute(stmt, rows)
 
+    kds_ids = {sambapos_id: kds_id for sambapos_id, kds_id in result.all()}
+
+    events = []
+    for row in rows:
+        sambapos_id = row["sambapos_ticket_id"]
+        events.extend(diff_kds_ticket_row(kitchen_id, kds_ids[sambapos_id], existing.get(sambapos_id), row, now))
+
+    # The upsert bypasses the ORM; don't let stale loaded instances be reused
+    for ticket in existing.values():
+        db.expire(ticket)
+
+    return kds_ids, events
+
+
+async def close_missing_kds_tickets(
+    db: AsyncSession,
+    kitchen_id: int,
+    active_sambapos_ids: set
+) -> list[int]:
+    """Deactivate tickets that are no longer open in SambaPOS, in one UPDATE.
+
+    Only deactivates tickets that have been bumped (kitchen is done) or
+    are stale (>4 hours old). Non-bumped tickets are preserved because
+    they may be instantly-closed tickets (free breakfast, bar tabs)
+    captured by the SignalR listener that never appear in
+    getTickets(isClosed: false). The kitchen is the authority on when
+    a ticket is done (via bumping). Does not commit.
+    Returns the local ids of the closed tickets.
+    """
+    from datetime import timedelta
+
+    now = datetime.utcnow()
+    stale_cutoff = now - timedelta(hours=4)
+
+    conditions = [
+        KDSTicket.kitchen_id == kitchen_id,
+        KDSTicket.is_active == True,
+        or_(KDSTicket.is_bumped == True, KDSTicket.received_at < stale_cutoff),
+    ]
+    if active_sambapos_ids:
+        # Still open in SambaPOS — keep active
+        conditions.append(KDSTicket.sambapos_ticket_id.notin_(list(active_sambapos_ids)))
+
+    result = await db.execute(
+        update(KDSTicket)
+        .where(*conditions)
+        .values(is_active=False, updated_at=now)
+        .returning(KDSTicket.id, KDSTicket.ticket_number, KDSTicket.sambapos_ticket_id, KDSTicket.is_bumped, KDSTicket.received_at)
+        .execution_options(synchronize_session=False)
+    )
+    closed = result.all()
+    for _, ticket_number, sambapos_id, is_bumped, received_at in closed:
+        if not is_bumped:
+            # Stale safety net: >4 hours without being bumped
+            logger.info(
+                f"KDS: Deactivating stale ticket {ticket_number} "
+                f"(SambaPOS ID {sambapos_id}, age={now - received_at})"
+            )
+    return [row.id for row in closed]
+
+
+async def reconcile_kds_tickets(
+    db: AsyncSession,
+    kitchen_id: int,
+    sambapos_tickets: list[dict],
+    course_order: list
+) -> dict:
+    """Bring local KDS state in line with SambaPOS's full open ticket list.
+
+    One upsert for the open tickets and one UPDATE to close the rest, in a
+    single transaction, then the resulting deltas go out on the SSE bus.
+    Returns {"upserted": n, "closed": n, "events": n}.
+    """
+    upserted, events = await upsert_kds_tickets(db, kitchen_id, sambapos_tickets, course_order)
+    closed_ids = await close_missing_kds_tickets(db, kitchen_id, {t["id"] for t in sambapos_tickets})
     await db.commit()
-    await db.refresh(kds_ticket)
-    return kds_ticket
+
+    events.extend(
+        {"type": "ticket_closed", "kitchen_id": kitchen_id, "ticket_id": ticket_id}
+        for ticket_id in closed_ids
+    )
+    await publish_kds_events(events)
+    return {"upserted": len(upserted), "closed": len(closed_ids), "events": len(events)}
 
 
 # =============================================================================
@@ -568,9 +831,9 @@ async def get_tickets(
     Get all active KDS tickets for the current kitchen.
 
     This endpoint:
-    1. Fetches open tickets from SambaPOS via GraphQL
-    2. Updates local KDS ticket state
-    3. Returns tickets with timing and course state info
+    1. Refreshes the kitchen's shared SambaPOS snapshot if it is stale
+       (one GraphQL fetch + local ticket update, shared by all screens)
+    2. Returns tickets with timing and course state info from local state
     """
     settings = await get_kds_settings(db, current_user.kitchen_id)
 
@@ -580,157 +843,42 @@ async def get_tickets(
     course_order = settings.kds_course_order or ["Starters", "Mains", "Desserts"]
 
     # Check if KDS is enabled and configured
-    kds_url = settings.kds_graphql_url
-    kds_username = settings.kds_graphql_username
-    kds_password = settings.kds_graphql_password
-    kds_client_id = settings.kds_graphql_client_id
-
-    if not all([kds_url, kds_username, kds_password, kds_client_id]):
+    if not all([
+        settings.kds_graphql_url,
+        settings.kds_graphql_username,
+        settings.kds_graphql_password,
+        settings.kds_graphql_client_id,
+    ]):
         # Return local tickets only if not configured
         return await get_local_tickets(db, current_user.kitchen_id)
 
-    # Fetch from SambaPOS
-    client = SambaPOSGraphQLClient(
-        server_url=kds_url,
-        username=kds_username,
-        password=kds_password,
-        client_id=kds_client_id
-    )
-
-    result = await client.get_open_tickets()
-
-    if "error" in result:
-        logger.error(f"KDS GraphQL error: {result['error']}")
+    snapshot = await kds_snapshots.get(settings, course_order)
+    if snapshot.error:
         # Fall back to local tickets
         return await get_local_tickets(db, current_user.kitchen_id)
 
-    # Process tickets
-    tickets_data = result.get("data", {}).get("getTickets", [])
-    active_sambapos_ids = set()
-    response_tickets = []
+    # Open SambaPOS tickets first (in SambaPOS order), then SignalR-captured
+    # tickets not in the open set (instantly-closed tickets such as free
+    # breakfast or bar tabs, persisted by the SignalR listener)
+    return await get_local_tickets(db, current_user.kitchen_id, open_ticket_ids=snapshot.ticket_ids)
 
-    for ticket_data in tickets_data:
-        transformed = transform_ticket_for_kds(ticket_data)
-        if not transformed:
-            continue  # Skip tickets with no kitchen orders
 
-        active_sambapos_ids.add(transformed["id"])
+async def persist_kds_snapshot(kitchen_id: int, tickets: list[dict], course_order: list):
+    """Write a freshly fetched open-ticket list to local KDS state (called by kds_snapshots)."""
+    async with AsyncSessionLocal() as db:
+        await reconcile_kds_tickets(db, kitchen_id, tickets, course_order)
 
-        # Get or create local KDS ticket
-        kds_ticket = await get_or_create_kds_ticket(
-            db, current_user.kitchen_id, transformed, course_order
-        )
-
-        # Skip tickets that have been bumped (completed)
-        if kds_ticket.is_bumped:
-            continue
-
-        # Calculate elapsed time
-        now = datetime.utcnow()
-        elapsed = (now - kds_ticket.received_at).total_seconds()
-
-        # Annotate orders with is_sent and is_addition flags
-        initial_ids = set(kds_ticket.initial_order_ids or [])
-        ticket_course_states = kds_ticket.course_states or {}
-        annotated_orders = []
-        for o in transformed.get("orders", []):
-            course_name = o.get("kitchen_course", "Uncategorized")
-            sent_ids = set(ticket_course_states.get(course_name, {}).get("sent_order_ids", []))
-            order_is_sent = o.get("id") in sent_ids
-            annotated_orders.append(KDSOrderResponse(
-                **o,
-                is_sent=order_is_sent,
-                # Clear addition flag once the order has been sent
-                is_addition=False if order_is_sent else (o.get("id") not in initial_ids if initial_ids else False),
-            ))
-
-        # Build response
-        response_tickets.append(KDSTicketResponse(
-            id=kds_ticket.id,
-            sambapos_ticket_id=kds_ticket.sambapos_ticket_id,
-            ticket_number=kds_ticket.ticket_number,
-            table_name=kds_ticket.table_name,
-            covers=kds_ticket.covers,
-            received_at=kds_ticket.received_at,
-            time_elapsed_seconds=int(elapsed),
-            orders=annotated_orders,
-            orders_by_course=transformed.get("orders_by_course", {}),
-            course_states=kds_ticket.course_states or {},
-            is_bumped=kds_ticket.is_bumped
-        ))
-
-    # Include SignalR-captured tickets not in the SambaPOS open set.
-    # These are instantly-closed tickets (free breakfast, bar tabs, etc.)
-    # persisted by the SignalR listener's _fetch_and_persist_ticket().
-    signalr_filter = (
-        KDSTicket.sambapos_ticket_id.notin_(active_sambapos_ids)
-        if active_sambapos_ids
-        else True
-    )
-    signalr_result = await db.execute(
-        select(KDSTicket).where(
-            and_(
-                KDSTicket.kitchen_id == current_user.kitchen_id,
-                KDSTicket.is_active == True,
-                KDSTicket.is_bumped == False,
-                signalr_filter,
-            )
-        ).order_by(KDSTicket.received_at)
-    )
-    signalr_tickets = signalr_result.scalars().all()
-
-    now_local = datetime.utcnow()
-    for kds_ticket in signalr_tickets:
-        orders = kds_ticket.orders_data or []
-        if not orders:
-            continue
-
-        elapsed = (now_local - kds_ticket.received_at).total_seconds()
-
-        # Group orders by course
-        orders_by_course = {}
-        for order in orders:
-            course = order.get("kitchen_course", "Uncategorized")
-            if course not in orders_by_course:
-                orders_by_course[course] = []
-            orders_by_course[course].append(order)
-
-        # Annotate orders
-        initial_ids = set(kds_ticket.initial_order_ids or [])
-        ticket_course_states = kds_ticket.course_states or {}
-        annotated_orders = []
-        for o in orders:
-            course_name = o.get("kitchen_course", "Uncategorized")
-            sent_ids = set(ticket_course_states.get(course_name, {}).get("sent_order_ids", []))
-            order_is_sent = o.get("id") in sent_ids
-            annotated_orders.append(KDSOrderResponse(
-                **o,
-                is_sent=order_is_sent,
-                is_addition=False if order_is_sent else (o.get("id") not in initial_ids if initial_ids else False),
-            ))
-
-        response_tickets.append(KDSTicketResponse(
-            id=kds_ticket.id,
-            sambapos_ticket_id=kds_ticket.sambapos_ticket_id,
-            ticket_number=kds_ticket.ticket_number,
-            table_name=kds_ticket.table_name,
-            covers=kds_ticket.covers,
-            received_at=kds_ticket.received_at,
-            time_elapsed_seconds=int(elapsed),
-            orders=annotated_orders,
-            orders_by_course=orders_by_course,
-            course_states=kds_ticket.course_states or {},
-            is_bumped=kds_ticket.is_bumped,
-        ))
-
-    # Mark tickets no longer in SambaPOS as inactive
-    await mark_closed_tickets(db, current_user.kitchen_id, active_sambapos_ids)
-
-    return response_tickets
 
+async def get_local_tickets(
+    db: AsyncSession,
+    kitchen_id: int,
+    open_ticket_ids: Optional[list[int]] = None
+) -> list[KDSTicketResponse]:
+    """Get locally stored KDS tickets.
 
-async def get_local_tickets(db: AsyncSession, kitchen_id: int) -> list[KDSTicketResponse]:
-    """Get locally stored KDS tickets when GraphQL is unavailable."""
+    open_ticket_ids (from the SambaPOS snapshot) are listed first in that order,
+    then any other active tickets by received time.
+    """
     result = await db.execute(
         select(KDSTicket).where(
             and_(
@@ -742,101 +890,15 @@ async def get_local_tickets(db: AsyncSession, kitchen_id: int) -> list[KDSTicket
     )
     kds_tickets = result.scalars().all()
 
-    response_tickets = []
-    now = datetime.utcnow()
-
-    for kds_ticket in kds_tickets:
-        elapsed = (now - kds_ticket.received_at).total_seconds()
-        orders = kds_ticket.orders_data or []
-
-        # Group orders by course
-        orders_by_course = {}
-        for order in orders:
-            course = order.get("kitchen_course", "Uncategorized")
-            if course not in orders_by_course:
-                orders_by_course[course] = []
-            orders_by_course[course].append(order)
-
-        # Annotate orders with is_sent and is_addition flags
-        initial_ids = set(kds_ticket.initial_order_ids or [])
-        ticket_course_states = kds_ticket.course_states or {}
-        annotated_orders = []
-        for o in orders:
-            course_name = o.get("kitchen_course", "Uncategorized")
-            sent_ids = set(ticket_course_states.get(course_name, {}).get("sent_order_ids", []))
-            order_is_sent = o.get("id") in sent_ids
-            annotated_orders.append(KDSOrderResponse(
-                **o,
-                is_sent=order_is_sent,
-                # Clear addition flag once the order has been sent
-                is_addition=False if order_is_sent else (o.get("id") not in initial_ids if initial_ids else False),
-            ))
-
-        response_tickets.append(KDSTicketResponse(
-            id=kds_ticket.id,
-            sambapos_ticket_id=kds_ticket.sambapos_ticket_id,
-            ticket_number=kds_ticket.ticket_number,
-            table_name=kds_ticket.table_name,
-            covers=kds_ticket.covers,
-            received_at=kds_ticket.received_at,
-            time_elapsed_seconds=int(elapsed),
-            orders=annotated_orders,
-            orders_by_course=orders_by_course,
-            course_states=kds_ticket.course_states or {},
-            is_bumped=kds_ticket.is_bumped
-        ))
-
-    return response_tickets
-
-
-async def mark_closed_tickets(
-    db: AsyncSession,
-    kitchen_id: int,
-    active_sambapos_ids: set
-):
-    """Mark tickets that are no longer in SambaPOS as inactive.
-
-    Only deactivates tickets that have been bumped (kitchen is done) or
-    are stale (>4 hours old). Non-bumped tickets are preserved because
-    they may be instantly-closed tickets (free breakfast, bar tabs)
-    captured by the SignalR listener that never appear in
-    getTickets(isClosed: false). The kitchen is the authority on when
-    a ticket is done (via bumping).
-    """
-    from datetime import timedelta
-
-    result = await db.execute(
-        select(KDSTicket).where(
-            and_(
-                KDSTicket.kitchen_id == kitchen_id,
-                KDSTicket.is_active == True
-            )
+    if open_ticket_ids:
+        position = {ticket_id: i for i, ticket_id in enumerate(open_ticket_ids)}
+        kds_tickets = sorted(
+            kds_tickets,
+            key=lambda t: (0, position[t.sambapos_ticket_id]) if t.sambapos_ticket_id in position else (1, 0)
         )
-    )
-    local_tickets = result.scalars().all()
-    now = datetime.utcnow()
-    stale_threshold = timedelta(hours=4)
-
-    for ticket in local_tickets:
-        if ticket.sambapos_ticket_id in active_sambapos_ids:
-            continue  # Still open in SambaPOS — keep active
-
-        # Ticket is NOT in SambaPOS open list
-        if ticket.is_bumped:
-            # Kitchen bumped it — safe to deactivate
-            ticket.is_active = False
-            ticket.updated_at = now
-        elif (now - ticket.received_at) > stale_threshold:
-            # Stale safety net: >4 hours without being bumped
-            logger.info(
-                f"KDS: Deactivating stale ticket {ticket.ticket_number} "
-                f"(SambaPOS ID {ticket.sambapos_ticket_id}, age={now - ticket.received_at})"
-            )
-            ticket.is_active = False
-            ticket.updated_at = now
-        # else: not bumped and not stale — keep active for kitchen to process
 
-    await db.commit()
+    now = datetime.utcnow()
+    return [build_kds_ticket_response(kds_ticket, now) for kds_ticket in kds_tickets]
 
 
 # =============================================================================
@@ -1044,7 +1106,8 @@ async def course_away(
         raise HTTPException(status_code=400, detail="Ticket already completed")
 
     now = datetime.utcnow()
-    course_states = dict(kds_ticket.course_states or {})
+    previous_states = kds_ticket.course_states or {}
+    course_states = dict(previous_states)
 
     # Validate the course exists
     course_state = course_states.get(request.course_name)
@@ -1117,6 +1180,9 @@ async def course_away(
     db.add(bump)
 
     await db.commit()
+    await publish_kds_events(
+        course_change_events(current_user.kitchen_id, kds_ticket, previous_states, now)
+    )
 
     return CourseActionResponse(
         success=True,
@@ -1158,7 +1224,8 @@ async def course_sent(
         raise HTTPException(status_code=400, detail="Ticket already completed")
 
     now = datetime.utcnow()
-    course_states = dict(kds_ticket.course_states or {})
+    previous_states = kds_ticket.course_states or {}
+    course_states = dict(previous_states)
 
     # Validate the course exists
     course_state = course_states.get(request.course_name)
@@ -1215,6 +1282,9 @@ async def course_sent(
     db.add(bump)
 
     await db.commit()
+    await publish_kds_events(
+        course_change_events(current_user.kitchen_id, kds_ticket, previous_states, now)
+    )
 
     return CourseActionResponse(
         success=True,
@@ -1274,6 +1344,9 @@ async def bump_full_ticket(
     kds_ticket.updated_at = now
 
     await db.commit()
+    await publish_kds_events([
+        {"type": "ticket_bumped", "kitchen_id": current_user.kitchen_id, "ticket_id": ticket_id}
+    ])
 
     return {"success": True, "message": "Ticket bumped", "ticket_id": ticket_id}
 
@@ -1284,7 +1357,8 @@ async def trigger_sync(
     db: AsyncSession = Depends(get_db)
 ):
     """Manually trigger a sync with SambaPOS."""
-    # This just returns the current tickets - the actual sync happens in get_tickets
+    # Force the shared snapshot to refresh - the actual sync happens in get_tickets
+    kds_snapshots.invalidate(current_user.kitchen_id)
     tickets = await get_tickets(current_user, db)
     return {
         "success": True,
@@ -1293,6 +1367,23 @@ async def trigger_sync(
     }
 
 
+@router.get("/snapshot-stats")
+async def get_snapshot_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """Shared ticket snapshot counters (GraphQL refreshes vs polls served from the snapshot)."""
+    return kds_snapshots.stats(current_user.kitchen_id)
+
+
+@router.get("/signalr-stats")
+async def get_signalr_listener_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """SignalR TICKET_REFRESH counters (broadcasts received vs GraphQL fetches saved)."""
+    from services.signalr_listener import get_signalr_stats
+    return get_signalr_stats()
+
+
 @router.get("/debug-graphql")
 async def debug_graphql(
     current_user: User = Depends(get_current_user),
@@ -1474,32 +1565,68 @@ async def get_recipe_link(
 # =============================================================================
 
 @router.get("/events")
-async def kds_events(request: Request):
+async def kds_events(
+    request: Request,
+    token: str,
+    last_event_id: Optional[int] = None,
+):
     """
-    Server-Sent Events stream for real-time KDS updates.
+    Server-Sent Events stream of KDS ticket deltas for the user's kitchen.
 
-    The SignalR listener pushes events here when SambaPOS broadcasts
-    TICKET_REFRESH messages. Frontend subscribes to this for instant
-    refresh instead of relying solely on polling.
+    Each event is a JSON delta (ticket_added, order_added, ticket_updated,
+    course_state, ticket_bumped, ticket_closed) with the kitchen's sequence
+    number as its SSE id. A reconnecting screen resumes from Last-Event-ID
+    (header, or last_event_id for a manual reconnect) out of the replay ring;
+    if that's not possible it gets a "resync" event and reloads /tickets.
 
-    No auth required for SSE (connection is long-lived and the
-    KDS display may not have convenient auth headers for EventSource).
+    Auth is via the token query param (EventSource can't send headers).
     """
     import json
 
+    async with AsyncSessionLocal() as db:
+        current_user = await get_current_user_from_token(token, db)
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    kitchen_id = current_user.kitchen_id
+
+    header_id = request.headers.get("last-event-id")
+    resume_from = int(header_id) if header_id and header_id.isdigit() else last_event_id
+
+    def format_event(event: dict) -> str:
+        seq = event.get("seq")
+        prefix = f"id: {seq}\n" if seq is not None else ""
+        return f"{prefix}data: {json.dumps(event, default=str)}\n\n"
+
     async def event_generator():
-        queue = kds_event_bus.subscribe()
+        # Subscribe before reading the replay ring so nothing falls in between
+        queue = kds_event_bus.subscribe(kitchen_id)
         try:
+            missed = kds_event_bus.replay(kitchen_id, resume_from) if resume_from is not None else None
+            if missed is None:
+                last_seq = kds_event_bus.latest_seq(kitchen_id) or 0
+                yield format_event({"type": "resync", "kitchen_id": kitchen_id, "seq": last_seq or None})
+            else:
+                last_seq = resume_from
+                for event in missed:
+                    last_seq = event["seq"]
+                    yield format_event(event)
+
             while True:
                 # Check if client disconnected
                 if await request.is_disconnected():
                     break
                 try:
                     event = await asyncio.wait_for(queue.get(), timeout=30)
-                    yield f"data: {json.dumps(event)}\n\n"
                 except asyncio.TimeoutError:
                     # Send keepalive comment to prevent connection timeout
                     yield ": keepalive\n\n"
+                    continue
+                seq = event.get("seq")
+                if seq is not None:
+                    if seq <= last_seq:
+                        continue  # Already sent from the replay ring
+                    last_seq = seq
+                yield format_event(event)
         finally:
             kds_event_bus.unsubscribe(queue)
 
@@ -1512,3 +1639,14 @@ async def kds_events(request: Request):
             "X-Accel-Buffering": "no",
         },
     )
+
+
+@router.get("/event-stats")
+async def get_event_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """SSE event bus counters (subscribers, published, dropped, replay ring size)."""
+    return {
+        **kds_event_bus.stats(),
+        "latest_seq": kds_event_bus.latest_seq(current_user.kitchen_id),
+    }
@@ -29,6 +29,18 @@ from models.ingredient import IngredientFlag, IngredientFlagNone
 from models.settings import KitchenSettings
 from auth.jwt import get_current_user, get_current_user_from_token
 from api.ingredients import convert_to_standard, UNIT_CONVERSIONS
+from services.recipe_costing import (
+    RecipeCostEngine,
+    recipe_ancestors,
+    recipes_using_ingredients,
+    touch_recipes,
+    write_change_logs,
+    write_cost_snapshots,
+    convert_unit as _convert_unit,
+    get_compatible_units as _get_compatible_units,
+    get_output_qty as _get_output_qty,
+    get_output_unit as _get_output_unit,
+)
 from models.menu import Menu, MenuItem
 
 logger = logging.getLogger(__name__)
@@ -361,61 +373,42 @@ async def recipe_dashboard_stats(
             )
         )).all()
 
+        # Ingredient usage comes from the kitchen's recipe graph (direct + nested sub-recipes),
+        # and assessments for the required categories are loaded once as (ingredient, category) pairs
+        cost_engine = await RecipeCostEngine(db).load_kitchen(kid)
+
+        flag_rows = (await db.execute(
+            select(IngredientFlag.ingredient_id, FoodFlag.category_id)
+            .join(FoodFlag, FoodFlag.id == IngredientFlag.food_flag_id)
+            .join(Ingredient, Ingredient.id == IngredientFlag.ingredient_id)
+            .where(
+                FoodFlag.category_id.in_(req_cats),
+                FoodFlag.kitchen_id == kid,
+                Ingredient.kitchen_id == kid,
+            )
+        )).all()
+        none_rows = (await db.execute(
+            select(IngredientFlagNone.ingredient_id, IngredientFlagNone.category_id)
+            .join(Ingredient, Ingredient.id == IngredientFlagNone.ingredient_id)
+            .where(
+                IngredientFlagNone.category_id.in_(req_cats),
+                Ingredient.kitchen_id == kid,
+            )
+        )).all()
+        assessed = {(ing_id, cat_id) for ing_id, cat_id in flag_rows}
+        assessed |= {(ing_id, cat_id) for ing_id, cat_id in none_rows}
+
         for dish_id, dish_name in dish_rows:
-            # Get all ingredient IDs used by this dish (direct + via sub-recipes)
-            direct_ings = (await db.execute(
-                select(RecipeIngredient.ingredient_id).where(
-                    RecipeIngredient.recipe_id == dish_id
-                )
-            )).scalars().all()
-
-            sub_recipe_ids = (await db.execute(
-                select(RecipeSubRecipe.child_recipe_id).where(
-                    RecipeSubRecipe.parent_recipe_id == dish_id
-                )
-            )).scalars().all()
-
-            sub_ings: list[int] = []
-            for sr_id in sub_recipe_ids:
-                sr_ings = (await db.execute(
-                    select(RecipeIngredient.ingredient_id).where(
-                        RecipeIngredient.recipe_id == sr_id
-                    )
-                )).scalars().all()
-                sub_ings.extend(sr_ings)
-
-            all_ing_ids = set(direct_ings) | set(sub_ings)
+            all_ing_ids = cost_engine.ingredient_ids(dish_id)
             if not all_ing_ids:
                 continue
 
             # Check each ingredient against required categories
-            has_unassessed = False
-            for ing_id in all_ing_ids:
-                for cat_id in req_cats:
-                    # Check if ingredient has any flag in this category
-                    has_flag = (await db.execute(
-                        select(IngredientFlag.id).where(
-                            IngredientFlag.ingredient_id == ing_id,
-                            IngredientFlag.food_flag_id.in_(
-                                select(FoodFlag.id).where(FoodFlag.category_id == cat_id)
-                            ),
-                        ).limit(1)
-                    )).scalar_one_or_none()
-
-                    if not has_flag:
-                        # Check if ingredient has "none" for this category
-                        has_none = (await db.execute(
-                            select(IngredientFlagNone.id).where(
-                                IngredientFlagNone.ingredient_id == ing_id,
-                                IngredientFlagNone.category_id == cat_id,
-                            ).limit(1)
-                        )).scalar_one_or_none()
-
-                        if not has_none:
-                            has_unassessed = True
-                            break
-                if has_unassessed:
-                    break
+            has_unassessed = any(
+                (ing_id, cat_id) not in assessed
+                for ing_id in all_ing_ids
+                for cat_id in req_cats
+            )
 
             if has_unassessed:
                 dishes_missing_allergens += 1
@@ -539,61 +532,8 @@ async def price_impact_report(
 
     # Get recipe info + cost snapshots for affected recipes
     recipe_ids = list(recipe_changes.keys())
-    recipe_result = await db.execute(
-        select(Recipe)
-        .options(
-            selectinload(Recipe.ingredients).selectinload(RecipeIngredient.ingredient),
-            selectinload(Recipe.sub_recipes)
-                .selectinload(RecipeSubRecipe.child_recipe)
-                .options(
-                    selectinload(Recipe.ingredients).selectinload(RecipeIngredient.ingredient),
-                    selectinload(Recipe.sub_recipes)
-                        .selectinload(RecipeSubRecipe.child_recipe)
-                        .selectinload(Recipe.ingredients)
-                        .selectinload(RecipeIngredient.ingredient),
-                ),
-        )
-        .where(Recipe.id.in_(recipe_ids))
-    )
-    recipes = {r.id: r for r in recipe_result.scalars().all()}
-
-    def _build_ing_usage(recipe, scale: float = 1.0, depth: int = 0) -> dict[str, float]:
-        """Recursively build ingredient name -> qty_in_std_unit map, expanding sub-recipes."""
-        usage: dict[str, float] = {}
-        for ri in recipe.ingredients:
-            if ri.ingredient and ri.quantity:
-                display_unit = ri.unit or ri.ingredient.standard_unit
-                qty_std = _convert_unit(float(ri.quantity), display_unit, ri.ingredient.standard_unit)
-                yld = float(ri.yield_percent) if ri.yield_percent else 100.0
-                qty_effective = (qty_std / (yld / 100) if yld > 0 else qty_std) * scale
-                key = ri.ingredient.name.lower()
-                usage[key] = usage.get(key, 0) + qty_effective
-        if depth < 3:
-            try:
-                for sr in recipe.sub_recipes:
-                    child = sr.child_recipe
-                    if not child:
-                        continue
-                    child_output = _get_output_qty(child)
-                    if not child_output:
-                        continue
-                    needed = float(sr.portions_needed) if sr.portions_needed else 0
-                    if not needed:
-                        continue
-                    # Convert portions_needed unit to child output unit if needed (bulk sub-recipes)
-                    child_output_unit = (_get_output_unit(child)).lower().strip()
-                    needed_unit = (sr.portions_needed_unit or child_output_unit).lower().strip()
-                    if needed_unit != child_output_unit and child.batch_output_type == "bulk":
-                        converted = _convert_unit(needed, needed_unit, child_output_unit)
-                        if converted is not None:
-                            needed = converted
-                    sub_scale = scale * needed / child_output
-                    child_usage = _build_ing_usage(child, sub_scale, depth + 1)
-                    for k, v in child_usage.items():
-                        usage[k] = usage.get(k, 0) + v
-            except Exception:
-                pass  # lazy load guard
-        return usage
+    cost_engine = await RecipeCostEngine(db).load_recipes(recipe_ids)
+    recipes = cost_engine.recipes
 
     items = []
     for rid in recipe_ids:
@@ -604,7 +544,7 @@ async def price_impact_report(
         output_qty = _get_output_qty(r)
 
         # Build ingredient name -> usage map for cost impact calculation (including sub-recipes)
-        ing_usage = _build_ing_usage(r)
+        ing_usage = cost_engine.ingredient_usage(rid)
 
         # Calculate per-change cost impact
         for change in recipe_changes[rid]:
@@ -836,12 +776,17 @@ async def get_recipe(
         })
 
     sub_recipes = []
+    # Calculate child costs from scratch (not from snapshots, which may be stale/missing),
+    # loading all child sub-trees in one pass so shared components are costed once
+    cost_engine = await RecipeCostEngine(db).load_recipes(
+        [sr.child_recipe_id for sr in recipe.sub_recipes if sr.child_recipe]
+    )
+    child_costs = cost_engine.cost_all()
     for sr in sorted(recipe.sub_recipes, key=lambda x: x.sort_order):
         child = sr.child_recipe
         if not child:
             continue
-        # Calculate child cost from scratch (not from snapshots, which may be stale/missing)
-        child_cost_data = await _calc_recipe_cost(child.id, db)
+        child_cost_data = child_costs.get(child.id, {})
         child_total = child_cost_data.get("total_cost_recent", 0) or 0
         child_output_qty = _get_output_qty(child)
         child_cost_per_portion = child_total / child_output_qty if child_total and child_output_qty else None
@@ -1568,243 +1513,10 @@ async def delete_image(
 
 # ── Costing ──────────────────────────────────────────────────────────────────
 
-def _scale_child_sub_recipes(sub_recipes: list, scale: float) -> list:
-    """Recursively scale nested sub-recipe data for hierarchical display."""
-    result = []
-    for sr in sub_recipes:
-        result.append({
-            "child_recipe_id": sr["child_recipe_id"],
-            "child_recipe_name": sr["child_recipe_name"],
-            "batch_output_type": sr.get("batch_output_type", "portions"),
-            "output_qty": sr.get("output_qty", 1),
-            "output_unit": sr.get("output_unit", "portion"),
-            "portions_needed": round(sr["portions_needed"] * scale, 4),
-            "cost_contribution": round(sr["cost_contribution"] * scale, 4) if sr.get("cost_contribution") else None,
-            "child_ingredients": [
-                {
-                    "ingredient_id": ci["ingredient_id"],
-                    "ingredient_name": ci["ingredient_name"],
-                    "quantity": round(ci["quantity"] * scale, 4),
-                    "unit": ci["unit"],
-                    "yield_percent": ci.get("yield_percent", 100.0),
-                    "cost_recent": round(ci["cost_recent"] * scale, 4) if ci.get("cost_recent") else None,
-                    "cost_min": round(ci["cost_min"] * scale, 4) if ci.get("cost_min") else None,
-                    "cost_max": round(ci["cost_max"] * scale, 4) if ci.get("cost_max") else None,
-                    "is_manual_price": ci.get("is_manual_price", False),
-                    "has_no_price": ci.get("has_no_price", False),
-                }
-                for ci in sr.get("child_ingredients", [])
-            ],
-            "child_sub_recipes": _scale_child_sub_recipes(sr.get("child_sub_recipes", []), scale),
-        })
-    return result
-
-
 async def _calc_recipe_cost(recipe_id: int, db: AsyncSession, scale_to: Optional[float] = None) -> dict:
     """Calculate full cost breakdown for a recipe."""
-    recipe_result = await db.execute(
-        select(Recipe)
-        .options(
-            selectinload(Recipe.ingredients).selectinload(RecipeIngredient.ingredient).selectinload(Ingredient.sources),
-            selectinload(Recipe.sub_recipes).selectinload(RecipeSubRecipe.child_recipe),
-        )
-        .where(Recipe.id == recipe_id)
-    )
-    recipe = recipe_result.scalar_one_or_none()
-    if not recipe:
-        return {}
-
-    output_qty = _get_output_qty(recipe)
-    output_unit = _get_output_unit(recipe)
-    scale_factor = (scale_to / output_qty) if scale_to else 1.0
-
-    ingredient_costs = []
-    total_ing_cost = Decimal(0)
-    total_ing_cost_min = Decimal(0)
-    total_ing_cost_max = Decimal(0)
-
-    for ri in recipe.ingredients:
-        ing = ri.ingredient
-        if not ing:
-            continue
-
-        display_unit = ri.unit or ing.standard_unit
-        qty_display = float(ri.quantity) * scale_factor
-        # Convert to standard unit for cost calculation
-        qty_std = _convert_unit(qty_display, display_unit, ing.standard_unit)
-        yld = float(ri.yield_percent) if ri.yield_percent else 100.0
-
-        # Get all source prices
-        source_prices = []
-        for src in (ing.sources or []):
-            if src.price_per_std_unit:
-                source_prices.append({
-                    "supplier_id": src.supplier_id,
-                    "price_per_std_unit": float(src.price_per_std_unit),
-                    "latest_invoice_date": str(src.latest_invoice_date) if src.latest_invoice_date else None,
-                })
-
-        # Effective prices
-        recent_price = None
-        min_price = None
-        max_price = None
-        if source_prices:
-            prices = [sp["price_per_std_unit"] for sp in source_prices]
-            min_price = min(prices)
-            max_price = max(prices)
-            recent_price = source_prices[0]["price_per_std_unit"]
-            # Find most recent by date
-            dated = [(sp.get("latest_invoice_date", ""), sp["price_per_std_unit"]) for sp in source_prices]
-            dated.sort(reverse=True)
-            if dated:
-                recent_price = dated[0][1]
-        elif ing.manual_price:
-            recent_price = min_price = max_price = float(ing.manual_price)
-
-        ing_is_free = getattr(ing, 'is_free', False)
-        is_manual_price = (not source_prices and ing.manual_price is not None) if not ing_is_free else False
-        has_no_price = (recent_price is None) if not ing_is_free else False
-
-        # Apply yield adjustment
-        if recent_price and yld > 0:
-            recent_eff = recent_price / (yld / 100)
-        else:
-            recent_eff = recent_price
-        if min_price and yld > 0:
-            min_eff = min_price / (yld / 100)
-        else:
-            min_eff = min_price
-        if max_price and yld > 0:
-            max_eff = max_price / (yld / 100)
-        else:
-            max_eff = max_price
-
-        # Cost is calculated in standard units
-        cost_recent = round(qty_std * recent_eff, 4) if recent_eff else None
-        cost_min = round(qty_std * min_eff, 4) if min_eff else None
-        cost_max = round(qty_std * max_eff, 4) if max_eff else None
-
-        if cost_recent:
-            total_ing_cost += Decimal(str(cost_recent))
-        if cost_min:
-            total_ing_cost_min += Decimal(str(cost_min))
-        if cost_max:
-            total_ing_cost_max += Decimal(str(cost_max))
-
-        ingredient_costs.append({
-            "ingredient_id": ing.id,
-            "ingredient_name": ing.name,
-            "quantity": qty_display,
-            "unit": display_unit,
-            "yield_percent": yld,
-            "recent_price": round(recent_eff, 6) if recent_eff else None,
-            "min_price": round(min_eff, 6) if min_eff else None,
-            "max_price": round(max_eff, 6) if max_eff else None,
-            "cost_recent": cost_recent,
-            "cost_min": cost_min,
-            "cost_max": cost_max,
-            "sources": source_prices,
-            "is_manual_price": is_manual_price,
-            "has_no_price": has_no_price,
-        })
-
-    # Sub-recipe costs
-    sub_recipe_costs = []
-    total_sub_cost = Decimal(0)
-    total_sub_cost_min = Decimal(0)
-    total_sub_cost_max = Decimal(0)
-
-    for sr in recipe.sub_recipes:
-        child = sr.child_recipe
-        if not child:
-            continue
-        child_cost_data = await _calc_recipe_cost(child.id, db)
-        child_total = Decimal(str(child_cost_data.get("total_cost_recent", 0) or 0))
-        child_total_min = Decimal(str(child_cost_data.get("total_cost_min", 0) or 0))
-        child_total_max = Decimal(str(child_cost_data.get("total_cost_max", 0) or 0))
-        child_output_qty = _get_output_qty(child)
-        child_output_unit = _get_output_unit(child)
-        # Convert portions_needed to child output unit if different unit was used
-        needed_unit = sr.portions_needed_unit or child_output_unit
-        portions_needed_raw = float(sr.portions_needed) * scale_factor
-        portions_needed = _convert_unit(portions_needed_raw, needed_unit, child_output_unit)
-        scale_ratio = portions_needed / child_output_qty if child_output_qty else 0
-        cost_contribution = float(child_total) * scale_ratio if child_total else None
-        cost_contribution_min = float(child_total_min) * scale_ratio if child_total_min else None
-        cost_contribution_max = float(child_total_max) * scale_ratio if child_total_max else None
-
-        if cost_contribution:
-            total_sub_cost += Decimal(str(cost_contribution))
-        if cost_contribution_min:
-            total_sub_cost_min += Decimal(str(cost_contribution_min))
-        if cost_contribution_max:
-            total_sub_cost_max += Decimal(str(cost_contribution_max))
-
-        # Scale child ingredients by portions_needed / child_output_qty
-        # Include both direct ingredients AND ingredients from the child's own sub-recipes
-        child_scale = portions_needed / child_output_qty if child_output_qty else 1
-        child_ingredients = []
-        for ci in child_cost_data.get("ingredients", []):
-            child_ingredients.append({
-                "ingredient_id": ci["ingredient_id"],
-                "ingredient_name": ci["ingredient_name"],
-                "quantity": round(ci["quantity"] * child_scale, 4),
-                "unit": ci["unit"],
-                "yield_percent": ci["yield_percent"],
-                "cost_recent": round(ci["cost_recent"] * child_scale, 4) if ci.get("cost_recent") else None,
-                "cost_min": round(ci["cost_min"] * child_scale, 4) if ci.get("cost_min") else None,
-                "cost_max": round(ci["cost_max"] * child_scale, 4) if ci.get("cost_max") else None,
-                "is_manual_price": ci.get("is_manual_price", False),
-                "has_no_price": ci.get("has_no_price", False),
-            })
-        # Build hierarchical child_sub_recipes from the child's own sub-recipes
-        child_sub_recipes = _scale_child_sub_recipes(
-            child_cost_data.get("sub_recipes", []), child_scale
-        )
-
-        sub_recipe_costs.append({
-            "child_recipe_id": child.id,
-            "child_recipe_name": child.name,
-            "batch_portions": child.batch_portions,
-            "batch_output_type": child.batch_output_type or "portions",
-            "output_qty": child_output_qty,
-            "output_unit": child_output_unit,
-            "portions_needed": portions_needed,
-            "cost_per_portion": float(child_total) / child_output_qty if child_total and child_output_qty else None,
-            "cost_contribution": round(cost_contribution, 4) if cost_contribution else None,
-            "child_ingredients": child_ingredients,
-            "child_sub_recipes": child_sub_recipes,
-        })
-
-    total_cost = float(total_ing_cost + total_sub_cost)
-    total_cost_min = float(total_ing_cost_min + total_sub_cost_min)
-    total_cost_max = float(total_ing_cost_max + total_sub_cost_max)
-    effective_output = scale_to if scale_to else output_qty
-    cost_per_portion = total_cost / effective_output if effective_output and total_cost else None
-
-    # GP calculator for dishes (gross prices incl. 20% VAT)
-    gp_comparison = None
-    if recipe.recipe_type == "dish" and cost_per_portion:
-        vat_rate = 1.20
-        gp_comparison = [
-            {"gp_target": pct, "suggested_price": round(cost_per_portion / (1 - pct / 100) * vat_rate, 2)}
-            for pct in [60, 65, 70, 75, 80]
-        ]
-
-    return {
-        "recipe_id": recipe.id,
-        "batch_portions": recipe.batch_portions or 1,
-        "batch_output_type": recipe.batch_output_type or "portions",
-        "output_qty": effective_output,
-        "output_unit": output_unit,
-        "ingredients": ingredient_costs,
-        "sub_recipes": sub_recipe_costs,
-        "total_cost_recent": round(total_cost, 4) if total_cost else None,
-        "total_cost_min": round(total_cost_min, 4) if total_cost_min else None,
-        "total_cost_max": round(total_cost_max, 4) if total_cost_max else None,
-        "cost_per_portion": round(cost_per_portion, 4) if cost_per_portion else None,
-        "gp_comparison": gp_comparison,
-    }
+    engine = await RecipeCostEngine(db).load_recipes([recipe_id])
+    return engine.cost(recipe_id, scale_to)
 
 
 @router.get("/{recipe_id}/costing")
@@ -1862,115 +1574,71 @@ async def get_cost_trend(
     }
 
 
-async def snapshot_recipe_cost(recipe_id: int, db: AsyncSession, trigger_source: str = "manual_recalc"):
-    """Calculate and store/upsert a cost snapshot for today."""
-    cost_data = await _calc_recipe_cost(recipe_id, db)
-    total_cost = cost_data.get("total_cost_recent")
-    cost_per_portion = cost_data.get("cost_per_portion")
-    if total_cost is None or cost_per_portion is None:
-        return
-
-    today = date.today()
-    existing = await db.execute(
-        select(RecipeCostSnapshot).where(
-            RecipeCostSnapshot.recipe_id == recipe_id,
-            RecipeCostSnapshot.snapshot_date == today,
-        )
-    )
-    snap = existing.scalar_one_or_none()
-    if snap:
-        snap.cost_per_portion = Decimal(str(cost_per_portion))
-        snap.total_cost = Decimal(str(total_cost))
-        snap.trigger_source = trigger_source
-    else:
-        db.add(RecipeCostSnapshot(
-            recipe_id=recipe_id,
-            cost_per_portion=Decimal(str(cost_per_portion)),
-            total_cost=Decimal(str(total_cost)),
-            snapshot_date=today,
-            trigger_source=trigger_source,
-        ))
-
-
 async def _snapshot_recipe_and_parents(recipe_id: int, db: AsyncSession, trigger_source: str = ""):
-    """Snapshot a recipe and any parent recipes that use it as a sub-recipe.
+    """Snapshot a recipe and every recipe that uses it as a sub-recipe (at any depth).
     Also bumps updated_at so menu staleness detection picks up content changes."""
-    # Bump updated_at on the recipe itself (ingredient/sub-recipe changes don't trigger onupdate)
-    recipe_result = await db.execute(select(Recipe).where(Recipe.id == recipe_id))
-    recipe = recipe_result.scalar_one_or_none()
-    if recipe:
-        recipe.updated_at = datetime.utcnow()
-
-    await snapshot_recipe_cost(recipe_id, db, trigger_source)
-    parent_result = await db.execute(
-        select(RecipeSubRecipe.parent_recipe_id).where(RecipeSubRecipe.child_recipe_id == recipe_id)
-    )
-    for (parent_id,) in parent_result.fetchall():
-        # Bump parent updated_at too
-        p_result = await db.execute(select(Recipe).where(Recipe.id == parent_id))
-        parent = p_result.scalar_one_or_none()
-        if parent:
-            parent.updated_at = datetime.utcnow()
-        await snapshot_recipe_cost(parent_id, db, trigger_source)
+    recipe_ids = {recipe_id} | await recipe_ancestors(db, recipe_id)
+    # Ingredient/sub-recipe changes don't trigger onupdate
+    await touch_recipes(db, recipe_ids)
+
+    cost_engine = await RecipeCostEngine(db).load_recipes(recipe_ids)
+    await write_cost_snapshots(db, cost_engine, recipe_ids, trigger_source)
     await db.commit()
 
 
-async def snapshot_recipes_using_ingredient(
-    ingredient_id: int,
+def _price_change_summary(price_info: dict) -> Optional[str]:
+    """Change log message for an ingredient price update, or None if the price didn't move."""
+    name = price_info["name"]
+    unit = price_info.get("unit", "")
+    old_p = price_info.get("old_price")
+    new_p = price_info["new_price"]
+    unit_label = f"/{unit}" if unit else ""
+    # Only log if price actually changed
+    if old_p is not None and abs(new_p - old_p) > 0.000001:
+        return f"{name} price changed: £{old_p:.4f}{unit_label} → £{new_p:.4f}{unit_label}"
+    elif old_p is None:
+        return f"{name} price set: £{new_p:.4f}{unit_label}"
+    return None
+
+
+async def snapshot_recipes_using_ingredients(
+    price_updates: dict[int, dict | None],
     db: AsyncSession,
     trigger_source: str = "",
-    price_info: dict | None = None,
     invoice_id: int | None = None,
 ):
-    """Find all recipes using this ingredient and snapshot their costs.
+    """Snapshot the costs of every recipe using any of the given ingredients.
 
-    If price_info is provided ({"name", "unit", "old_price", "new_price"}),
-    a RecipeChangeLog entry is created for each affected recipe.
+    price_updates maps ingredient_id -> price_info ({"name", "unit", "old_price",
+    "new_price"}) or None. Affected recipes include all ancestor recipes/dishes,
+    are costed once from a single engine load, and their snapshots and change
+    log entries are written in bulk.
     """
-    # Direct usage
-    ri_result = await db.execute(
-        select(RecipeIngredient.recipe_id).where(RecipeIngredient.ingredient_id == ingredient_id)
-    )
-    recipe_ids = set(r[0] for r in ri_result.fetchall())
+    usage = await recipes_using_ingredients(db, price_updates.keys())
+    recipe_ids = set().union(*usage.values()) if usage else set()
+    if not recipe_ids:
+        return
 
-    # Also find recipes that use sub-recipes containing this ingredient (1 level)
-    for rid in list(recipe_ids):
-        parent_result = await db.execute(
-            select(RecipeSubRecipe.parent_recipe_id).where(RecipeSubRecipe.child_recipe_id == rid)
-        )
-        for (parent_id,) in parent_result.fetchall():
-            recipe_ids.add(parent_id)
-
-    # Build change log message if price info available
-    change_msg = None
-    if price_info:
-        name = price_info["name"]
-        unit = price_info.get("unit", "")
-        old_p = price_info.get("old_price")
-        new_p = price_info["new_price"]
-        unit_label = f"/{unit}" if unit else ""
-        # Only log if price actually changed
-        if old_p is not None and abs(new_p - old_p) > 0.000001:
-            change_msg = f"{name} price changed: £{old_p:.4f}{unit_label} → £{new_p:.4f}{unit_label}"
-        elif old_p is None:
-            change_msg = f"{name} price set: £{new_p:.4f}{unit_label}"
+    # Bump updated_at so menu staleness detection picks up ingredient flag changes
+    await touch_recipes(db, recipe_ids)
 
-    for rid in recipe_ids:
-        # Bump updated_at so menu staleness detection picks up ingredient flag changes
-        r_result = await db.execute(select(Recipe).where(Recipe.id == rid))
-        r = r_result.scalar_one_or_none()
-        if r:
-            r.updated_at = datetime.utcnow()
-        await snapshot_recipe_cost(rid, db, trigger_source)
-        if change_msg:
-            db.add(RecipeChangeLog(
-                recipe_id=rid,
-                change_summary=change_msg,
-                user_id=None,
-                source_invoice_id=invoice_id,
-            ))
-    if recipe_ids:
-        await db.commit()
+    cost_engine = await RecipeCostEngine(db).load_recipes(recipe_ids)
+    await write_cost_snapshots(db, cost_engine, recipe_ids, trigger_source)
+
+    change_logs = []
+    for ingredient_id, price_info in price_updates.items():
+        change_msg = _price_change_summary(price_info) if price_info else None
+        if not change_msg:
+            continue
+        for rid in sorted(usage.get(ingredient_id, ())):
+            change_logs.append({
+                "recipe_id": rid,
+                "change_summary": change_msg,
+                "user_id": None,
+                "source_invoice_id": invoice_id,
+            })
+    await write_change_logs(db, change_logs)
+    await db.commit()
 
 
 # ── Recipe Change Log ────────────────────────────────────────────────────────
@@ -2266,48 +1934,6 @@ def _build_recipe_html(recipe_data: dict, cost_data: dict, flags, format: str =
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
-# Unit conversion factors to a common base (g for weight, ml for volume)
-_UNIT_TO_BASE = {"g": 1.0, "kg": 1000.0, "ml": 1.0, "ltr": 1000.0}
-
-# Which units are compatible (same measurement type)
-_COMPATIBLE_UNITS = {
-    "g": ("g", "kg"), "kg": ("g", "kg"),
-    "ml": ("ml", "ltr"), "ltr": ("ml", "ltr"),
-    "portion": ("portion",), "each": ("each",),
-}
-
-
-def _convert_unit(value: float, from_unit: str, to_unit: str) -> float:
-    """Convert a value between compatible units. Returns original value if incompatible."""
-    if from_unit == to_unit:
-        return value
-    from_base = _UNIT_TO_BASE.get(from_unit)
-    to_base = _UNIT_TO_BASE.get(to_unit)
-    if from_base is None or to_base is None:
-        return value
-    # Check compatibility
-    if to_unit not in _COMPATIBLE_UNITS.get(from_unit, ()):
-        return value
-    return value * from_base / to_base
-
-
-def _get_compatible_units(unit: str) -> list[str]:
-    """Get list of compatible units for a given output unit."""
-    return list(_COMPATIBLE_UNITS.get(unit, (unit,)))
-
-
-def _get_output_qty(recipe) -> float:
-    """Unified output quantity: bulk uses yield_qty, portioned uses batch_portions."""
-    if recipe.batch_output_type == "bulk" and recipe.batch_yield_qty:
-        return float(recipe.batch_yield_qty)
-    return recipe.batch_portions or 1
-
-def _get_output_unit(recipe) -> str:
-    """Unified output unit label: bulk uses yield_unit, portioned uses 'portion'."""
-    if recipe.batch_output_type == "bulk" and recipe.batch_yield_unit:
-        return recipe.batch_yield_unit
-    return "portion"
-
 async def _get_recipe(recipe_id: int, kitchen_id: int, db: AsyncSession) -> Recipe:
     result = await db.execute(
         select(Recipe).where(Recipe.id == recipe_id, Recipe.kitchen_id == kitchen_id)
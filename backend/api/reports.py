@@ -5,7 +5,7 @@ import logging
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, case
+from sqlalchemy import select, func, case, cast, Date
 from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 
@@ -17,11 +17,35 @@ from models.invoice import Invoice, InvoiceStatus
 from models.gp import RevenueEntry, GPPeriod
 from models.newbook import NewbookDailyRevenue, NewbookGLAccount, NewbookDailyOccupancy
 from models.cost_distribution import CostDistribution, CostDistributionEntry, DistributionStatus
+from models.daily_purchase_total import DailyPurchaseTotal
 from auth.jwt import get_current_user
 
 router = APIRouter()
 
 
+def _stock_purchases_query(kitchen_id: int, start_date: date, end_date: date, *group_by):
+    """
+    Net stock purchases of confirmed invoices in a date range (credit notes
+    negative), read from daily_purchase_totals; one row per group_by value.
+    """
+    query = (
+        select(*group_by, func.sum(DailyPurchaseTotal.stock_net).label('stock_total'))
+        .where(
+            DailyPurchaseTotal.kitchen_id == kitchen_id,
+            DailyPurchaseTotal.purchase_date >= start_date,
+            DailyPurchaseTotal.purchase_date <= end_date
+        )
+    )
+    if group_by:
+        query = query.group_by(*group_by)
+    return query
+
+
+def _invoice_calendar_date():
+    """The date the purchases calendars file an invoice under: invoice_date, else the upload date."""
+    return func.coalesce(Invoice.invoice_date, cast(Invoice.created_at, Date))
+
+
 class RevenueEntryCreate(BaseModel):
     date: date
     amount: Decimal
@@ -229,9 +253,6 @@ async def calculate_gp(
     db: AsyncSession = Depends(get_db)
 ):
     """Calculate GP for a specific date range"""
-    from models.line_item import LineItem
-    from sqlalchemy import or_, and_
-
     # Get manual revenue entries for period
     manual_revenue_result = await db.execute(
         select(func.sum(RevenueEntry.amount))
@@ -260,41 +281,10 @@ async def calculate_gp(
     total_revenue = manual_revenue + newbook_revenue
 
     # Get total costs from confirmed invoices - stock items only
-    # Credit notes are treated as negative purchases
-    # Use subquery to sum per invoice first, then conditionally negate if credit note has positive total
-    # This matches the flash report's calc_stock_values logic
-    invoice_stock_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.document_type.label('doc_type'),
-            Invoice.category.label('category'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= request.start_date,
-            Invoice.invoice_date <= request.end_date,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.document_type, Invoice.category)
-        .subquery()
-    )
-
+    # Credit notes are treated as negative purchases (per invoice, matching the
+    # flash report's calc_stock_values logic) - pre-summed in daily_purchase_totals
     costs_result = await db.execute(
-        select(func.sum(
-            case(
-                # Credit note with positive total - negate it
-                (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                      invoice_stock_subq.c.stock_total > 0),
-                 -invoice_stock_subq.c.stock_total),
-                # Otherwise use as-is (includes credit notes with already-negative totals)
-                else_=invoice_stock_subq.c.stock_total
-            )
-        ))
-        .select_from(invoice_stock_subq)
+        _stock_purchases_query(current_user.kitchen_id, request.start_date, request.end_date)
     )
     total_costs = costs_result.scalar() or Decimal("0.00")
 
@@ -315,21 +305,12 @@ async def calculate_gp(
     gp_amount = total_revenue - total_costs
     gp_percentage = (gp_amount / total_revenue * 100) if total_revenue > 0 else Decimal("0.00")
 
-    # Category breakdown for costs (using same subquery approach)
+    # Category breakdown for costs
     category_result = await db.execute(
-        select(
-            invoice_stock_subq.c.category,
-            func.sum(
-                case(
-                    (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                          invoice_stock_subq.c.stock_total > 0),
-                     -invoice_stock_subq.c.stock_total),
-                    else_=invoice_stock_subq.c.stock_total
-                )
-            )
+        _stock_purchases_query(
+            current_user.kitchen_id, request.start_date, request.end_date,
+            DailyPurchaseTotal.category
         )
-        .select_from(invoice_stock_subq)
-        .group_by(invoice_stock_subq.c.category)
     )
     category_breakdown = {
         cat or "uncategorized": float(amount)
@@ -366,10 +347,8 @@ async def get_dashboard(
     prev_end = current_start - timedelta(days=1)
 
     async def calc_period_gp(start: date, end: date) -> GPReportResponse | None:
-        from models.line_item import LineItem
         from models.logbook import LogbookEntry, EntryType
         from models.dispute import InvoiceDispute, DisputeStatus
-        from sqlalchemy import or_
 
         # Manual revenue entries
         manual_rev_result = await db.execute(
@@ -399,41 +378,9 @@ async def get_dashboard(
         revenue = manual_revenue + newbook_revenue
 
         # Costs - stock items only (exclude non-stock)
-        # Credit notes (document_type='credit_note') are treated as negative purchases
-        # Use subquery to sum per invoice first, then conditionally negate if credit note has positive total
-        # This matches the flash report's calc_stock_values logic
-        from sqlalchemy import and_
-        invoice_stock_subq = (
-            select(
-                Invoice.id.label('inv_id'),
-                Invoice.document_type.label('doc_type'),
-                func.sum(LineItem.amount).label('stock_total')
-            )
-            .join(Invoice, LineItem.invoice_id == Invoice.id)
-            .where(
-                Invoice.kitchen_id == current_user.kitchen_id,
-                Invoice.invoice_date >= start,
-                Invoice.invoice_date <= end,
-                Invoice.status == InvoiceStatus.CONFIRMED,
-                LineItem.amount.isnot(None),
-                or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-            )
-            .group_by(Invoice.id, Invoice.document_type)
-            .subquery()
-        )
-        cost_result = await db.execute(
-            select(func.sum(
-                case(
-                    # Credit note with positive total - negate it
-                    (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                          invoice_stock_subq.c.stock_total > 0),
-                     -invoice_stock_subq.c.stock_total),
-                    # Otherwise use as-is (includes credit notes with already-negative totals)
-                    else_=invoice_stock_subq.c.stock_total
-                )
-            ))
-            .select_from(invoice_stock_subq)
-        )
+        # Credit notes (document_type='credit_note') are treated as negative purchases,
+        # per invoice as in the flash report's calc_stock_values logic
+        cost_result = await db.execute(_stock_purchases_query(current_user.kitchen_id, start, end))
         costs = cost_result.scalar() or Decimal("0.00")
 
         # Add cost distribution adjustments
@@ -570,23 +517,19 @@ async def get_weekly_purchases(
     week_end = week_start + timedelta(days=6)
     dates = [week_start + timedelta(days=i) for i in range(7)]
 
-    # Get all invoices for the week (all statuses, matched or not)
-    # Fetch all recent invoices and filter in Python for reliable date handling
+    # Get all invoices for the week (all statuses, matched or not),
+    # using invoice_date or created_at as fallback
+    calendar_date = _invoice_calendar_date()
     result = await db.execute(
         select(Invoice)
         .where(
             Invoice.kitchen_id == current_user.kitchen_id,
+            calendar_date >= week_start,
+            calendar_date <= week_end
         )
         .order_by(Invoice.invoice_date.desc().nullslast())
     )
-    all_invoices = result.scalars().all()
-
-    # Filter to invoices in the week range, using invoice_date or created_at as fallback
-    invoices = []
-    for inv in all_invoices:
-        inv_date = inv.invoice_date or inv.created_at.date()
-        if week_start <= inv_date <= week_end:
-            invoices.append(inv)
+    invoices = result.scalars().all()
 
     # Get all suppliers for name lookup
     supplier_result = await db.execute(
@@ -691,22 +634,18 @@ async def get_monthly_purchases(
     month_end = date(year, month, days_in_month)
 
     # Get all invoices for the month with their line items
+    calendar_date = _invoice_calendar_date()
     result = await db.execute(
         select(Invoice)
         .where(
             Invoice.kitchen_id == current_user.kitchen_id,
+            calendar_date >= month_start,
+            calendar_date <= month_end
         )
         .options(selectinload(Invoice.line_items))
         .order_by(Invoice.invoice_date.desc().nullslast())
     )
-    all_invoices = result.scalars().all()
-
-    # Filter to invoices in the month range
-    invoices = []
-    for inv in all_invoices:
-        inv_date = inv.invoice_date or inv.created_at.date()
-        if month_start <= inv_date <= month_end:
-            invoices.append(inv)
+    invoices = result.scalars().all()
 
     # Get all suppliers for name lookup
     supplier_result = await db.execute(
@@ -899,23 +838,19 @@ async def get_purchases_by_range(
         period_label = f"{from_date.strftime('%b %d, %Y')} - {to_date.strftime('%b %d, %Y')}"
 
     # Get all confirmed invoices for the range with their line items
+    calendar_date = _invoice_calendar_date()
     result = await db.execute(
         select(Invoice)
         .where(
             Invoice.kitchen_id == current_user.kitchen_id,
             Invoice.status == InvoiceStatus.CONFIRMED,
+            calendar_date >= from_date,
+            calendar_date <= to_date
         )
         .options(selectinload(Invoice.line_items))
         .order_by(Invoice.invoice_date.desc().nullslast())
     )
-    all_invoices = result.scalars().all()
-
-    # Filter to invoices in the date range
-    invoices = []
-    for inv in all_invoices:
-        inv_date = inv.invoice_date or inv.created_at.date()
-        if from_date <= inv_date <= to_date:
-            invoices.append(inv)
+    invoices = result.scalars().all()
 
     # Get all suppliers for name lookup
     supplier_result = await db.execute(
@@ -1155,9 +1090,7 @@ async def get_gp_by_range(
     db: AsyncSession = Depends(get_db)
 ):
     """Get GP calculation for a custom date range (inclusive)"""
-    from models.line_item import LineItem
     from models.logbook import LogbookEntry, EntryType
-    from sqlalchemy import or_
 
     # Validate date range
     if from_date > to_date:
@@ -1201,36 +1134,8 @@ async def get_gp_by_range(
 
     # Get net purchases from confirmed invoices - stock items only (exclude non-stock)
     # Credit notes (document_type='credit_note') are treated as negative purchases
-    # Use subquery to sum per invoice first, then conditionally negate if credit note has positive total
-    from sqlalchemy import and_
-    invoice_stock_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.document_type.label('doc_type'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= from_date,
-            Invoice.invoice_date <= to_date,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.document_type)
-        .subquery()
-    )
     purchases_result = await db.execute(
-        select(func.sum(
-            case(
-                (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                      invoice_stock_subq.c.stock_total > 0),
-                 -invoice_stock_subq.c.stock_total),
-                else_=invoice_stock_subq.c.stock_total
-            )
-        ))
-        .select_from(invoice_stock_subq)
+        _stock_purchases_query(current_user.kitchen_id, from_date, to_date)
     )
     net_food_purchases = purchases_result.scalar() or Decimal("0.00")
 
@@ -1310,51 +1215,15 @@ async def get_gp_by_range(
     gross_profit_percent = (gross_profit / net_food_sales * 100) if net_food_sales > 0 else Decimal("0.00")
 
     # Get supplier breakdown for purchases (credit notes as negative)
-    # Use subquery to sum per invoice, then aggregate by supplier
     from models.supplier import Supplier
-    invoice_by_supplier_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.supplier_id.label('supplier_id'),
-            Invoice.document_type.label('doc_type'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= from_date,
-            Invoice.invoice_date <= to_date,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.supplier_id, Invoice.document_type)
-        .subquery()
-    )
+    supplier_totals = _stock_purchases_query(
+        current_user.kitchen_id, from_date, to_date, DailyPurchaseTotal.supplier_id
+    ).subquery()
     supplier_result = await db.execute(
-        select(
-            invoice_by_supplier_subq.c.supplier_id,
-            Supplier.name,
-            func.sum(
-                case(
-                    (and_(invoice_by_supplier_subq.c.doc_type == 'credit_note',
-                          invoice_by_supplier_subq.c.stock_total > 0),
-                     -invoice_by_supplier_subq.c.stock_total),
-                    else_=invoice_by_supplier_subq.c.stock_total
-                )
-            )
-        )
-        .select_from(invoice_by_supplier_subq)
-        .outerjoin(Supplier, invoice_by_supplier_subq.c.supplier_id == Supplier.id)
-        .group_by(invoice_by_supplier_subq.c.supplier_id, Supplier.name)
-        .order_by(func.sum(
-            case(
-                (and_(invoice_by_supplier_subq.c.doc_type == 'credit_note',
-                      invoice_by_supplier_subq.c.stock_total > 0),
-                 -invoice_by_supplier_subq.c.stock_total),
-                else_=invoice_by_supplier_subq.c.stock_total
-            )
-        ).desc())
+        select(supplier_totals.c.supplier_id, Supplier.name, supplier_totals.c.stock_total)
+        .select_from(supplier_totals)
+        .outerjoin(Supplier, supplier_totals.c.supplier_id == Supplier.id)
+        .order_by(supplier_totals.c.stock_total.desc())
     )
     supplier_rows = supplier_result.all()
     supplier_breakdown = []
@@ -1439,9 +1308,8 @@ async def get_daily_gp_data(
     db: AsyncSession = Depends(get_db)
 ):
     """Get daily net sales and purchases for charting"""
-    from models.line_item import LineItem
     from models.resos import ResosDailyStats, ResosBooking
-    from sqlalchemy import or_, and_
+    from sqlalchemy import and_
     from datetime import timedelta
 
     # Validate date range
@@ -1476,40 +1344,8 @@ async def get_daily_gp_data(
 
     # Get daily purchases from confirmed invoices (grouped by invoice_date)
     # Credit notes (document_type='credit_note') are treated as negative purchases
-    # Use subquery to sum per invoice, then aggregate by date
-    invoice_daily_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.invoice_date.label('inv_date'),
-            Invoice.document_type.label('doc_type'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= from_date,
-            Invoice.invoice_date <= to_date,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.invoice_date, Invoice.document_type)
-        .subquery()
-    )
     purchases_daily = await db.execute(
-        select(
-            invoice_daily_subq.c.inv_date,
-            func.sum(
-                case(
-                    (and_(invoice_daily_subq.c.doc_type == 'credit_note',
-                          invoice_daily_subq.c.stock_total > 0),
-                     -invoice_daily_subq.c.stock_total),
-                    else_=invoice_daily_subq.c.stock_total
-                )
-            )
-        )
-        .select_from(invoice_daily_subq)
-        .group_by(invoice_daily_subq.c.inv_date)
+        _stock_purchases_query(current_user.kitchen_id, from_date, to_date, DailyPurchaseTotal.purchase_date)
     )
     purchases_by_date = {row[0]: row[1] or Decimal("0") for row in purchases_daily.all()}
 
@@ -1659,38 +1495,8 @@ async def get_monthly_gp(
 
     # Get net purchases from confirmed invoices - stock items only (exclude non-stock)
     # Credit notes (document_type='credit_note') are treated as negative purchases
-    # Use subquery to sum per invoice, then conditionally negate
-    from models.line_item import LineItem
-    from sqlalchemy import or_, and_
-
-    invoice_stock_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.document_type.label('doc_type'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= month_start,
-            Invoice.invoice_date <= month_end,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.document_type)
-        .subquery()
-    )
     purchases_result = await db.execute(
-        select(func.sum(
-            case(
-                (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                      invoice_stock_subq.c.stock_total > 0),
-                 -invoice_stock_subq.c.stock_total),
-                else_=invoice_stock_subq.c.stock_total
-            )
-        ))
-        .select_from(invoice_stock_subq)
+        _stock_purchases_query(current_user.kitchen_id, month_start, month_end)
     )
     net_food_purchases = purchases_result.scalar() or Decimal("0.00")
 
@@ -1814,7 +1620,7 @@ async def get_top_sellers(
     from models.settings import KitchenSettings
     from models.newbook import NewbookGLAccount
     from services.newbook_api import NewbookAPIClient, NewbookAPIError
-    from services.sambapos_api import SambaPOSClient
+    from services.sambapos_facts import get_sales_source
     from collections import defaultdict
     import logging
     logger = logging.getLogger(__name__)
@@ -1862,13 +1668,8 @@ async def get_top_sellers(
             )
 
         try:
-            client = SambaPOSClient(
-                host=settings.sambapos_db_host,
-                port=settings.sambapos_db_port or 1433,
-                database=settings.sambapos_db_name,
-                username=settings.sambapos_db_username,
-                password=settings.sambapos_db_password
-            )
+            # Local order fact table when synced, live SambaPOS query otherwise
+            client = await get_sales_source(db, settings)
 
             # Get top sellers by quantity and by revenue (excluding configured GroupCodes)
             top_by_qty = await client.get_top_sellers(from_date, to_date, tracked_categories, limit, excluded_categories=excluded_items if excluded_items else None)
@@ -2140,9 +1941,7 @@ async def get_purchases_summary(
     db: AsyncSession = Depends(get_db)
 ):
     """Get purchases summary with supplier breakdown for date range"""
-    from models.line_item import LineItem
     from models.supplier import Supplier
-    from sqlalchemy import or_
 
     # Validate date range
     if from_date > to_date:
@@ -2159,66 +1958,20 @@ async def get_purchases_summary(
 
     # Get total purchases (stock items only from confirmed invoices)
     # Credit notes (document_type='credit_note') are treated as negative purchases
-    # Use subquery to sum per invoice, then conditionally negate
-    from sqlalchemy import and_
-    invoice_stock_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.supplier_id.label('supplier_id'),
-            Invoice.document_type.label('doc_type'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= from_date,
-            Invoice.invoice_date <= to_date,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.supplier_id, Invoice.document_type)
-        .subquery()
-    )
     total_result = await db.execute(
-        select(func.sum(
-            case(
-                (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                      invoice_stock_subq.c.stock_total > 0),
-                 -invoice_stock_subq.c.stock_total),
-                else_=invoice_stock_subq.c.stock_total
-            )
-        ))
-        .select_from(invoice_stock_subq)
+        _stock_purchases_query(current_user.kitchen_id, from_date, to_date)
     )
     total_purchases = total_result.scalar() or Decimal("0.00")
 
     # Get supplier breakdown (credit notes as negative)
-    # Reuse the subquery grouped by supplier
+    supplier_totals = _stock_purchases_query(
+        current_user.kitchen_id, from_date, to_date, DailyPurchaseTotal.supplier_id
+    ).subquery()
     supplier_result = await db.execute(
-        select(
-            invoice_stock_subq.c.supplier_id,
-            Supplier.name,
-            func.sum(
-                case(
-                    (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                          invoice_stock_subq.c.stock_total > 0),
-                     -invoice_stock_subq.c.stock_total),
-                    else_=invoice_stock_subq.c.stock_total
-                )
-            )
-        )
-        .select_from(invoice_stock_subq)
-        .outerjoin(Supplier, invoice_stock_subq.c.supplier_id == Supplier.id)
-        .group_by(invoice_stock_subq.c.supplier_id, Supplier.name)
-        .order_by(func.sum(
-            case(
-                (and_(invoice_stock_subq.c.doc_type == 'credit_note',
-                      invoice_stock_subq.c.stock_total > 0),
-                 -invoice_stock_subq.c.stock_total),
-                else_=invoice_stock_subq.c.stock_total
-            )
-        ).desc())
+        select(supplier_totals.c.supplier_id, Supplier.name, supplier_totals.c.stock_total)
+        .select_from(supplier_totals)
+        .outerjoin(Supplier, supplier_totals.c.supplier_id == Supplier.id)
+        .order_by(supplier_totals.c.stock_total.desc())
     )
 
     supplier_breakdown = []
@@ -2249,9 +2002,7 @@ async def get_daily_purchases_by_supplier(
     db: AsyncSession = Depends(get_db)
 ):
     """Get daily purchases grouped by supplier for multi-line chart"""
-    from models.line_item import LineItem
     from models.supplier import Supplier
-    from sqlalchemy import or_
     from datetime import timedelta
     from collections import defaultdict
 
@@ -2260,46 +2011,15 @@ async def get_daily_purchases_by_supplier(
         raise HTTPException(status_code=400, detail="from_date must be before or equal to to_date")
 
     # Get daily purchases by supplier (credit notes as negative)
-    # Use subquery to sum per invoice first, then aggregate by date/supplier
-    from sqlalchemy import and_
-    invoice_daily_subq = (
-        select(
-            Invoice.id.label('inv_id'),
-            Invoice.invoice_date.label('inv_date'),
-            Invoice.supplier_id.label('supplier_id'),
-            Invoice.document_type.label('doc_type'),
-            func.sum(LineItem.amount).label('stock_total')
-        )
-        .join(Invoice, LineItem.invoice_id == Invoice.id)
-        .where(
-            Invoice.kitchen_id == current_user.kitchen_id,
-            Invoice.invoice_date >= from_date,
-            Invoice.invoice_date <= to_date,
-            Invoice.status == InvoiceStatus.CONFIRMED,
-            LineItem.amount.isnot(None),
-            or_(LineItem.is_non_stock == False, LineItem.is_non_stock.is_(None))
-        )
-        .group_by(Invoice.id, Invoice.invoice_date, Invoice.supplier_id, Invoice.document_type)
-        .subquery()
-    )
+    daily_totals = _stock_purchases_query(
+        current_user.kitchen_id, from_date, to_date,
+        DailyPurchaseTotal.purchase_date, DailyPurchaseTotal.supplier_id
+    ).subquery()
     daily_result = await db.execute(
-        select(
-            invoice_daily_subq.c.inv_date,
-            invoice_daily_subq.c.supplier_id,
-            Supplier.name,
-            func.sum(
-                case(
-                    (and_(invoice_daily_subq.c.doc_type == 'credit_note',
-                          invoice_daily_subq.c.stock_total > 0),
-                     -invoice_daily_subq.c.stock_total),
-                    else_=invoice_daily_subq.c.stock_total
-                )
-            )
-        )
-        .select_from(invoice_daily_subq)
-        .outerjoin(Supplier, invoice_daily_subq.c.supplier_id == Supplier.id)
-        .group_by(invoice_daily_subq.c.inv_date, invoice_daily_subq.c.supplier_id, Supplier.name)
-        .order_by(invoice_daily_subq.c.inv_date)
+        select(daily_totals.c.purchase_date, daily_totals.c.supplier_id, Supplier.name, daily_totals.c.stock_total)
+        .select_from(daily_totals)
+        .outerjoin(Supplier, daily_totals.c.supplier_id == Supplier.id)
+        .order_by(daily_totals.c.purchase_date)
     )
 
     # Collect all supplier totals to determine top suppliers
@@ -2753,7 +2473,7 @@ async def get_sales_gp(
     """
     from models.settings import KitchenSettings
     from models.recipe import Recipe, MenuSection, RecipeCostSnapshot
-    from services.sambapos_api import SambaPOSClient
+    from services.sambapos_facts import get_sales_source
 
     if from_date > to_date:
         raise HTTPException(status_code=400, detail="from_date must be before or equal to to_date")
@@ -2786,14 +2506,8 @@ async def get_sales_gp(
     if settings.sambapos_excluded_items:
         excluded_items = [i.strip() for i in settings.sambapos_excluded_items.split('|') if i.strip()]
 
-    # Fetch sales data from SambaPOS
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
-    )
+    # Fetch sales data (local order fact table when synced, live SambaPOS otherwise)
+    client = await get_sales_source(db, settings)
 
     try:
         sales = await client.get_sales_breakdown(
@@ -3089,7 +2803,7 @@ async def get_usage_variance(
     from models.recipe import Recipe, RecipeIngredient, RecipeSubRecipe
     from models.ingredient import Ingredient, IngredientSource, IngredientCategory
     from models.line_item import LineItem
-    from services.sambapos_api import SambaPOSClient
+    from services.sambapos_facts import get_sales_source
     from api.ingredients import convert_to_standard, UNIT_CONVERSIONS
     from sqlalchemy import distinct, and_, or_
 
@@ -3122,13 +2836,7 @@ async def get_usage_variance(
         i.strip() for i in (settings.sambapos_excluded_items or "").split("|") if i.strip()
     ]
 
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password,
-    )
+    client = await get_sales_source(db, settings)
 
     # ── Step 1: Get sales + match to recipes ──
     try:
@@ -11,8 +11,12 @@ from pydantic import BaseModel
 from database import get_db
 from models.user import User
 from models.settings import KitchenSettings
+from models.sambapos import SambaPOSSyncState
 from auth.jwt import get_current_user
 from services.sambapos_api import SambaPOSClient
+from services.sambapos_pool import sambapos_pools
+from services.sambapos_facts import SambaPOSFactsSyncService
+from services.sambapos_menu_cache import sambapos_menu_cache
 
 router = APIRouter()
 
@@ -119,6 +123,10 @@ async def update_sambapos_settings(
     await db.commit()
     await db.refresh(settings)
 
+    # Connection details may have changed - drop the pooled connections and cached menu
+    await sambapos_pools.invalidate(current_user.kitchen_id)
+    sambapos_menu_cache.invalidate(current_user.kitchen_id)
+
     # Parse tracked categories from comma-separated string
     tracked_categories = []
     if settings.sambapos_tracked_categories:
@@ -167,7 +175,8 @@ async def test_sambapos_connection(
         port=settings.sambapos_db_port or 1433,
         database=settings.sambapos_db_name,
         username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
+        password=settings.sambapos_db_password,
+        kitchen_id=settings.kitchen_id
     )
 
     result = await client.test_connection()
@@ -178,6 +187,91 @@ async def test_sambapos_connection(
         raise HTTPException(status_code=400, detail=f"Connection failed: {result['message']}")
 
 
+@router.get("/pool-stats")
+async def get_sambapos_pool_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """Connection pool stats for this kitchen's SambaPOS database (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can view pool stats")
+
+    stats = sambapos_pools.stats(current_user.kitchen_id)
+    return {"pooled": bool(stats), **stats}
+
+
+# ============ Order Fact Sync Endpoints ============
+
+@router.get("/facts-status")
+async def get_sambapos_facts_status(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """State of the local SambaPOS order fact table used by sales reports"""
+    result = await db.execute(
+        select(SambaPOSSyncState).where(SambaPOSSyncState.kitchen_id == current_user.kitchen_id)
+    )
+    state = result.scalar_one_or_none()
+    if not state:
+        return {"synced": False, "watermark": None, "synced_at": None, "tickets_synced": 0, "last_error": None}
+
+    return {
+        "synced": state.facts_synced_at is not None,
+        "watermark": state.facts_watermark,
+        "synced_at": state.facts_synced_at,
+        "tickets_synced": state.tickets_synced,
+        "last_error": state.last_error,
+    }
+
+
+@router.post("/sync-facts")
+async def sync_sambapos_facts(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Pull changed SambaPOS tickets into the local order fact table now (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can run the SambaPOS sync")
+
+    try:
+        results = await SambaPOSFactsSyncService(db, current_user.kitchen_id).sync()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SambaPOS sync failed: {str(e)}")
+
+    return {"status": "success", **results}
+
+
+@router.post("/menu-cache/refresh")
+async def refresh_sambapos_menu_cache(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Re-read menu items from SambaPOS into the cached menu dimension"""
+    result = await db.execute(
+        select(KitchenSettings).where(KitchenSettings.kitchen_id == current_user.kitchen_id)
+    )
+    settings = result.scalar_one_or_none()
+
+    if not settings:
+        raise HTTPException(status_code=404, detail="Settings not found")
+
+    if not all([
+        settings.sambapos_db_host,
+        settings.sambapos_db_name,
+        settings.sambapos_db_username,
+        settings.sambapos_db_password
+    ]):
+        raise HTTPException(status_code=400, detail="SambaPOS database credentials not configured")
+
+    try:
+        menu = await sambapos_menu_cache.get(db, settings, force_refresh=True)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to refresh menu: {str(e)}")
+
+    return {"status": "success", "menu_items": len(menu.items), "refreshed_at": menu.refreshed_at}
+
+
 # ============ Categories Endpoints ============
 
 @router.get("/categories", response_model=list[CategoryResponse])
@@ -202,16 +296,10 @@ async def get_sambapos_categories(
     ]):
         raise HTTPException(status_code=400, detail="SambaPOS database credentials not configured")
 
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
-    )
-
     try:
-        categories = await client.get_categories()
+        # Parsed menu item dimension (cached per kitchen, see services/sambapos_menu_cache.py)
+        menu = await sambapos_menu_cache.get(db, settings)
+        categories = menu.get_categories()
         return [CategoryResponse(id=cat["id"], name=cat["name"]) for cat in categories]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch categories: {str(e)}")
@@ -281,7 +369,8 @@ async def debug_menuitems(
         port=settings.sambapos_db_port or 1433,
         database=settings.sambapos_db_name,
         username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
+        password=settings.sambapos_db_password,
+        kitchen_id=settings.kitchen_id
     )
 
     try:
@@ -319,16 +408,10 @@ async def get_menu_items(
     if settings.sambapos_tracked_categories:
         tracked_categories = [c.strip() for c in settings.sambapos_tracked_categories.split(',') if c.strip()]
 
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
-    )
-
     try:
-        items = await client.get_menu_item_names(categories=tracked_categories if tracked_categories else None)
+        # Parsed menu item dimension (cached per kitchen, see services/sambapos_menu_cache.py)
+        menu = await sambapos_menu_cache.get(db, settings)
+        items = menu.get_menu_item_names(categories=tracked_categories if tracked_categories else None)
         return [MenuItemResponse(name=item["name"], category=item["category"]) for item in items]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch menu items: {str(e)}")
@@ -368,16 +451,10 @@ async def get_menu_items_with_portions(
     if settings.sambapos_tracked_categories:
         tracked_categories = [c.strip() for c in settings.sambapos_tracked_categories.split(',') if c.strip()]
 
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
-    )
-
     try:
-        items = await client.get_menu_items_with_portions(
+        # Parsed menu item dimension (cached per kitchen, see services/sambapos_menu_cache.py)
+        menu = await sambapos_menu_cache.get(db, settings)
+        items = menu.get_menu_items_with_portions(
             categories=tracked_categories if tracked_categories else None
         )
         return [
@@ -466,16 +543,10 @@ async def get_group_codes(
     ]):
         raise HTTPException(status_code=400, detail="SambaPOS database credentials not configured")
 
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
-    )
-
     try:
-        group_codes = await client.get_menu_group_codes()
+        # Parsed menu item dimension (cached per kitchen, see services/sambapos_menu_cache.py)
+        menu = await sambapos_menu_cache.get(db, settings)
+        group_codes = menu.get_menu_group_codes()
         return [GroupCodeResponse(name=gc["name"]) for gc in group_codes]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch group codes: {str(e)}")
@@ -514,16 +585,10 @@ async def get_gl_codes(
     ]):
         raise HTTPException(status_code=400, detail="SambaPOS database credentials not configured")
 
-    client = SambaPOSClient(
-        host=settings.sambapos_db_host,
-        port=settings.sambapos_db_port or 1433,
-        database=settings.sambapos_db_name,
-        username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
-    )
-
     try:
-        gl_codes = await client.get_gl_codes()
+        # Parsed menu item dimension (cached per kitchen, see services/sambapos_menu_cache.py)
+        menu = await sambapos_menu_cache.get(db, settings)
+        gl_codes = menu.get_gl_codes()
         return [GLCodeResponse(code=gc["code"]) for gc in gl_codes]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch GL codes: {str(e)}")
@@ -614,7 +679,8 @@ async def debug_custom_tags(
         port=settings.sambapos_db_port or 1433,
         database=settings.sambapos_db_name,
         username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
+        password=settings.sambapos_db_password,
+        kitchen_id=settings.kitchen_id
     )
 
     try:
@@ -650,7 +716,8 @@ async def debug_table_schema(
         port=settings.sambapos_db_port or 1433,
         database=settings.sambapos_db_name,
         username=settings.sambapos_db_username,
-        password=settings.sambapos_db_password
+        password=settings.sambapos_db_password,
+        kitchen_id=settings.kitchen_id
     )
 
     try:
@@ -1,12 +1,13 @@
 """
 Search API endpoints for searching invoices, line items, and product definitions.
 """
+import re
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, func, and_, or_, desc, literal_column
 from pydantic import BaseModel
 
 from database import get_db
@@ -18,9 +19,25 @@ from models.product_definition import ProductDefinition
 from models.settings import KitchenSettings
 from auth.jwt import get_current_user
 from services.price_history import PriceHistoryService
+from services.pagination import decode_cursor, keyset_after, paginate, want_total
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
+# Invoice search counts stop here; beyond it the UI shows "1000+"
+SEARCH_COUNT_CAP = 1000
+
+# Generated tsvector columns (migrations/add_search_indexes.py), not mapped on the models
+INVOICE_SEARCH_VECTOR = literal_column("invoices.search_vector")
+LINE_ITEM_SEARCH_VECTOR = literal_column("line_items.search_vector")
+
+
+def _prefix_tsquery(q: str):
+    """to_tsquery matching every word of q as a prefix ("fresh veg" -> fresh:* & veg:*), or None."""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    return func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words))
+
 
 # ============ Response Models ============
 
@@ -48,9 +65,11 @@ class InvoiceSearchItem(BaseModel):
 
 class InvoiceSearchResponse(BaseModel):
     items: List[InvoiceSearchItem]
-    total_count: int
+    total_count: Optional[int]  # None when not requested (cursor pages)
+    total_is_estimate: bool = False  # total_count is a lower bound (count was capped)
     grouped_by: Optional[str]
     groups: Optional[List[GroupSummary]]
+    next_cursor: Optional[str] = None
 
 
 class LineItemSearchItem(BaseModel):
@@ -89,9 +108,10 @@ class LineItemSearchItem(BaseModel):
 
 class LineItemSearchResponse(BaseModel):
     items: List[LineItemSearchItem]
-    total_count: int
+    total_count: Optional[int]  # None when not requested (cursor pages)
     grouped_by: Optional[str]
     groups: Optional[List[GroupSummary]]
+    next_cursor: Optional[str] = None
 
 
 class DefinitionSearchItem(BaseModel):
@@ -116,7 +136,8 @@ class DefinitionSearchItem(BaseModel):
 
 class DefinitionSearchResponse(BaseModel):
     items: List[DefinitionSearchItem]
-    total_count: int
+    total_count: Optional[int]  # None when not requested (cursor pages)
+    next_cursor: Optional[str] = None
 
 
 class PriceHistoryPointResponse(BaseModel):
@@ -170,18 +191,22 @@ async def search_invoices(
     group_by: Optional[str] = None,
     limit: int = Query(default=100, le=500),
     offset: int = 0,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Search invoices with optional filters.
 
-    - q: Search term (invoice_number, vendor_name)
+    - q: Search term (invoice_number, vendor_name, supplier name); results ranked by relevance
     - include_line_items: Also search line item product_code/description
     - supplier_id: Filter by supplier
     - status: Filter by status (pending, confirmed, etc.)
     - date_from/date_to: Date range (default: last 30 days)
     - group_by: "supplier" or "month" for grouped results
+    - after: next_cursor from the previous page (keyset paging instead of offset)
+    - include_total: count matches (default: first page only)
     """
     # Default date range: last 30 days
     if date_to is None:
@@ -202,44 +227,81 @@ async def search_invoices(
     if status:
         conditions.append(Invoice.status == status)
 
-    # Search filter
+    # Search filter: substring matches (trigram indexes) or word-prefix matches
+    # (search_vector) on the invoice, its supplier and optionally its line items
+    rank = None
     if q:
         search_pattern = f"%{q}%"
+        tsquery = _prefix_tsquery(q)
         search_conditions = [
             Invoice.invoice_number.ilike(search_pattern),
             Invoice.vendor_name.ilike(search_pattern),
+            Invoice.supplier_id.in_(
+                select(Supplier.id).where(
+                    Supplier.kitchen_id == current_user.kitchen_id,
+                    Supplier.name.ilike(search_pattern)
+                )
+            ),
         ]
+        if tsquery is not None:
+            search_conditions.append(INVOICE_SEARCH_VECTOR.op("@@")(tsquery))
 
         if include_line_items:
             # Need to join line items and search there too
-            line_item_subquery = (
-                select(LineItem.invoice_id)
-                .where(or_(
-                    LineItem.product_code.ilike(search_pattern),
-                    LineItem.description.ilike(search_pattern)
-                ))
-                .distinct()
-            )
+            line_item_conditions = [
+                LineItem.product_code.ilike(search_pattern),
+                LineItem.description.ilike(search_pattern),
+            ]
+            if tsquery is not None:
+                line_item_conditions.append(LINE_ITEM_SEARCH_VECTOR.op("@@")(tsquery))
+            line_item_subquery = select(LineItem.invoice_id).where(or_(*line_item_conditions))
             search_conditions.append(Invoice.id.in_(line_item_subquery))
 
         conditions.append(or_(*search_conditions))
 
-    # Get total count
-    count_query = select(func.count(Invoice.id)).where(and_(*conditions))
-    count_result = await db.execute(count_query)
-    total_count = count_result.scalar() or 0
-
-    # Get invoices with supplier name
+        # Relevance: weighted word matches (number > vendor) plus closest substring similarity
+        rank = func.greatest(
+            func.similarity(func.coalesce(Invoice.invoice_number, ""), q),
+            func.similarity(func.coalesce(Invoice.vendor_name, ""), q),
+            func.similarity(func.coalesce(Supplier.name, ""), q),
+        )
+        if tsquery is not None:
+            rank = rank + func.ts_rank_cd(INVOICE_SEARCH_VECTOR, tsquery)
+
+    # Get invoices with supplier name, newest first or by relevance, then (invoice_date, id)
+    # - idx_invoices_kitchen_date_id serves the unranked keyset
+    sort_columns = [Invoice.invoice_date, Invoice.id]
+    if rank is not None:
+        sort_columns.insert(0, rank)
     query = (
-        select(Invoice, Supplier.name.label('supplier_name'))
+        select(Invoice, Supplier.name.label('supplier_name'), *sort_columns)
         .outerjoin(Supplier, Invoice.supplier_id == Supplier.id)
         .where(and_(*conditions))
-        .order_by(desc(Invoice.invoice_date))
-        .limit(limit)
-        .offset(offset)
+        .order_by(*[desc(col) for col in sort_columns])
+        .limit(limit + 1)
     )
+    if after:
+        query = query.where(keyset_after(sort_columns, decode_cursor(after, len(sort_columns))))
+    else:
+        query = query.offset(offset)
     result = await db.execute(query)
-    rows = result.fetchall()
+    rows, next_cursor = paginate(result.fetchall(), limit, lambda row: tuple(row[2:]))
+
+    # Total count: free when the page isn't full, otherwise counted up to SEARCH_COUNT_CAP
+    total_count = None
+    total_is_estimate = False
+    if not want_total(include_total, after):
+        pass
+    elif not after and (offset == 0 or rows) and len(rows) < limit:
+        total_count = offset + len(rows)
+    else:
+        count_cap = max(SEARCH_COUNT_CAP, offset + limit)
+        capped = select(Invoice.id).where(and_(*conditions)).limit(count_cap + 1).subquery()
+        count_result = await db.execute(select(func.count()).select_from(capped))
+        total_count = count_result.scalar() or 0
+        if total_count > count_cap:
+            total_count = count_cap
+            total_is_estimate = True
 
     items = [
         InvoiceSearchItem(
@@ -296,8 +358,10 @@ async def search_invoices(
     return InvoiceSearchResponse(
         items=items,
         total_count=total_count,
+        total_is_estimate=total_is_estimate,
         grouped_by=group_by,
-        groups=groups
+        groups=groups,
+        next_cursor=next_cursor
     )
 
 
@@ -313,6 +377,8 @@ async def search_line_items(
     mapped: Optional[str] = Query(default=None, description="Filter by ingredient mapping: 'yes', 'no'"),
     limit: int = Query(default=100, le=500),
     offset: int = 0,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -321,16 +387,19 @@ async def search_line_items(
 
     Returns DISTINCT line items by (product_code OR description + supplier),
     with most recent price, price change status, total quantity, occurrence count.
+    Page with `after` (the previous page's next_cursor) instead of offset.
     """
     price_service = PriceHistoryService(db, current_user.kitchen_id)
 
-    items_data, total_count = await price_service.get_consolidated_line_items(
+    items_data, total_count, next_cursor = await price_service.get_consolidated_line_items(
         search_query=q if q else None,
         supplier_id=supplier_id,
         date_from=date_from,
         date_to=date_to,
         limit=limit,
-        offset=offset
+        offset=offset,
+        after=after,
+        include_total=want_total(include_total, after)
     )
 
     items = [LineItemSearchItem(**item) for item in items_data]
@@ -365,7 +434,8 @@ async def search_line_items(
         items=items,
         total_count=total_count,
         grouped_by=group_by,
-        groups=groups
+        groups=groups,
+        next_cursor=next_cursor
     )
 
 
@@ -378,6 +448,8 @@ async def search_definitions(
     has_portions: Optional[bool] = None,
     limit: int = Query(default=100, le=500),
     offset: int = 0,
+    after: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -387,6 +459,7 @@ async def search_definitions(
     - q: Search term (product_code, description_pattern)
     - supplier_id: Filter by supplier
     - has_portions: Filter by whether portions_per_unit is set
+    - after: next_cursor from the previous page (keyset paging instead of offset)
     """
     conditions = [ProductDefinition.kitchen_id == current_user.kitchen_id]
 
@@ -407,11 +480,14 @@ async def search_definitions(
             conditions.append(ProductDefinition.portions_per_unit.is_(None))
 
     # Get total count
-    count_query = select(func.count(ProductDefinition.id)).where(and_(*conditions))
-    count_result = await db.execute(count_query)
-    total_count = count_result.scalar() or 0
+    total_count = None
+    if want_total(include_total, after):
+        count_query = select(func.count(ProductDefinition.id)).where(and_(*conditions))
+        count_result = await db.execute(count_query)
+        total_count = count_result.scalar() or 0
 
     # Get definitions with supplier name and source invoice number
+    # (updated_at, id) descending - idx_product_definitions_kitchen_updated_id
     query = (
         select(
             ProductDefinition,
@@ -421,12 +497,20 @@ async def search_definitions(
         .outerjoin(Supplier, ProductDefinition.supplier_id == Supplier.id)
         .outerjoin(Invoice, ProductDefinition.source_invoice_id == Invoice.id)
         .where(and_(*conditions))
-        .order_by(desc(ProductDefinition.updated_at))
-        .limit(limit)
-        .offset(offset)
+        .order_by(desc(ProductDefinition.updated_at), desc(ProductDefinition.id))
+        .limit(limit + 1)
     )
+    if after:
+        query = query.where(keyset_after(
+            (ProductDefinition.updated_at, ProductDefinition.id), decode_cursor(after, 2)
+        ))
+    else:
+        query = query.offset(offset)
     result = await db.execute(query)
-    rows = result.fetchall()
+    rows, next_cursor = paginate(
+        result.fetchall(), limit,
+        lambda row: (row.ProductDefinition.updated_at, row.ProductDefinition.id)
+    )
 
     items = []
     for row in rows:
@@ -474,7 +558,7 @@ async def search_definitions(
             updated_at=definition.updated_at
         ))
 
-    return DefinitionSearchResponse(items=items, total_count=total_count)
+    return DefinitionSearchResponse(items=items, total_count=total_count, next_cursor=next_cursor)
 
 
 # ============ Line Item History ============
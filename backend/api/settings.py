@@ -40,6 +40,7 @@ class SettingsResponse(BaseModel):
     ocr_clean_product_codes: bool
     ocr_filter_subtotal_rows: bool
     ocr_use_weight_as_quantity: bool
+    azure_requests_per_minute: int = 15
     # Cost distribution settings
     cost_distribution_max_days: int
     # LLM settings — see LLM-MANIFEST.md for removal instructions
@@ -83,6 +84,7 @@ class SettingsUpdate(BaseModel):
     ocr_clean_product_codes: bool | None = None
     ocr_filter_subtotal_rows: bool | None = None
     ocr_use_weight_as_quantity: bool | None = None
+    azure_requests_per_minute: int | None = None
     # Cost distribution settings
     cost_distribution_max_days: int | None = None
     # LLM settings — see LLM-MANIFEST.md for removal instructions
@@ -150,6 +152,7 @@ def _build_settings_response(settings: KitchenSettings) -> SettingsResponse:
         ocr_clean_product_codes=settings.ocr_clean_product_codes,
         ocr_filter_subtotal_rows=settings.ocr_filter_subtotal_rows,
         ocr_use_weight_as_quantity=settings.ocr_use_weight_as_quantity,
+        azure_requests_per_minute=settings.azure_requests_per_minute or 15,
         cost_distribution_max_days=settings.cost_distribution_max_days,
         # LLM settings — see LLM-MANIFEST.md for removal instructions
         llm_enabled=settings.llm_enabled,
@@ -11,6 +11,8 @@ from models.supplier import Supplier
 from models.invoice import Invoice
 from auth.jwt import get_current_user
 from ocr.parser import identify_supplier
+from services.price_points import refresh_invoice_price_points
+from services.purchase_totals import refresh_purchase_totals
 
 router = APIRouter()
 
@@ -31,6 +33,7 @@ async def rematch_unmatched_invoices(kitchen_id: int):
         )
         invoices = result.scalars().all()
 
+        matched_dates = []
         for invoice in invoices:
             if invoice.vendor_name:
                 supplier_id, match_type = await identify_supplier(
@@ -39,7 +42,12 @@ async def rematch_unmatched_invoices(kitchen_id: int):
                 if supplier_id:
                     invoice.supplier_id = supplier_id
                     invoice.supplier_match_type = match_type
+                    await db.flush()
+                    await refresh_invoice_price_points(db, invoice.id)
+                    matched_dates.append(invoice.invoice_date)
 
+        # Once, just before commit: the refresh holds the kitchen's totals lock until then
+        await refresh_purchase_totals(db, kitchen_id, matched_dates)
         await db.commit()
 
 
@@ -335,6 +343,11 @@ async def rematch_fuzzy_invoices(
         invoice.supplier_id = None
         invoice.supplier_match_type = None
 
+    await db.flush()
+    for invoice in fuzzy_invoices:
+        await refresh_invoice_price_points(db, invoice.id)
+    await refresh_purchase_totals(db, current_user.kitchen_id, [invoice.invoice_date for invoice in fuzzy_invoices])
+
     await db.commit()
 
     # Re-run matching in background
@@ -1,4 +1,9 @@
 import logging
+import time
+
+# Process start, for reporting cold-start time
+_boot_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -12,458 +17,42 @@ logging.basicConfig(
 )
 from api import invoices, suppliers, reports, settings, field_mappings, newbook, sambapos, backup, search, resos, calendar_events, residents_table_chart, disputes, credit_notes, public, logbook, imap, support, kds, budget, cover_overrides, purchase_orders, cost_distributions, ingredients, recipes, food_flags, event_orders, external, menus, reconciliation
 from auth.routes import router as auth_router
-from migrations.add_invoice_features import run_migration
-from migrations.add_newbook_tables import run_migration as run_newbook_migration
-from migrations.add_line_item_search import run_migration as run_search_migration
-from migrations.add_sambapos_settings import run_migration as run_sambapos_migration
-from migrations.add_sambapos_excluded_items import run_migration as run_sambapos_excluded_migration
-from migrations.add_admin_restricted_pages import run_migration as run_admin_pages_migration
-from migrations.add_nextcloud_backup import run_migration as run_nextcloud_backup_migration
-from migrations.add_price_settings import run_migration as run_price_settings_migration
-from migrations.add_resos_integration import run_migration as run_resos_migration
-from migrations.add_calendar_events import run_migration as run_calendar_events_migration
-from migrations.add_resos_upcoming_sync import run_migration as run_resos_upcoming_sync_migration
-from migrations.add_newbook_upcoming_sync import run_migration as run_newbook_upcoming_sync_migration
-from migrations.add_residents_table_chart import run_migration as run_residents_table_chart_migration
-from migrations.add_rooms_breakdown import run_migration as run_rooms_breakdown_migration
-from migrations.add_invoice_disputes import run_migration as run_disputes_migration
-from migrations.add_awaiting_replacement_status import run_migration as run_awaiting_replacement_migration
-from migrations.add_new_status import run_migration as run_new_status_migration
-from migrations.add_dispute_attachment_public_hash import run_migration as run_dispute_attachment_hash_migration
-from migrations.add_logbook import run_migration as run_logbook_migration
-from migrations.add_imap_integration import run_migration as run_imap_migration
-from migrations.add_support_request import run_migration as run_support_migration
-from migrations.add_pdf_annotation_settings import run_migration as run_pdf_annotation_settings_migration
-from migrations.add_linked_dispute import run_migration as run_linked_dispute_migration
-from migrations.add_ocr_post_processing import run_migration as run_ocr_post_processing_migration
-from migrations.add_ocr_weight_setting import run_migration as run_ocr_weight_setting_migration
-from migrations.add_kds_tables import run_migration as run_kds_migration
-from migrations.add_kds_course_flow import run_migration as run_kds_course_flow_migration
-from migrations.add_kds_order_tracking import run_migration as run_kds_order_tracking_migration
-from migrations.add_kds_bookings_refresh import run_migration as run_kds_bookings_refresh_migration
-from migrations.add_budget_settings import migrate as run_budget_settings_migration
-from migrations.add_cover_overrides import migrate as run_cover_overrides_migration
-from migrations.add_purchase_orders import migrate as run_purchase_orders_migration
-from migrations.add_supplier_po_fields import migrate as run_supplier_po_fields_migration
-from migrations.add_kitchen_details import migrate as run_kitchen_details_migration
-from migrations.add_cost_distributions import migrate as run_cost_distributions_migration
-from migrations.add_recipe_system import migrate as run_recipe_system_migration
-from migrations.add_flag_assessment import migrate as run_flag_assessment_migration
-from migrations.add_dish_separation import migrate as run_dish_separation_migration
-from migrations.add_step_title import migrate as run_step_title_migration
-from migrations.add_gross_sell_price import migrate as run_gross_sell_price_migration
-from migrations.add_recipe_ingredient_yield import migrate as run_recipe_ingredient_yield_migration
-from migrations.add_recipe_batch_type import migrate as run_recipe_batch_type_migration
-from migrations.add_sub_recipe_unit import migrate as run_sub_recipe_unit_migration
-from migrations.add_recipe_ingredient_unit import migrate as run_recipe_ingredient_unit_migration
-from migrations.add_allergen_keywords import migrate as run_allergen_keywords_migration
-from migrations.add_brakes_cache import migrate as run_brakes_cache_migration
-from migrations.add_description_aliases import migrate as run_description_aliases_migration
-from migrations.add_brakes_dietary_info import migrate as run_brakes_dietary_info_migration
-from migrations.add_ingredient_flag_dismissals import migrate as run_ingredient_flag_dismissals_migration
-from migrations.add_menus import migrate as run_menus_migration
-from migrations.add_ingredient_is_free import migrate as run_ingredient_is_free_migration
-from migrations.add_recipe_text_flag_dismissals import migrate as run_recipe_text_flag_dismissals_migration
-from migrations.add_llm_infrastructure import migrate as run_llm_infrastructure_migration  # LLM FEATURE — see LLM-MANIFEST.md
-from migrations.add_changelog_invoice_link import migrate as run_changelog_invoice_link_migration
-from migrations.add_sambapos_portion_name import migrate as run_sambapos_portion_name_migration
+from migrations.ledger import run_pending_migrations
 from scheduler import start_scheduler, stop_scheduler
 from services.signalr_listener import start_signalr_listener, stop_signalr_listener
+from services.sambapos_pool import sambapos_pools
+from services.kds_events import kds_event_bus
+from services.ocr_queue import ocr_queue
+from services.ocr_reparse import shutdown_reparse_pool
+from services.pdf_jobs import shutdown_pdf_pool
+from services.preview_cache import preview_cache
 
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    app.state.startup_seconds = None
+    app.state.first_healthy_seconds = None
+
     # Startup: Create database tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-    # Run migrations for new columns on existing tables
-    try:
-        await run_migration()
-        logger.info("Database migrations completed")
-    except Exception as e:
-        logger.warning(f"Migration warning (may be expected): {e}")
-
-    # Run Newbook migrations
-    try:
-        await run_newbook_migration()
-        logger.info("Newbook migrations completed")
-    except Exception as e:
-        logger.warning(f"Newbook migration warning (may be expected): {e}")
-
-    # Run line item search migrations (pg_trgm extension and index)
-    try:
-        await run_search_migration()
-        logger.info("Line item search migrations completed")
-    except Exception as e:
-        logger.warning(f"Line item search migration warning (may be expected): {e}")
-
-    # Run SambaPOS migrations
-    try:
-        await run_sambapos_migration()
-        logger.info("SambaPOS migrations completed")
-    except Exception as e:
-        logger.warning(f"SambaPOS migration warning (may be expected): {e}")
-
-    # Run SambaPOS excluded items migration
-    try:
-        await run_sambapos_excluded_migration()
-        logger.info("SambaPOS excluded items migration completed")
-    except Exception as e:
-        logger.warning(f"SambaPOS excluded items migration warning (may be expected): {e}")
-
-    # Run admin restricted pages migration
-    try:
-        await run_admin_pages_migration()
-        logger.info("Admin restricted pages migration completed")
-    except Exception as e:
-        logger.warning(f"Admin restricted pages migration warning (may be expected): {e}")
-
-    # Run Nextcloud/Backup migration
-    try:
-        await run_nextcloud_backup_migration()
-        logger.info("Nextcloud/Backup migration completed")
-    except Exception as e:
-        logger.warning(f"Nextcloud/Backup migration warning (may be expected): {e}")
-
-    # Run price settings migration
-    try:
-        await run_price_settings_migration()
-        logger.info("Price settings migration completed")
-    except Exception as e:
-        logger.warning(f"Price settings migration warning (may be expected): {e}")
-
-    # Run Resos integration migration
-    try:
-        await run_resos_migration()
-        logger.info("Resos integration migration completed")
-    except Exception as e:
-        logger.warning(f"Resos integration migration warning (may be expected): {e}")
-
-    # Run Calendar events migration
-    try:
-        await run_calendar_events_migration()
-        logger.info("Calendar events migration completed")
-    except Exception as e:
-        logger.warning(f"Calendar events migration warning (may be expected): {e}")
-
-    # Run Resos upcoming sync migration
-    try:
-        await run_resos_upcoming_sync_migration()
-        logger.info("Resos upcoming sync migration completed")
-    except Exception as e:
-        logger.warning(f"Resos upcoming sync migration warning (may be expected): {e}")
-
-    # Run Newbook upcoming sync migration
-    try:
-        await run_newbook_upcoming_sync_migration()
-        logger.info("Newbook upcoming sync migration completed")
-    except Exception as e:
-        logger.warning(f"Newbook upcoming sync migration warning (may be expected): {e}")
-
-    # Run residents table chart migration
-    try:
-        await run_residents_table_chart_migration()
-        logger.info("Residents table chart migration completed")
-    except Exception as e:
-        logger.warning(f"Residents table chart migration warning (may be expected): {e}")
-
-    # Run rooms breakdown migration
-    try:
-        await run_rooms_breakdown_migration()
-        logger.info("Rooms breakdown migration completed")
-    except Exception as e:
-        logger.warning(f"Rooms breakdown migration warning (may be expected): {e}")
-
-    # Run invoice disputes migration
-    try:
-        await run_disputes_migration()
-        logger.info("Invoice disputes migration completed")
-    except Exception as e:
-        logger.warning(f"Invoice disputes migration warning (may be expected): {e}")
-
-    # Run awaiting replacement status migration
-    try:
-        await run_awaiting_replacement_migration()
-        logger.info("Awaiting replacement status migration completed")
-    except Exception as e:
-        logger.warning(f"Awaiting replacement status migration warning (may be expected): {e}")
-
-    # Run NEW status migration
-    try:
-        await run_new_status_migration()
-        logger.info("NEW status migration completed")
-    except Exception as e:
-        logger.warning(f"NEW status migration warning (may be expected): {e}")
-
-    # Run dispute attachment public hash migration
-    try:
-        await run_dispute_attachment_hash_migration()
-        logger.info("Dispute attachment public hash migration completed")
-    except Exception as e:
-        logger.warning(f"Dispute attachment public hash migration warning (may be expected): {e}")
-
-    # Run logbook migration
-    try:
-        await run_logbook_migration()
-        logger.info("Logbook migration completed")
-    except Exception as e:
-        logger.warning(f"Logbook migration warning (may be expected): {e}")
-
-    # Run IMAP integration migration
-    try:
-        await run_imap_migration()
-        logger.info("IMAP integration migration completed")
-    except Exception as e:
-        logger.warning(f"IMAP integration migration warning (may be expected): {e}")
-
-    # Run support request migration
-    try:
-        await run_support_migration()
-        logger.info("Support request migration completed")
-    except Exception as e:
-        logger.warning(f"Support request migration warning (may be expected): {e}")
-
-    # Run PDF annotation settings migration
-    try:
-        await run_pdf_annotation_settings_migration()
-        logger.info("PDF annotation settings migration completed")
-    except Exception as e:
-        logger.warning(f"PDF annotation settings migration warning (may be expected): {e}")
-
-    # Run linked dispute migration
-    try:
-        await run_linked_dispute_migration()
-        logger.info("Linked dispute migration completed")
-    except Exception as e:
-        logger.warning(f"Linked dispute migration warning (may be expected): {e}")
-
-    # Run OCR post-processing settings migration
-    try:
-        await run_ocr_post_processing_migration()
-        logger.info("OCR post-processing migration completed")
-    except Exception as e:
-        logger.warning(f"OCR post-processing migration warning (may be expected): {e}")
-
-    # Run OCR weight setting migration
-    try:
-        await run_ocr_weight_setting_migration()
-        logger.info("OCR weight setting migration completed")
-    except Exception as e:
-        logger.warning(f"OCR weight setting migration warning (may be expected): {e}")
-
-    # Run KDS migration
-    try:
-        await run_kds_migration()
-        logger.info("KDS migration completed")
-    except Exception as e:
-        logger.warning(f"KDS migration warning (may be expected): {e}")
-
-    # Run KDS course flow migration
-    try:
-        await run_kds_course_flow_migration()
-        logger.info("KDS course flow migration completed")
-    except Exception as e:
-        logger.warning(f"KDS course flow migration warning (may be expected): {e}")
-
-    # Run KDS order tracking migration
-    try:
-        await run_kds_order_tracking_migration()
-        logger.info("KDS order tracking migration completed")
-    except Exception as e:
-        logger.warning(f"KDS order tracking migration warning (may be expected): {e}")
+    # Run new/changed migrations (see migrations/ledger.py)
+    app.state.migrations = await run_pending_migrations()
 
-    # Run KDS bookings refresh migration
-    try:
-        await run_kds_bookings_refresh_migration()
-        logger.info("KDS bookings refresh migration completed")
-    except Exception as e:
-        logger.warning(f"KDS bookings refresh migration warning (may be expected): {e}")
-
-    # Run budget settings migration
-    try:
-        await run_budget_settings_migration()
-        logger.info("Budget settings migration completed")
-    except Exception as e:
-        logger.warning(f"Budget settings migration warning (may be expected): {e}")
-
-    # Run cover overrides migration
-    try:
-        await run_cover_overrides_migration()
-        logger.info("Cover overrides migration completed")
-    except Exception as e:
-        logger.warning(f"Cover overrides migration warning (may be expected): {e}")
-
-    # Run purchase orders migration
-    try:
-        await run_purchase_orders_migration()
-        logger.info("Purchase orders migration completed")
-    except Exception as e:
-        logger.warning(f"Purchase orders migration warning (may be expected): {e}")
-
-    # Run supplier PO fields migration
-    try:
-        await run_supplier_po_fields_migration()
-        logger.info("Supplier PO fields migration completed")
-    except Exception as e:
-        logger.warning(f"Supplier PO fields migration warning (may be expected): {e}")
-
-    # Run kitchen details migration
-    try:
-        await run_kitchen_details_migration()
-        logger.info("Kitchen details migration completed")
-    except Exception as e:
-        logger.warning(f"Kitchen details migration warning (may be expected): {e}")
-
-    # Run cost distributions migration
-    try:
-        await run_cost_distributions_migration()
-        logger.info("Cost distributions migration completed")
-    except Exception as e:
-        logger.warning(f"Cost distributions migration warning (may be expected): {e}")
-
-    # Run recipe system migration
-    try:
-        await run_recipe_system_migration()
-        logger.info("Recipe system migration completed")
-    except Exception as e:
-        logger.warning(f"Recipe system migration warning (may be expected): {e}")
-
-    # Run flag assessment migration
-    try:
-        await run_flag_assessment_migration()
-        logger.info("Flag assessment migration completed")
-    except Exception as e:
-        logger.warning(f"Flag assessment migration warning (may be expected): {e}")
-
-    # Run dish separation migration
-    try:
-        await run_dish_separation_migration()
-        logger.info("Dish separation migration completed")
-    except Exception as e:
-        logger.warning(f"Dish separation migration warning (may be expected): {e}")
-
-    # Run step title migration
-    try:
-        await run_step_title_migration()
-        logger.info("Step title migration completed")
-    except Exception as e:
-        logger.warning(f"Step title migration warning (may be expected): {e}")
-
-    # Run gross sell price migration
-    try:
-        await run_gross_sell_price_migration()
-        logger.info("Gross sell price migration completed")
-    except Exception as e:
-        logger.warning(f"Gross sell price migration warning (may be expected): {e}")
-
-    # Run recipe ingredient yield migration
-    try:
-        await run_recipe_ingredient_yield_migration()
-        logger.info("Recipe ingredient yield migration completed")
-    except Exception as e:
-        logger.warning(f"Recipe ingredient yield migration warning (may be expected): {e}")
-
-    # Run recipe batch type migration
-    try:
-        await run_recipe_batch_type_migration()
-        logger.info("Recipe batch type migration completed")
-    except Exception as e:
-        logger.warning(f"Recipe batch type migration warning (may be expected): {e}")
-
-    # Run sub-recipe unit migration
-    try:
-        await run_sub_recipe_unit_migration()
-        logger.info("Sub-recipe unit migration completed")
-    except Exception as e:
-        logger.warning(f"Sub-recipe unit migration warning (may be expected): {e}")
-
-    # Run recipe ingredient unit migration
-    try:
-        await run_recipe_ingredient_unit_migration()
-        logger.info("Recipe ingredient unit migration completed")
-    except Exception as e:
-        logger.warning(f"Recipe ingredient unit migration warning (may be expected): {e}")
-
-    # Run allergen keywords migration
-    try:
-        await run_allergen_keywords_migration()
-        logger.info("Allergen keywords migration completed")
-    except Exception as e:
-        logger.warning(f"Allergen keywords migration warning (may be expected): {e}")
-
-    # Run Brakes product cache migration
-    try:
-        await run_brakes_cache_migration()
-        logger.info("Brakes product cache migration completed")
-    except Exception as e:
-        logger.warning(f"Brakes product cache migration warning (may be expected): {e}")
-
-    # Run description aliases migration
-    try:
-        await run_description_aliases_migration()
-        logger.info("Description aliases migration completed")
-    except Exception as e:
-        logger.warning(f"Description aliases migration warning (may be expected): {e}")
-
-    # Run brakes dietary info migration
-    try:
-        await run_brakes_dietary_info_migration()
-        logger.info("Brakes dietary info migration completed")
-    except Exception as e:
-        logger.warning(f"Brakes dietary info migration warning (may be expected): {e}")
-
-    # Run ingredient flag dismissals migration
-    try:
-        await run_ingredient_flag_dismissals_migration()
-        logger.info("Ingredient flag dismissals migration completed")
-    except Exception as e:
-        logger.warning(f"Ingredient flag dismissals migration warning (may be expected): {e}")
-
-    # Run menus migration
-    try:
-        await run_menus_migration()
-        logger.info("Menus migration completed")
-    except Exception as e:
-        logger.warning(f"Menus migration warning (may be expected): {e}")
-
-    # Run ingredient is_free migration
-    try:
-        await run_ingredient_is_free_migration()
-        logger.info("Ingredient is_free migration completed")
-    except Exception as e:
-        logger.warning(f"Ingredient is_free migration warning (may be expected): {e}")
-
-    # Run recipe text flag dismissals migration
-    try:
-        await run_recipe_text_flag_dismissals_migration()
-        logger.info("Recipe text flag dismissals migration completed")
-    except Exception as e:
-        logger.warning(f"Recipe text flag dismissals migration warning (may be expected): {e}")
-
-    # LLM FEATURE — see LLM-MANIFEST.md for removal instructions
-    try:
-        await run_llm_infrastructure_migration()
-        logger.info("LLM infrastructure migration completed")
-    except Exception as e:
-        logger.warning(f"LLM infrastructure migration warning (may be expected): {e}")
+    # Start the scheduler for daily sync jobs
+    start_scheduler()
 
-    try:
-        await run_changelog_invoice_link_migration()
-        logger.info("Changelog invoice link migration completed")
-    except Exception as e:
-        logger.warning(f"Changelog invoice link migration warning (may be expected): {e}")
+    # Start the OCR queue workers (resumes jobs queued before a restart)
+    await ocr_queue.start()
 
-    try:
-        await run_sambapos_portion_name_migration()
-        logger.info("SambaPOS portion name migration completed")
-    except Exception as e:
-        logger.warning(f"SambaPOS portion name migration warning (may be expected): {e}")
+    # Start the preview cache worker (pre-renders line item crops after OCR)
+    await preview_cache.start()
 
-    # Start the scheduler for daily sync jobs
-    start_scheduler()
+    # Start the KDS event bus (cross-worker fan-out for /api/kds/events)
+    await kds_event_bus.start()
 
     # Start SignalR listener for real-time KDS updates
     try:
@@ -472,10 +61,19 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"SignalR listener failed to start (KDS will use polling): {e}")
 
+    app.state.startup_seconds = round(time.perf_counter() - _boot_started, 3)
+    logger.info(f"Startup completed in {app.state.startup_seconds:.2f}s")
+
     yield
     # Shutdown: Clean up resources
     await stop_signalr_listener()
+    await kds_event_bus.stop()
+    await ocr_queue.stop()
+    await preview_cache.stop()
+    shutdown_reparse_pool()
+    shutdown_pdf_pool()
     stop_scheduler()
+    await sambapos_pools.close_all()
     await engine.dispose()
 
 
@@ -540,4 +138,12 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # Cold start = process start to the first health check that succeeds
+    if app.state.first_healthy_seconds is None:
+        app.state.first_healthy_seconds = round(time.perf_counter() - _boot_started, 3)
+        logger.info(f"First healthy request {app.state.first_healthy_seconds:.2f}s after process start")
+    return {
+        "status": "healthy",
+        "startup_seconds": app.state.startup_seconds,
+        "first_healthy_seconds": app.state.first_healthy_seconds,
+    }
@@ -0,0 +1,33 @@
+"""
+Migration: Backfill daily_purchase_totals for existing kitchens.
+
+The table itself is created by Base.metadata.create_all. This fills it for any
+kitchen that has confirmed invoices but no purchase totals yet, so it is a
+no-op after the first run.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+from services.purchase_totals import backfill_purchase_totals
+
+
+async def migrate():
+    async with engine.connect() as conn:
+        result = await conn.execute(text("""
+            SELECT DISTINCT inv.kitchen_id
+            FROM invoices inv
+            WHERE inv.status = 'CONFIRMED'
+              AND inv.invoice_date IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM daily_purchase_totals dpt WHERE dpt.kitchen_id = inv.kitchen_id
+              )
+        """))
+        kitchen_ids = [row[0] for row in result.fetchall()]
+
+    for kitchen_id in kitchen_ids:
+        count = await backfill_purchase_totals(kitchen_id)
+        print(f"+ Backfilled {count} daily purchase totals for kitchen {kitchen_id}")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,28 @@
+"""
+Migration: SHA-256 of each invoice file as received.
+
+Uploads and emailed attachments store the hash so a second copy of the same
+file reuses the first one's OCR analysis and is flagged as a firm duplicate.
+Existing invoices are left without a hash.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER TABLE invoices ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64)"
+        ))
+        print("+ Added invoices.content_sha256")
+
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_invoices_kitchen_content_hash "
+            "ON invoices(kitchen_id, content_sha256)"
+        ))
+        print("+ Created index idx_invoices_kitchen_content_hash")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,27 @@
+"""
+Migration: OCR geometry index on invoices.
+
+invoices.ocr_geometry holds the line item / field / word coordinates from
+ocr_raw_json (see services/ocr_geometry.py). New OCR results store it when
+saved; this backfills invoices that have an OCR result but no index, so it is
+a no-op after the first run. Viewing an invoice never writes the index.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+from services.ocr_geometry import backfill_ocr_geometry
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER TABLE invoices ADD COLUMN IF NOT EXISTS ocr_geometry JSONB"
+        ))
+        print("+ Added invoices.ocr_geometry")
+
+    count = await backfill_ocr_geometry()
+    print(f"+ Backfilled OCR geometry for {count} invoices")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
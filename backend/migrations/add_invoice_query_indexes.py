@@ -0,0 +1,47 @@
+"""
+Migration: Composite and expression indexes for invoice / line item hot queries.
+
+- invoices: search, dashboard, budget/report ranges and DuplicateDetector all
+  filter on kitchen_id plus date, supplier, status or invoice number
+- line_items: history / consolidation lookups match on product_code + unit;
+  ingredient source matching and auto-normalise match items on their
+  normalised first description line, LOWER(TRIM(split_part(description, E'\\n', 1)))
+
+scripts/check_query_plans.py seeds 500k line items and fails if any of these
+queries falls back to a sequential scan.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+INDEXES = [
+    ("idx_invoices_kitchen_date", "invoices(kitchen_id, invoice_date)"),
+    ("idx_invoices_kitchen_supplier_date", "invoices(kitchen_id, supplier_id, invoice_date)"),
+    ("idx_invoices_kitchen_number", "invoices(kitchen_id, invoice_number)"),
+    ("idx_invoices_kitchen_status_date", "invoices(kitchen_id, status, invoice_date)"),
+    ("idx_line_items_code_unit", "line_items(product_code, unit)"),
+    ("idx_line_items_norm_first_line", "line_items((LOWER(TRIM(split_part(description, E'\\n', 1)))))"),
+]
+
+# Superseded: price history moved to product_price_points, and the remaining
+# first-line lookups compare the lower-cased, trimmed form
+DROPPED_INDEXES = ["idx_line_items_desc_first_line"]
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        for idx_name in DROPPED_INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {idx_name}"))
+            print(f"- Dropped index {idx_name}")
+        for idx_name, idx_def in INDEXES:
+            await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_def}"))
+            print(f"+ Created index {idx_name}")
+
+        # Refresh planner statistics so the new indexes are picked up straight away
+        await conn.execute(text("ANALYZE invoices"))
+        await conn.execute(text("ANALYZE line_items"))
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
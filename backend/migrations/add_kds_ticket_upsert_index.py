@@ -0,0 +1,38 @@
+"""
+Migration: Unique index on active KDS tickets.
+
+The KDS poll writes every open ticket with one INSERT ... ON CONFLICT DO UPDATE,
+which needs a unique index on (kitchen_id, sambapos_ticket_id) for active rows.
+Any duplicate active rows left by the old per-ticket writes are deactivated
+first, keeping the newest. New databases get this index from the model.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        result = await conn.execute(text("""
+            UPDATE kds_tickets t
+            SET is_active = FALSE, updated_at = NOW()
+            WHERE t.is_active
+              AND EXISTS (
+                  SELECT 1 FROM kds_tickets newer
+                  WHERE newer.kitchen_id = t.kitchen_id
+                    AND newer.sambapos_ticket_id = t.sambapos_ticket_id
+                    AND newer.is_active
+                    AND newer.id > t.id
+              )
+        """))
+        print(f"+ Deactivated {result.rowcount} duplicate active KDS tickets")
+
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_kds_tickets_active_ticket "
+            "ON kds_tickets(kitchen_id, sambapos_ticket_id) WHERE is_active"
+        ))
+        print("+ Created index uq_kds_tickets_active_ticket")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
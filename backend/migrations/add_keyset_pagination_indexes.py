@@ -0,0 +1,38 @@
+"""
+Migration: composite indexes for keyset (cursor) pagination.
+
+Each list endpoint pages on (sort column, id) descending; an index on the
+kitchen plus the same columns answers `(col, id) < (:col, :id)` by walking
+backwards from the cursor, so deep pages cost the same as the first.
+
+- invoices list:        (kitchen_id, created_at, id)
+- invoice search:       (kitchen_id, invoice_date, id)
+- definition search:    (kitchen_id, updated_at, id)
+- disputes list:        (kitchen_id, opened_at, id)
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+INDEXES = [
+    ("idx_invoices_kitchen_created_id", "invoices(kitchen_id, created_at, id)"),
+    ("idx_invoices_kitchen_date_id", "invoices(kitchen_id, invoice_date, id)"),
+    ("idx_product_definitions_kitchen_updated_id", "product_definitions(kitchen_id, updated_at, id)"),
+    ("idx_invoice_disputes_kitchen_opened_id", "invoice_disputes(kitchen_id, opened_at, id)"),
+]
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        for idx_name, idx_def in INDEXES:
+            await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {idx_def}"))
+            print(f"+ Created index {idx_name}")
+
+        await conn.execute(text("ANALYZE invoices"))
+        await conn.execute(text("ANALYZE product_definitions"))
+        await conn.execute(text("ANALYZE invoice_disputes"))
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,23 @@
+"""
+Migration: OCR job force-Azure flag.
+
+Jobs queued by reprocess-all mode=azure or resend to Azure set
+ocr_jobs.force_azure, so the worker calls Azure rather than reusing another
+same-content invoice's stored analysis.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER TABLE ocr_jobs "
+            "ADD COLUMN IF NOT EXISTS force_azure BOOLEAN NOT NULL DEFAULT FALSE"
+        ))
+        print("+ Added ocr_jobs.force_azure")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,22 @@
+"""
+Migration: OCR job queue rate limit setting.
+
+The ocr_jobs table itself is created by create_all; this adds the per-kitchen
+Azure request rate the queue workers throttle to.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER TABLE kitchen_settings "
+            "ADD COLUMN IF NOT EXISTS azure_requests_per_minute INTEGER DEFAULT 15"
+        ))
+        print("+ Added kitchen_settings.azure_requests_per_minute")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
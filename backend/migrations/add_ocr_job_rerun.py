@@ -0,0 +1,22 @@
+"""
+Migration: OCR job re-run flag.
+
+A reprocess or resend that arrives while an invoice's OCR job is running sets
+ocr_jobs.rerun_requested, and the worker queues the job again once it finishes.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER TABLE ocr_jobs "
+            "ADD COLUMN IF NOT EXISTS rerun_requested BOOLEAN NOT NULL DEFAULT FALSE"
+        ))
+        print("+ Added ocr_jobs.rerun_requested")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,34 @@
+"""
+Migration: Backfill product_price_points for existing kitchens.
+
+The table itself is created by Base.metadata.create_all. This fills it for any
+kitchen that has invoices with line items but no price points yet, so it is a
+no-op after the first run.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+from services.price_points import backfill_price_points
+
+
+async def migrate():
+    async with engine.connect() as conn:
+        result = await conn.execute(text("""
+            SELECT DISTINCT inv.kitchen_id
+            FROM invoices inv
+            JOIN line_items li ON li.invoice_id = inv.id
+            WHERE inv.supplier_id IS NOT NULL
+              AND inv.invoice_date IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM product_price_points ppp WHERE ppp.kitchen_id = inv.kitchen_id
+              )
+        """))
+        kitchen_ids = [row[0] for row in result.fetchall()]
+
+    for kitchen_id in kitchen_ids:
+        count = await backfill_price_points(kitchen_id)
+        print(f"+ Backfilled {count} product price points for kitchen {kitchen_id}")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
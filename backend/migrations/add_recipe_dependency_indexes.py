@@ -0,0 +1,23 @@
+"""
+Migration: Index recipe_ingredients.ingredient_id.
+
+Ingredient price updates look up every recipe using an ingredient and then
+walk recipe_sub_recipes up to all ancestor dishes (child_recipe_id is already
+indexed). New databases get this index from the model.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_recipe_ingredients_ingredient_id "
+            "ON recipe_ingredients(ingredient_id)"
+        ))
+        print("+ Created index ix_recipe_ingredients_ingredient_id")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
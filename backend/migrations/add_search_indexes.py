@@ -0,0 +1,71 @@
+"""
+Migration: indexes for invoice search (api/search.py search_invoices).
+
+- pg_trgm GIN indexes so the ILIKE '%q%' filters on invoice number, vendor
+  name, supplier name and line item code/description use an index instead of
+  scanning every row
+- search_vector tsvector columns on invoices (number, vendor) and line_items
+  (code, description), generated by Postgres on every insert/update, with GIN
+  indexes for word-prefix matching and relevance ranking
+
+The generated columns are not mapped in the models; api/search.py refers to
+them by name.
+"""
+import asyncio
+from sqlalchemy import text
+from database import engine
+
+
+async def migrate():
+    # pg_trgm (separate transaction — may need superuser)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            print("+ Enabled pg_trgm extension")
+    except Exception as e:
+        print(f"- pg_trgm extension not available ({e}), trigram indexes skipped")
+
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "ALTER TABLE invoices ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(invoice_number, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(vendor_name, '')), 'B')"
+            ") STORED"
+        ))
+        print("+ Added invoices.search_vector")
+
+        await conn.execute(text(
+            "ALTER TABLE line_items ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(product_code, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+            ") STORED"
+        ))
+        print("+ Added line_items.search_vector")
+
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_invoices_search_vector ON invoices USING gin (search_vector)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_line_items_search_vector ON line_items USING gin (search_vector)"
+        ))
+        print("+ Created full-text indexes on invoices and line_items")
+
+    try:
+        async with engine.begin() as conn:
+            for index_name, index_def in [
+                ("idx_invoices_invoice_number_trgm", "invoices USING gin (invoice_number gin_trgm_ops)"),
+                ("idx_invoices_vendor_name_trgm", "invoices USING gin (vendor_name gin_trgm_ops)"),
+                ("idx_suppliers_name_trgm", "suppliers USING gin (name gin_trgm_ops)"),
+                ("idx_line_items_product_code_trgm", "line_items USING gin (product_code gin_trgm_ops)"),
+                ("ix_line_items_description_trgm", "line_items USING gin (description gin_trgm_ops)"),
+            ]:
+                await conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {index_def}"))
+                print(f"+ Created index {index_name}")
+    except Exception as e:
+        print(f"- Trigram indexes not created ({e}), search falls back to scans")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,240 @@
+"""
+Startup migration runner backed by a schema_migrations ledger.
+
+Every module in MIGRATIONS exposes run_migration() or migrate(). On startup a
+migration runs only if it has no ledger row yet, or if its source file has
+changed since it was recorded (checksum mismatch) — all migrations are written
+to be idempotent, so re-running an edited one is safe. Successful runs are
+recorded with their checksum and duration. Failures are logged as before and
+left unrecorded, so they are retried on the next start.
+
+Many migrations catch their own errors and only report them, with a warning
+on their module logger or a "! ..." line on stdout. A run that reported
+either is treated as failed too, so it is not recorded as applied. If the
+ledger itself can't be read, every migration runs, as before the ledger.
+
+To add a migration: create the module in this package and append it to
+MIGRATIONS (order matters — later migrations may depend on earlier ones).
+
+Force a full re-run (e.g. after restoring an old backup):
+    DELETE FROM schema_migrations;
+"""
+import hashlib
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+
+from sqlalchemy import text
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+# (module name, log label) in run order
+MIGRATIONS = [
+    ("add_invoice_features", "Database"),
+    ("add_newbook_tables", "Newbook"),
+    ("add_line_item_search", "Line item search"),
+    ("add_sambapos_settings", "SambaPOS"),
+    ("add_sambapos_excluded_items", "SambaPOS excluded items"),
+    ("add_admin_restricted_pages", "Admin restricted pages"),
+    ("add_nextcloud_backup", "Nextcloud/Backup"),
+    ("add_price_settings", "Price settings"),
+    ("add_resos_integration", "Resos integration"),
+    ("add_calendar_events", "Calendar events"),
+    ("add_resos_upcoming_sync", "Resos upcoming sync"),
+    ("add_newbook_upcoming_sync", "Newbook upcoming sync"),
+    ("add_residents_table_chart", "Residents table chart"),
+    ("add_rooms_breakdown", "Rooms breakdown"),
+    ("add_invoice_disputes", "Invoice disputes"),
+    ("add_awaiting_replacement_status", "Awaiting replacement status"),
+    ("add_new_status", "NEW status"),
+    ("add_dispute_attachment_public_hash", "Dispute attachment public hash"),
+    ("add_logbook", "Logbook"),
+    ("add_imap_integration", "IMAP integration"),
+    ("add_support_request", "Support request"),
+    ("add_pdf_annotation_settings", "PDF annotation settings"),
+    ("add_linked_dispute", "Linked dispute"),
+    ("add_ocr_post_processing", "OCR post-processing"),
+    ("add_ocr_weight_setting", "OCR weight setting"),
+    ("add_kds_tables", "KDS"),
+    ("add_kds_course_flow", "KDS course flow"),
+    ("add_kds_order_tracking", "KDS order tracking"),
+    ("add_kds_bookings_refresh", "KDS bookings refresh"),
+    ("add_budget_settings", "Budget settings"),
+    ("add_cover_overrides", "Cover overrides"),
+    ("add_purchase_orders", "Purchase orders"),
+    ("add_supplier_po_fields", "Supplier PO fields"),
+    ("add_kitchen_details", "Kitchen details"),
+    ("add_cost_distributions", "Cost distributions"),
+    ("add_recipe_system", "Recipe system"),
+    ("add_flag_assessment", "Flag assessment"),
+    ("add_dish_separation", "Dish separation"),
+    ("add_step_title", "Step title"),
+    ("add_gross_sell_price", "Gross sell price"),
+    ("add_recipe_ingredient_yield", "Recipe ingredient yield"),
+    ("add_recipe_batch_type", "Recipe batch type"),
+    ("add_sub_recipe_unit", "Sub-recipe unit"),
+    ("add_recipe_ingredient_unit", "Recipe ingredient unit"),
+    ("add_allergen_keywords", "Allergen keywords"),
+    ("add_brakes_cache", "Brakes product cache"),
+    ("add_description_aliases", "Description aliases"),
+    ("add_brakes_dietary_info", "Brakes dietary info"),
+    ("add_ingredient_flag_dismissals", "Ingredient flag dismissals"),
+    ("add_menus", "Menus"),
+    ("add_ingredient_is_free", "Ingredient is_free"),
+    ("add_recipe_text_flag_dismissals", "Recipe text flag dismissals"),
+    ("add_llm_infrastructure", "LLM infrastructure"),  # LLM FEATURE — see LLM-MANIFEST.md
+    ("add_changelog_invoice_link", "Changelog invoice link"),
+    ("add_sambapos_portion_name", "SambaPOS portion name"),
+    ("add_product_price_points", "Product price points"),
+    ("add_invoice_query_indexes", "Invoice query indexes"),
+    ("add_recipe_dependency_indexes", "Recipe dependency indexes"),
+    ("add_kds_ticket_upsert_index", "KDS ticket upsert index"),
+    ("add_ocr_job_queue", "OCR job queue"),
+    ("add_ocr_job_rerun", "OCR job re-run flag"),
+    ("add_ocr_job_force_azure", "OCR job force-Azure flag"),
+    ("add_invoice_content_hash", "Invoice content hash"),
+    ("add_invoice_ocr_geometry", "Invoice OCR geometry index"),
+    ("add_search_indexes", "Invoice full-text and trigram search indexes"),
+    ("add_keyset_pagination_indexes", "Keyset pagination indexes"),
+    ("add_daily_purchase_totals", "Daily purchase totals"),
+]
+
+
+def _checksum(module) -> str:
+    return hashlib.sha256(Path(module.__file__).read_bytes()).hexdigest()
+
+
+def _entry_point(module):
+    fn = getattr(module, "run_migration", None) or getattr(module, "migrate", None)
+    if fn is None:
+        raise AttributeError(f"{module.__name__} has no run_migration() or migrate()")
+    return fn
+
+
+class _ReportedProblems(logging.Handler):
+    """Collects what a migration reports about errors it caught itself."""
+
+    def __init__(self, stdout):
+        super().__init__(level=logging.WARNING)
+        self.problems: list[str] = []
+        self._stdout = stdout
+
+    def emit(self, record):
+        self.problems.append(record.getMessage())
+
+    # stdout side: pass prints through, keeping the "! ..." lines
+    def write(self, text: str) -> int:
+        self.problems.extend(line.strip() for line in text.splitlines() if line.strip().startswith("!"))
+        return self._stdout.write(text)
+
+    def flush(self):
+        self._stdout.flush()
+
+
+@contextmanager
+def _collect_reported_problems():
+    reported = _ReportedProblems(sys.stdout)
+    migrations_logger = logging.getLogger("migrations")
+    migrations_logger.addHandler(reported)
+    try:
+        with redirect_stdout(reported):
+            yield reported.problems
+    finally:
+        migrations_logger.removeHandler(reported)
+
+
+async def _load_ledger() -> dict[str, str]:
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name VARCHAR(255) PRIMARY KEY,
+                checksum VARCHAR(64) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                duration_ms INTEGER
+            )
+        """))
+        result = await conn.execute(text("SELECT name, checksum FROM schema_migrations"))
+        return {row[0]: row[1] for row in result.fetchall()}
+
+
+async def _record(name: str, checksum: str, duration_ms: int) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO schema_migrations (name, checksum, applied_at, duration_ms)
+                VALUES (:name, :checksum, NOW(), :duration_ms)
+                ON CONFLICT (name) DO UPDATE SET
+                    checksum = EXCLUDED.checksum,
+                    applied_at = EXCLUDED.applied_at,
+                    duration_ms = EXCLUDED.duration_ms
+            """),
+            {"name": name, "checksum": checksum, "duration_ms": duration_ms},
+        )
+
+
+async def run_pending_migrations() -> dict:
+    """
+    Run every migration that is new or changed since it was last recorded.
+
+    Returns {"applied": [...], "failed": [...], "skipped": n, "duration_ms": n}.
+    """
+    started = time.perf_counter()
+    try:
+        ledger = await _load_ledger()
+    except Exception as e:
+        logger.warning(f"Migration ledger could not be read, running every migration: {e}")
+        ledger = {}
+    applied: list[str] = []
+    failed: list[str] = []
+    skipped = 0
+
+    for name, label in MIGRATIONS:
+        try:
+            module = importlib.import_module(f"migrations.{name}")
+            checksum = _checksum(module)
+        except Exception as e:
+            logger.warning(f"{label} migration could not be loaded: {e}")
+            failed.append(name)
+            continue
+
+        if ledger.get(name) == checksum:
+            skipped += 1
+            continue
+
+        if name in ledger:
+            logger.info(f"{label} migration changed since it was applied, re-running")
+
+        run_started = time.perf_counter()
+        try:
+            with _collect_reported_problems() as problems:
+                await _entry_point(module)()
+        except Exception as e:
+            logger.warning(f"{label} migration warning (may be expected): {e}")
+            failed.append(name)
+            continue
+        duration_ms = int((time.perf_counter() - run_started) * 1000)
+
+        if problems:
+            # Caught and reported by the migration itself - retry on the next start
+            logger.warning(f"{label} migration reported {len(problems)} problem(s), not recording it: {problems[0]}")
+            failed.append(name)
+            continue
+
+        try:
+            await _record(name, checksum, duration_ms)
+        except Exception as e:
+            logger.warning(f"{label} migration could not be recorded: {e}")
+        applied.append(name)
+        logger.info(f"{label} migration completed in {duration_ms}ms")
+
+    total_ms = int((time.perf_counter() - started) * 1000)
+    logger.info(
+        f"Migrations: {len(applied)} applied, {skipped} already up to date, "
+        f"{len(failed)} failed ({total_ms}ms)"
+    )
+    return {"applied": applied, "failed": failed, "skipped": skipped, "duration_ms": total_ms}
@@ -8,8 +8,10 @@ from .field_mapping import FieldMapping
 from .product_definition import ProductDefinition
 from .newbook import NewbookGLAccount, NewbookDailyRevenue, NewbookDailyOccupancy, NewbookSyncLog
 from .resos import ResosBooking, ResosDailyStats, ResosOpeningHour, ResosSyncLog
+from .sambapos import SambaPOSOrderFact, SambaPOSSyncState, SambaPOSMenuItem
 from .backup import BackupHistory
 from .acknowledged_price import AcknowledgedPrice
+from .product_price_point import ProductPricePoint
 from .dispute import (
     InvoiceDispute, DisputeLineItem, DisputeAttachment, DisputeActivity, CreditNote,
     DisputeType, DisputeStatus, DisputePriority
@@ -24,13 +26,17 @@ from .recipe import (
 )
 from .menu import Menu, MenuDivision, MenuItem
 from .event_order import EventOrder, EventOrderItem
+from .ocr_job import OCRJob
+from .supplier_vendor_match import SupplierVendorMatch
+from .daily_purchase_total import DailyPurchaseTotal
 
 __all__ = [
     "User", "Kitchen", "Invoice", "Supplier", "RevenueEntry", "GPPeriod",
     "KitchenSettings", "LineItem", "FieldMapping", "ProductDefinition",
     "NewbookGLAccount", "NewbookDailyRevenue", "NewbookDailyOccupancy", "NewbookSyncLog",
     "ResosBooking", "ResosDailyStats", "ResosOpeningHour", "ResosSyncLog",
-    "BackupHistory", "AcknowledgedPrice",
+    "SambaPOSOrderFact", "SambaPOSSyncState", "SambaPOSMenuItem",
+    "BackupHistory", "AcknowledgedPrice", "ProductPricePoint",
     "InvoiceDispute", "DisputeLineItem", "DisputeAttachment", "DisputeActivity", "CreditNote",
     "DisputeType", "DisputeStatus", "DisputePriority",
     "PurchaseOrder", "PurchaseOrderLineItem",
@@ -41,4 +47,5 @@ __all__ = [
     "RecipeTextFlagDismissal",
     "Menu", "MenuDivision", "MenuItem",
     "EventOrder", "EventOrderItem",
+    "OCRJob", "SupplierVendorMatch", "DailyPurchaseTotal",
 ]
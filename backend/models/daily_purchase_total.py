@@ -0,0 +1,36 @@
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import Integer, String, Date, DateTime, ForeignKey, Numeric, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from database import Base
+
+
+class DailyPurchaseTotal(Base):
+    """
+    Confirmed invoice purchases per kitchen, invoice date, supplier and category.
+
+    Derived from line_items x invoices with the report rules: line item amounts
+    summed per invoice, credit notes with a positive total negated, stock and
+    non-stock kept apart. Maintained by services.purchase_totals whenever
+    invoices or line items are written, and checked against the raw tables by
+    its nightly reconciliation.
+    """
+    __tablename__ = "daily_purchase_totals"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), nullable=False)
+    purchase_date: Mapped[date] = mapped_column(Date, nullable=False)
+    supplier_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Not an FK: rows follow invoices.supplier_id
+    category: Mapped[str | None] = mapped_column(String(50), nullable=True)
+
+    stock_net: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    non_stock_net: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    credit_stock_net: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)  # Credit notes' share of stock_net (<= 0)
+    credit_non_stock_net: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    invoice_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_daily_purchase_totals_kitchen_date", "kitchen_id", "purchase_date"),
+    )
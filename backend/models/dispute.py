@@ -13,7 +13,7 @@ from decimal import Decimal
 import enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import String, DateTime, Date, ForeignKey, Numeric, Text, Integer, Enum as SQLEnum
+from sqlalchemy import String, DateTime, Date, ForeignKey, Numeric, Text, Integer, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -122,6 +122,11 @@ class InvoiceDispute(Base):
         "DisputeActivity", back_populates="dispute", cascade="all, delete-orphan"
     )
 
+    # Keyset pagination of the disputes list (migrations/add_keyset_pagination_indexes.py)
+    __table_args__ = (
+        Index("idx_invoice_disputes_kitchen_opened_id", "kitchen_id", "opened_at", "id"),
+    )
+
 
 class DisputeLineItem(Base):
     """Specific line items that are disputed"""
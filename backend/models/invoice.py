@@ -1,7 +1,8 @@
 from datetime import datetime, date
 from decimal import Decimal
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import String, DateTime, Date, ForeignKey, Numeric, Text, Enum, Integer
+from sqlalchemy import String, DateTime, Date, ForeignKey, Numeric, Text, Enum, Integer, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from database import Base
 import enum
@@ -48,8 +49,10 @@ class Invoice(Base):
     # OCR metadata
     image_path: Mapped[str] = mapped_column(String(500), nullable=False)
     ocr_raw_text: Mapped[str] = mapped_column(Text, nullable=True)
-    ocr_raw_json: Mapped[str] = mapped_column(Text, nullable=True)  # Full Azure response JSON for debugging/remapping
+    ocr_raw_json: Mapped[str] = mapped_column(Text, nullable=True, deferred=True)  # Full Azure response JSON for debugging/remapping (deferred: several MB)
     ocr_confidence: Mapped[float] = mapped_column(Numeric(5, 4), nullable=True)
+    content_sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)  # Hash of the file as received
+    ocr_geometry: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)  # Coordinate index of ocr_raw_json (services/ocr_geometry.py)
 
     # Status tracking
     status: Mapped[InvoiceStatus] = mapped_column(
@@ -139,6 +142,18 @@ class Invoice(Base):
         uselist=False
     )
 
+    # Also created on existing databases by migrations/add_invoice_query_indexes.py
+    __table_args__ = (
+        Index("idx_invoices_kitchen_date", "kitchen_id", "invoice_date"),
+        Index("idx_invoices_kitchen_supplier_date", "kitchen_id", "supplier_id", "invoice_date"),
+        Index("idx_invoices_kitchen_number", "kitchen_id", "invoice_number"),
+        Index("idx_invoices_kitchen_status_date", "kitchen_id", "status", "invoice_date"),
+        Index("idx_invoices_kitchen_content_hash", "kitchen_id", "content_sha256"),
+        # Keyset pagination (migrations/add_keyset_pagination_indexes.py)
+        Index("idx_invoices_kitchen_created_id", "kitchen_id", "created_at", "id"),
+        Index("idx_invoices_kitchen_date_id", "kitchen_id", "invoice_date", "id"),
+    )
+
 
 # Forward references
 from .user import Kitchen, User
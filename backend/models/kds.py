@@ -5,7 +5,7 @@ Local state tracking for kitchen orders, course bumping, and display.
 """
 
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey, Text, Boolean, Integer, Float
+from sqlalchemy import String, DateTime, ForeignKey, Text, Boolean, Integer, BigInteger, Float, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from database import Base
@@ -59,6 +59,14 @@ class KDSTicket(Base):
     kitchen: Mapped["Kitchen"] = relationship("Kitchen")
     course_bumps: Mapped[list["KDSCourseBump"]] = relationship("KDSCourseBump", back_populates="ticket", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # At most one active row per SambaPOS ticket; target of the bulk upsert in api/kds.py
+        Index(
+            "uq_kds_tickets_active_ticket", "kitchen_id", "sambapos_ticket_id",
+            unique=True, postgresql_where=text("is_active"),
+        ),
+    )
+
 
 class KDSCourseBump(Base):
     """
@@ -84,5 +92,19 @@ class KDSCourseBump(Base):
     bumped_by: Mapped["User"] = relationship("User")
 
 
+class KDSEventSequence(Base):
+    """
+    Last SSE event sequence number issued per kitchen.
+
+    Incremented by the Postgres event bus (services/kds_events.py) in the same
+    statement as its pg_notify, so every worker sees one gap-free sequence per
+    kitchen and reconnecting screens can resume from Last-Event-ID.
+    """
+    __tablename__ = "kds_event_sequences"
+
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), primary_key=True)
+    last_seq: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
 # Forward references
 from .user import Kitchen, User
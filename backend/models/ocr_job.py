@@ -0,0 +1,50 @@
+from datetime import datetime
+from sqlalchemy import String, DateTime, ForeignKey, Text, Integer, Boolean, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from database import Base
+
+
+# Lower runs first: interactive uploads ahead of bulk reprocessing
+OCR_PRIORITY_INTERACTIVE = 0
+OCR_PRIORITY_EMAIL = 5
+OCR_PRIORITY_BULK = 10
+
+
+class OCRJob(Base):
+    """
+    Durable queue entry for running an invoice through Azure OCR.
+
+    Claimed by services/ocr_queue.py workers with SELECT ... FOR UPDATE SKIP
+    LOCKED, so queued work survives a restart and several processes can share
+    the queue. At most one queued/running job exists per invoice; enqueueing
+    while it runs sets rerun_requested so the new input isn't lost. force_azure
+    jobs (reprocess via Azure, resend) never reuse a same-content analysis.
+    """
+    __tablename__ = "ocr_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), nullable=False)
+    invoice_id: Mapped[int] = mapped_column(ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False)
+    image_path: Mapped[str] = mapped_column(String(500), nullable=False)
+
+    priority: Mapped[int] = mapped_column(Integer, default=OCR_PRIORITY_INTERACTIVE)
+    status: Mapped[str] = mapped_column(String(20), default="queued")  # queued, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=4)
+    run_after: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # Retry backoff
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    rerun_requested: Mapped[bool] = mapped_column(Boolean, default=False)  # Enqueued again mid-run
+    force_azure: Mapped[bool] = mapped_column(Boolean, default=False)  # Skip same-content reuse
+
+    locked_by: Mapped[str | None] = mapped_column(String(100), nullable=True)  # host:pid of the worker
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_ocr_jobs_claim", "status", "priority", "run_after", "id"),
+        Index(
+            "uq_ocr_jobs_active_invoice", "invoice_id",
+            unique=True, postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
@@ -1,7 +1,7 @@
 from datetime import datetime
 from decimal import Decimal
 from typing import Optional
-from sqlalchemy import String, DateTime, ForeignKey, Numeric, Integer, Text, UniqueConstraint
+from sqlalchemy import String, DateTime, ForeignKey, Numeric, Integer, Text, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from database import Base
 
@@ -62,6 +62,8 @@ class ProductDefinition(Base):
     # Unique constraint: one definition per product_code per supplier per kitchen
     __table_args__ = (
         UniqueConstraint('kitchen_id', 'supplier_id', 'product_code', name='uix_product_definition'),
+        # Keyset pagination of definition search (migrations/add_keyset_pagination_indexes.py)
+        Index("idx_product_definitions_kitchen_updated_id", "kitchen_id", "updated_at", "id"),
     )
 
 
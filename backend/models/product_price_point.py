@@ -0,0 +1,50 @@
+"""
+Product price points — one row per line item, denormalised with the invoice
+fields that price/stock history filters on.
+
+Lets the history services answer "prices for this product from this supplier"
+with an indexed range scan instead of joining line_items to invoices and
+filtering on split_part(description, E'\\n', 1).
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import String, Date, ForeignKey, Numeric, Text, Boolean, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from database import Base
+
+
+class ProductPricePoint(Base):
+    """Price timeline entry for a product, maintained by services.price_points"""
+    __tablename__ = "product_price_points"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    line_item_id: Mapped[int] = mapped_column(
+        ForeignKey("line_items.id", ondelete="CASCADE"), nullable=False, unique=True
+    )
+    invoice_id: Mapped[int] = mapped_column(
+        ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id"), nullable=False)
+    supplier_id: Mapped[int] = mapped_column(ForeignKey("suppliers.id", ondelete="CASCADE"), nullable=False)
+
+    # Product key: product_code when present, otherwise the first description line.
+    # description_key is always NULL for coded rows so both lookups use the full index prefix.
+    product_code: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    description_key: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    unit: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+
+    invoice_date: Mapped[date] = mapped_column(Date, nullable=False)
+    invoice_number: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    document_type: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+
+    unit_price: Mapped[Optional[Decimal]] = mapped_column(Numeric(10, 2), nullable=True)
+    quantity: Mapped[Optional[Decimal]] = mapped_column(Numeric(10, 3), nullable=True)
+    is_non_stock: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "idx_ppp_product_timeline",
+            "kitchen_id", "supplier_id", "product_code", "description_key", "unit", "invoice_date",
+        ),
+    )
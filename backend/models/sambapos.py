@@ -0,0 +1,102 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import String, DateTime, ForeignKey, Numeric, Boolean, Text, Integer, BigInteger, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from database import Base
+
+
+class SambaPOSOrderFact(Base):
+    """
+    Local copy of SambaPOS order lines (one row per Orders row on a closed ticket).
+
+    Filled incrementally by services/sambapos_facts.py. Kitchen Course, NewBook
+    GLA and GroupCode are taken from the menu item dimension at ingest, and the
+    ticket-level fields used by the restaurant spend report are denormalised
+    onto each row, so sales reports never touch the till server.
+    """
+    __tablename__ = "sambapos_order_facts"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), nullable=False)
+
+    # SambaPOS identifiers
+    order_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ticket_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    menu_item_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    # Ticket fields
+    ticket_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # Tickets.Date
+    ticket_last_update: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Tickets.LastUpdateTime (closed time)
+    ticket_tags: Mapped[str | None] = mapped_column(Text, nullable=True)
+    table_name: Mapped[str | None] = mapped_column(String(255), nullable=True)  # TicketEntities type 2
+    room_entity: Mapped[str | None] = mapped_column(String(255), nullable=True)  # TicketEntities type 3
+
+    # Order fields
+    menu_item_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    portion_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    quantity: Mapped[Decimal] = mapped_column(Numeric(18, 3), nullable=False, default=0)
+    price: Mapped[Decimal] = mapped_column(Numeric(18, 4), nullable=False, default=0)
+    order_created: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    is_voided: Mapped[bool] = mapped_column(Boolean, default=False)  # Void or Canceled order state
+
+    # Parsed menu item tags
+    group_code: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    kitchen_course: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    gl_code: Mapped[str | None] = mapped_column(String(50), nullable=True)
+
+    synced_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("kitchen_id", "order_id", name="uq_sambapos_order_facts_kitchen_order"),
+        Index("idx_sambapos_order_facts_kitchen_date", "kitchen_id", "ticket_date"),
+        Index("idx_sambapos_order_facts_kitchen_ticket", "kitchen_id", "ticket_id"),
+    )
+
+
+class SambaPOSSyncState(Base):
+    """Per-kitchen watermark for the incremental SambaPOS order fact sync"""
+    __tablename__ = "sambapos_sync_state"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), unique=True, nullable=False)
+
+    # Keyset position in Tickets ordered by (LastUpdateTime, Id)
+    facts_watermark: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    facts_watermark_ticket_id: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    facts_synced_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Last successful sync
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    tickets_synced: Mapped[int] = mapped_column(Integer, default=0)  # Tickets processed by the last run
+
+
+class SambaPOSMenuItem(Base):
+    """
+    Menu item dimension: MenuItems with CustomTags parsed and portions attached.
+
+    Refreshed by services/sambapos_menu_cache.py (TTL or SambaPOS menu change
+    broadcast) and held in memory per kitchen, so the settings pages and the
+    order fact sync don't re-parse CustomTags on the till server.
+    """
+    __tablename__ = "sambapos_menu_items"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), nullable=False)
+
+    menu_item_id: Mapped[int] = mapped_column(BigInteger, nullable=False)  # MenuItems.Id
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    group_code: Mapped[str | None] = mapped_column(String(255), nullable=True)
+
+    # Parsed from CustomTags
+    kitchen_course: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    gl_code: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    tags: Mapped[dict | None] = mapped_column(JSONB, nullable=True)  # {tag name: value}
+
+    portions: Mapped[list | None] = mapped_column(JSONB, nullable=True)  # MenuItemPortions names
+    on_pos_menu: Mapped[bool] = mapped_column(Boolean, default=False)  # Appears on a POS screen menu
+
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("kitchen_id", "menu_item_id", name="uq_sambapos_menu_items_kitchen_item"),
+    )
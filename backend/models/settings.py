@@ -21,6 +21,7 @@ class KitchenSettings(Base):
     ocr_clean_product_codes: Mapped[bool] = mapped_column(Boolean, default=False)  # Strip section headers from product codes
     ocr_filter_subtotal_rows: Mapped[bool] = mapped_column(Boolean, default=False)  # Filter subtotal/total rows from line items
     ocr_use_weight_as_quantity: Mapped[bool] = mapped_column(Boolean, default=False)  # For KG items, use weight as quantity when it matches total
+    azure_requests_per_minute: Mapped[int] = mapped_column(Integer, default=15)  # OCR queue rate limit (F0 tier allows 20/min)
 
     # Newbook API settings
     newbook_api_username: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from database import Base
+
+
+class SupplierVendorMatch(Base):
+    """
+    Remembered vendor text -> supplier resolution for OCR supplier matching.
+
+    Written when the LLM fallback in ocr.parser.identify_supplier picks a
+    supplier that the name/alias/keyword matching missed, so the same vendor
+    name on a later invoice resolves without another LLM call. vendor_key is
+    ocr.parser.normalize_text of the vendor text.
+    """
+    __tablename__ = "supplier_vendor_matches"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kitchen_id: Mapped[int] = mapped_column(ForeignKey("kitchens.id", ondelete="CASCADE"), nullable=False)
+    vendor_key: Mapped[str] = mapped_column(String(500), nullable=False)
+    supplier_id: Mapped[int] = mapped_column(ForeignKey("suppliers.id", ondelete="CASCADE"), nullable=False)
+    source: Mapped[str] = mapped_column(String(20), default="llm")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("kitchen_id", "vendor_key", name="uq_supplier_vendor_matches_kitchen_key"),
+    )
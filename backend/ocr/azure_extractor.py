@@ -3,6 +3,7 @@ import json
 import asyncio
 import re
 from datetime import date
+from types import SimpleNamespace
 from decimal import Decimal
 from typing import Optional, Any
 from azure.ai.formrecognizer import DocumentAnalysisClient
@@ -233,6 +234,14 @@ def serialize_azure_result(result: Any) -> dict:
                 'height': page.height if hasattr(page, 'height') else None,
                 'unit': str(page.unit) if hasattr(page, 'unit') else 'inch',
                 'angle': page.angle if hasattr(page, 'angle') else 0,
+                # Word boxes, so any text on the page (dates, invoice numbers) can be located
+                'words': [
+                    {
+                        'content': word.content,
+                        'polygon': [[p.x, p.y] for p in word.polygon] if word.polygon else [],
+                    }
+                    for word in (getattr(page, 'words', None) or [])
+                ],
             }
             output['pages'].append(page_info)
 
@@ -367,6 +376,30 @@ async def process_invoice_with_azure(
     # Serialize the full Azure response for storage/debugging
     raw_json = serialize_azure_result(result)
 
+    return build_extraction_result(
+        result,
+        raw_json,
+        clean_product_codes=clean_product_codes,
+        filter_subtotal_rows=filter_subtotal_rows,
+        use_weight_as_quantity=use_weight_as_quantity
+    )
+
+
+def build_extraction_result(
+    result: Any,
+    raw_json: dict,
+    clean_product_codes: bool = False,
+    filter_subtotal_rows: bool = False,
+    use_weight_as_quantity: bool = False
+) -> dict:
+    """
+    Extract invoice fields and line items from an Azure AnalyzeResult.
+
+    result may be the SDK object or one rebuilt from ocr_raw_json by
+    load_stored_analyze_result; raw_json is returned unchanged as "raw_json".
+    """
+    doc_count = len(result.documents) if result.documents else 0
+
     if not result.documents:
         logger.warning("No invoice detected in document")
         return {
@@ -851,3 +884,97 @@ async def process_invoice_with_azure(
         "raw_json": raw_json,
         "confidence": confidence
     }
+
+
+def _stored_value_type(data: dict) -> str:
+    # Stored as str(field.value_type): "date", or "DocumentFieldType.DATE" on some SDK versions
+    return str(data.get("type") or "").lower().rsplit(".", 1)[-1]
+
+
+def _load_stored_field(data: Any) -> Any:
+    """Rebuild a DocumentField-like object from serialize_azure_field output."""
+    if not isinstance(data, dict):
+        return data
+
+    value_type = _stored_value_type(data)
+    value = data.get("value")
+    if isinstance(value, list):
+        value = [_load_stored_field(item) for item in value]
+    elif isinstance(value, dict):
+        if value_type == "currency" or "amount" in value:
+            value = SimpleNamespace(
+                amount=value.get("amount"),
+                symbol=value.get("symbol"),
+                code=value.get("code"),
+            )
+        else:
+            value = {k: _load_stored_field(v) for k, v in value.items()}
+    elif isinstance(value, str) and value_type == "date":
+        try:
+            value = date.fromisoformat(value)
+        except ValueError:
+            pass
+
+    return SimpleNamespace(
+        value_type=data.get("type"),
+        value=value,
+        content=data.get("content"),
+        confidence=data.get("confidence"),
+        bounding_regions=[
+            SimpleNamespace(
+                page_number=region.get("page_number", 1),
+                polygon=[SimpleNamespace(x=p[0], y=p[1]) for p in region.get("polygon") or []],
+            )
+            for region in data.get("bounding_regions") or []
+        ],
+    )
+
+
+def load_stored_analyze_result(raw_json: dict) -> SimpleNamespace:
+    """
+    Rebuild an AnalyzeResult-like object from serialize_azure_result output
+    (Invoice.ocr_raw_json), so build_extraction_result can re-run on it.
+    """
+    documents = []
+    for doc in raw_json.get("documents") or []:
+        document = SimpleNamespace(
+            doc_type=doc.get("doc_type"),
+            fields={
+                name: _load_stored_field(field)
+                for name, field in (doc.get("fields") or {}).items()
+            },
+        )
+        if doc.get("confidence") is not None:
+            # Left unset otherwise, as on SDK documents without one
+            document.confidence = doc["confidence"]
+        documents.append(document)
+
+    return SimpleNamespace(content=raw_json.get("content") or "", documents=documents)
+
+
+def has_stored_azure_result(ocr_raw_json: Optional[str]) -> bool:
+    """True if ocr_raw_json holds a serialized Azure result that can be re-parsed."""
+    return bool(ocr_raw_json) and '"documents"' in ocr_raw_json
+
+
+def reparse_stored_azure_json(
+    ocr_raw_json: str,
+    clean_product_codes: bool = False,
+    filter_subtotal_rows: bool = False,
+    use_weight_as_quantity: bool = False
+) -> dict:
+    """
+    Re-run the extraction for a stored Azure response without calling Azure.
+
+    Takes and parses the JSON text itself so it can run in a process pool
+    (see services/ocr_reparse.py). Returns the same dict as
+    process_invoice_with_azure.
+    """
+    raw_json = json.loads(ocr_raw_json)
+    return build_extraction_result(
+        load_stored_analyze_result(raw_json),
+        raw_json,
+        clean_product_codes=clean_product_codes,
+        filter_subtotal_rows=filter_subtotal_rows,
+        use_weight_as_quantity=use_weight_as_quantity
+    )
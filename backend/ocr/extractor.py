@@ -5,7 +5,7 @@ from sqlalchemy import select
 from .parser import identify_supplier
 from .azure_extractor import process_invoice_with_azure
 from services.duplicate_detector import detect_document_type
-from services.pdf_rotation import rotate_pdf_pages
+from services.pdf_jobs import rotate_invoice_pdf
 
 logger = logging.getLogger(__name__)
 
@@ -81,77 +81,14 @@ async def process_invoice_image(
         # because coordinates need to be transformed to match the corrected orientation
         if image_path.lower().endswith('.pdf') and result.get('raw_json'):
             try:
-                modified, updated_json = rotate_pdf_pages(image_path, result['raw_json'])
+                modified, updated_json = await rotate_invoice_pdf(image_path, result['raw_json'])
                 if modified:
                     result['raw_json'] = updated_json
                     logger.info(f"PDF pages rotated and coordinates transformed for {image_path}")
             except Exception as e:
                 logger.warning(f"PDF rotation failed (non-fatal): {e}")
 
-        # Try to identify/match supplier from vendor name
-        supplier_id = None
-        supplier_match_type = None
-        if result.get("vendor_name"):
-            supplier_id, supplier_match_type = await identify_supplier(result["vendor_name"], kitchen_id, db)
-        if not supplier_id and result.get("raw_text"):
-            supplier_id, supplier_match_type = await identify_supplier(result["raw_text"], kitchen_id, db)
-
-        # Use document_type from azure_extractor (already detected there)
-        # Fall back to detect_document_type only if not provided
-        document_type = result.get("document_type")
-        if not document_type:
-            document_type = detect_document_type(
-                result.get("raw_text", ""),
-                result
-            )
-
-        # LLM FEATURE — see LLM-MANIFEST.md for removal instructions
-        # Feature E: LLM fallback when Azure returns null for header fields
-        invoice_number = result.get("invoice_number")
-        invoice_date = result.get("invoice_date")
-        total = result.get("total")
-        any_null = invoice_number is None or invoice_date is None or total is None
-
-        if any_null and result.get("raw_text"):
-            try:
-                from services.llm_service import extract_invoice_fields_llm
-                llm_result = await extract_invoice_fields_llm(
-                    db=db,
-                    kitchen_id=kitchen_id,
-                    raw_text=result["raw_text"],
-                )
-                if llm_result["status"] in ("success", "cached") and llm_result.get("fields"):
-                    fields = llm_result["fields"]
-                    if invoice_number is None and fields.get("invoice_number"):
-                        invoice_number = fields["invoice_number"]
-                        logger.info(f"LLM extracted invoice_number: {invoice_number}")
-                    if invoice_date is None and fields.get("invoice_date"):
-                        invoice_date = fields["invoice_date"]
-                        logger.info(f"LLM extracted invoice_date: {invoice_date}")
-                    if total is None and fields.get("total"):
-                        total = fields["total"]
-                        logger.info(f"LLM extracted total: {total}")
-            except Exception as llm_err:
-                logger.warning(f"LLM field extraction fallback failed (non-fatal): {llm_err}")
-
-        logger.info(f"Processed invoice: number={invoice_number}, "
-                    f"type={document_type}, supplier_id={supplier_id}, match_type={supplier_match_type}")
-
-        return {
-            "invoice_number": invoice_number,
-            "invoice_date": invoice_date,
-            "total": total,
-            "net_total": result.get("net_total"),
-            "supplier_id": supplier_id,
-            "supplier_match_type": supplier_match_type,
-            "vendor_name": result.get("vendor_name"),
-            "order_number": result.get("order_number"),
-            "document_type": document_type,
-            "line_items": result.get("line_items", []),
-            "raw_text": result.get("raw_text", ""),
-            "raw_json": result.get("raw_json"),
-            "confidence": result.get("confidence", 0.0)
-        }
+        return await complete_invoice_extraction(result, kitchen_id, db)
 
     except Exception as e:
         logger.error(f"Azure OCR failed: {e}")
@@ -168,5 +105,82 @@ async def process_invoice_image(
             "line_items": [],
             "raw_text": f"Error: Azure OCR failed - {str(e)}",
             "raw_json": None,
-            "confidence": 0.0
+            "confidence": 0.0,
+            "error": str(e),  # Lets the OCR queue retry the call
         }
+
+
+async def complete_invoice_extraction(
+    result: dict,
+    kitchen_id: int,
+    db: AsyncSession
+) -> dict:
+    """
+    Finish an Azure extraction result (from process_invoice_with_azure or
+    reparse_stored_azure_json): match the supplier, settle the document type
+    and fill missing header fields. Returns the process_invoice_image dict.
+    """
+    # Try to identify/match supplier from vendor name
+    supplier_id = None
+    supplier_match_type = None
+    if result.get("vendor_name"):
+        supplier_id, supplier_match_type = await identify_supplier(result["vendor_name"], kitchen_id, db)
+    if not supplier_id and result.get("raw_text"):
+        supplier_id, supplier_match_type = await identify_supplier(result["raw_text"], kitchen_id, db)
+
+    # Use document_type from azure_extractor (already detected there)
+    # Fall back to detect_document_type only if not provided
+    document_type = result.get("document_type")
+    if not document_type:
+        document_type = detect_document_type(
+            result.get("raw_text", ""),
+            result
+        )
+
+    # LLM FEATURE — see LLM-MANIFEST.md for removal instructions
+    # Feature E: LLM fallback when Azure returns null for header fields
+    invoice_number = result.get("invoice_number")
+    invoice_date = result.get("invoice_date")
+    total = result.get("total")
+    any_null = invoice_number is None or invoice_date is None or total is None
+
+    if any_null and result.get("raw_text"):
+        try:
+            from services.llm_service import extract_invoice_fields_llm
+            llm_result = await extract_invoice_fields_llm(
+                db=db,
+                kitchen_id=kitchen_id,
+                raw_text=result["raw_text"],
+            )
+            if llm_result["status"] in ("success", "cached") and llm_result.get("fields"):
+                fields = llm_result["fields"]
+                if invoice_number is None and fields.get("invoice_number"):
+                    invoice_number = fields["invoice_number"]
+                    logger.info(f"LLM extracted invoice_number: {invoice_number}")
+                if invoice_date is None and fields.get("invoice_date"):
+                    invoice_date = fields["invoice_date"]
+                    logger.info(f"LLM extracted invoice_date: {invoice_date}")
+                if total is None and fields.get("total"):
+                    total = fields["total"]
+                    logger.info(f"LLM extracted total: {total}")
+        except Exception as llm_err:
+            logger.warning(f"LLM field extraction fallback failed (non-fatal): {llm_err}")
+
+    logger.info(f"Processed invoice: number={invoice_number}, "
+                f"type={document_type}, supplier_id={supplier_id}, match_type={supplier_match_type}")
+
+    return {
+        "invoice_number": invoice_number,
+        "invoice_date": invoice_date,
+        "total": total,
+        "net_total": result.get("net_total"),
+        "supplier_id": supplier_id,
+        "supplier_match_type": supplier_match_type,
+        "vendor_name": result.get("vendor_name"),
+        "order_number": result.get("order_number"),
+        "document_type": document_type,
+        "line_items": result.get("line_items", []),
+        "raw_text": result.get("raw_text", ""),
+        "raw_json": result.get("raw_json"),
+        "confidence": result.get("confidence", 0.0)
+    }
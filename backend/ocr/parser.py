@@ -4,7 +4,6 @@ from decimal import Decimal, InvalidOperation
 from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 
 # Default patterns for common invoice formats
@@ -269,91 +268,60 @@ async def identify_supplier(
     Returns:
         tuple of (supplier_id, match_type) where match_type is "exact", "fuzzy", or None
     """
-    from models.supplier import Supplier
-
-    result = await db.execute(
-        select(Supplier).where(Supplier.kitchen_id == kitchen_id)
+    from services.supplier_index import (
+        get_supplier_index, get_remembered_supplier, remember_supplier, FUZZY_MAX_TEXT_LENGTH
     )
-    suppliers = result.scalars().all()
 
-    text_normalized = normalize_text(text)
-    text_upper = text.upper()
+    # Names, aliases and keywords are compiled once per kitchen (services/supplier_index.py)
+    index = await get_supplier_index(db, kitchen_id)
 
     # First pass: TRUE exact matches (text equals name/alias exactly)
-    for supplier in suppliers:
-        supplier_norm = normalize_text(supplier.name)
-
-        # Check if text exactly equals supplier name
-        if text_normalized == supplier_norm:
-            return (supplier.id, "exact")
-
-        # Check if text exactly equals any alias
-        aliases = supplier.aliases or []
-        for alias in aliases:
-            if text_normalized == normalize_text(alias):
-                return (supplier.id, "exact")
-
-    # Second pass: "contains" matches - name/alias found IN text (fuzzy, not exact)
-    for supplier in suppliers:
-        # Check if supplier name is contained in text
-        if supplier.name.upper() in text_upper:
-            return (supplier.id, "fuzzy")
-
-        # Check aliases contained in text
-        aliases = supplier.aliases or []
-        for alias in aliases:
-            if alias.upper() in text_upper:
-                return (supplier.id, "fuzzy")
-
-        # Check identifier_config keywords
-        identifier_config = supplier.identifier_config or {}
-        keywords = identifier_config.get("keywords", [])
-        for keyword in keywords:
-            if keyword.upper() in text_upper:
-                return (supplier.id, "fuzzy")
-
-    # Third pass: fuzzy word matching
-    # Only do fuzzy matching on vendor name-like text (short text, not full OCR dump)
-    # Full OCR text has too many words that could accidentally match
-    if len(text) > 500:
-        # Text is too long - likely full OCR text, skip fuzzy matching
+    supplier_id = index.exact(text)
+    if supplier_id:
+        return (supplier_id, "exact")
+
+    # Second pass: "contains" matches - name/alias/keyword found IN text (fuzzy, not exact)
+    supplier_id = index.contains(text)
+    if supplier_id:
+        return (supplier_id, "fuzzy")
+
+    # Only fuzzy- and LLM-match vendor name-like text (short text, not full OCR dump):
+    # a long text matches the wrong supplier by accident
+    if len(text) > FUZZY_MAX_TEXT_LENGTH:
         return (None, None)
 
-    best_match = None
-    best_score = 0.0
-    FUZZY_THRESHOLD = 0.6  # Minimum score to consider a fuzzy match
-
-    for supplier in suppliers:
-        # Check supplier name fuzzy match
-        score = fuzzy_match_score(supplier.name, text)
-        if score > best_score and score >= FUZZY_THRESHOLD:
-            best_score = score
-            best_match = supplier.id
-
-        # Check aliases fuzzy match
-        aliases = supplier.aliases or []
-        for alias in aliases:
-            score = fuzzy_match_score(alias, text)
-            if score > best_score and score >= FUZZY_THRESHOLD:
-                best_score = score
-                best_match = supplier.id
+    # Third pass: fuzzy word matching
+    supplier_id = index.fuzzy(text)
+    if supplier_id:
+        return (supplier_id, "fuzzy")
 
-    if best_match:
-        return (best_match, "fuzzy")
+    # A vendor name the LLM fallback already resolved
+    vendor_key = normalize_text(text)
+    supplier_id = await get_remembered_supplier(db, kitchen_id, vendor_key)
+    if supplier_id:
+        return (supplier_id, "fuzzy")
 
     # LLM FEATURE — see LLM-MANIFEST.md for removal instructions
     # Feature F: LLM fallback when all regex/fuzzy passes fail
+    # Runs in its own session: the LLM layer commits its usage log and cache,
+    # which must not commit (or roll back) the caller's pending work
     try:
+        from database import AsyncSessionLocal
         from services.llm_service import match_supplier_llm
-        supplier_list = [{"id": s.id, "name": s.name} for s in suppliers]
-        llm_result = await match_supplier_llm(
-            db=db,
-            kitchen_id=kitchen_id,
-            vendor_text=text[:500],
-            supplier_list=supplier_list,
-        )
-        if llm_result["status"] in ("success", "cached") and llm_result.get("match"):
-            return (llm_result["match"]["id"], "fuzzy")
+        async with AsyncSessionLocal() as llm_db:
+            llm_result = await match_supplier_llm(
+                db=llm_db,
+                kitchen_id=kitchen_id,
+                vendor_text=text,
+                supplier_list=index.llm_choices,
+            )
+            if llm_result["status"] in ("success", "cached") and llm_result.get("match"):
+                supplier_id = llm_result["match"]["id"]
+                # Remember the vendor name so it never needs the LLM again
+                if supplier_id in index.supplier_ids:
+                    await remember_supplier(llm_db, kitchen_id, vendor_key, supplier_id)
+                    await llm_db.commit()
+                return (supplier_id, "fuzzy")
     except Exception:
         pass  # Non-fatal — fall through to None
 
@@ -16,6 +16,8 @@ from models.settings import KitchenSettings
 from services.newbook_sync import NewbookSyncService
 from services.resos_sync import ResosSyncService
 from services.imap_sync import ImapSyncService
+from services.sambapos_pool import run_sambapos_pool_health_check
+from services.sambapos_facts import SambaPOSFactsSyncService
 
 logger = logging.getLogger(__name__)
 
@@ -180,6 +182,32 @@ async def run_imap_inbox_sync():
                 # Continue with other kitchens
 
 
+async def run_sambapos_facts_sync():
+    """
+    Incremental SambaPOS order fact sync for all kitchens with SambaPOS configured.
+    Runs every 5 minutes - pulls tickets changed since the last run into
+    sambapos_order_facts, which the sales reports query instead of the till server.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(KitchenSettings.kitchen_id).where(
+                KitchenSettings.sambapos_db_host.isnot(None),
+                KitchenSettings.sambapos_db_name.isnot(None),
+                KitchenSettings.sambapos_db_username.isnot(None),
+                KitchenSettings.sambapos_db_password.isnot(None)
+            )
+        )
+        kitchen_ids = result.scalars().all()
+
+        for kitchen_id in kitchen_ids:
+            try:
+                sync_service = SambaPOSFactsSyncService(db, kitchen_id)
+                await sync_service.sync()
+            except Exception as e:
+                logger.error(f"Kitchen {kitchen_id} SambaPOS facts sync failed: {e}")
+                # Continue with other kitchens
+
+
 async def run_scheduled_backup():
     """
     Run scheduled backups for all kitchens with auto-backup enabled.
@@ -273,8 +301,42 @@ async def run_file_archival():
                 logger.error(f"Kitchen {settings.kitchen_id} archival failed: {e}")
 
 
+async def run_purchase_totals_reconciliation():
+    """
+    Check every kitchen's daily purchase totals against its invoices and
+    rebuild any day that has drifted.
+    Runs at 2:30 AM, before the backup.
+    """
+    from models.user import Kitchen
+    from services.purchase_totals import reconcile_purchase_totals
+
+    logger.info("Starting purchase totals reconciliation job")
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Kitchen.id))
+        kitchen_ids = result.scalars().all()
+
+        for kitchen_id in kitchen_ids:
+            try:
+                summary = await reconcile_purchase_totals(db, kitchen_id)
+                if summary["mismatched_days"]:
+                    logger.info(f"Kitchen {kitchen_id} purchase totals reconciled: {summary}")
+            except Exception as e:
+                logger.error(f"Kitchen {kitchen_id} purchase totals reconciliation failed: {e}")
+                await db.rollback()
+
+
 def start_scheduler():
     """Initialize and start the scheduler"""
+    # Purchase totals reconciliation at 2:30 AM
+    scheduler.add_job(
+        run_purchase_totals_reconciliation,
+        CronTrigger(hour=2, minute=30),
+        id="purchase_totals_reconciliation",
+        name="Purchase Totals Reconciliation",
+        replace_existing=True
+    )
+
     # Backup at 3:00 AM
     scheduler.add_job(
         run_scheduled_backup,
@@ -341,8 +403,27 @@ def start_scheduler():
         replace_existing=True
     )
 
+    # SambaPOS connection pool health check - every minute
+    # Broken pools are dropped and rebuilt on next use
+    scheduler.add_job(
+        run_sambapos_pool_health_check,
+        IntervalTrigger(minutes=1),
+        id="sambapos_pool_health_check",
+        name="SambaPOS Connection Pool Health Check",
+        replace_existing=True
+    )
+
+    # SambaPOS order fact sync - every 5 minutes
+    scheduler.add_job(
+        run_sambapos_facts_sync,
+        IntervalTrigger(minutes=5),
+        id="sambapos_facts_sync",
+        name="SambaPOS Order Fact Sync",
+        replace_existing=True
+    )
+
     scheduler.start()
-    logger.info("Scheduler started - backup at 3:00 AM, archival at 3:30 AM, Newbook sync at 4:00 AM, Resos sync at 4:30 AM, Upcoming syncs every 15 min, IMAP sync every 15 min")
+    logger.info("Scheduler started - purchase totals reconciliation at 2:30 AM, backup at 3:00 AM, archival at 3:30 AM, Newbook sync at 4:00 AM, Resos sync at 4:30 AM, Upcoming syncs every 15 min, IMAP sync every 15 min, SambaPOS pool health check every 1 min, SambaPOS order fact sync every 5 min")
 
 
 def stop_scheduler():
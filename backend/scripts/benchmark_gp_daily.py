@@ -0,0 +1,81 @@
+"""
+Time /gp/daily for a year-long range.
+
+Calls the endpoint function directly for the kitchen's last 365 days (or the
+given number of days), then times the purchases part on its own two ways:
+read from daily_purchase_totals as the endpoint does, and re-aggregated from
+line_items x invoices as before the totals table. Read-only. The target for
+the endpoint is tens of milliseconds.
+
+    python -m scripts.benchmark_gp_daily 3            # kitchen 3, last 365 days
+    python -m scripts.benchmark_gp_daily 3 730 20     # two years, 20 runs
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from database import AsyncSessionLocal
+from api.reports import get_daily_gp_data, _stock_purchases_query
+from models.daily_purchase_total import DailyPurchaseTotal
+from services.purchase_totals import _TOTALS_SQL
+
+
+async def timed(runs: int, fn) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summary(label: str, timings: list[float]) -> str:
+    return f"  {label:<24} median {statistics.median(timings):.1f}ms, max {max(timings):.1f}ms"
+
+
+async def benchmark(kitchen_id: int, days: int, runs: int):
+    to_date = date.today()
+    from_date = to_date - timedelta(days=days - 1)
+    user = SimpleNamespace(kitchen_id=kitchen_id)
+    raw_sql = text(_TOTALS_SQL.format(
+        scope="inv.kitchen_id = :kid AND inv.invoice_date BETWEEN :date_from AND :date_to"
+    ))
+    raw_params = {"kid": kitchen_id, "date_from": from_date, "date_to": to_date}
+
+    async with AsyncSessionLocal() as db:
+        async def endpoint():
+            await get_daily_gp_data(from_date, to_date, current_user=user, db=db)
+
+        async def from_totals():
+            result = await db.execute(
+                _stock_purchases_query(kitchen_id, from_date, to_date, DailyPurchaseTotal.purchase_date)
+            )
+            result.all()
+
+        async def from_raw_tables():
+            (await db.execute(raw_sql, raw_params)).all()
+
+        await endpoint()  # Warm the connection and query caches
+        results = {
+            "/gp/daily": await timed(runs, endpoint),
+            "purchases (totals)": await timed(runs, from_totals),
+            "purchases (raw tables)": await timed(runs, from_raw_tables),
+        }
+        await db.rollback()
+
+    print(f"kitchen {kitchen_id}, {from_date} .. {to_date} ({days} days), {runs} runs")
+    for label, timings in results.items():
+        print(summary(label, timings))
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(
+        int(sys.argv[1]),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 365,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 10,
+    ))
@@ -0,0 +1,87 @@
+"""
+Time one KDS poll's database work for a busy service.
+
+Runs reconcile's upsert + close for N synthetic open tickets (default 80,
+three courses, four orders each) against the configured database: first as
+new tickets, then again as updates to the same tickets (every tenth one
+gaining an order each round). Everything runs in one transaction that is rolled back, so no
+tickets are kept and no SSE events are published.
+
+    python -m scripts.benchmark_kds_poll 3            # kitchen 3, 80 tickets
+    python -m scripts.benchmark_kds_poll 3 200 10     # 200 tickets, 10 rounds
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from database import AsyncSessionLocal
+from api.kds import upsert_kds_tickets, close_missing_kds_tickets
+
+COURSES = ["Starters", "Mains", "Desserts"]
+# Synthetic SambaPOS ids, well clear of real ones
+FIRST_TICKET_ID = 900_000_000
+
+
+def synthetic_tickets(count: int, round_no: int) -> list[dict]:
+    submitted_at = datetime.utcnow().isoformat() + "Z"
+    tickets = []
+    for n in range(count):
+        ticket_id = FIRST_TICKET_ID + n
+        orders = [
+            {
+                "id": ticket_id * 10 + i,
+                "name": f"Item {i}",
+                "quantity": 1,
+                "price": 9.5,
+                "kitchen_course": COURSES[i % len(COURSES)],
+                "status": "New",
+                "tags": [],
+            }
+            for i in range(4 + (round_no if n % 10 == 0 else 0))  # every tenth ticket gains orders
+        ]
+        tickets.append({
+            "id": ticket_id,
+            "uid": f"bench-{ticket_id}",
+            "number": str(n + 1),
+            "table": f"T{n + 1}",
+            "covers": 2,
+            "total_amount": 38.0,
+            "submitted_at": submitted_at,
+            "orders": orders,
+        })
+    return tickets
+
+
+async def benchmark(kitchen_id: int, count: int, rounds: int):
+    timings = {"insert": [], "update": []}
+    async with AsyncSessionLocal() as db:
+        try:
+            for round_no in range(rounds):
+                tickets = synthetic_tickets(count, round_no)
+                started = time.perf_counter()
+                _, events = await upsert_kds_tickets(db, kitchen_id, tickets, COURSES)
+                await close_missing_kds_tickets(db, kitchen_id, {t["id"] for t in tickets})
+                await db.flush()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                timings["insert" if round_no == 0 else "update"].append(elapsed_ms)
+                print(f"round {round_no + 1}: {elapsed_ms:.1f}ms, {len(events)} events")
+        finally:
+            await db.rollback()
+
+    print(f"{count} tickets, kitchen {kitchen_id}")
+    print(f"  new tickets: {timings['insert'][0]:.1f}ms")
+    if timings["update"]:
+        print(
+            f"  updates:     median {statistics.median(timings['update']):.1f}ms, "
+            f"max {max(timings['update']):.1f}ms over {len(timings['update'])} rounds"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(
+        int(sys.argv[1]),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 80,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 5,
+    ))
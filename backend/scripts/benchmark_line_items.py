@@ -0,0 +1,103 @@
+"""
+Time GET /invoices/{id}/line-items as the invoice's line count grows.
+
+For each size (10, 100 and 500 lines by default) it adds a throwaway invoice
+from the supplier, with lines that reuse the products in the supplier's price
+history, so every line gets a real price status lookup. It then calls the
+endpoint function directly and reports latency and the number of SQL
+statements per call. Both should stay roughly flat from 10 to 500 lines,
+because get_price_statuses resolves every line in a fixed number of queries.
+Everything is rolled back afterwards.
+
+    python -m scripts.benchmark_line_items 3 12              # kitchen 3, supplier 12
+    python -m scripts.benchmark_line_items 3 12 10,100,500,1000 20
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import event, select
+
+from api.invoices import get_line_items
+from database import AsyncSessionLocal, engine
+from models.invoice import Invoice, InvoiceStatus
+from models.line_item import LineItem
+from models.product_price_point import ProductPricePoint
+
+
+async def supplier_products(db, kitchen_id: int, supplier_id: int, limit: int) -> list:
+    P = ProductPricePoint
+    result = await db.execute(
+        select(P.product_code, P.description_key, P.unit, P.unit_price)
+        .where(P.kitchen_id == kitchen_id, P.supplier_id == supplier_id, P.unit_price > 0)
+        .distinct(P.product_code, P.description_key, P.unit)
+        .limit(limit)
+    )
+    products = result.all()
+    if not products:
+        raise SystemExit(f"Supplier {supplier_id} has no price history in kitchen {kitchen_id}")
+    return products
+
+
+async def add_invoice(db, kitchen_id: int, supplier_id: int, products: list, lines: int) -> int:
+    invoice = Invoice(
+        kitchen_id=kitchen_id, supplier_id=supplier_id, invoice_number=f"BENCH-{lines}",
+        invoice_date=date.today(), image_path="benchmark.pdf", status=InvoiceStatus.PROCESSED,
+    )
+    db.add(invoice)
+    await db.flush()
+    for n in range(lines):
+        code, description, unit, price = products[n % len(products)]
+        db.add(LineItem(
+            invoice_id=invoice.id, line_number=n + 1, product_code=code,
+            description=description, unit=unit, quantity=Decimal("1"),
+            unit_price=price * Decimal("1.05"), amount=price * Decimal("1.05"),
+        ))
+    await db.flush()
+    return invoice.id
+
+
+async def benchmark(kitchen_id: int, supplier_id: int, sizes: list[int], runs: int):
+    statements = 0
+
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    user = SimpleNamespace(kitchen_id=kitchen_id)
+    results = []
+    async with AsyncSessionLocal() as db:
+        products = await supplier_products(db, kitchen_id, supplier_id, max(sizes))
+        print(f"kitchen {kitchen_id}, supplier {supplier_id}: {len(products)} products with price history")
+        event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+        try:
+            for size in sizes:
+                invoice_id = await add_invoice(db, kitchen_id, supplier_id, products, size)
+                await get_line_items(invoice_id, current_user=user, db=db)  # Warm caches
+                timings = []
+                statements = 0
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    await get_line_items(invoice_id, current_user=user, db=db)
+                    timings.append((time.perf_counter() - started) * 1000)
+                results.append((size, timings, statements / runs))
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+            await db.rollback()
+
+    for size, timings, per_call in results:
+        print(f"  {size:>5} lines: median {statistics.median(timings):.1f}ms, "
+              f"max {max(timings):.1f}ms, {per_call:.0f} statements per call")
+
+
+if __name__ == "__main__":
+    asyncio.run(benchmark(
+        int(sys.argv[1]),
+        int(sys.argv[2]),
+        [int(n) for n in sys.argv[3].split(",")] if len(sys.argv) > 3 else [10, 100, 500],
+        int(sys.argv[4]) if len(sys.argv) > 4 else 10,
+    ))
@@ -0,0 +1,138 @@
+"""
+Benchmark the recipe cost engine on a synthetic 2,000-recipe kitchen.
+
+Builds the kitchen in memory. Each tier of recipes draws on the tiers below it,
+so shared components appear under many dishes:
+
+- 400 base components made from ingredients only
+- 600 intermediates, each using base components
+- 1,000 dishes, each using intermediates and base components
+
+It then costs the kitchen two ways:
+
+- cost_all(): one engine, every recipe costed once in topological order.
+- Per dish: a fresh engine over each dish's own sub-tree, so shared components
+  are re-costed under every dish that uses them, as the old recursive
+  _calc_recipe_cost did. That version also re-queried each component.
+
+The two must give every dish the same cost. No database is used.
+
+    python -m scripts.benchmark_recipe_costing             # 2,000 recipes
+    python -m scripts.benchmark_recipe_costing 5000 3      # 5,000 recipes, 3 runs
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from services.recipe_costing import RecipeCostEngine
+
+INGREDIENTS = 500
+SEED = 4
+
+
+def synthetic_kitchen(recipe_count: int) -> RecipeCostEngine:
+    rng = random.Random(SEED)
+    engine = RecipeCostEngine(db=None)
+
+    ingredients = []
+    for i in range(INGREDIENTS):
+        unit = rng.choice(["g", "ml", "each"])
+        sources = [
+            SimpleNamespace(
+                supplier_id=s + 1,
+                price_per_std_unit=round(rng.uniform(0.001, 0.05), 5),
+                latest_invoice_date=date(2026, 1, 1) + timedelta(days=rng.randrange(300)),
+            )
+            for s in range(rng.randint(0, 3))
+        ]
+        ingredients.append(SimpleNamespace(
+            id=i + 1, name=f"Ingredient {i + 1}", standard_unit=unit, sources=sources,
+            manual_price=None if sources else round(rng.uniform(0.001, 0.05), 5), is_free=False,
+        ))
+
+    bases = int(recipe_count * 0.2)
+    intermediates = int(recipe_count * 0.3)
+    next_edge_id = 1
+    for rid in range(1, recipe_count + 1):
+        tier = "base" if rid <= bases else "intermediate" if rid <= bases + intermediates else "dish"
+        bulk = tier != "dish" and rng.random() < 0.5
+        engine.recipes[rid] = SimpleNamespace(
+            id=rid, name=f"Recipe {rid}", recipe_type="dish" if tier == "dish" else "component",
+            batch_output_type="bulk" if bulk else "portions",
+            batch_yield_qty=rng.choice([500, 1000, 2000]) if bulk else None,
+            batch_yield_unit=rng.choice(["g", "ml"]) if bulk else None,
+            batch_portions=rng.randint(1, 20),
+        )
+        engine.ingredients[rid] = [
+            SimpleNamespace(
+                recipe_id=rid, ingredient_id=ing.id, ingredient=ing,
+                quantity=rng.randint(5, 500), unit=ing.standard_unit,
+                yield_percent=rng.choice([None, 80, 90, 100]),
+            )
+            for ing in rng.sample(ingredients, rng.randint(3, 8))
+        ]
+
+        children = []
+        if tier == "intermediate":
+            children = rng.sample(range(1, bases + 1), rng.randint(1, 3))
+        elif tier == "dish":
+            children = (rng.sample(range(bases + 1, bases + intermediates + 1), rng.randint(1, 3))
+                        + rng.sample(range(1, bases + 1), rng.randint(0, 2)))
+        engine.sub_recipes[rid] = []
+        for child_id in children:
+            engine.sub_recipes[rid].append(SimpleNamespace(
+                id=next_edge_id, parent_recipe_id=rid, child_recipe_id=child_id,
+                portions_needed=rng.randint(1, 4), portions_needed_unit=None,
+            ))
+            next_edge_id += 1
+    return engine
+
+
+def fresh_engine(source: RecipeCostEngine, recipe_id: int | None = None) -> RecipeCostEngine:
+    """
+    An engine over the kitchen (or just one recipe's sub-tree, as load_recipes
+    would load it) with nothing costed yet.
+    """
+    engine = RecipeCostEngine(db=None)
+    ids = source.descendants(recipe_id) if recipe_id is not None else source.recipes.keys()
+    for rid in ids:
+        engine.recipes[rid] = source.recipes[rid]
+        engine.ingredients[rid] = source.ingredients[rid]
+        engine.sub_recipes[rid] = source.sub_recipes[rid]
+    return engine
+
+
+def benchmark(recipe_count: int, runs: int):
+    kitchen = synthetic_kitchen(recipe_count)
+    dishes = [rid for rid, r in kitchen.recipes.items() if r.recipe_type == "dish"]
+    edges = sum(len(e) for e in kitchen.sub_recipes.values())
+    print(f"{len(kitchen.recipes)} recipes ({len(dishes)} dishes), {edges} sub-recipe edges")
+
+    graph_timings, per_dish_timings = [], []
+    for _ in range(runs):
+        engine = fresh_engine(kitchen)
+        started = time.perf_counter()
+        costs = engine.cost_all()
+        graph_timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        per_dish = {rid: fresh_engine(kitchen, rid).cost(rid) for rid in dishes}
+        per_dish_timings.append((time.perf_counter() - started) * 1000)
+
+    mismatched = [rid for rid in dishes if costs[rid]["total_cost_recent"] != per_dish[rid]["total_cost_recent"]]
+    if mismatched:
+        raise SystemExit(f"FAIL: {len(mismatched)} dish cost(s) differ, e.g. recipe {mismatched[0]}")
+
+    print(f"  cost_all (each recipe once): median {statistics.median(graph_timings):.1f}ms")
+    print(f"  per dish, no sharing:        median {statistics.median(per_dish_timings):.1f}ms")
+    print("  dish costs match")
+
+
+if __name__ == "__main__":
+    benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
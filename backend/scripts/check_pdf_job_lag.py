@@ -0,0 +1,125 @@
+"""
+Check that PDF highlighting in the job pool doesn't stall the event loop.
+
+Runs 10 highlight jobs at once while a ticker measures how late the event loop
+wakes it every 10ms. Exits with status 1 if the worst lag is 50ms or more.
+
+With no arguments it generates its own invoice and OCR data: a multi-page
+PDF with a scanned-page image and line item rows, plus the matching Azure
+ocr_raw_json. Every row is marked non-stock, so each job highlights them all
+and adds the notes overlay. A real invoice can be used instead. Pass its PDF
+and, to highlight its line items, its stored ocr_raw_json.
+
+    python -m scripts.check_pdf_job_lag
+    python -m scripts.check_pdf_job_lag invoice.pdf ocr_raw.json
+"""
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import fitz
+
+from services.pdf_highlighter import parse_azure_ocr_line_items
+from services.pdf_jobs import highlight_invoice_pdf, shutdown_pdf_pool
+
+JOBS = 10
+TICK_SECONDS = 0.01
+MAX_LAG_MS = 50
+
+# Synthetic invoice: A4 pages of line item rows over a noisy "scan"
+PAGES = 4
+ROWS_PER_PAGE = 30
+SCAN_PIXELS = (1240, 1754)  # A4 at 150 dpi
+POINTS_PER_INCH = 72
+
+
+def synthetic_invoice(pdf_path: str) -> dict:
+    """Write an invoice PDF and return Azure-style ocr_raw_json for its rows."""
+    rng = random.Random(20)
+    doc = fitz.open()
+    items = []
+    light_grey = bytes(200 + i % 56 for i in range(256))
+    for page_number in range(1, PAGES + 1):
+        page = doc.new_page(width=595, height=842)
+        noise = rng.randbytes(SCAN_PIXELS[0] * SCAN_PIXELS[1]).translate(light_grey)
+        page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csGRAY, *SCAN_PIXELS, noise, False))
+        for row in range(ROWS_PER_PAGE):
+            code = f"P{page_number}{row:03d}"
+            description = f"Synthetic product {page_number}-{row} 6x1kg"
+            y = 120 + row * 22
+            page.insert_text((40, y), f"{code}   {description}   6   {rng.uniform(2, 60):.2f}", fontsize=9)
+            x0, y0, x1, y1 = 38 / POINTS_PER_INCH, (y - 10) / POINTS_PER_INCH, 555 / POINTS_PER_INCH, (y + 3) / POINTS_PER_INCH
+            items.append({
+                "bounding_regions": [{"page_number": page_number, "polygon": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]}],
+                "value": {"Description": {"value": description}, "ProductCode": {"value": code}},
+            })
+    doc.save(pdf_path)
+    doc.close()
+    return {"content": "", "documents": [{"fields": {"Items": {"value": items}}}], "pages": []}
+
+
+async def measure_lag(stop: asyncio.Event, lags: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+
+async def check(pdf_path: str | None, ocr_json_path: str | None) -> bool:
+    with tempfile.TemporaryDirectory() as workdir:
+        ocr_data = None
+        if pdf_path is None:
+            pdf_path = os.path.join(workdir, "synthetic_invoice.pdf")
+            ocr_data = synthetic_invoice(pdf_path)
+        elif ocr_json_path:
+            with open(ocr_json_path) as f:
+                ocr_data = json.load(f)
+        ocr_line_items = parse_azure_ocr_line_items(ocr_data) if ocr_data else []
+        non_stock = [
+            SimpleNamespace(description=item["description"], product_code=item["product_code"])
+            for item in ocr_line_items
+        ]
+        print(f"{pdf_path}: {len(ocr_line_items)} line items to highlight")
+
+        copies = []
+        for n in range(JOBS):
+            copy = os.path.join(workdir, f"invoice_{n}.pdf")
+            shutil.copy(pdf_path, copy)
+            copies.append(copy)
+
+        lags: list[float] = []
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(measure_lag(stop, lags))
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(
+                highlight_invoice_pdf(copy, ocr_line_items, non_stock, copy,
+                                      notes="Lag check", ocr_data=ocr_data)
+                for copy in copies
+            ))
+        finally:
+            stop.set()
+            await ticker
+            shutdown_pdf_pool()
+        elapsed = time.perf_counter() - started
+
+    worst = max(lags, default=0.0)
+    print(f"{JOBS} highlights in {elapsed:.2f}s, {len(lags)} ticks")
+    print(f"  event-loop lag: max {worst:.1f}ms, mean {sum(lags) / max(1, len(lags)):.1f}ms")
+    ok = worst < MAX_LAG_MS
+    print(f"  {'OK' if ok else 'FAIL'}: target under {MAX_LAG_MS}ms")
+    return ok
+
+
+if __name__ == "__main__":
+    passed = asyncio.run(check(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        sys.argv[2] if len(sys.argv) > 2 else None,
+    ))
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,191 @@
+"""
+Check that the invoice / line item hot queries use their indexes.
+
+Seeds a throwaway kitchen with 25,000 invoices and 500,000 line items over
+five years, runs ANALYZE, then EXPLAINs the filters behind:
+
+- invoice search and listing
+- DuplicateDetector
+- the budget lookback
+- price history
+- ingredient source matching / auto-normalise
+
+The check fails if any plan reads invoices or line_items with a Seq Scan.
+Everything runs in one transaction that is rolled back, so nothing is kept.
+The indexes come from migrations/add_invoice_query_indexes.py and the model
+declarations, so run the migrations first.
+
+    python -m scripts.check_query_plans
+    python -m scripts.check_query_plans 1000000     # line items to seed
+"""
+import asyncio
+import json
+import sys
+import time
+
+from sqlalchemy import text
+
+from database import engine
+
+LINES_PER_INVOICE = 20
+SUPPLIERS = 30
+PRODUCT_CODES = 5000
+SEEDED_DAYS = 5 * 365
+CHECKED_TABLES = {"invoices", "line_items"}
+
+_SEED_SQL = [
+    """
+    INSERT INTO kitchens (name, created_at) VALUES ('Query plan check', now())
+    RETURNING id
+    """,
+    """
+    INSERT INTO suppliers (kitchen_id, name, aliases, template_config, identifier_config, skip_dext, created_at, updated_at)
+    SELECT :kid, 'Plan check supplier ' || g, '[]', '{}', '{}', false, now(), now()
+    FROM generate_series(1, :suppliers) g
+    """,
+    """
+    INSERT INTO invoices (
+        kitchen_id, supplier_id, invoice_number, invoice_date, total, net_total, document_type,
+        order_number, image_path, status, category, created_at, updated_at, file_storage_location, source
+    )
+    SELECT
+        :kid,
+        (SELECT min(id) FROM suppliers WHERE kitchen_id = :kid) + g % :suppliers,
+        'PC-' || g,
+        current_date - (g % :days),
+        round((random() * 900 + 20)::numeric, 2),
+        round((random() * 750 + 15)::numeric, 2),
+        CASE WHEN g % 40 = 0 THEN 'credit_note' ELSE 'invoice' END,
+        'PO-' || (g / 2),
+        'plan-check/' || g || '.pdf',
+        (CASE WHEN g % 10 = 0 THEN 'PENDING' ELSE 'CONFIRMED' END)::invoicestatus,
+        'food',
+        now(), now(), 'local', 'upload'
+    FROM generate_series(1, :invoices) g
+    """,
+    """
+    INSERT INTO line_items (
+        invoice_id, product_code, description, unit, quantity, unit_price, amount,
+        line_number, is_non_stock, created_at, updated_at
+    )
+    SELECT
+        inv.id,
+        CASE WHEN n % 4 = 0 THEN NULL ELSE 'C' || ((inv.id * 7 + n * 13) % :codes) END,
+        'Product ' || ((inv.id * 7 + n * 13) % :codes) || E'\\n' || 'Case of 6',
+        (ARRAY['KG', 'EA', 'CS'])[1 + n % 3],
+        1 + n % 5,
+        round((random() * 40 + 1)::numeric, 2),
+        round((random() * 120 + 1)::numeric, 2),
+        n, n % 9 = 0, now(), now()
+    FROM invoices inv
+    CROSS JOIN generate_series(1, :lines) n
+    WHERE inv.kitchen_id = :kid
+    """,
+    "ANALYZE kitchens",
+    "ANALYZE suppliers",
+    "ANALYZE invoices",
+    "ANALYZE line_items",
+]
+
+# (what it stands for, query); :kid and :sid are the seeded kitchen and a supplier
+QUERIES = [
+    ("search_invoices: date range", """
+        SELECT inv.id FROM invoices inv
+        WHERE inv.kitchen_id = :kid AND inv.invoice_date BETWEEN current_date - 30 AND current_date
+        ORDER BY inv.invoice_date DESC, inv.id DESC LIMIT 50
+    """),
+    ("search_invoices: supplier + date range", """
+        SELECT inv.id FROM invoices inv
+        WHERE inv.kitchen_id = :kid AND inv.supplier_id = :sid
+          AND inv.invoice_date BETWEEN current_date - 90 AND current_date
+        ORDER BY inv.invoice_date DESC, inv.id DESC LIMIT 50
+    """),
+    ("search_invoices: status + date range", """
+        SELECT inv.id FROM invoices inv
+        WHERE inv.kitchen_id = :kid AND inv.status = 'PENDING'
+          AND inv.invoice_date BETWEEN current_date - 365 AND current_date
+    """),
+    ("DuplicateDetector: firm duplicate", """
+        SELECT inv.id FROM invoices inv
+        WHERE inv.kitchen_id = :kid AND inv.invoice_number = 'PC-12345' AND inv.supplier_id = :sid
+        ORDER BY inv.id
+    """),
+    ("DuplicateDetector: fuzzy duplicates", """
+        SELECT inv.id FROM invoices inv
+        WHERE inv.kitchen_id = :kid AND inv.supplier_id = :sid
+          AND inv.invoice_date BETWEEN current_date - 33 AND current_date - 27
+          AND inv.total BETWEEN 100 AND 110
+    """),
+    ("budget: confirmed spend lookback", """
+        SELECT inv.id, inv.supplier_id, sum(li.amount)
+        FROM invoices inv JOIN line_items li ON li.invoice_id = inv.id
+        WHERE inv.kitchen_id = :kid AND inv.status = 'CONFIRMED'
+          AND inv.invoice_date BETWEEN current_date - 28 AND current_date
+        GROUP BY inv.id, inv.supplier_id
+    """),
+    ("price history: recent price by product code", """
+        SELECT li.unit_price, inv.id FROM line_items li JOIN invoices inv ON inv.id = li.invoice_id
+        WHERE inv.kitchen_id = :kid AND inv.supplier_id = :sid AND li.product_code = 'C1234'
+          AND li.unit_price > 0
+        ORDER BY inv.invoice_date DESC LIMIT 1
+    """),
+    ("ingredient sources: match by first description line", """
+        SELECT li.id FROM line_items li JOIN invoices inv ON inv.id = li.invoice_id
+        WHERE inv.kitchen_id = :kid AND inv.supplier_id = :sid
+          AND (li.product_code IS NULL OR li.product_code = '')
+          AND LOWER(TRIM(split_part(li.description, E'\\n', 1))) = LOWER('Product 1234')
+    """),
+]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Tables in CHECKED_TABLES read by a Seq Scan anywhere in the plan."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in CHECKED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def check(line_items: int) -> bool:
+    invoices = line_items // LINES_PER_INVOICE
+    ok = True
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            started = time.perf_counter()
+            kitchen_id = (await conn.execute(text(_SEED_SQL[0]))).scalar_one()
+            params = {
+                "kid": kitchen_id, "suppliers": SUPPLIERS, "days": SEEDED_DAYS,
+                "invoices": invoices, "lines": LINES_PER_INVOICE, "codes": PRODUCT_CODES,
+            }
+            for sql in _SEED_SQL[1:]:
+                await conn.execute(text(sql), params)
+            supplier_id = (await conn.execute(
+                text("SELECT min(id) FROM suppliers WHERE kitchen_id = :kid"), {"kid": kitchen_id}
+            )).scalar_one()
+            print(f"seeded {invoices} invoices / {invoices * LINES_PER_INVOICE} line items "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+            bind = {"kid": kitchen_id, "sid": supplier_id}
+            for label, sql in QUERIES:
+                result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), bind)
+                plan_json = result.scalar_one()
+                plan = (json.loads(plan_json) if isinstance(plan_json, str) else plan_json)[0]["Plan"]
+                scans = seq_scans(plan)
+                if scans:
+                    ok = False
+                    print(f"  FAIL {label}: Seq Scan on {', '.join(sorted(set(scans)))}")
+                else:
+                    print(f"  ok   {label}")
+        finally:
+            await trans.rollback()
+
+    print("OK: no sequential scans" if ok else "FAIL: sequential scans found")
+    return ok
+
+
+if __name__ == "__main__":
+    passed = asyncio.run(check(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000))
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,115 @@
+"""
+Load test the KDS SSE fan-out across uvicorn workers.
+
+Start the API with several workers and the Postgres event bus, e.g.
+
+    KDS_EVENT_BUS=postgres uvicorn main:app --port 8000 --workers 4
+
+then run this against it. It opens N screens (default 50) on /api/kds/events
+for the kitchen's first active user. The kernel spreads the connections over
+the workers. It then publishes events from this process through its own
+PostgresKDSEventBus, as a fifth worker would. Every screen must receive every
+event, whichever worker it is connected to. Delivery latency and any screen
+that missed events are reported. The exit status is 1 if any event was lost.
+
+The events have type "load_test", which screens ignore, but they do advance the
+kitchen's SSE sequence. Run it outside service hours.
+
+    python -m scripts.load_test_kds_events 3                       # kitchen 3
+    python -m scripts.load_test_kds_events 3 http://localhost:8000 50 200
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+from sqlalchemy import select
+
+from auth.jwt import create_access_token
+from database import AsyncSessionLocal, DATABASE_URL
+from models.user import User
+from services.kds_events import PostgresKDSEventBus
+
+PUBLISH_INTERVAL_SECONDS = 0.02
+SETTLE_SECONDS = 5
+
+
+async def kitchen_token(kitchen_id: int) -> str:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id).where(User.kitchen_id == kitchen_id, User.is_active == True).order_by(User.id).limit(1)
+        )
+        user_id = result.scalar_one_or_none()
+    if user_id is None:
+        raise SystemExit(f"Kitchen {kitchen_id} has no active user to open screens as")
+    return create_access_token(data={"sub": str(user_id)})
+
+
+async def screen(client: httpx.AsyncClient, token: str, connected: asyncio.Event, received: dict):
+    """One KDS screen: read the stream, timestamping each load_test event."""
+    async with client.stream("GET", "/api/kds/events", params={"token": token}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event.get("type") == "resync":
+                connected.set()  # First event on every new stream
+            elif event.get("type") == "load_test":
+                received[event["n"]] = time.time() - event["sent_at"]
+
+
+async def load_test(kitchen_id: int, base_url: str, screens: int, events: int) -> bool:
+    token = await kitchen_token(kitchen_id)
+    bus = PostgresKDSEventBus(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+
+    received = [{} for _ in range(screens)]
+    connected = [asyncio.Event() for _ in range(screens)]
+    limits = httpx.Limits(max_connections=screens + 5)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        tasks = [
+            asyncio.create_task(screen(client, token, connected[i], received[i]))
+            for i in range(screens)
+        ]
+        try:
+            await asyncio.wait_for(asyncio.gather(*(c.wait() for c in connected)), timeout=30)
+            print(f"{screens} screens connected to {base_url}")
+
+            started = time.perf_counter()
+            for n in range(events):
+                await bus.publish({"type": "load_test", "kitchen_id": kitchen_id, "n": n, "sent_at": time.time()})
+                await asyncio.sleep(PUBLISH_INTERVAL_SECONDS)
+            print(f"published {events} events in {time.perf_counter() - started:.2f}s")
+            await asyncio.sleep(SETTLE_SECONDS)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await bus.stop()
+
+    latencies = sorted(latency * 1000 for r in received for latency in r.values())
+    incomplete = [i for i, r in enumerate(received) if len(r) < events]
+    if latencies:
+        print(
+            f"  delivered {len(latencies)}/{screens * events}: "
+            f"median {statistics.median(latencies):.1f}ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}ms, max {latencies[-1]:.1f}ms"
+        )
+    if incomplete:
+        print(f"  FAIL: {len(incomplete)} screen(s) missed events, e.g. screen {incomplete[0]} "
+              f"got {len(received[incomplete[0]])}/{events}")
+        return False
+    print("  OK: every screen received every event")
+    return True
+
+
+if __name__ == "__main__":
+    passed = asyncio.run(load_test(
+        int(sys.argv[1]),
+        sys.argv[2] if len(sys.argv) > 2 else "http://localhost:8000",
+        int(sys.argv[3]) if len(sys.argv) > 3 else 50,
+        int(sys.argv[4]) if len(sys.argv) > 4 else 100,
+    ))
+    sys.exit(0 if passed else 1)
@@ -45,8 +45,15 @@ class DuplicateDetector:
             "related_documents": []
         }
 
-        # 1. FIRM DUPLICATE: Same invoice_number (with same supplier if available)
-        if invoice.invoice_number:
+        # 1. FIRM DUPLICATE: Same file content, else same invoice_number
+        # (with same supplier if available)
+        if invoice.content_sha256:
+            same_file = await self._find_same_content(invoice)
+            if same_file:
+                logger.info(f"Found firm duplicate: invoice {same_file.id} (same file content)")
+                result["firm_duplicate"] = same_file
+
+        if invoice.invoice_number and not result["firm_duplicate"]:
             firm = await self._find_firm_duplicate(invoice)
             if firm:
                 logger.info(f"Found firm duplicate: invoice {firm.id} (number={firm.invoice_number})")
@@ -66,6 +73,16 @@ class DuplicateDetector:
 
         return result
 
+    async def _find_same_content(self, invoice: Invoice) -> Optional[Invoice]:
+        """Find the oldest other invoice whose file had the same SHA-256"""
+        query = select(Invoice).where(
+            Invoice.kitchen_id == self.kitchen_id,
+            Invoice.content_sha256 == invoice.content_sha256,
+            Invoice.id != invoice.id
+        ).order_by(Invoice.id).limit(1)
+        result = await self.db.execute(query)
+        return result.scalars().first()
+
     async def _find_firm_duplicate(self, invoice: Invoice) -> Optional[Invoice]:
         """Find exact match by invoice_number (same supplier if available)"""
         # Build conditions
@@ -6,6 +6,7 @@ the existing Azure OCR pipeline.
 """
 import asyncio
 import email
+import hashlib
 import imaplib
 import logging
 import os
@@ -24,6 +25,10 @@ from models.email_processing import EmailProcessingLog
 
 logger = logging.getLogger(__name__)
 
+# How long an email attachment waits for its queued OCR before giving up
+# (the email is then left unread, as for low-confidence results)
+OCR_WAIT_SECONDS = 600
+
 
 class ImapSyncService:
     """Service for syncing invoice emails from IMAP inbox"""
@@ -130,8 +135,8 @@ class ImapSyncService:
 
         return attachments
 
-    async def _save_attachment(self, content: bytes, filename: str) -> str:
-        """Save attachment to filesystem and return the path"""
+    async def _save_attachment(self, content: bytes, filename: str) -> tuple[str, str]:
+        """Save attachment to filesystem and return (path, SHA-256 of the content)"""
         # Get file extension
         ext = os.path.splitext(filename)[1].lower()
         if not ext:
@@ -146,7 +151,7 @@ class ImapSyncService:
         # Write file asynchronously
         await asyncio.to_thread(self._write_file, file_path, content)
 
-        return file_path
+        return file_path, hashlib.sha256(content).hexdigest()
 
     def _write_file(self, path: str, content: bytes):
         """Write content to file (blocking operation)"""
@@ -156,7 +161,8 @@ class ImapSyncService:
     async def _process_attachment(
         self,
         file_path: str,
-        email_subject: str
+        email_subject: str,
+        content_sha256: Optional[str] = None
     ) -> tuple[int, float]:
         """
         Process attachment through the same pipeline as manual uploads.
@@ -164,7 +170,8 @@ class ImapSyncService:
         line items, product definitions, and duplicate detection.
         Returns (invoice_id, confidence)
         """
-        from api.invoices import process_invoice_background
+        from services.ocr_queue import ocr_queue, enqueue_ocr_job
+        from models.ocr_job import OCR_PRIORITY_EMAIL
 
         # Create invoice record with source tracking
         invoice = Invoice(
@@ -172,20 +179,27 @@ class ImapSyncService:
             image_path=file_path,
             status=InvoiceStatus.PENDING,
             source="email",
-            source_reference=email_subject[:255] if email_subject else None
+            source_reference=email_subject[:255] if email_subject else None,
+            content_sha256=content_sha256
         )
         self.db.add(invoice)
-        await self.db.commit()
-        await self.db.refresh(invoice)
+        await self.db.flush()
         invoice_id = invoice.id
 
+        # Queue through the same flow as manual uploads (rate limited with
+        # them), committed with the invoice so it's never left without a job
+        await enqueue_ocr_job(self.db, invoice_id, self.kitchen_id, file_path, OCR_PRIORITY_EMAIL)
+        await self.db.commit()
+        ocr_queue.notify()
+
         try:
-            # Process through the same flow as manual uploads
-            # This handles OCR, line items, product definitions, and duplicate detection
-            await process_invoice_background(invoice_id, file_path, self.kitchen_id)
+            # Wait for it: the confidence decides whether the email is marked read
+            if await ocr_queue.wait_for_invoice(invoice_id, timeout=OCR_WAIT_SECONDS) is None:
+                logger.warning(f"Invoice {invoice_id} still queued for OCR after {OCR_WAIT_SECONDS}s")
+                return invoice_id, 0.0
 
             # Use a fresh session to fetch updated invoice data
-            # (process_invoice_background uses its own session, so we need fresh data)
+            # (the OCR worker uses its own session, so we need fresh data)
             from database import AsyncSessionLocal
             async with AsyncSessionLocal() as fresh_db:
                 result = await fresh_db.execute(
@@ -400,11 +414,11 @@ class ImapSyncService:
                     for filename, content, content_type in attachments:
                         try:
                             # Save attachment
-                            file_path = await self._save_attachment(content, filename)
+                            file_path, content_sha256 = await self._save_attachment(content, filename)
 
-                            # Process through OCR
+                            # Process through OCR (reusing the analysis of an earlier copy of the same file)
                             invoice_id, confidence = await self._process_attachment(
-                                file_path, email_subject
+                                file_path, email_subject, content_sha256
                             )
 
                             attachment_results.append((invoice_id, confidence))
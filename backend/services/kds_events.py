@@ -0,0 +1,253 @@
+"""
+KDS Event Bus
+
+Fans KDS ticket changes out to every SSE subscriber on /api/kds/events.
+
+Events are deltas (ticket_added, order_added, ticket_updated, course_state,
+ticket_bumped, ticket_closed) published by api/kds.py, plus "resync" when a
+screen must reload /api/kds/tickets. Each kitchen's events carry a
+monotonically increasing "seq" (the SSE event id), and the last
+KDS_EVENT_REPLAY_SIZE events per kitchen are kept so a reconnecting screen can
+resume from Last-Event-ID instead of re-fetching everything.
+
+Two implementations:
+- InProcessKDSEventBus: subscribers in this process only (single worker)
+- PostgresKDSEventBus: publishes with pg_notify and LISTENs on a dedicated
+  asyncpg connection, so an event published in any uvicorn worker reaches the
+  SSE subscribers of every worker. Sequence numbers come from
+  kds_event_sequences so all workers agree on them.
+
+A worker that loses its LISTEN connection misses whatever was published
+until it reconnects, so on reconnect it drops its replay rings and sends every
+connected screen a resync; a ring that sees a gap in seq is reset too, so a
+Last-Event-ID resume never skips over missing events.
+
+Selected with KDS_EVENT_BUS=postgres (default) or memory. Subscriber queues
+are bounded (KDS_EVENT_QUEUE_SIZE); when a stalled screen's queue is full its
+backlog is replaced by a single resync event, so one tablet can't grow memory
+without limit.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Optional
+
+import asyncpg
+
+from database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+KDS_EVENT_CHANNEL = "kds_events"
+QUEUE_SIZE = int(os.getenv("KDS_EVENT_QUEUE_SIZE", "100"))
+REPLAY_SIZE = int(os.getenv("KDS_EVENT_REPLAY_SIZE", "500"))
+# pg_notify payloads are limited to 8000 bytes; leave room for the seq
+MAX_NOTIFY_BYTES = 7900
+RECONNECT_SECONDS = 5
+
+
+class InProcessKDSEventBus:
+    """Pub/sub for SSE subscribers in this process, with per-kitchen replay rings."""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, replay_size: int = REPLAY_SIZE):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self._subscribers: dict[asyncio.Queue, Optional[int]] = {}  # queue -> kitchen_id
+        self._rings: dict[int, deque] = {}
+        self._sequences: dict[int, int] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, kitchen_id: Optional[int] = None) -> asyncio.Queue:
+        """Queue of events for one kitchen (or every kitchen if kitchen_id is None)."""
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[q] = kitchen_id
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        self._subscribers.pop(q, None)
+
+    def _deliver(self, event: dict):
+        kitchen_id = event.get("kitchen_id")
+        if kitchen_id is not None and event.get("seq") is not None:
+            ring = self._rings.get(kitchen_id)
+            if ring is None:
+                ring = self._rings[kitchen_id] = deque(maxlen=self.replay_size)
+            elif ring and event["seq"] != ring[-1]["seq"] + 1:
+                # Missed events in between: replaying across the hole would skip them
+                ring.clear()
+            ring.append(event)
+
+        for q, subscribed_kitchen in list(self._subscribers.items()):
+            if subscribed_kitchen is not None and subscribed_kitchen != kitchen_id:
+                continue
+            if q.full():
+                # Stalled screen: swap its backlog for one resync (it reloads all
+                # tickets, so this event is covered too and isn't queued)
+                while not q.empty():
+                    q.get_nowait()
+                    self.dropped += 1
+                q.put_nowait({"type": "resync", "kitchen_id": kitchen_id})
+                self.dropped += 1
+                continue
+            q.put_nowait(event)
+
+    async def publish(self, event: dict):
+        self.published += 1
+        kitchen_id = event.get("kitchen_id")
+        if kitchen_id is not None:
+            seq = self._sequences.get(kitchen_id, 0) + 1
+            self._sequences[kitchen_id] = seq
+            event = {**event, "seq": seq}
+        self._deliver(event)
+
+    def replay(self, kitchen_id: int, last_seq: int) -> Optional[list[dict]]:
+        """
+        Events for the kitchen after last_seq, or None if some of them are no
+        longer held (ring overflowed, worker restarted) and the screen must resync.
+        """
+        ring = self._rings.get(kitchen_id)
+        if not ring:
+            return None
+        if last_seq < ring[0]["seq"] - 1 or last_seq > ring[-1]["seq"]:
+            return None
+        return [event for event in ring if event["seq"] > last_seq]
+
+    def latest_seq(self, kitchen_id: int) -> Optional[int]:
+        ring = self._rings.get(kitchen_id)
+        return ring[-1]["seq"] if ring else None
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "replay_events": sum(len(ring) for ring in self._rings.values()),
+        }
+
+
+# Take the kitchen's next sequence number and notify in one statement; the row
+# lock on kds_event_sequences orders notifications by seq across workers
+_NEXT_SEQ_AND_NOTIFY = """
+    WITH next AS (
+        INSERT INTO kds_event_sequences (kitchen_id, last_seq) VALUES ($1, 1)
+        ON CONFLICT (kitchen_id) DO UPDATE SET last_seq = kds_event_sequences.last_seq + 1
+        RETURNING last_seq
+    )
+    SELECT pg_notify($2, jsonb_set($3::jsonb, '{seq}', to_jsonb(next.last_seq))::text) FROM next
+"""
+
+
+class PostgresKDSEventBus(InProcessKDSEventBus):
+    """Cross-worker bus: pg_notify to publish, LISTEN to fan out locally."""
+
+    def __init__(self, dsn: str, queue_size: int = QUEUE_SIZE, replay_size: int = REPLAY_SIZE):
+        super().__init__(queue_size, replay_size)
+        self.dsn = dsn
+        self._listen_conn: Optional[asyncpg.Connection] = None
+        self._publish_conn: Optional[asyncpg.Connection] = None
+        self._publish_lock = asyncio.Lock()
+        self._supervisor: Optional[asyncio.Task] = None
+        self.received = 0
+        self.publish_failures = 0
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except (json.JSONDecodeError, TypeError):
+            logger.warning(f"KDS event bus: ignoring malformed payload {payload!r}")
+            return
+        self.received += 1
+        self._deliver(event)
+
+    async def _connect_listener(self):
+        self._listen_conn = await asyncpg.connect(self.dsn)
+        await self._listen_conn.add_listener(KDS_EVENT_CHANNEL, self._on_notify)
+        logger.info(f"KDS event bus: listening on '{KDS_EVENT_CHANNEL}'")
+
+    def _resync_after_gap(self):
+        """Events published while not listening are gone: drop the rings and reload every screen."""
+        kitchens = set(self._rings) | {k for k in self._subscribers.values() if k is not None}
+        self._rings.clear()
+        for kitchen_id in kitchens:
+            self._deliver({"type": "resync", "kitchen_id": kitchen_id})
+        logger.warning(f"KDS event bus: LISTEN reconnected, resynced {len(kitchens)} kitchen(s)")
+
+    async def _supervise(self):
+        """Keep the LISTEN connection open, reconnecting if Postgres drops it."""
+        while True:
+            try:
+                if self._listen_conn is None or self._listen_conn.is_closed():
+                    reconnecting = self._listen_conn is not None
+                    await self._connect_listener()
+                    if reconnecting:
+                        self._resync_after_gap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"KDS event bus: LISTEN connection failed, retrying in {RECONNECT_SECONDS}s: {e}")
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def publish(self, event: dict):
+        self.published += 1
+        kitchen_id = event.get("kitchen_id")
+        payload = json.dumps(event, default=str)
+        if kitchen_id is not None and len(payload.encode()) > MAX_NOTIFY_BYTES:
+            # Too big for NOTIFY (e.g. a very long ticket): screens reload instead
+            payload = json.dumps({"type": "resync", "kitchen_id": kitchen_id})
+        try:
+            async with self._publish_lock:
+                if self._publish_conn is None or self._publish_conn.is_closed():
+                    self._publish_conn = await asyncpg.connect(self.dsn)
+                if kitchen_id is None:
+                    await self._publish_conn.execute("SELECT pg_notify($1, $2)", KDS_EVENT_CHANNEL, payload)
+                else:
+                    await self._publish_conn.execute(_NEXT_SEQ_AND_NOTIFY, kitchen_id, KDS_EVENT_CHANNEL, payload)
+        except Exception as e:
+            # Postgres unavailable: no shared sequence, so this worker's screens reload
+            self.publish_failures += 1
+            logger.warning(f"KDS event bus: pg_notify failed, delivering locally only: {e}")
+            self._deliver({"type": "resync", "kitchen_id": kitchen_id} if kitchen_id is not None else event)
+
+    async def start(self):
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._supervisor:
+            self._supervisor.cancel()
+            self._supervisor = None
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        self._listen_conn = None
+        self._publish_conn = None
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "backend": "postgres",
+            "listening": self._listen_conn is not None and not self._listen_conn.is_closed(),
+            "received": self.received,
+            "publish_failures": self.publish_failures,
+        }
+
+
+def _create_bus() -> InProcessKDSEventBus:
+    if os.getenv("KDS_EVENT_BUS", "postgres").lower() == "memory":
+        return InProcessKDSEventBus()
+    # asyncpg wants a plain postgresql:// DSN, not the SQLAlchemy dialect URL
+    return PostgresKDSEventBus(DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+
+
+# Global event bus - published to by the SignalR listener, consumed by /api/kds/events
+kds_event_bus = _create_bus()
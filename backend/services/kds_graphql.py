@@ -13,6 +13,48 @@ import httpx
 logger = logging.getLogger(__name__)
 
 
+# Ticket fields fetched by getTicket (get_ticket_by_id / get_tickets_by_ids)
+TICKET_BY_ID_FIELDS = """{
+    id
+    uid
+    number
+    date
+    lastUpdateTime
+    totalAmount
+    tags {
+      tag
+      tagName
+    }
+    states {
+      stateName
+      state
+    }
+    orders {
+      id
+      uid
+      name
+      portion
+      quantity
+      price
+      date
+      tags {
+        tag
+        tagName
+        quantity
+      }
+      states {
+        stateName
+        state
+        stateValue
+      }
+    }
+    entities {
+      type
+      name
+    }
+  }"""
+
+
 class SambaPOSGraphQLClient:
     """Client for SambaPOS Message Server GraphQL API."""
 
@@ -182,51 +224,21 @@ class SambaPOSGraphQLClient:
         Message Server has a NullReferenceException bug when processing
         variable bindings for getTicket.
         """
-        query = f"""
-        {{
-          getTicket(id: {int(ticket_id)}) {{
-            id
-            uid
-            number
-            date
-            lastUpdateTime
-            totalAmount
-            tags {{
-              tag
-              tagName
-            }}
-            states {{
-              stateName
-              state
-            }}
-            orders {{
-              id
-              uid
-              name
-              portion
-              quantity
-              price
-              date
-              tags {{
-                tag
-                tagName
-                quantity
-              }}
-              states {{
-                stateName
-                state
-                stateValue
-              }}
-            }}
-            entities {{
-              type
-              name
-            }}
-          }}
-        }}
-        """
+        query = f"{{ getTicket(id: {int(ticket_id)}) {TICKET_BY_ID_FIELDS} }}"
         return await self.graphql_query(query)
 
+    async def get_tickets_by_ids(self, ticket_ids: list[int]) -> dict:
+        """Query several tickets by ID in one request.
+
+        Each ticket is an aliased getTicket field (t<id>), with inline IDs for
+        the same reason as get_ticket_by_id. Returns {"data": {"t<id>": ticket}}.
+        """
+        fields = " ".join(
+            f"t{int(ticket_id)}: getTicket(id: {int(ticket_id)}) {TICKET_BY_ID_FIELDS}"
+            for ticket_id in ticket_ids
+        )
+        return await self.graphql_query(f"{{ {fields} }}")
+
 
 def parse_kitchen_course(order: dict) -> Optional[str]:
     """Extract Kitchen Course from order states."""
@@ -0,0 +1,168 @@
+"""
+Shared KDS Ticket Snapshot
+
+Every KDS screen polls GET /api/kds/tickets. Rather than each poll creating
+its own GraphQL client (fresh /Token grant), querying getTickets and writing
+every ticket, one snapshot per kitchen is kept here:
+
+- one long-lived, authenticated SambaPOSGraphQLClient per kitchen (rebuilt
+  only when the KDS connection settings change)
+- the open ticket list is refreshed from GraphQL at most once per
+  KDS_SNAPSHOT_MAX_AGE_SECONDS, or sooner after a SignalR TICKET_REFRESH
+  (invalidate())
+- concurrent callers share the same in-flight refresh, which also writes the
+  local KDSTicket rows once; screens then read their state from the database
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from services.kds_graphql import SambaPOSGraphQLClient, transform_ticket_for_kds
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("KDS_SNAPSHOT_MAX_AGE_SECONDS", "3"))
+
+
+@dataclass
+class KDSSnapshot:
+    """Open SambaPOS tickets (transformed for KDS) as of fetched_at."""
+    tickets: list[dict]
+    fetched_at: float
+    generation: int
+    error: Optional[str] = None
+
+    @property
+    def ticket_ids(self) -> list[int]:
+        return [t["id"] for t in self.tickets]
+
+
+@dataclass
+class _KitchenSnapshotState:
+    credentials: tuple
+    client: SambaPOSGraphQLClient
+    snapshot: Optional[KDSSnapshot] = None
+    inflight: Optional[asyncio.Task] = None
+    generation: int = 0  # Bumped by invalidate(); older snapshots are stale
+    refreshes: int = 0
+    coalesced: int = 0
+    served_from_cache: int = 0
+
+
+class KDSSnapshotService:
+    """Per-kitchen open-ticket snapshots with request coalescing."""
+
+    def __init__(self, max_age_seconds: float = SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._kitchens: dict[int, _KitchenSnapshotState] = {}
+
+    def _state(self, settings) -> _KitchenSnapshotState:
+        credentials = (
+            settings.kds_graphql_url,
+            settings.kds_graphql_username,
+            settings.kds_graphql_password,
+            settings.kds_graphql_client_id,
+        )
+        state = self._kitchens.get(settings.kitchen_id)
+        if state is None or state.credentials != credentials:
+            # New kitchen or KDS settings edited: new client, fresh token
+            state = _KitchenSnapshotState(
+                credentials=credentials,
+                client=SambaPOSGraphQLClient(
+                    server_url=settings.kds_graphql_url,
+                    username=settings.kds_graphql_username,
+                    password=settings.kds_graphql_password,
+                    client_id=settings.kds_graphql_client_id,
+                ),
+            )
+            self._kitchens[settings.kitchen_id] = state
+        return state
+
+    def _is_fresh(self, state: _KitchenSnapshotState) -> bool:
+        snapshot = state.snapshot
+        # Failed fetches are also held for the max age, so a down Message Server
+        # isn't retried by every poll
+        return (
+            snapshot is not None
+            and snapshot.generation == state.generation
+            and time.monotonic() - snapshot.fetched_at < self.max_age_seconds
+        )
+
+    async def get(self, settings, course_order: list) -> KDSSnapshot:
+        """
+        Return a current snapshot for the kitchen, refreshing (and persisting
+        the tickets) if it is older than the max age or has been invalidated.
+        """
+        state = self._state(settings)
+        if self._is_fresh(state):
+            state.served_from_cache += 1
+            return state.snapshot
+
+        if state.inflight is None:
+            state.inflight = asyncio.create_task(
+                self._refresh(settings.kitchen_id, state, course_order)
+            )
+        else:
+            state.coalesced += 1
+
+        # shield: a screen disconnecting mustn't cancel the refresh other screens are awaiting
+        return await asyncio.shield(state.inflight)
+
+    def invalidate(self, kitchen_id: int) -> None:
+        """Mark the kitchen's snapshot stale (e.g. after a SignalR TICKET_REFRESH)."""
+        state = self._kitchens.get(kitchen_id)
+        if state:
+            state.generation += 1
+
+    async def _refresh(
+        self,
+        kitchen_id: int,
+        state: _KitchenSnapshotState,
+        course_order: list
+    ) -> KDSSnapshot:
+        from api.kds import persist_kds_snapshot
+
+        generation = state.generation
+        try:
+            result = await state.client.get_open_tickets()
+            if "error" in result:
+                logger.error(f"KDS GraphQL error: {result['error']}")
+                snapshot = KDSSnapshot([], time.monotonic(), generation, error=str(result["error"]))
+            else:
+                tickets = []
+                for ticket_data in result.get("data", {}).get("getTickets", []):
+                    transformed = transform_ticket_for_kds(ticket_data)
+                    if transformed:  # Skip tickets with no kitchen orders
+                        tickets.append(transformed)
+
+                await persist_kds_snapshot(kitchen_id, tickets, course_order)
+                snapshot = KDSSnapshot(tickets, time.monotonic(), generation)
+                state.refreshes += 1
+        except Exception as e:
+            logger.error(f"KDS snapshot refresh failed for kitchen {kitchen_id}: {e}")
+            snapshot = KDSSnapshot([], time.monotonic(), generation, error=str(e))
+        finally:
+            state.inflight = None
+
+        state.snapshot = snapshot
+        return snapshot
+
+    def stats(self, kitchen_id: int) -> dict:
+        state = self._kitchens.get(kitchen_id)
+        if not state:
+            return {}
+        snapshot = state.snapshot
+        return {
+            "refreshes": state.refreshes,
+            "coalesced": state.coalesced,
+            "served_from_cache": state.served_from_cache,
+            "open_tickets": len(snapshot.tickets) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot.fetched_at, 2) if snapshot else None,
+            "last_error": snapshot.error if snapshot else None,
+        }
+
+
+kds_snapshots = KDSSnapshotService()
@@ -0,0 +1,231 @@
+"""
+OCR Geometry Index
+
+A compact sidecar of Invoice.ocr_raw_json (the full Azure response, often
+several MB) holding only the coordinates the review screen and the PDF
+highlighter need, stored in Invoice.ocr_geometry (JSONB) when the OCR result
+is saved:
+
+- pages:      [{"width", "height"}] in inches, index = page_number - 1
+- items:      one entry per Azure line item, in OCR order (= line_number):
+              {"page", "box": [x0, y0, x1, y1], "fields": {AzureKey: {"page", "box"}}}
+- line_items: items with bounding regions, in the shape of
+              pdf_highlighter.parse_azure_ocr_line_items
+- key_fields: in the shape of pdf_highlighter.parse_azure_ocr_key_fields
+- fields:     header fields {Name: {"value", "page", "box"}}
+- words:      upper-cased page word -> {"page", "box"} of its first occurrence
+
+Boxes are the bounding rectangle of the first bounding region's polygon.
+Invoices saved before the index existed are backfilled by the
+add_invoice_ocr_geometry migration (or backfill_ocr_geometry below). Reads
+never write: get_ocr_geometry builds a missing index in memory.
+
+Invoice.ocr_raw_json is a deferred column, so loading an Invoice doesn't pull
+the raw response; load_ocr_raw_json fetches it when it's actually needed.
+"""
+import asyncio
+import json
+import logging
+import sys
+from typing import Optional
+
+from sqlalchemy import inspect, select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.pdf_highlighter import parse_azure_ocr_line_items, parse_azure_ocr_key_fields
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY_VERSION = 1
+BACKFILL_BATCH_SIZE = 200
+
+# Line item sub-fields with preview crops (see _FIELD_KEY_MAP in api/invoices.py)
+ITEM_FIELD_KEYS = ("ProductCode", "Description", "UnitPrice", "Amount", "Quantity")
+
+
+def _polygon_box(polygon: list) -> Optional[list]:
+    """Bounding [x0, y0, x1, y1] of a nested [[x, y], ...] or flat [x, y, ...] polygon."""
+    if not polygon:
+        return None
+    if isinstance(polygon[0], (int, float)):
+        xs, ys = polygon[0::2], polygon[1::2]
+    else:
+        xs, ys = [p[0] for p in polygon], [p[1] for p in polygon]
+    if not xs or not ys:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _region_geometry(field: dict, min_points: int = 1) -> Optional[dict]:
+    """{"page", "box"} of a serialized field's first bounding region."""
+    regions = field.get("bounding_regions") or []
+    if not regions:
+        return None
+    region = regions[0]
+    polygon = region.get("polygon") or []
+    if len(polygon) < min_points:
+        return None
+    box = _polygon_box(polygon)
+    if box is None:
+        return None
+    return {"page": region.get("page_number", 1), "box": box}
+
+
+def build_ocr_geometry(raw_json: dict) -> dict:
+    """Build the geometry index from a serialized Azure result (after any PDF rotation)."""
+    pages = [
+        {"width": page.get("width") or 8.5, "height": page.get("height") or 11.0}
+        for page in raw_json.get("pages", [])
+    ]
+
+    documents = raw_json.get("documents") or []
+    doc_fields = (documents[0].get("fields") or {}) if documents else {}
+
+    items = []
+    for item in (doc_fields.get("Items") or {}).get("value") or []:
+        regions = item.get("bounding_regions") or []
+        entry = {"page": regions[0].get("page_number", 1) if regions else 1, "box": None, "fields": {}}
+        # Crops need a real rectangle, not a point or line
+        region = _region_geometry(item, min_points=4)
+        if region:
+            entry["box"] = region["box"]
+        item_fields = item.get("value") if isinstance(item.get("value"), dict) else {}
+        for key in ITEM_FIELD_KEYS:
+            field = item_fields.get(key)
+            if isinstance(field, dict):
+                field_region = _region_geometry(field, min_points=4)
+                if field_region:
+                    entry["fields"][key] = field_region
+        items.append(entry)
+
+    fields = {}
+    for name, field in doc_fields.items():
+        if name == "Items" or not isinstance(field, dict):
+            continue
+        value = field.get("value")
+        entry = {"value": value if isinstance(value, (str, int, float)) else None}
+        region = _region_geometry(field)
+        if region:
+            entry.update(region)
+        fields[name] = entry
+
+    words = {}
+    for page_idx, page in enumerate(raw_json.get("pages", [])):
+        for word in page.get("words") or []:
+            text = (word.get("content") or "").strip().upper()
+            if not text or text in words:
+                continue
+            box = _polygon_box(word.get("polygon") or [])
+            if box:
+                words[text] = {"page": page_idx + 1, "box": box}
+
+    return {
+        "version": GEOMETRY_VERSION,
+        "pages": pages,
+        "items": items,
+        "line_items": parse_azure_ocr_line_items(raw_json),
+        "key_fields": parse_azure_ocr_key_fields(raw_json),
+        "fields": fields,
+        "words": words,
+    }
+
+
+async def load_ocr_raw_json(db: AsyncSession, invoice) -> Optional[str]:
+    """The invoice's stored Azure response, loading the deferred column if needed."""
+    if "ocr_raw_json" in inspect(invoice).unloaded:
+        await db.refresh(invoice, attribute_names=["ocr_raw_json"])
+    return invoice.ocr_raw_json
+
+
+async def has_ocr_data(db: AsyncSession, invoice) -> bool:
+    """True if the invoice has an OCR result (only reads ocr_raw_json when there's no index)."""
+    return bool(invoice.ocr_geometry) or bool(await load_ocr_raw_json(db, invoice))
+
+
+async def get_ocr_geometry(db: AsyncSession, invoice) -> Optional[dict]:
+    """The invoice's geometry index, building it in memory from ocr_raw_json if missing."""
+    geometry = invoice.ocr_geometry
+    if geometry and geometry.get("version") == GEOMETRY_VERSION:
+        return geometry
+    raw_json = await load_ocr_raw_json(db, invoice)
+    if not raw_json:
+        return None
+    try:
+        return build_ocr_geometry(json.loads(raw_json))
+    except Exception as e:
+        logger.warning(f"Failed to build OCR geometry for invoice {invoice.id}: {e}")
+        return None
+
+
+def page_size(geometry: dict, page_number: int) -> tuple[float, float]:
+    """(width, height) in inches of a 1-based page, defaulting to US Letter."""
+    pages = geometry.get("pages") or []
+    if 1 <= page_number <= len(pages):
+        return pages[page_number - 1]["width"], pages[page_number - 1]["height"]
+    return 8.5, 11.0
+
+
+def box_to_percent(geometry: dict, page_number: int, box: list) -> dict:
+    """Box in inches -> {x, y, width, height} as percentages of the page, plus pageNumber."""
+    page_width, page_height = page_size(geometry, page_number)
+    x0, y0, x1, y1 = box
+    return {
+        "x": (x0 / page_width) * 100,
+        "y": (y0 / page_height) * 100,
+        "width": ((x1 - x0) / page_width) * 100,
+        "height": ((y1 - y0) / page_height) * 100,
+        "pageNumber": page_number,
+    }
+
+
+async def backfill_ocr_geometry(kitchen_id: Optional[int] = None) -> int:
+    """
+    Build and store the index for invoices with an OCR result but no (or an
+    outdated) index, for one kitchen or all kitchens, in batches.
+
+    Returns the number of invoices updated.
+    """
+    from database import AsyncSessionLocal
+    from models.invoice import Invoice
+
+    conditions = [
+        Invoice.ocr_raw_json.is_not(None),
+        or_(
+            Invoice.ocr_geometry.is_(None),
+            Invoice.ocr_geometry["version"].astext != str(GEOMETRY_VERSION),
+        ),
+    ]
+    if kitchen_id is not None:
+        conditions.append(Invoice.kitchen_id == kitchen_id)
+
+    count = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Invoice.id, Invoice.ocr_raw_json)
+                .where(*conditions, Invoice.id > last_id)
+                .order_by(Invoice.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for invoice_id, raw_json in rows:
+                try:
+                    geometry = build_ocr_geometry(json.loads(raw_json))
+                except Exception as e:
+                    logger.warning(f"Failed to build OCR geometry for invoice {invoice_id}: {e}")
+                    continue
+                await db.execute(update(Invoice).where(Invoice.id == invoice_id).values(ocr_geometry=geometry))
+                count += 1
+            await db.commit()
+            last_id = rows[-1].id
+
+    logger.info(f"Backfilled OCR geometry for {count} invoices" + (f" in kitchen {kitchen_id}" if kitchen_id else ""))
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill_ocr_geometry(int(sys.argv[1]) if len(sys.argv) > 1 else None))
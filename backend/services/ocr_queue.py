@@ -0,0 +1,378 @@
+"""
+OCR Job Queue
+
+Invoices waiting for Azure OCR are queued in ocr_jobs rather than run as
+FastAPI background tasks, so a restart doesn't lose them and a bulk reprocess
+can't fire hundreds of concurrent Azure calls.
+
+- Each process runs OCR_WORKERS worker tasks (0 disables them). Workers claim
+  the next job with SELECT ... FOR UPDATE SKIP LOCKED, ordered by priority
+  (interactive uploads, then email, then bulk reprocess) and age.
+- Azure calls are throttled per kitchen by a token bucket refilled at the
+  kitchen's azure_requests_per_minute (match it to the Azure tier; the limit
+  applies per process). Kitchens that are out of tokens are skipped when
+  claiming, so one kitchen's backlog doesn't stall the others.
+- A failed Azure call is retried with exponential backoff (run_after) up to
+  max_attempts; the last attempt records the error on the invoice as before.
+- Enqueueing an invoice whose job is running flags it, and the worker queues
+  it again when it finishes so a mid-OCR reprocess or resend isn't lost.
+- Jobs left 'running' by a crashed worker are requeued after
+  OCR_JOB_TIMEOUT_SECONDS.
+- A file whose SHA-256 matches an invoice already analysed in the kitchen
+  reuses that stored analysis instead of calling Azure (and takes no token),
+  unless the job was queued with force_azure (reprocess via Azure, resend).
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, func, case, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models.ocr_job import OCRJob, OCR_PRIORITY_INTERACTIVE
+from models.settings import KitchenSettings
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+POLL_SECONDS = float(os.getenv("OCR_QUEUE_POLL_SECONDS", "5"))
+JOB_TIMEOUT_SECONDS = int(os.getenv("OCR_JOB_TIMEOUT_SECONDS", "900"))
+MAX_ATTEMPTS = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "4"))
+RETRY_BASE_SECONDS = 30
+DEFAULT_REQUESTS_PER_MINUTE = 15
+MAX_BURST = 5
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class TokenBucket:
+    """Requests-per-minute limiter allowing a small burst."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, min(per_minute, MAX_BURST))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(self.seconds_until_available())
+
+
+async def enqueue_ocr_job(
+    db: AsyncSession,
+    invoice_id: int,
+    kitchen_id: int,
+    image_path: str,
+    priority: int = OCR_PRIORITY_INTERACTIVE,
+    force_azure: bool = False
+):
+    """
+    Queue an invoice for OCR (caller commits, then calls ocr_queue.notify()).
+
+    An invoice that is already queued keeps its single job, moved up to the
+    more urgent of the two priorities. If that job is already running it is
+    flagged to run again with the new file once it finishes, since the worker
+    is still using the old one. force_azure calls Azure even when another
+    invoice with the same file has a stored analysis; it sticks once set.
+    """
+    stmt = pg_insert(OCRJob).values(
+        kitchen_id=kitchen_id,
+        invoice_id=invoice_id,
+        image_path=image_path,
+        priority=priority,
+        force_azure=force_azure,
+        status="queued",
+        attempts=0,
+        max_attempts=MAX_ATTEMPTS,
+        run_after=datetime.utcnow(),
+        created_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OCRJob.invoice_id],
+        index_where=text("status IN ('queued', 'running')"),
+        set_={
+            "priority": func.least(OCRJob.priority, stmt.excluded.priority),
+            "image_path": stmt.excluded.image_path,
+            "rerun_requested": OCRJob.rerun_requested | (OCRJob.status == "running"),
+            "force_azure": OCRJob.force_azure | stmt.excluded.force_azure,
+        },
+    )
+    await db.execute(stmt)
+
+
+class OCRQueue:
+    """This process's OCR workers plus queue status."""
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._buckets: dict[int, TokenBucket] = {}
+        self._last_requeue = 0.0
+        self._finished: deque = deque(maxlen=1000)  # monotonic finish times, for throughput
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.reused = 0  # Jobs served from an earlier copy of the same file
+
+    async def start(self):
+        if self.workers <= 0:
+            logger.info("OCR queue: workers disabled in this process (OCR_WORKERS=0)")
+            return
+        await self._requeue_stale()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"OCR queue: started {self.workers} worker(s) as {WORKER_ID}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers after enqueueing (other processes pick jobs up on their next poll)."""
+        self._wake.set()
+
+    def _bucket(self, kitchen_id: int, per_minute: int) -> TokenBucket:
+        bucket = self._buckets.get(kitchen_id)
+        if bucket is None or bucket.per_minute != per_minute:
+            bucket = self._buckets[kitchen_id] = TokenBucket(per_minute)
+        return bucket
+
+    def _throttled_kitchens(self) -> list[int]:
+        return [kid for kid, bucket in self._buckets.items() if bucket.seconds_until_available() > 0]
+
+    async def _requeue_stale(self):
+        """Requeue jobs whose worker died mid-run."""
+        self._last_requeue = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT_SECONDS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(OCRJob)
+                .where(OCRJob.status == "running", OCRJob.started_at < cutoff)
+                .values(status="queued", locked_by=None, run_after=datetime.utcnow())
+                .returning(OCRJob.id)
+            )
+            requeued = result.scalars().all()
+            await db.commit()
+        if requeued:
+            logger.warning(f"OCR queue: requeued {len(requeued)} stalled job(s): {requeued}")
+
+    async def _claim(self) -> Optional[OCRJob]:
+        now = datetime.utcnow()
+        conditions = [OCRJob.status == "queued", OCRJob.run_after <= now]
+        throttled = self._throttled_kitchens()
+        if throttled:
+            conditions.append(OCRJob.kitchen_id.notin_(throttled))
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(OCRJob)
+                .where(*conditions)
+                .order_by(OCRJob.priority, OCRJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = result.scalar_one_or_none()
+            if job is None:
+                return None
+            job.status = "running"
+            job.attempts += 1
+            job.locked_by = WORKER_ID
+            job.started_at = now
+            await db.commit()
+            return job
+
+    async def _kitchen_rate(self, kitchen_id: int) -> int:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(KitchenSettings.azure_requests_per_minute)
+                .where(KitchenSettings.kitchen_id == kitchen_id)
+            )
+            return result.scalar_one_or_none() or DEFAULT_REQUESTS_PER_MINUTE
+
+    async def _idle_wait(self):
+        if time.monotonic() - self._last_requeue > 60:
+            await self._requeue_stale()
+        timeout = POLL_SECONDS
+        waits = [bucket.seconds_until_available() for bucket in self._buckets.values()]
+        if any(waits):
+            # Wake when a throttled kitchen's next token arrives
+            timeout = min(timeout, max(0.1, min(w for w in waits if w > 0)))
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await self._claim()
+                if job is None:
+                    await self._idle_wait()
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"OCR queue worker {index} error: {e}")
+                await asyncio.sleep(POLL_SECONDS)
+
+    async def _run(self, job: OCRJob):
+        from api.invoices import process_invoice_background, reuse_same_content_analysis, OCRCallFailed
+
+        # Same file as an invoice already analysed: no Azure call, so no token
+        reused = False
+        if not job.force_azure:
+            try:
+                reused = await reuse_same_content_analysis(job.invoice_id, job.image_path, job.kitchen_id)
+            except Exception as e:
+                logger.warning(f"OCR queue: reusing an earlier analysis for invoice {job.invoice_id} failed: {e}")
+
+        if not reused:
+            bucket = self._bucket(job.kitchen_id, await self._kitchen_rate(job.kitchen_id))
+            await bucket.acquire()
+
+        last_attempt = job.attempts >= job.max_attempts
+        values = {"finished_at": datetime.utcnow()}
+        try:
+            if reused:
+                self.reused += 1
+            else:
+                await process_invoice_background(
+                    job.invoice_id, job.image_path, job.kitchen_id,
+                    raise_ocr_errors=not last_attempt,
+                )
+            values.update(status="done", last_error=None)
+            self.completed += 1
+        except OCRCallFailed as e:
+            delay = RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+            logger.warning(
+                f"OCR queue: invoice {job.invoice_id} attempt {job.attempts}/{job.max_attempts} "
+                f"failed, retrying in {delay}s: {e}"
+            )
+            values.update(
+                status="queued", last_error=str(e), locked_by=None, finished_at=None,
+                run_after=datetime.utcnow() + timedelta(seconds=delay),
+                rerun_requested=False,  # The retry reads the latest image_path anyway
+            )
+            self.retried += 1
+        except Exception as e:
+            logger.error(f"OCR queue: invoice {job.invoice_id} failed: {e}")
+            values.update(status="failed", last_error=str(e))
+            self.failed += 1
+
+        if values["status"] != "queued":
+            self._finished.append(time.monotonic())
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(OCRJob).where(OCRJob.id == job.id).values(**values)
+                .returning(OCRJob.rerun_requested)
+            )
+            rerun = values["status"] != "queued" and bool(result.scalar_one_or_none())
+            if rerun:
+                # Reprocessed or resent while running: go again with the new input
+                await db.execute(
+                    update(OCRJob).where(OCRJob.id == job.id).values(
+                        status="queued", rerun_requested=False, attempts=0, locked_by=None,
+                        started_at=None, finished_at=None, run_after=datetime.utcnow(),
+                    )
+                )
+                logger.info(f"OCR queue: invoice {job.invoice_id} changed while running, queued again")
+            await db.commit()
+        if rerun:
+            self.notify()
+
+    async def wait_for_invoice(self, invoice_id: int, timeout: float) -> Optional[str]:
+        """Wait until the invoice's latest job finishes; returns its status, or None on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(OCRJob.status)
+                    .where(OCRJob.invoice_id == invoice_id)
+                    .order_by(OCRJob.id.desc())
+                    .limit(1)
+                )
+                status = result.scalar_one_or_none()
+            if status in ("done", "failed"):
+                return status
+            await asyncio.sleep(2)
+        return None
+
+    async def status(self, db: AsyncSession, kitchen_id: int) -> dict:
+        """Queue depth and throughput for a kitchen, plus this process's worker counters."""
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(
+                func.count().filter(OCRJob.status == "queued").label("queued"),
+                func.count().filter(
+                    OCRJob.status == "queued", OCRJob.priority == OCR_PRIORITY_INTERACTIVE
+                ).label("queued_interactive"),
+                func.count().filter(OCRJob.status == "queued", OCRJob.attempts > 0).label("awaiting_retry"),
+                func.count().filter(OCRJob.status == "running").label("running"),
+                func.count().filter(
+                    OCRJob.status == "failed", OCRJob.finished_at >= now - timedelta(hours=24)
+                ).label("failed_24h"),
+                func.count().filter(
+                    OCRJob.status == "done", OCRJob.finished_at >= now - timedelta(hours=1)
+                ).label("done_last_hour"),
+                func.count().filter(
+                    OCRJob.status == "done", OCRJob.finished_at >= now - timedelta(minutes=5)
+                ).label("done_last_5_min"),
+                func.min(case((OCRJob.status == "queued", OCRJob.created_at))).label("oldest_queued_at"),
+            ).where(OCRJob.kitchen_id == kitchen_id)
+        )
+        row = result.one()
+        bucket = self._buckets.get(kitchen_id)
+        recent = time.monotonic() - 300
+        return {
+            "queued": row.queued,
+            "queued_interactive": row.queued_interactive,
+            "awaiting_retry": row.awaiting_retry,
+            "running": row.running,
+            "failed_24h": row.failed_24h,
+            "done_last_hour": row.done_last_hour,
+            "throughput_per_minute": round(row.done_last_5_min / 5, 2),
+            "oldest_queued_seconds": int((now - row.oldest_queued_at).total_seconds()) if row.oldest_queued_at else None,
+            "rate_limit_per_minute": bucket.per_minute if bucket else await self._kitchen_rate(kitchen_id),
+            "worker": {
+                "id": WORKER_ID,
+                "workers": len(self._tasks),
+                "completed": self.completed,
+                "retried": self.retried,
+                "failed": self.failed,
+                "reused": self.reused,
+                "finished_last_5_min": sum(1 for t in self._finished if t >= recent),
+            },
+        }
+
+
+ocr_queue = OCRQueue()
@@ -0,0 +1,58 @@
+"""
+Stored OCR Re-parse
+
+Rebuilds invoice fields and line items from Invoice.ocr_raw_json (the stored
+Azure response) instead of sending the image to Azure again, e.g. after the
+OCR post-processing settings or the extraction code change.
+
+The extraction itself (ocr.azure_extractor.reparse_stored_azure_json) is pure
+CPU work on the JSON, so a batch is fanned out over a process pool of
+OCR_REPARSE_WORKERS processes (default: CPU count) rather than parsed one
+invoice at a time on the event loop. The pool is created on first use and
+shut down with the app.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from ocr.azure_extractor import reparse_stored_azure_json
+
+REPARSE_WORKERS = int(os.getenv("OCR_REPARSE_WORKERS", str(os.cpu_count() or 2)))
+# Invoices parsed per round; bounds how many results are held at once
+REPARSE_BATCH_SIZE = int(os.getenv("OCR_REPARSE_BATCH_SIZE", "50"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=REPARSE_WORKERS)
+    return _pool
+
+
+async def reparse_stored_ocr(ocr_raw_jsons: list[str], settings) -> list:
+    """
+    Re-run the Azure extraction on each stored ocr_raw_json with the kitchen's
+    post-processing settings. Returns, in order, the process_invoice_with_azure
+    result dict for each, or the exception raised while parsing it.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    options = (
+        bool(settings and settings.ocr_clean_product_codes),
+        bool(settings and settings.ocr_filter_subtotal_rows),
+        bool(settings and settings.ocr_use_weight_as_quantity),
+    )
+    return await asyncio.gather(
+        *(loop.run_in_executor(pool, reparse_stored_azure_json, raw, *options) for raw in ocr_raw_jsons),
+        return_exceptions=True
+    )
+
+
+def shutdown_reparse_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
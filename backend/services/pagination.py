@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination
+
+LIMIT/OFFSET makes Postgres produce and throw away every row before the
+requested page, so page 50 of a year of invoices costs fifty pages of work -
+plus a full count(*) on every request. The list endpoints (invoices, invoice
+search, line item search, definitions, disputes) also accept an opaque
+`after` cursor instead: the sort key of the last row of the previous page,
+turned into a row comparison that a composite index on the same columns
+answers directly, so every page costs the same.
+
+- encode_cursor / decode_cursor: sort key values <-> opaque URL-safe string
+- keyset_after: `(col1, col2, ...) < (v1, v2, ...)` for a descending sort
+- paginate: trims the limit + 1 rows fetched to a page and builds next_cursor
+  (None on the last page)
+- want_total: totals default to on for the first page and off for cursor
+  pages, where the client already has the count from page one
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+        raise ValueError("unknown cursor value")
+    return value
+
+
+def encode_cursor(*values) -> str:
+    """Opaque cursor for a row's sort key values."""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple:
+    """Sort key values from a cursor made by encode_cursor; 400 if it's malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong number of values")
+        return tuple(_decode_value(v) for v in values)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_after(columns: Sequence, values: Sequence):
+    """Rows after the cursor in a (col1 DESC, col2 DESC, ...) ordering."""
+    return tuple_(*columns) < tuple_(*values)
+
+
+def want_total(include_total: Optional[bool], after: Optional[str]) -> bool:
+    return (after is None) if include_total is None else include_total
+
+
+def paginate(rows: Sequence, limit: int, sort_key: Callable[[Any], tuple]) -> tuple[list, Optional[str]]:
+    """(page, next_cursor) from up to limit + 1 rows fetched in sort order."""
+    page = list(rows[:limit])
+    if len(rows) > limit and page:
+        return page, encode_cursor(*sort_key(page[-1]))
+    return page, None
@@ -116,11 +116,16 @@ def parse_azure_ocr_key_fields(ocr_raw_json: Dict[str, Any]) -> List[Dict[str, A
     - AmountDue
 
     Args:
-        ocr_raw_json: Raw OCR JSON from Azure Document Intelligence
+        ocr_raw_json: Raw OCR JSON from Azure Document Intelligence, or an
+            invoice's OCR geometry index (services/ocr_geometry.py), which
+            holds this list precomputed
 
     Returns:
         List of field info with name and bounding_regions
     """
+    if 'key_fields' in ocr_raw_json:
+        return ocr_raw_json['key_fields']
+
     result = []
 
     # Key fields that should not be covered
@@ -233,7 +238,7 @@ class PDFHighlighter:
             non_stock_line_items: Database LineItem objects with is_non_stock=True
             output_path: Path to save the annotated PDF
             notes: Optional invoice notes to overlay on page 1
-            ocr_data: Full OCR JSON data (needed for notes overlay positioning)
+            ocr_data: Full OCR JSON data or OCR geometry index (needed for notes overlay positioning)
 
         Returns:
             Path to the annotated PDF (or original path if highlighting failed)
@@ -0,0 +1,182 @@
+"""
+PDF Job Pool
+
+Highlighting non-stock items / drawing the notes overlay (PDFHighlighter) and
+straightening rotated pages after OCR (rotate_pdf_pages) are CPU-bound
+PyMuPDF work that used to run inside request handlers, stalling the event
+loop - and with it every other request and the KDS SSE streams - for as long
+as a large PDF took to annotate.
+
+They now run in a dedicated process pool of PDF_JOB_WORKERS processes
+(default 2) behind async functions with the same inputs and results:
+
+- highlight_invoice_pdf: PDFHighlighter.highlight_items_with_ocr_data
+- rotate_invoice_pdf:    pdf_rotation.rotate_pdf_pages
+
+Each job is limited to PDF_JOB_TIMEOUT seconds (PDFJobTimeout, a TimeoutError,
+is raised; the worker process is left to finish in the background), and
+per-kind counters and durations are reported by pdf_job_stats(). Both jobs
+write to a temp file and os.replace it into place, so a job still running
+after its timeout can't expose a partly written PDF. The pool is created on
+first use and shut down with the app.
+
+scripts/check_pdf_job_lag.py measures event-loop lag while 10 highlights run
+(target: under 50 ms).
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PDF_JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", "2"))
+PDF_JOB_TIMEOUT = float(os.getenv("PDF_JOB_TIMEOUT", "60"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_metrics: dict[str, dict] = {}
+
+
+class PDFJobTimeout(TimeoutError):
+    """A PDF job ran longer than PDF_JOB_TIMEOUT."""
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_JOB_WORKERS)
+    return _pool
+
+
+# ── Job functions (run in the worker processes; arguments must pickle) ─────────
+
+def _highlight_job(
+    pdf_path: str,
+    ocr_line_items: List[Dict[str, Any]],
+    non_stock_items: List[Dict[str, Any]],
+    output_path: str,
+    notes: Optional[str],
+    ocr_data: Optional[Dict[str, Any]]
+) -> str:
+    from services.pdf_highlighter import PDFHighlighter
+
+    # Save beside the output and swap it in when done, so a job that outlives
+    # its caller's timeout never leaves a half-written PDF for the next request
+    temp_fd, temp_path = tempfile.mkstemp(suffix=".pdf", dir=os.path.dirname(output_path) or None)
+    os.close(temp_fd)
+    try:
+        highlighter = PDFHighlighter(pdf_path)
+        saved_path = highlighter.highlight_items_with_ocr_data(
+            ocr_line_items=ocr_line_items,
+            # _match_line_items only reads description and product_code
+            non_stock_line_items=[SimpleNamespace(**item) for item in non_stock_items],
+            output_path=temp_path,
+            notes=notes,
+            ocr_data=ocr_data
+        )
+        if saved_path != temp_path:
+            return saved_path  # Save failed; highlighter returned the original
+        os.replace(temp_path, output_path)
+        return output_path
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def _rotate_job(pdf_path: str, ocr_raw_json: dict) -> tuple[bool, dict]:
+    from services.pdf_rotation import rotate_pdf_pages
+
+    return rotate_pdf_pages(pdf_path, ocr_raw_json)
+
+
+# ── Async façade ───────────────────────────────────────────────────────────────
+
+def _record(kind: str, seconds: float, outcome: str):
+    m = _metrics.setdefault(kind, {
+        "completed": 0, "failed": 0, "timed_out": 0,
+        "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": None,
+    })
+    m[outcome] += 1
+    m["total_seconds"] += seconds
+    m["max_seconds"] = max(m["max_seconds"], seconds)
+    m["last_seconds"] = round(seconds, 3)
+
+
+async def _run_job(kind: str, fn, *args, timeout: Optional[float] = None):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            loop.run_in_executor(_get_pool(), fn, *args),
+            timeout=timeout or PDF_JOB_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        _record(kind, time.perf_counter() - started, "timed_out")
+        raise PDFJobTimeout(f"PDF {kind} job exceeded {timeout or PDF_JOB_TIMEOUT:.0f}s")
+    except Exception:
+        _record(kind, time.perf_counter() - started, "failed")
+        raise
+    seconds = time.perf_counter() - started
+    _record(kind, seconds, "completed")
+    logger.debug(f"PDF {kind} job finished in {seconds:.2f}s")
+    return result
+
+
+async def highlight_invoice_pdf(
+    pdf_path: str,
+    ocr_line_items: List[Dict[str, Any]],
+    non_stock_line_items: List[Any],
+    output_path: str,
+    notes: Optional[str] = None,
+    ocr_data: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None
+) -> str:
+    """
+    PDFHighlighter(pdf_path).highlight_items_with_ocr_data(...) in the PDF pool.
+
+    non_stock_line_items may be LineItem rows; only their description and
+    product_code are sent to the worker.
+    """
+    items = [
+        {"description": item.description, "product_code": item.product_code}
+        for item in non_stock_line_items
+    ]
+    return await _run_job(
+        "highlight", _highlight_job,
+        pdf_path, ocr_line_items, items, output_path, notes, ocr_data,
+        timeout=timeout
+    )
+
+
+async def rotate_invoice_pdf(pdf_path: str, ocr_raw_json: dict, timeout: Optional[float] = None) -> tuple[bool, dict]:
+    """rotate_pdf_pages(pdf_path, ocr_raw_json) in the PDF pool."""
+    return await _run_job("rotate", _rotate_job, pdf_path, ocr_raw_json, timeout=timeout)
+
+
+def pdf_job_stats() -> dict:
+    return {
+        "workers": PDF_JOB_WORKERS,
+        "timeout_seconds": PDF_JOB_TIMEOUT,
+        "jobs": {
+            kind: {
+                **m,
+                "total_seconds": round(m["total_seconds"], 3),
+                "max_seconds": round(m["max_seconds"], 3),
+                "avg_seconds": round(
+                    m["total_seconds"] / max(1, m["completed"] + m["failed"] + m["timed_out"]), 3
+                ),
+            }
+            for kind, m in _metrics.items()
+        },
+    }
+
+
+def shutdown_pdf_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
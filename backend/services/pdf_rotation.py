@@ -193,6 +193,17 @@ def transform_ocr_coordinates(ocr_json: dict, rotations: dict[int, int]) -> dict
     for doc in ocr_json.get('documents', []):
         transform_fields_coordinates(doc.get('fields', {}), rotations, original_pages)
 
+    # Transform page word polygons the same way
+    for page_info, original in zip(ocr_json.get('pages', []), original_pages):
+        rotation = rotations.get(original['page_number'], 0)
+        if rotation != 0 and page_info.get('words'):
+            transform_bounding_regions(
+                page_info['words'],
+                rotation,
+                original.get('width') or 8.5,
+                original.get('height') or 11
+            )
+
     return ocr_json
 
 
@@ -0,0 +1,327 @@
+"""
+Invoice Preview Crop Cache
+
+The review screen requests a cropped PNG per line item (and per field on
+hover) from /api/invoices/{id}/line-items/{n}/preview[/field/{name}].
+Rasterising the PDF page for every one of those requests made scrolling a
+long invoice render the same page dozens of times, so rendered pages and
+crops are kept on disk:
+
+- entries are keyed by the SHA-256 of the invoice file's current bytes, the
+  page, render DPI and the crop box, so re-rotated or re-annotated PDFs (the
+  file changes on disk) never serve stale images
+- the cache directory (PREVIEW_CACHE_DIR) is capped at PREVIEW_CACHE_MAX_MB;
+  hits refresh an entry's mtime and the least recently used entries are
+  evicted when the cap is exceeded
+- the crop key doubles as the response ETag, so browsers revalidate with
+  If-None-Match and get a 304 without the file being read
+- after OCR, a background worker renders each page once and crops every line
+  item from it, so the review screen opens on warm previews
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", "/app/data/preview_cache")
+PREVIEW_CACHE_MAX_MB = int(os.getenv("PREVIEW_CACHE_MAX_MB", "512"))
+RENDER_DPI = 200
+LINE_PAD_INCHES = 0.15
+FIELD_PAD_INCHES = 0.05  # smaller padding for individual fields
+CACHE_CONTROL = "private, max-age=86400"
+FILE_HASH_MEMO_SIZE = 2048
+
+
+def _render_pdf_page(file_bytes: bytes, page_number: int) -> bytes:
+    import fitz
+    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    try:
+        return doc[page_number - 1].get_pixmap(dpi=RENDER_DPI).tobytes("png")
+    finally:
+        doc.close()
+
+
+def _crop_pdf_page(page_png: bytes, box: list, pad: float) -> bytes:
+    """Crop a page rendered at RENDER_DPI to a box in inches (Azure coordinates)."""
+    from PIL import Image
+    img = Image.open(io.BytesIO(page_png))
+    w, h = img.size
+    x0, y0, x1, y1 = box
+    crop_box = (
+        max(0, int((x0 - pad) * RENDER_DPI)),
+        max(0, int((y0 - pad) * RENDER_DPI)),
+        min(w, int((x1 + pad) * RENDER_DPI)),
+        min(h, int((y1 + pad) * RENDER_DPI)),
+    )
+    buf = io.BytesIO()
+    img.crop(crop_box).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _crop_image(file_bytes: bytes, box: list, pad: float, page_w: float, page_h: float) -> bytes:
+    """Crop a photo/scan, scaling the box by the page size Azure reported in inches."""
+    from PIL import Image
+    img = Image.open(io.BytesIO(file_bytes))
+    w, h = img.size
+    x0, y0, x1, y1 = box
+    crop_box = (
+        max(0, int((x0 / page_w - pad / page_w) * w)),
+        max(0, int((y0 / page_h - pad / page_h) * h)),
+        min(w, int((x1 / page_w + pad / page_w) * w)),
+        min(h, int((y1 / page_h + pad / page_h) * h)),
+    )
+    buf = io.BytesIO()
+    img.crop(crop_box).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class PreviewCache:
+    """Disk LRU of rendered invoice pages and preview crops."""
+
+    def __init__(self, directory: str = PREVIEW_CACHE_DIR, max_mb: int = PREVIEW_CACHE_MAX_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()  # put() also runs in worker threads
+        self._size: Optional[int] = None  # Bytes on disk, scanned on first write
+        self._file_hashes: OrderedDict = OrderedDict()  # file identity -> content SHA-256
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evicted = 0
+        self.prerendered = 0
+
+    # ── Disk store ─────────────────────────────────────────────────────────────
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Recently used
+            return data
+        except OSError:
+            return None
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Preview cache: could not write {key}: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Delete least recently used entries down to 90% of the cap (caller holds the lock)."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evicted += 1
+            except OSError:
+                pass
+        self._size = total
+
+    # ── Keys ───────────────────────────────────────────────────────────────────
+
+    def known_file_hash(self, invoice) -> Optional[str]:
+        """Content hash of the invoice file if it's already known and the file unchanged (no read)."""
+        identity = self._file_identity(invoice)
+        if identity is None:
+            return None
+        file_hash = self._file_hashes.get(identity)
+        if file_hash:
+            self._file_hashes.move_to_end(identity)
+        return file_hash
+
+    def remember_file_hash(self, invoice, file_bytes: bytes) -> str:
+        file_hash = hashlib.sha256(file_bytes).hexdigest()
+        identity = self._file_identity(invoice)
+        if identity is not None:
+            self._file_hashes[identity] = file_hash
+            while len(self._file_hashes) > FILE_HASH_MEMO_SIZE:
+                self._file_hashes.popitem(last=False)
+        return file_hash
+
+    @staticmethod
+    def _file_identity(invoice) -> Optional[tuple]:
+        # Local files can be rewritten (rotation, highlights): include mtime and size.
+        # Archived Nextcloud copies are immutable.
+        try:
+            stat = os.stat(invoice.image_path)
+            return ("local", invoice.image_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
+        if invoice.nextcloud_path:
+            return ("nextcloud", invoice.nextcloud_path)
+        return None
+
+    @staticmethod
+    def crop_key(file_hash: str, page_number: int, box: list, pad: float, page_size: tuple) -> str:
+        raw = ":".join([
+            file_hash, str(page_number), str(RENDER_DPI), f"{pad:.3f}",
+            ",".join(f"{v:.4f}" for v in box), ",".join(f"{v:.4f}" for v in page_size),
+        ])
+        return hashlib.sha256(raw.encode()).hexdigest()[:40]
+
+    @staticmethod
+    def page_key(file_hash: str, page_number: int) -> str:
+        return hashlib.sha256(f"{file_hash}:page:{page_number}:{RENDER_DPI}".encode()).hexdigest()[:40]
+
+    # ── Rendering ──────────────────────────────────────────────────────────────
+
+    def _page_png(self, file_bytes: bytes, file_hash: str, page_number: int) -> bytes:
+        key = self.page_key(file_hash, page_number)
+        page_png = self.get(key)
+        if page_png is None:
+            page_png = _render_pdf_page(file_bytes, page_number)
+            self.put(key, page_png)
+        return page_png
+
+    def render_crop(
+        self,
+        file_bytes: bytes,
+        is_pdf: bool,
+        file_hash: str,
+        page_number: int,
+        box: list,
+        pad: float,
+        page_size: tuple
+    ) -> bytes:
+        """Render (blocking) and store one crop; returns the PNG."""
+        if is_pdf:
+            png = _crop_pdf_page(self._page_png(file_bytes, file_hash, page_number), box, pad)
+        else:
+            png = _crop_image(file_bytes, box, pad, *page_size)
+        self.put(self.crop_key(file_hash, page_number, box, pad, page_size), png)
+        return png
+
+    def _prerender_sync(self, file_bytes: bytes, is_pdf: bool, file_hash: str, geometry: dict) -> int:
+        from services.ocr_geometry import page_size
+
+        rendered = 0
+        for item in geometry.get("items") or []:
+            if not item.get("box"):
+                continue
+            size = page_size(geometry, item["page"])
+            if self.has(self.crop_key(file_hash, item["page"], item["box"], LINE_PAD_INCHES, size)):
+                continue
+            self.render_crop(file_bytes, is_pdf, file_hash, item["page"], item["box"], LINE_PAD_INCHES, size)
+            rendered += 1
+        return rendered
+
+    # ── Pre-render worker ──────────────────────────────────────────────────────
+
+    def schedule_prerender(self, invoice_id: int):
+        """Queue an invoice's line item crops for rendering (called after OCR)."""
+        if self._worker is not None:
+            self._queue.put_nowait(invoice_id)
+
+    async def _prerender(self, invoice_id: int):
+        from sqlalchemy import select
+        from database import AsyncSessionLocal
+        from models.invoice import Invoice
+        from services.file_archival_service import FileArchivalService
+        from services.ocr_geometry import get_ocr_geometry
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Invoice).where(Invoice.id == invoice_id))
+            invoice = result.scalar_one_or_none()
+            if invoice is None:
+                return
+            geometry = await get_ocr_geometry(db, invoice)
+            if not geometry or not geometry.get("items"):
+                return
+            success, file_bytes = await FileArchivalService(db, invoice.kitchen_id).get_file_content(invoice)
+            if not success:
+                return
+
+        file_hash = self.remember_file_hash(invoice, file_bytes)
+        is_pdf = invoice.image_path.lower().endswith(".pdf")
+        started = time.perf_counter()
+        rendered = await asyncio.to_thread(self._prerender_sync, file_bytes, is_pdf, file_hash, geometry)
+        self.prerendered += rendered
+        if rendered:
+            logger.info(
+                f"Preview cache: pre-rendered {rendered} line item crops for invoice {invoice_id} "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+
+    async def _run(self):
+        while True:
+            invoice_id = await self._queue.get()
+            try:
+                await self._prerender(invoice_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Preview cache: pre-render failed for invoice {invoice_id}: {e}")
+
+    async def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evicted": self.evicted,
+            "prerendered": self.prerendered,
+            "size_mb": round(self._size / (1024 * 1024), 1) if self._size is not None else None,
+            "max_mb": self.max_bytes // (1024 * 1024),
+            "pending_prerender": self._queue.qsize(),
+        }
+
+
+preview_cache = PreviewCache()
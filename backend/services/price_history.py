@@ -19,6 +19,7 @@ from models.line_item import LineItem
 from models.supplier import Supplier
 from models.settings import KitchenSettings
 from models.acknowledged_price import AcknowledgedPrice
+from models.product_price_point import ProductPricePoint
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,33 @@ def normalize_description(description: Optional[str]) -> Optional[str]:
     return description.split('\n')[0].strip()
 
 
+def product_point_conditions(
+    product_code: Optional[str],
+    description: Optional[str],
+    unit: Optional[str],
+) -> list:
+    """
+    ProductPricePoint filters for one product, matching the historic
+    line_items rules: product_code if available, otherwise first line of
+    description, and always the unit.
+    """
+    P = ProductPricePoint
+    if product_code:
+        # description_key is always NULL on coded rows; included so the
+        # lookup uses the full idx_ppp_product_timeline prefix
+        conditions = [P.product_code == product_code, P.description_key.is_(None)]
+    else:
+        conditions = [P.product_code.is_(None)]
+        if description:
+            conditions.append(P.description_key == normalize_description(description))
+
+    if unit:
+        conditions.append(P.unit == unit)
+    else:
+        conditions.append(P.unit.is_(None))
+    return conditions
+
+
 @dataclass
 class PriceHistoryPoint:
     """Single point in price history."""
@@ -57,6 +85,15 @@ class PriceStatus:
     future_change_percent: Optional[float] = None
 
 
+@dataclass
+class PriceStatusRequest:
+    """One line item to resolve in a batched price status lookup."""
+    product_code: Optional[str]
+    description: Optional[str]
+    unit: Optional[str]
+    current_price: Decimal
+
+
 @dataclass
 class LineItemHistory:
     """Full history data for a line item."""
@@ -138,44 +175,25 @@ class PriceHistoryService:
         ref_date = reference_date or date.today()
         cutoff_date = ref_date - timedelta(days=lookback_days)
 
-        # Build conditions for matching product
+        P = ProductPricePoint
         conditions = [
-            Invoice.kitchen_id == self.kitchen_id,
-            LineItem.invoice_id == Invoice.id,
-            Invoice.supplier_id == supplier_id,
-            Invoice.invoice_date >= cutoff_date,
-            LineItem.unit_price.isnot(None),
-            LineItem.unit_price > 0,
-            or_(Invoice.document_type.is_(None), Invoice.document_type != 'credit_note'),
+            P.kitchen_id == self.kitchen_id,
+            P.supplier_id == supplier_id,
+            *product_point_conditions(product_code, description, unit),
+            P.invoice_date >= cutoff_date,
+            P.unit_price.isnot(None),
+            P.unit_price > 0,
+            or_(P.document_type.is_(None), P.document_type != 'credit_note'),
         ]
 
-        # Match by product_code if available, otherwise by description
-        if product_code:
-            conditions.append(LineItem.product_code == product_code)
-        else:
-            conditions.append(LineItem.product_code.is_(None))
-            if description:
-                # Normalize description to first line only for matching
-                normalized_desc = normalize_description(description)
-                # Match against first line of stored descriptions
-                conditions.append(
-                    func.split_part(LineItem.description, '\n', 1) == normalized_desc
-                )
-
-        # Match by unit - critical for products sold in different units (Box, Each, Kg, etc.)
-        if unit:
-            conditions.append(LineItem.unit == unit)
-        else:
-            conditions.append(LineItem.unit.is_(None))
-
         # Exclude current invoice if provided
         if exclude_invoice_id:
-            conditions.append(Invoice.id != exclude_invoice_id)
+            conditions.append(P.invoice_id != exclude_invoice_id)
 
         result = await self.db.execute(
-            select(LineItem.unit_price, Invoice.invoice_date)
+            select(P.unit_price, P.invoice_date)
             .where(and_(*conditions))
-            .order_by(desc(Invoice.invoice_date))
+            .order_by(desc(P.invoice_date))
         )
 
         return [(row[0], row[1]) for row in result.fetchall()]
@@ -190,42 +208,25 @@ class PriceHistoryService:
         exclude_invoice_id: Optional[int] = None
     ) -> List[Tuple[Decimal, date]]:
         """Get future prices for a product (after reference_date)."""
-        # Build conditions for matching product
+        P = ProductPricePoint
         conditions = [
-            Invoice.kitchen_id == self.kitchen_id,
-            LineItem.invoice_id == Invoice.id,
-            Invoice.supplier_id == supplier_id,
-            Invoice.invoice_date > reference_date,
-            LineItem.unit_price.isnot(None),
-            LineItem.unit_price > 0,
-            or_(Invoice.document_type.is_(None), Invoice.document_type != 'credit_note'),
+            P.kitchen_id == self.kitchen_id,
+            P.supplier_id == supplier_id,
+            *product_point_conditions(product_code, description, unit),
+            P.invoice_date > reference_date,
+            P.unit_price.isnot(None),
+            P.unit_price > 0,
+            or_(P.document_type.is_(None), P.document_type != 'credit_note'),
         ]
 
-        # Match by product_code if available, otherwise by description
-        if product_code:
-            conditions.append(LineItem.product_code == product_code)
-        else:
-            conditions.append(LineItem.product_code.is_(None))
-            if description:
-                normalized_desc = normalize_description(description)
-                conditions.append(
-                    func.split_part(LineItem.description, '\n', 1) == normalized_desc
-                )
-
-        # Match by unit
-        if unit:
-            conditions.append(LineItem.unit == unit)
-        else:
-            conditions.append(LineItem.unit.is_(None))
-
         # Exclude current invoice if provided
         if exclude_invoice_id:
-            conditions.append(Invoice.id != exclude_invoice_id)
+            conditions.append(P.invoice_id != exclude_invoice_id)
 
         result = await self.db.execute(
-            select(LineItem.unit_price, Invoice.invoice_date)
+            select(P.unit_price, P.invoice_date)
             .where(and_(*conditions))
-            .order_by(desc(Invoice.invoice_date))
+            .order_by(desc(P.invoice_date))
         )
 
         return [(row[0], row[1]) for row in result.fetchall()]
@@ -255,39 +256,75 @@ class PriceHistoryService:
             - "acknowledged": Price was flagged but user acknowledged it
         """
         # Get settings if thresholds not provided
-        if lookback_days is None or amber_threshold is None or red_threshold is None:
-            settings = await self._get_settings()
-            lookback_days = lookback_days or (settings.price_change_lookback_days if settings else 30)
-            amber_threshold = amber_threshold or (settings.price_change_amber_threshold if settings else 10)
-            red_threshold = red_threshold or (settings.price_change_red_threshold if settings else 20)
+        lookback_days, amber_threshold, red_threshold = await self._resolve_thresholds(
+            lookback_days, amber_threshold, red_threshold
+        )
 
         # Get previous prices
         previous_prices = await self._get_previous_prices(
             supplier_id, product_code, description, unit, lookback_days, current_invoice_id, reference_date
         )
+        previous_price = previous_prices[0][0] if previous_prices else None
 
         # Get future prices (if viewing an old invoice)
         future_price = None
-        future_change_percent = None
         if reference_date:
             future_prices = await self._get_future_prices(
                 supplier_id, product_code, description, unit, reference_date, current_invoice_id
             )
             if future_prices:
                 future_price = future_prices[0][0]  # Most recent future price
-                if future_price and future_price != 0:
-                    future_change_percent = float((future_price - current_price) / current_price * 100)
 
-        if not previous_prices:
+        # Acknowledgement only matters once a change has been detected, so look it up lazily
+        async def get_acknowledged():
+            return await self._get_acknowledged_price(supplier_id, product_code, description)
+
+        return await self._classify_price_status(
+            current_price, bool(previous_prices), previous_price, future_price,
+            get_acknowledged, red_threshold
+        )
+
+    async def _resolve_thresholds(
+        self,
+        lookback_days: Optional[int],
+        amber_threshold: Optional[int],
+        red_threshold: Optional[int],
+    ) -> Tuple[int, int, int]:
+        """Fill in any missing price thresholds from kitchen settings."""
+        if lookback_days is None or amber_threshold is None or red_threshold is None:
+            settings = await self._get_settings()
+            lookback_days = lookback_days or (settings.price_change_lookback_days if settings else 30)
+            amber_threshold = amber_threshold or (settings.price_change_amber_threshold if settings else 10)
+            red_threshold = red_threshold or (settings.price_change_red_threshold if settings else 20)
+        return lookback_days, amber_threshold, red_threshold
+
+    @staticmethod
+    async def _classify_price_status(
+        current_price: Decimal,
+        has_history: bool,
+        previous_price: Optional[Decimal],
+        future_price: Optional[Decimal],
+        get_acknowledged,
+        red_threshold: int,
+    ) -> PriceStatus:
+        """
+        Turn previous/future prices into a PriceStatus.
+
+        Shared by get_price_status and get_price_statuses so the single and
+        batched paths can never disagree. get_acknowledged is an async callable
+        returning the AcknowledgedPrice (or None) for the product.
+        """
+        future_change_percent = None
+        if future_price and future_price != 0:
+            future_change_percent = float((future_price - current_price) / current_price * 100)
+
+        if not has_history:
             return PriceStatus(
                 status="no_history",
                 future_price=future_price,
                 future_change_percent=future_change_percent
             )
 
-        # Get most recent previous price
-        previous_price = previous_prices[0][0]
-
         # Calculate change percentage
         if previous_price and previous_price != 0:
             change_percent = float((current_price - previous_price) / previous_price * 100)
@@ -309,9 +346,7 @@ class PriceHistoryService:
         abs_change = abs(change_percent)
 
         # Check if price is acknowledged
-        acknowledged = await self._get_acknowledged_price(
-            supplier_id, product_code, description
-        )
+        acknowledged = await get_acknowledged()
 
         if acknowledged and acknowledged.acknowledged_price == current_price:
             return PriceStatus(
@@ -349,6 +384,149 @@ class PriceHistoryService:
                 future_change_percent=future_change_percent
             )
 
+    async def get_price_statuses(
+        self,
+        supplier_id: int,
+        requests: List[PriceStatusRequest],
+        current_invoice_id: Optional[int] = None,
+        reference_date: Optional[date] = None,
+        lookback_days: Optional[int] = None,
+        amber_threshold: Optional[int] = None,
+        red_threshold: Optional[int] = None,
+    ) -> List[PriceStatus]:
+        """
+        Batched get_price_status for every line item on an invoice.
+
+        Resolves previous price, future price and acknowledgement for all
+        requests in a constant number of queries (settings, one ranked
+        product_price_points query, one acknowledgement query) instead of 3-4
+        per line item.
+
+        Returns a PriceStatus per request, in the same order.
+        """
+        if not requests:
+            return []
+
+        lookback_days, amber_threshold, red_threshold = await self._resolve_thresholds(
+            lookback_days, amber_threshold, red_threshold
+        )
+
+        ref_date = reference_date or date.today()
+        cutoff_date = ref_date - timedelta(days=lookback_days)
+
+        # Matching keys follow _get_previous_prices: product_code when present,
+        # otherwise first line of description. Items with neither code nor
+        # description match every code-less row, which can't be expressed as a
+        # partition key, so those (rare) items use the single-item path.
+        keys = {}
+        fallback = set()
+        for idx, req in enumerate(requests):
+            code = req.product_code or None
+            desc_key = None if code else (normalize_description(req.description) if req.description else None)
+            if code is None and desc_key is None:
+                fallback.add(idx)
+                continue
+            keys[idx] = (code, desc_key, req.unit or None)
+
+        latest = {}
+        if keys:
+            codes = {k[0] for k in keys.values() if k[0] is not None}
+            descs = {k[1] for k in keys.values() if k[1] is not None}
+            units = {k[2] for k in keys.values() if k[2] is not None}
+            any_null_unit = any(k[2] is None for k in keys.values())
+
+            P = ProductPricePoint
+            conditions = [
+                P.kitchen_id == self.kitchen_id,
+                P.supplier_id == supplier_id,
+                or_(
+                    P.product_code.in_(codes),
+                    and_(P.product_code.is_(None), P.description_key.in_(descs)),
+                ),
+                or_(P.unit.in_(units), P.unit.is_(None)) if any_null_unit
+                else P.unit.in_(units),
+                P.invoice_date >= cutoff_date,
+                P.unit_price.isnot(None),
+                P.unit_price > 0,
+                or_(P.document_type.is_(None), P.document_type != 'credit_note'),
+            ]
+            if current_invoice_id:
+                conditions.append(P.invoice_id != current_invoice_id)
+
+            # Rank every matching point per product key, newest first. The newest
+            # point is both the "previous" price (any date since cutoff) and, when
+            # it is dated after the reference date, the "future" price.
+            ranked = (
+                select(
+                    P.product_code, P.description_key, P.unit, P.unit_price, P.invoice_date,
+                    func.row_number().over(
+                        partition_by=(P.product_code, P.description_key, P.unit),
+                        order_by=(desc(P.invoice_date), desc(P.invoice_id)),
+                    ).label('rn'),
+                )
+                .where(and_(*conditions))
+                .subquery()
+            )
+            result = await self.db.execute(
+                select(
+                    ranked.c.product_code, ranked.c.description_key, ranked.c.unit,
+                    ranked.c.unit_price, ranked.c.invoice_date,
+                ).where(ranked.c.rn == 1)
+            )
+            for code, desc_key, unit, unit_price, inv_date in result.fetchall():
+                latest[(code, desc_key, unit)] = (unit_price, inv_date)
+
+        # Acknowledgements for this supplier, matched in Python with the same
+        # exact (product_code, description) rules as _get_acknowledged_price
+        ack_codes = {r.product_code for r in requests if r.product_code}
+        ack_descs = {r.description for r in requests if r.description}
+        ack_result = await self.db.execute(
+            select(AcknowledgedPrice).where(
+                AcknowledgedPrice.kitchen_id == self.kitchen_id,
+                AcknowledgedPrice.supplier_id == supplier_id,
+                or_(
+                    AcknowledgedPrice.product_code.in_(ack_codes),
+                    AcknowledgedPrice.description.in_(ack_descs),
+                    and_(AcknowledgedPrice.product_code.is_(None), AcknowledgedPrice.description.is_(None)),
+                ),
+            )
+        )
+        acknowledged_by_key = {}
+        for ack in ack_result.scalars().all():
+            acknowledged_by_key.setdefault((ack.product_code, ack.description), ack)
+
+        statuses = []
+        for idx, req in enumerate(requests):
+            if idx in fallback:
+                statuses.append(await self.get_price_status(
+                    supplier_id, req.product_code, req.description, req.current_price,
+                    unit=req.unit,
+                    current_invoice_id=current_invoice_id,
+                    reference_date=reference_date,
+                    lookback_days=lookback_days,
+                    amber_threshold=amber_threshold,
+                    red_threshold=red_threshold,
+                ))
+                continue
+
+            row = latest.get(keys[idx])
+            previous_price = row[0] if row else None
+            future_price = None
+            if row and reference_date and row[1] > reference_date:
+                future_price = row[0]
+
+            ack_key = (req.product_code or None, req.description or None)
+
+            async def get_acknowledged(ack_key=ack_key):
+                return acknowledged_by_key.get(ack_key)
+
+            statuses.append(await self._classify_price_status(
+                req.current_price, row is not None, previous_price, future_price,
+                get_acknowledged, red_threshold
+            ))
+
+        return statuses
+
     async def get_history(
         self,
         supplier_id: int,
@@ -378,46 +556,25 @@ class PriceHistoryService:
         if date_from is None:
             date_from = date_to - timedelta(days=365)
 
-        # Build conditions for matching product
-        conditions = [
-            Invoice.kitchen_id == self.kitchen_id,
-            LineItem.invoice_id == Invoice.id,
-            Invoice.supplier_id == supplier_id,
-            Invoice.invoice_date >= date_from,
-            Invoice.invoice_date <= date_to,
-        ]
-
-        # Match by product_code if available, otherwise by description
-        if product_code:
-            conditions.append(LineItem.product_code == product_code)
-        else:
-            conditions.append(LineItem.product_code.is_(None))
-            if description:
-                # Normalize description to first line only for matching
-                normalized_desc = normalize_description(description)
-                # Match against first line of stored descriptions
-                conditions.append(
-                    func.split_part(LineItem.description, '\n', 1) == normalized_desc
-                )
-
-        # Match by unit - critical for products sold in different units
-        if unit:
-            conditions.append(LineItem.unit == unit)
-        else:
-            conditions.append(LineItem.unit.is_(None))
-
-        # Get price history points
+        # Get price history points for this product
+        P = ProductPricePoint
         result = await self.db.execute(
             select(
-                Invoice.invoice_date,
-                LineItem.unit_price,
-                LineItem.quantity,
-                Invoice.id,
-                Invoice.invoice_number,
-                Invoice.document_type,
+                P.invoice_date,
+                P.unit_price,
+                P.quantity,
+                P.invoice_id,
+                P.invoice_number,
+                P.document_type,
             )
-            .where(and_(*conditions))
-            .order_by(Invoice.invoice_date)
+            .where(
+                P.kitchen_id == self.kitchen_id,
+                P.supplier_id == supplier_id,
+                *product_point_conditions(product_code, description, unit),
+                P.invoice_date >= date_from,
+                P.invoice_date <= date_to,
+            )
+            .order_by(P.invoice_date)
         )
         rows = result.fetchall()
 
@@ -538,17 +695,24 @@ class PriceHistoryService:
         date_from: Optional[date] = None,
         date_to: Optional[date] = None,
         limit: int = 100,
-        offset: int = 0
-    ) -> Tuple[List[dict], int]:
+        offset: int = 0,
+        after: Optional[str] = None,
+        include_total: bool = True
+    ) -> Tuple[List[dict], Optional[int], Optional[str]]:
         """
         Get consolidated line items for search results.
 
         Groups line items by (product_code OR description) + supplier,
         returning most recent price, total quantity, occurrence count, etc.
 
+        Items are ordered most recent first; `after` takes the next_cursor of
+        the previous page instead of an offset.
+
         Returns:
-            (list of consolidated items, total count)
+            (list of consolidated items, total count or None, next_cursor)
         """
+        from services.pagination import decode_cursor, keyset_after, paginate
+
         # Build base conditions — search all history unless dates explicitly provided
         conditions = [
             Invoice.kitchen_id == self.kitchen_id,
@@ -627,17 +791,36 @@ class PriceHistoryService:
         )
 
         # Get total count
-        count_subquery = agg_query.subquery()
-        count_result = await self.db.execute(
-            select(func.count()).select_from(count_subquery)
-        )
-        total_count = count_result.scalar() or 0
-
-        # Get paginated results
-        agg_result = await self.db.execute(
-            agg_query.order_by(desc('most_recent_date')).limit(limit).offset(offset)
+        total_count = None
+        if include_total:
+            count_subquery = agg_query.subquery()
+            count_result = await self.db.execute(
+                select(func.count()).select_from(count_subquery)
+            )
+            total_count = count_result.scalar() or 0
+
+        # Get paginated results - most recent first, then the (non-null) group key
+        # so the order is total and a cursor can resume after any group. NULL and
+        # '' are separate groups, so each coalesce is paired with an IS NULL flag
+        sort_columns = [
+            func.coalesce(func.max(Invoice.invoice_date), date.min),
+            Invoice.supplier_id,
+            LineItem.product_code.is_(None),
+            func.coalesce(LineItem.product_code, ''),
+            desc_first_line.is_(None),
+            func.coalesce(desc_first_line, ''),
+        ]
+        page_query = (
+            agg_query.add_columns(*sort_columns)
+            .order_by(*[desc(col) for col in sort_columns])
+            .limit(limit + 1)
         )
-        rows = agg_result.fetchall()
+        if after:
+            page_query = page_query.having(keyset_after(sort_columns, decode_cursor(after, len(sort_columns))))
+        else:
+            page_query = page_query.offset(offset)
+        agg_result = await self.db.execute(page_query)
+        rows, next_cursor = paginate(agg_result.fetchall(), limit, lambda row: tuple(row[-len(sort_columns):]))
 
         # Build result list with additional data
         items = []
@@ -836,7 +1019,7 @@ class PriceHistoryService:
                 'price_per_std_unit': src_row[3] if src_row else None,
             })
 
-        return items, total_count
+        return items, total_count, next_cursor
 
 
 # Import String for cast
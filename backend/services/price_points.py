@@ -0,0 +1,115 @@
+"""
+Maintenance of the product_price_points table.
+
+Price points are rebuilt per invoice whenever its line items (or the invoice
+fields copied onto the points) change. Row deletes are handled by the
+ON DELETE CASCADE foreign keys on line_items / invoices.
+
+One-off backfill for existing data:
+    python -m services.price_points            # all kitchens
+    python -m services.price_points 3          # kitchen 3 only
+"""
+import asyncio
+import logging
+import sys
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+_INSERT_POINTS_SQL = """
+    INSERT INTO product_price_points (
+        line_item_id, invoice_id, kitchen_id, supplier_id,
+        product_code, description_key, unit,
+        invoice_date, invoice_number, document_type,
+        unit_price, quantity, is_non_stock
+    )
+    SELECT
+        li.id, inv.id, inv.kitchen_id, inv.supplier_id,
+        li.product_code,
+        CASE WHEN li.product_code IS NULL THEN split_part(li.description, E'\\n', 1) END,
+        li.unit,
+        inv.invoice_date, inv.invoice_number, inv.document_type,
+        li.unit_price, li.quantity, li.is_non_stock
+    FROM line_items li
+    JOIN invoices inv ON inv.id = li.invoice_id
+    WHERE inv.supplier_id IS NOT NULL
+      AND inv.invoice_date IS NOT NULL
+      AND {scope}
+    ON CONFLICT (line_item_id) DO UPDATE SET
+        invoice_id = EXCLUDED.invoice_id,
+        kitchen_id = EXCLUDED.kitchen_id,
+        supplier_id = EXCLUDED.supplier_id,
+        product_code = EXCLUDED.product_code,
+        description_key = EXCLUDED.description_key,
+        unit = EXCLUDED.unit,
+        invoice_date = EXCLUDED.invoice_date,
+        invoice_number = EXCLUDED.invoice_number,
+        document_type = EXCLUDED.document_type,
+        unit_price = EXCLUDED.unit_price,
+        quantity = EXCLUDED.quantity,
+        is_non_stock = EXCLUDED.is_non_stock
+"""
+
+
+async def refresh_invoice_price_points(db: AsyncSession, invoice_id: int) -> None:
+    """
+    Rebuild price points for one invoice from its current line items.
+
+    Call after flushing line item / invoice changes and before commit so the
+    points are written in the same transaction. Invoices without a supplier
+    or date have no points.
+    """
+    await db.execute(
+        text("DELETE FROM product_price_points WHERE invoice_id = :invoice_id"),
+        {"invoice_id": invoice_id}
+    )
+    await db.execute(
+        text(_INSERT_POINTS_SQL.format(scope="li.invoice_id = :invoice_id")),
+        {"invoice_id": invoice_id}
+    )
+
+
+async def refresh_supplier_price_points(db: AsyncSession, kitchen_id: int, supplier_id: int) -> None:
+    """Rebuild all price points for a supplier (after bulk line item renames/backfills)."""
+    await db.execute(
+        text("DELETE FROM product_price_points WHERE kitchen_id = :kid AND supplier_id = :sid"),
+        {"kid": kitchen_id, "sid": supplier_id}
+    )
+    await db.execute(
+        text(_INSERT_POINTS_SQL.format(scope="inv.kitchen_id = :kid AND inv.supplier_id = :sid")),
+        {"kid": kitchen_id, "sid": supplier_id}
+    )
+
+
+async def backfill_price_points(kitchen_id: Optional[int] = None) -> int:
+    """
+    Rebuild price points from line_items for one kitchen (or all kitchens).
+
+    Returns the number of points written.
+    """
+    from database import engine
+
+    async with engine.begin() as conn:
+        if kitchen_id is None:
+            await conn.execute(text("DELETE FROM product_price_points"))
+            result = await conn.execute(text(_INSERT_POINTS_SQL.format(scope="TRUE")))
+        else:
+            await conn.execute(
+                text("DELETE FROM product_price_points WHERE kitchen_id = :kid"),
+                {"kid": kitchen_id}
+            )
+            result = await conn.execute(
+                text(_INSERT_POINTS_SQL.format(scope="inv.kitchen_id = :kid")),
+                {"kid": kitchen_id}
+            )
+    count = result.rowcount
+    logger.info(f"Backfilled {count} product price points" + (f" for kitchen {kitchen_id}" if kitchen_id else ""))
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill_price_points(int(sys.argv[1]) if len(sys.argv) > 1 else None))
@@ -0,0 +1,184 @@
+"""
+Product Definition Matcher
+
+Finds the ProductDefinition that applies to a line item (upload, invoice
+view, supplier change, apply-definitions). Matching rules:
+
+1. product_code - exact match; a supplier-specific definition wins over a
+   kitchen-wide one (supplier_id NULL) for the same code
+2. description_pattern - the normalized pattern is contained in the
+   normalized item description; supplier-specific patterns first, then the
+   longest pattern
+
+Rather than loading every definition and looping over all patterns for every
+line item, each (kitchen, supplier) gets a compiled DefinitionMatcher: a dict
+of codes plus an Aho-Corasick automaton over the normalized patterns, so a
+description is scanned once regardless of how many patterns exist.
+
+Matchers are cached in-process and hold plain DefinitionValues snapshots (not
+ORM rows), so they can be shared across requests. Each lookup checks a cheap
+fingerprint (count, max id, max updated_at) of the definitions in scope, so a
+definition created, edited or deleted - in this worker or any other -
+invalidates the cached matcher.
+"""
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.product_definition import ProductDefinition
+from services.pattern_automaton import PatternAutomaton
+
+logger = logging.getLogger(__name__)
+
+MATCHER_CACHE_SIZE = 512
+
+
+def normalize_description(text: str | None) -> str:
+    """Normalize description for matching - lowercase, collapse whitespace, strip"""
+    if not text:
+        return ""
+    return " ".join(text.lower().strip().split())
+
+
+@dataclass(frozen=True)
+class DefinitionValues:
+    """The fields of a ProductDefinition that get applied to line items."""
+    id: int
+    supplier_id: Optional[int]
+    product_code: Optional[str]
+    description_pattern: Optional[str]
+    pack_quantity: Optional[int]
+    unit_size: Optional[Decimal]
+    unit_size_type: Optional[str]
+    portions_per_unit: Optional[int]
+
+
+class DefinitionMatcher:
+    """Compiled definitions for one (kitchen, supplier)."""
+
+    def __init__(self, definitions: list[DefinitionValues]):
+        self.by_code: dict[str, DefinitionValues] = {}
+        desc_entries: list[tuple[str, DefinitionValues]] = []
+
+        for d in definitions:
+            if d.product_code:
+                existing = self.by_code.get(d.product_code)
+                if existing and existing.supplier_id and not d.supplier_id:
+                    pass  # Keep supplier-specific
+                else:
+                    self.by_code[d.product_code] = d
+            if d.description_pattern:
+                norm_pattern = normalize_description(d.description_pattern)
+                if norm_pattern:
+                    desc_entries.append((norm_pattern, d))
+
+        # Priority order: supplier-specific first, then longer (more specific) patterns
+        desc_entries.sort(key=lambda x: (0 if x[1].supplier_id else 1, -len(x[0])))
+
+        # One automaton entry per distinct pattern, holding its highest priority definition
+        self._patterns: list[str] = []
+        self._pattern_defs: list[DefinitionValues] = []
+        seen = set()
+        for pattern, d in desc_entries:
+            if pattern in seen:
+                continue
+            seen.add(pattern)
+            self._patterns.append(pattern)
+            self._pattern_defs.append(d)
+        self._automaton = PatternAutomaton(self._patterns) if self._patterns else None
+
+    @property
+    def code_count(self) -> int:
+        return len(self.by_code)
+
+    @property
+    def pattern_count(self) -> int:
+        return len(self._patterns)
+
+    def is_empty(self) -> bool:
+        return not self.by_code and not self._patterns
+
+    def match(self, product_code: Optional[str], description: Optional[str]) -> tuple[Optional[DefinitionValues], Optional[str]]:
+        """(definition, "product_code" | "description") for a line item, or (None, None)."""
+        if product_code and product_code in self.by_code:
+            return self.by_code[product_code], "product_code"
+        if description and self._automaton:
+            found = self._automaton.search(normalize_description(description))
+            if found:
+                # Patterns are indexed in priority order
+                return self._pattern_defs[min(found)], "description"
+        return None, None
+
+    def find(self, product_code: Optional[str], description: Optional[str]) -> Optional[DefinitionValues]:
+        return self.match(product_code, description)[0]
+
+
+# (kitchen_id, supplier_id) -> (fingerprint, matcher)
+_matchers: OrderedDict = OrderedDict()
+
+
+def _scope_conditions(kitchen_id: int, supplier_id: Optional[int]) -> list:
+    """Supplier-specific plus kitchen-wide definitions, or kitchen-wide only without a supplier."""
+    conditions = [ProductDefinition.kitchen_id == kitchen_id]
+    if supplier_id:
+        conditions.append(
+            or_(
+                ProductDefinition.supplier_id == supplier_id,
+                ProductDefinition.supplier_id.is_(None)
+            )
+        )
+    else:
+        conditions.append(ProductDefinition.supplier_id.is_(None))
+    return conditions
+
+
+async def get_definition_matcher(
+    db: AsyncSession,
+    kitchen_id: int,
+    supplier_id: Optional[int]
+) -> DefinitionMatcher:
+    """The compiled matcher for a kitchen and supplier, rebuilt only when its definitions changed."""
+    conditions = _scope_conditions(kitchen_id, supplier_id)
+    result = await db.execute(
+        select(
+            func.count(ProductDefinition.id),
+            func.max(ProductDefinition.id),
+            func.max(ProductDefinition.updated_at)
+        ).where(*conditions)
+    )
+    fingerprint = tuple(result.one())
+
+    key = (kitchen_id, supplier_id or None)
+    cached = _matchers.get(key)
+    if cached and cached[0] == fingerprint:
+        _matchers.move_to_end(key)
+        return cached[1]
+
+    result = await db.execute(
+        select(
+            ProductDefinition.id,
+            ProductDefinition.supplier_id,
+            ProductDefinition.product_code,
+            ProductDefinition.description_pattern,
+            ProductDefinition.pack_quantity,
+            ProductDefinition.unit_size,
+            ProductDefinition.unit_size_type,
+            ProductDefinition.portions_per_unit,
+        ).where(*conditions).order_by(ProductDefinition.id)
+    )
+    matcher = DefinitionMatcher([DefinitionValues(*row) for row in result.all()])
+    logger.info(
+        f"Compiled product definitions for kitchen {kitchen_id}, supplier {supplier_id}: "
+        f"{matcher.code_count} codes, {matcher.pattern_count} description patterns"
+    )
+
+    _matchers[key] = (fingerprint, matcher)
+    _matchers.move_to_end(key)
+    while len(_matchers) > MATCHER_CACHE_SIZE:
+        _matchers.popitem(last=False)
+    return matcher
@@ -0,0 +1,224 @@
+"""
+Maintenance of the daily_purchase_totals table.
+
+The GP and purchases reports (dashboard, GP range/daily/monthly, purchases
+summary, daily purchases by supplier) all need the same figure: confirmed
+invoices' line item amounts summed per invoice, credit notes with a positive
+total negated, stock and non-stock kept apart. Instead of re-aggregating
+line_items x invoices on every page load they read it pre-summed per
+(kitchen, invoice date, supplier, category) from daily_purchase_totals.
+
+Rows are rebuilt a whole day at a time from the raw tables, so an update is
+always exact however the invoice changed. Call refresh_invoice_purchase_totals
+(or refresh_purchase_totals for a deleted invoice) after flushing invoice /
+line item changes and before commit, so the totals are written in the same
+transaction - passing the invoice's previous date when it may have moved.
+The refresh takes a per-kitchen lock held until commit, so make it the last
+step before committing.
+
+reconcile_purchase_totals compares the table with the raw tables and rebuilds
+any day that differs; the scheduler runs it nightly for every kitchen.
+
+One-off rebuild:
+    python -m services.purchase_totals            # all kitchens
+    python -m services.purchase_totals 3          # kitchen 3 only
+
+Timing a year of /gp/daily against the raw aggregation:
+    python -m scripts.benchmark_gp_daily 3
+"""
+import asyncio
+import logging
+import sys
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+# Per (kitchen, date, supplier, category) totals of confirmed invoices, with the
+# same per-invoice credit note sign handling the reports always used
+_TOTALS_SQL = """
+    SELECT
+        kitchen_id, invoice_date AS purchase_date, supplier_id, category,
+        COALESCE(SUM(stock_net), 0) AS stock_net,
+        COALESCE(SUM(non_stock_net), 0) AS non_stock_net,
+        COALESCE(SUM(stock_net) FILTER (WHERE is_credit), 0) AS credit_stock_net,
+        COALESCE(SUM(non_stock_net) FILTER (WHERE is_credit), 0) AS credit_non_stock_net,
+        COUNT(*) AS invoice_count
+    FROM (
+        SELECT
+            kitchen_id, invoice_date, supplier_id, category, is_credit,
+            CASE WHEN is_credit AND stock_total > 0 THEN -stock_total ELSE stock_total END AS stock_net,
+            CASE WHEN is_credit AND non_stock_total > 0 THEN -non_stock_total ELSE non_stock_total END AS non_stock_net
+        FROM (
+            SELECT
+                inv.kitchen_id, inv.invoice_date, inv.supplier_id, inv.category,
+                COALESCE(inv.document_type = 'credit_note', false) AS is_credit,
+                SUM(li.amount) FILTER (WHERE li.is_non_stock IS NOT TRUE) AS stock_total,
+                SUM(li.amount) FILTER (WHERE li.is_non_stock) AS non_stock_total
+            FROM invoices inv
+            JOIN line_items li ON li.invoice_id = inv.id
+            WHERE inv.status = 'CONFIRMED'
+              AND inv.invoice_date IS NOT NULL
+              AND li.amount IS NOT NULL
+              AND {scope}
+            GROUP BY inv.id
+        ) per_invoice
+    ) signed
+    GROUP BY kitchen_id, invoice_date, supplier_id, category
+"""
+
+_INSERT_TOTALS_SQL = """
+    INSERT INTO daily_purchase_totals (
+        kitchen_id, purchase_date, supplier_id, category,
+        stock_net, non_stock_net, credit_stock_net, credit_non_stock_net,
+        invoice_count, updated_at
+    )
+    SELECT
+        kitchen_id, purchase_date, supplier_id, category,
+        stock_net, non_stock_net, credit_stock_net, credit_non_stock_net,
+        invoice_count, (now() AT TIME ZONE 'utc')
+    FROM ({totals}) totals
+"""
+
+_TOTAL_COLUMNS = ("stock_net", "non_stock_net", "credit_stock_net", "credit_non_stock_net", "invoice_count")
+
+
+async def refresh_purchase_totals(db: AsyncSession, kitchen_id: int, dates: Iterable[Optional[date]]) -> None:
+    """Rebuild a kitchen's totals for the given invoice dates (None dates are ignored)."""
+    dates = sorted({d for d in dates if d is not None})
+    if not dates:
+        return
+    params = {"kid": kitchen_id, "dates": dates}
+    # Serialise refreshes per kitchen until commit: two transactions rebuilding
+    # the same day would otherwise both insert it
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext('daily_purchase_totals'), :kid)"),
+        {"kid": kitchen_id}
+    )
+    await db.execute(
+        text("DELETE FROM daily_purchase_totals WHERE kitchen_id = :kid AND purchase_date = ANY(:dates)"),
+        params
+    )
+    await db.execute(
+        text(_INSERT_TOTALS_SQL.format(totals=_TOTALS_SQL.format(
+            scope="inv.kitchen_id = :kid AND inv.invoice_date = ANY(:dates)"
+        ))),
+        params
+    )
+
+
+async def refresh_invoice_purchase_totals(db: AsyncSession, invoice_id: int, *previous_dates: Optional[date]) -> None:
+    """
+    Rebuild the totals for the day an invoice is on now, plus any day it was
+    on before this change (previous_dates).
+    """
+    result = await db.execute(
+        text("SELECT kitchen_id, invoice_date FROM invoices WHERE id = :invoice_id"),
+        {"invoice_id": invoice_id}
+    )
+    row = result.first()
+    if row is None:
+        return
+    await refresh_purchase_totals(db, row.kitchen_id, [row.invoice_date, *previous_dates])
+
+
+async def reconcile_purchase_totals(
+    db: AsyncSession,
+    kitchen_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    repair: bool = True
+) -> dict:
+    """
+    Compare a kitchen's daily_purchase_totals with the raw tables.
+
+    Days whose rows differ (or exist on one side only) are logged and, with
+    repair, rebuilt and committed. Returns a summary for logging.
+    """
+    scope = "inv.kitchen_id = :kid"
+    stored_scope = "kitchen_id = :kid"
+    params = {"kid": kitchen_id}
+    if date_from:
+        scope += " AND inv.invoice_date >= :date_from"
+        stored_scope += " AND purchase_date >= :date_from"
+        params["date_from"] = date_from
+    if date_to:
+        scope += " AND inv.invoice_date <= :date_to"
+        stored_scope += " AND purchase_date <= :date_to"
+        params["date_to"] = date_to
+
+    def keyed(rows) -> dict:
+        return {
+            (row.purchase_date, row.supplier_id, row.category): tuple(getattr(row, c) for c in _TOTAL_COLUMNS)
+            for row in rows
+        }
+
+    raw_result = await db.execute(text(_TOTALS_SQL.format(scope=scope)), params)
+    raw = keyed(raw_result.all())
+    stored_result = await db.execute(
+        text(f"SELECT purchase_date, supplier_id, category, {', '.join(_TOTAL_COLUMNS)} "
+             f"FROM daily_purchase_totals WHERE {stored_scope}"),
+        params
+    )
+    stored = keyed(stored_result.all())
+
+    mismatched_days = sorted({
+        key[0] for key in raw.keys() | stored.keys()
+        if raw.get(key) != stored.get(key)
+    })
+
+    if mismatched_days:
+        drift = sum(
+            (raw.get(key, (Decimal(0),))[0] - stored.get(key, (Decimal(0),))[0])
+            for key in raw.keys() | stored.keys() if key[0] in mismatched_days
+        )
+        logger.warning(
+            f"Purchase totals for kitchen {kitchen_id} differ from invoices on {len(mismatched_days)} day(s) "
+            f"({mismatched_days[0]} .. {mismatched_days[-1]}, stock drift {drift})"
+            + (" - rebuilding" if repair else "")
+        )
+        if repair:
+            await refresh_purchase_totals(db, kitchen_id, mismatched_days)
+            await db.commit()
+
+    return {
+        "kitchen_id": kitchen_id,
+        "rows_checked": len(raw),
+        "mismatched_days": len(mismatched_days),
+        "repaired": bool(mismatched_days) and repair,
+    }
+
+
+async def backfill_purchase_totals(kitchen_id: Optional[int] = None) -> int:
+    """
+    Rebuild daily purchase totals from the raw tables for one kitchen (or all kitchens).
+
+    Returns the number of rows written.
+    """
+    from database import engine
+
+    async with engine.begin() as conn:
+        if kitchen_id is None:
+            await conn.execute(text("DELETE FROM daily_purchase_totals"))
+            result = await conn.execute(text(_INSERT_TOTALS_SQL.format(totals=_TOTALS_SQL.format(scope="TRUE"))))
+        else:
+            await conn.execute(
+                text("DELETE FROM daily_purchase_totals WHERE kitchen_id = :kid"),
+                {"kid": kitchen_id}
+            )
+            result = await conn.execute(
+                text(_INSERT_TOTALS_SQL.format(totals=_TOTALS_SQL.format(scope="inv.kitchen_id = :kid"))),
+                {"kid": kitchen_id}
+            )
+    count = result.rowcount
+    logger.info(f"Backfilled {count} daily purchase totals" + (f" for kitchen {kitchen_id}" if kitchen_id else ""))
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill_purchase_totals(int(sys.argv[1]) if len(sys.argv) > 1 else None))
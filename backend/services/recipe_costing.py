@@ -0,0 +1,632 @@
+"""
+Recipe costing engine and cost propagation.
+
+Loads a recipe DAG (recipes, recipe ingredients with their ingredient sources,
+and sub-recipe edges) in a few bulk queries, then costs it in memory in
+topological order (children first). Each recipe is costed once and the result
+is reused by every parent that includes it, instead of re-querying and
+re-costing shared components per dish.
+
+Used by:
+- /recipes/{id}/costing, recipe detail, print and cost snapshots
+- dashboard stats / price impact report (whole-kitchen walks)
+- external API recipe listings
+- cost snapshots when ingredient prices or recipe contents change: affected
+  recipes (including every ancestor dish) are found with one recursive query,
+  costed by one engine and written with bulk inserts
+
+Benchmark over a synthetic 2,000-recipe kitchen:
+    python -m scripts.benchmark_recipe_costing
+"""
+import logging
+from collections import defaultdict, deque
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from models.recipe import Recipe, RecipeIngredient, RecipeSubRecipe, RecipeChangeLog, RecipeCostSnapshot
+from models.ingredient import Ingredient
+
+logger = logging.getLogger(__name__)
+
+
+# ── Unit helpers ─────────────────────────────────────────────────────────────
+
+# Unit conversion factors to a common base (g for weight, ml for volume)
+UNIT_TO_BASE = {"g": 1.0, "kg": 1000.0, "ml": 1.0, "ltr": 1000.0}
+
+# Which units are compatible (same measurement type)
+COMPATIBLE_UNITS = {
+    "g": ("g", "kg"), "kg": ("g", "kg"),
+    "ml": ("ml", "ltr"), "ltr": ("ml", "ltr"),
+    "portion": ("portion",), "each": ("each",),
+}
+
+
+def convert_unit(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert a value between compatible units. Returns original value if incompatible."""
+    if from_unit == to_unit:
+        return value
+    from_base = UNIT_TO_BASE.get(from_unit)
+    to_base = UNIT_TO_BASE.get(to_unit)
+    if from_base is None or to_base is None:
+        return value
+    # Check compatibility
+    if to_unit not in COMPATIBLE_UNITS.get(from_unit, ()):
+        return value
+    return value * from_base / to_base
+
+
+def get_compatible_units(unit: str) -> list[str]:
+    """Get list of compatible units for a given output unit."""
+    return list(COMPATIBLE_UNITS.get(unit, (unit,)))
+
+
+def get_output_qty(recipe) -> float:
+    """Unified output quantity: bulk uses yield_qty, portioned uses batch_portions."""
+    if recipe.batch_output_type == "bulk" and recipe.batch_yield_qty:
+        return float(recipe.batch_yield_qty)
+    return recipe.batch_portions or 1
+
+
+def get_output_unit(recipe) -> str:
+    """Unified output unit label: bulk uses yield_unit, portioned uses 'portion'."""
+    if recipe.batch_output_type == "bulk" and recipe.batch_yield_unit:
+        return recipe.batch_yield_unit
+    return "portion"
+
+
+def scale_child_sub_recipes(sub_recipes: list, scale: float) -> list:
+    """Recursively scale nested sub-recipe data for hierarchical display."""
+    result = []
+    for sr in sub_recipes:
+        result.append({
+            "child_recipe_id": sr["child_recipe_id"],
+            "child_recipe_name": sr["child_recipe_name"],
+            "batch_output_type": sr.get("batch_output_type", "portions"),
+            "output_qty": sr.get("output_qty", 1),
+            "output_unit": sr.get("output_unit", "portion"),
+            "portions_needed": round(sr["portions_needed"] * scale, 4),
+            "cost_contribution": round(sr["cost_contribution"] * scale, 4) if sr.get("cost_contribution") else None,
+            "child_ingredients": [
+                {
+                    "ingredient_id": ci["ingredient_id"],
+                    "ingredient_name": ci["ingredient_name"],
+                    "quantity": round(ci["quantity"] * scale, 4),
+                    "unit": ci["unit"],
+                    "yield_percent": ci.get("yield_percent", 100.0),
+                    "cost_recent": round(ci["cost_recent"] * scale, 4) if ci.get("cost_recent") else None,
+                    "cost_min": round(ci["cost_min"] * scale, 4) if ci.get("cost_min") else None,
+                    "cost_max": round(ci["cost_max"] * scale, 4) if ci.get("cost_max") else None,
+                    "is_manual_price": ci.get("is_manual_price", False),
+                    "has_no_price": ci.get("has_no_price", False),
+                }
+                for ci in sr.get("child_ingredients", [])
+            ],
+            "child_sub_recipes": scale_child_sub_recipes(sr.get("child_sub_recipes", []), scale),
+        })
+    return result
+
+
+# ── Engine ───────────────────────────────────────────────────────────────────
+
+class RecipeCostEngine:
+    """
+    In-memory costing over a bulk-loaded recipe DAG.
+
+    Usage:
+        engine = await RecipeCostEngine(db).load_kitchen(kitchen_id)
+        engine = await RecipeCostEngine(db).load_recipes([recipe_id])
+        cost_data = engine.cost(recipe_id)
+        costs = engine.cost_all()   # every loaded recipe, one pass
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.recipes: dict[int, Recipe] = {}
+        self.ingredients: dict[int, list[RecipeIngredient]] = defaultdict(list)
+        self.sub_recipes: dict[int, list[RecipeSubRecipe]] = defaultdict(list)
+        self._cost_memo: dict[int, dict] = {}
+        self._order: Optional[list[int]] = None
+        self._usage_memo: dict[int, dict[str, float]] = {}
+        self._ingredient_ids_memo: dict[int, frozenset[int]] = {}
+
+    # ── Loading ──────────────────────────────────────────────────────────
+
+    async def load_kitchen(self, kitchen_id: int) -> "RecipeCostEngine":
+        """Load every recipe in the kitchen (plus any sub-recipes they reference)."""
+        result = await self.db.execute(select(Recipe.id).where(Recipe.kitchen_id == kitchen_id))
+        await self._load_closure(result.scalars().all())
+        return self
+
+    async def load_recipes(self, recipe_ids: Iterable[int]) -> "RecipeCostEngine":
+        """Load the given recipes and all of their descendants, one level per round trip."""
+        await self._load_closure(recipe_ids)
+        return self
+
+    async def _load_closure(self, recipe_ids: Iterable[int]) -> None:
+        pending = set(recipe_ids) - self.recipes.keys()
+        while pending:
+            await self._load_nodes(pending)
+            pending = {
+                sr.child_recipe_id
+                for rid in pending
+                for sr in self.sub_recipes.get(rid, [])
+            } - self.recipes.keys()
+
+    async def _load_nodes(self, recipe_ids: set[int]) -> None:
+        ids = list(recipe_ids)
+        self._cost_memo.clear()
+        self._order = None
+        self._usage_memo.clear()
+        self._ingredient_ids_memo.clear()
+
+        recipe_result = await self.db.execute(select(Recipe).where(Recipe.id.in_(ids)))
+        for recipe in recipe_result.scalars().all():
+            self.recipes[recipe.id] = recipe
+
+        ri_result = await self.db.execute(
+            select(RecipeIngredient)
+            .options(selectinload(RecipeIngredient.ingredient).selectinload(Ingredient.sources))
+            .where(RecipeIngredient.recipe_id.in_(ids))
+            .order_by(RecipeIngredient.id)
+        )
+        for ri in ri_result.scalars().all():
+            self.ingredients[ri.recipe_id].append(ri)
+
+        sr_result = await self.db.execute(
+            select(RecipeSubRecipe)
+            .where(RecipeSubRecipe.parent_recipe_id.in_(ids))
+            .order_by(RecipeSubRecipe.id)
+        )
+        for sr in sr_result.scalars().all():
+            self.sub_recipes[sr.parent_recipe_id].append(sr)
+
+        # Recipes with nothing attached still need (empty) entries so the closure terminates
+        for rid in ids:
+            self.ingredients.setdefault(rid, [])
+            self.sub_recipes.setdefault(rid, [])
+
+    # ── Graph ────────────────────────────────────────────────────────────
+
+    def topological_order(self) -> list[int]:
+        """Loaded recipe ids ordered children-first (Kahn's algorithm).
+
+        Recipes caught in a cycle (which the API prevents) are appended last.
+        """
+        if self._order is not None:
+            return self._order
+        pending_children = {
+            rid: {sr.child_recipe_id for sr in self.sub_recipes.get(rid, []) if sr.child_recipe_id in self.recipes}
+            for rid in self.recipes
+        }
+        parents: dict[int, set[int]] = defaultdict(set)
+        for rid, children in pending_children.items():
+            for child_id in children:
+                parents[child_id].add(rid)
+
+        ready = deque(sorted(rid for rid, children in pending_children.items() if not children))
+        order = []
+        while ready:
+            rid = ready.popleft()
+            order.append(rid)
+            for parent_id in parents.get(rid, ()):
+                pending_children[parent_id].discard(rid)
+                if not pending_children[parent_id]:
+                    ready.append(parent_id)
+
+        if len(order) < len(self.recipes):
+            placed = set(order)
+            cyclic = sorted(rid for rid in self.recipes if rid not in placed)
+            logger.warning(f"Recipe cost engine: sub-recipe cycle involving recipes {cyclic}")
+            order.extend(cyclic)
+        self._order = order
+        return order
+
+    def descendants(self, recipe_id: int) -> set[int]:
+        """A loaded recipe plus every sub-recipe under it, at any depth."""
+        found = {recipe_id}
+        stack = [recipe_id]
+        while stack:
+            for sr in self.sub_recipes.get(stack.pop(), []):
+                if sr.child_recipe_id in self.recipes and sr.child_recipe_id not in found:
+                    found.add(sr.child_recipe_id)
+                    stack.append(sr.child_recipe_id)
+        return found
+
+    def ingredient_ids(self, recipe_id: int, _visiting: Optional[set] = None) -> frozenset[int]:
+        """Every ingredient id used by a recipe, including via nested sub-recipes."""
+        if recipe_id in self._ingredient_ids_memo:
+            return self._ingredient_ids_memo[recipe_id]
+        visiting = _visiting if _visiting is not None else set()
+        if recipe_id in visiting:
+            return frozenset()
+        visiting.add(recipe_id)
+
+        ids = {ri.ingredient_id for ri in self.ingredients.get(recipe_id, [])}
+        for sr in self.sub_recipes.get(recipe_id, []):
+            ids |= self.ingredient_ids(sr.child_recipe_id, visiting)
+
+        visiting.discard(recipe_id)
+        self._ingredient_ids_memo[recipe_id] = frozenset(ids)
+        return self._ingredient_ids_memo[recipe_id]
+
+    def ingredient_usage(self, recipe_id: int, _visiting: Optional[set] = None) -> dict[str, float]:
+        """Ingredient name (lowercase) -> yield-adjusted qty in standard units for one batch,
+        expanding sub-recipes."""
+        if recipe_id in self._usage_memo:
+            return self._usage_memo[recipe_id]
+        visiting = _visiting if _visiting is not None else set()
+        if recipe_id in visiting:
+            return {}
+        visiting.add(recipe_id)
+
+        usage: dict[str, float] = {}
+        for ri in self.ingredients.get(recipe_id, []):
+            if ri.ingredient and ri.quantity:
+                display_unit = ri.unit or ri.ingredient.standard_unit
+                qty_std = convert_unit(float(ri.quantity), display_unit, ri.ingredient.standard_unit)
+                yld = float(ri.yield_percent) if ri.yield_percent else 100.0
+                qty_effective = qty_std / (yld / 100) if yld > 0 else qty_std
+                key = ri.ingredient.name.lower()
+                usage[key] = usage.get(key, 0) + qty_effective
+
+        for sr in self.sub_recipes.get(recipe_id, []):
+            child = self.recipes.get(sr.child_recipe_id)
+            if not child:
+                continue
+            child_output = get_output_qty(child)
+            if not child_output:
+                continue
+            needed = float(sr.portions_needed) if sr.portions_needed else 0
+            if not needed:
+                continue
+            # Convert portions_needed unit to child output unit if needed (bulk sub-recipes)
+            child_output_unit = get_output_unit(child).lower().strip()
+            needed_unit = (sr.portions_needed_unit or child_output_unit).lower().strip()
+            if needed_unit != child_output_unit and child.batch_output_type == "bulk":
+                needed = convert_unit(needed, needed_unit, child_output_unit)
+            sub_scale = needed / child_output
+            for k, v in self.ingredient_usage(child.id, visiting).items():
+                usage[k] = usage.get(k, 0) + v * sub_scale
+
+        visiting.discard(recipe_id)
+        self._usage_memo[recipe_id] = usage
+        return usage
+
+    # ── Costing ──────────────────────────────────────────────────────────
+
+    def _cost_in_order(self, recipe_ids: set[int]) -> None:
+        """Cost the given recipes children-first, so each parent only reads memoised children."""
+        for rid in self.topological_order():
+            if rid in recipe_ids and rid not in self._cost_memo:
+                self._cost_memo[rid] = self._cost_node(rid, None)
+
+    def cost_all(self) -> dict[int, dict]:
+        """Cost every loaded recipe once, children before parents."""
+        self._cost_in_order(self.recipes.keys())
+        return {rid: self._cost_memo[rid] for rid in self.topological_order()}
+
+    def cost(self, recipe_id: int, scale_to: Optional[float] = None) -> dict:
+        """Full cost breakdown for a recipe (same shape as the /costing endpoint)."""
+        if recipe_id not in self._cost_memo:
+            self._cost_in_order(self.descendants(recipe_id))
+        if scale_to:
+            return self._cost_node(recipe_id, scale_to)
+        return self._cost_memo.get(recipe_id, {})
+
+    def _cost_child(self, recipe_id: int) -> dict:
+        child_cost = self._cost_memo.get(recipe_id)
+        if child_cost is None:
+            # Only a cycle (which the API prevents) leaves a child uncosted here
+            logger.warning(f"Recipe cost engine: sub-recipe cycle at recipe {recipe_id}, costing as empty")
+            return {}
+        return child_cost
+
+    def _cost_node(self, recipe_id: int, scale_to: Optional[float]) -> dict:
+        recipe = self.recipes.get(recipe_id)
+        if not recipe:
+            return {}
+
+        output_qty = get_output_qty(recipe)
+        output_unit = get_output_unit(recipe)
+        scale_factor = (scale_to / output_qty) if scale_to else 1.0
+
+        ingredient_costs = []
+        total_ing_cost = Decimal(0)
+        total_ing_cost_min = Decimal(0)
+        total_ing_cost_max = Decimal(0)
+
+        for ri in self.ingredients.get(recipe_id, []):
+            ing = ri.ingredient
+            if not ing:
+                continue
+
+            display_unit = ri.unit or ing.standard_unit
+            qty_display = float(ri.quantity) * scale_factor
+            # Convert to standard unit for cost calculation
+            qty_std = convert_unit(qty_display, display_unit, ing.standard_unit)
+            yld = float(ri.yield_percent) if ri.yield_percent else 100.0
+
+            # Get all source prices
+            source_prices = []
+            for src in (ing.sources or []):
+                if src.price_per_std_unit:
+                    source_prices.append({
+                        "supplier_id": src.supplier_id,
+                        "price_per_std_unit": float(src.price_per_std_unit),
+                        "latest_invoice_date": str(src.latest_invoice_date) if src.latest_invoice_date else None,
+                    })
+
+            # Effective prices
+            recent_price = None
+            min_price = None
+            max_price = None
+            if source_prices:
+                prices = [sp["price_per_std_unit"] for sp in source_prices]
+                min_price = min(prices)
+                max_price = max(prices)
+                recent_price = source_prices[0]["price_per_std_unit"]
+                # Find most recent by date
+                dated = [(sp.get("latest_invoice_date", ""), sp["price_per_std_unit"]) for sp in source_prices]
+                dated.sort(reverse=True)
+                if dated:
+                    recent_price = dated[0][1]
+            elif ing.manual_price:
+                recent_price = min_price = max_price = float(ing.manual_price)
+
+            ing_is_free = getattr(ing, 'is_free', False)
+            is_manual_price = (not source_prices and ing.manual_price is not None) if not ing_is_free else False
+            has_no_price = (recent_price is None) if not ing_is_free else False
+
+            # Apply yield adjustment
+            if recent_price and yld > 0:
+                recent_eff = recent_price / (yld / 100)
+            else:
+                recent_eff = recent_price
+            if min_price and yld > 0:
+                min_eff = min_price / (yld / 100)
+            else:
+                min_eff = min_price
+            if max_price and yld > 0:
+                max_eff = max_price / (yld / 100)
+            else:
+                max_eff = max_price
+
+            # Cost is calculated in standard units
+            cost_recent = round(qty_std * recent_eff, 4) if recent_eff else None
+            cost_min = round(qty_std * min_eff, 4) if min_eff else None
+            cost_max = round(qty_std * max_eff, 4) if max_eff else None
+
+            if cost_recent:
+                total_ing_cost += Decimal(str(cost_recent))
+            if cost_min:
+                total_ing_cost_min += Decimal(str(cost_min))
+            if cost_max:
+                total_ing_cost_max += Decimal(str(cost_max))
+
+            ingredient_costs.append({
+                "ingredient_id": ing.id,
+                "ingredient_name": ing.name,
+                "quantity": qty_display,
+                "unit": display_unit,
+                "yield_percent": yld,
+                "recent_price": round(recent_eff, 6) if recent_eff else None,
+                "min_price": round(min_eff, 6) if min_eff else None,
+                "max_price": round(max_eff, 6) if max_eff else None,
+                "cost_recent": cost_recent,
+                "cost_min": cost_min,
+                "cost_max": cost_max,
+                "sources": source_prices,
+                "is_manual_price": is_manual_price,
+                "has_no_price": has_no_price,
+            })
+
+        # Sub-recipe costs (children are costed once and memoised)
+        sub_recipe_costs = []
+        total_sub_cost = Decimal(0)
+        total_sub_cost_min = Decimal(0)
+        total_sub_cost_max = Decimal(0)
+
+        for sr in self.sub_recipes.get(recipe_id, []):
+            child = self.recipes.get(sr.child_recipe_id)
+            if not child:
+                continue
+            child_cost_data = self._cost_child(child.id)
+            child_total = Decimal(str(child_cost_data.get("total_cost_recent", 0) or 0))
+            child_total_min = Decimal(str(child_cost_data.get("total_cost_min", 0) or 0))
+            child_total_max = Decimal(str(child_cost_data.get("total_cost_max", 0) or 0))
+            child_output_qty = get_output_qty(child)
+            child_output_unit = get_output_unit(child)
+            # Convert portions_needed to child output unit if different unit was used
+            needed_unit = sr.portions_needed_unit or child_output_unit
+            portions_needed_raw = float(sr.portions_needed) * scale_factor
+            portions_needed = convert_unit(portions_needed_raw, needed_unit, child_output_unit)
+            scale_ratio = portions_needed / child_output_qty if child_output_qty else 0
+            cost_contribution = float(child_total) * scale_ratio if child_total else None
+            cost_contribution_min = float(child_total_min) * scale_ratio if child_total_min else None
+            cost_contribution_max = float(child_total_max) * scale_ratio if child_total_max else None
+
+            if cost_contribution:
+                total_sub_cost += Decimal(str(cost_contribution))
+            if cost_contribution_min:
+                total_sub_cost_min += Decimal(str(cost_contribution_min))
+            if cost_contribution_max:
+                total_sub_cost_max += Decimal(str(cost_contribution_max))
+
+            # Scale child ingredients by portions_needed / child_output_qty
+            # Include both direct ingredients AND ingredients from the child's own sub-recipes
+            child_scale = portions_needed / child_output_qty if child_output_qty else 1
+            child_ingredients = []
+            for ci in child_cost_data.get("ingredients", []):
+                child_ingredients.append({
+                    "ingredient_id": ci["ingredient_id"],
+                    "ingredient_name": ci["ingredient_name"],
+                    "quantity": round(ci["quantity"] * child_scale, 4),
+                    "unit": ci["unit"],
+                    "yield_percent": ci["yield_percent"],
+                    "cost_recent": round(ci["cost_recent"] * child_scale, 4) if ci.get("cost_recent") else None,
+                    "cost_min": round(ci["cost_min"] * child_scale, 4) if ci.get("cost_min") else None,
+                    "cost_max": round(ci["cost_max"] * child_scale, 4) if ci.get("cost_max") else None,
+                    "is_manual_price": ci.get("is_manual_price", False),
+                    "has_no_price": ci.get("has_no_price", False),
+                })
+            # Build hierarchical child_sub_recipes from the child's own sub-recipes
+            child_sub_recipes = scale_child_sub_recipes(
+                child_cost_data.get("sub_recipes", []), child_scale
+            )
+
+            sub_recipe_costs.append({
+                "child_recipe_id": child.id,
+                "child_recipe_name": child.name,
+                "batch_portions": child.batch_portions,
+                "batch_output_type": child.batch_output_type or "portions",
+                "output_qty": child_output_qty,
+                "output_unit": child_output_unit,
+                "portions_needed": portions_needed,
+                "cost_per_portion": float(child_total) / child_output_qty if child_total and child_output_qty else None,
+                "cost_contribution": round(cost_contribution, 4) if cost_contribution else None,
+                "child_ingredients": child_ingredients,
+                "child_sub_recipes": child_sub_recipes,
+            })
+
+        total_cost = float(total_ing_cost + total_sub_cost)
+        total_cost_min = float(total_ing_cost_min + total_sub_cost_min)
+        total_cost_max = float(total_ing_cost_max + total_sub_cost_max)
+        effective_output = scale_to if scale_to else output_qty
+        cost_per_portion = total_cost / effective_output if effective_output and total_cost else None
+
+        # GP calculator for dishes (gross prices incl. 20% VAT)
+        gp_comparison = None
+        if recipe.recipe_type == "dish" and cost_per_portion:
+            vat_rate = 1.20
+            gp_comparison = [
+                {"gp_target": pct, "suggested_price": round(cost_per_portion / (1 - pct / 100) * vat_rate, 2)}
+                for pct in [60, 65, 70, 75, 80]
+            ]
+
+        return {
+            "recipe_id": recipe.id,
+            "batch_portions": recipe.batch_portions or 1,
+            "batch_output_type": recipe.batch_output_type or "portions",
+            "output_qty": effective_output,
+            "output_unit": output_unit,
+            "ingredients": ingredient_costs,
+            "sub_recipes": sub_recipe_costs,
+            "total_cost_recent": round(total_cost, 4) if total_cost else None,
+            "total_cost_min": round(total_cost_min, 4) if total_cost_min else None,
+            "total_cost_max": round(total_cost_max, 4) if total_cost_max else None,
+            "cost_per_portion": round(cost_per_portion, 4) if cost_per_portion else None,
+            "gp_comparison": gp_comparison,
+        }
+
+
+# ── Dependency lookups ───────────────────────────────────────────────────────
+
+async def recipes_using_ingredients(db: AsyncSession, ingredient_ids: Iterable[int]) -> dict[int, set[int]]:
+    """
+    Ingredient id -> every recipe that uses it, directly or through any depth of
+    sub-recipes. One recursive query over recipe_ingredients / recipe_sub_recipes
+    (both indexed on the lookup side), so it is always in step with recipe edits.
+    """
+    ids = list(ingredient_ids)
+    if not ids:
+        return {}
+
+    affected = (
+        select(RecipeIngredient.ingredient_id, RecipeIngredient.recipe_id)
+        .where(RecipeIngredient.ingredient_id.in_(ids))
+        .cte("affected", recursive=True)
+    )
+    affected = affected.union(
+        select(affected.c.ingredient_id, RecipeSubRecipe.parent_recipe_id)
+        .join(RecipeSubRecipe, RecipeSubRecipe.child_recipe_id == affected.c.recipe_id)
+    )
+    result = await db.execute(select(affected.c.ingredient_id, affected.c.recipe_id))
+
+    usage: dict[int, set[int]] = defaultdict(set)
+    for ingredient_id, recipe_id in result.all():
+        usage[ingredient_id].add(recipe_id)
+    return dict(usage)
+
+
+async def recipe_ancestors(db: AsyncSession, recipe_id: int) -> set[int]:
+    """Every recipe that includes recipe_id as a sub-recipe, at any depth."""
+    ancestors = (
+        select(RecipeSubRecipe.parent_recipe_id.label("recipe_id"))
+        .where(RecipeSubRecipe.child_recipe_id == recipe_id)
+        .cte("ancestors", recursive=True)
+    )
+    ancestors = ancestors.union(
+        select(RecipeSubRecipe.parent_recipe_id)
+        .join(ancestors, RecipeSubRecipe.child_recipe_id == ancestors.c.recipe_id)
+    )
+    result = await db.execute(select(ancestors.c.recipe_id))
+    return set(result.scalars().all()) - {recipe_id}
+
+
+# ── Snapshot writes ──────────────────────────────────────────────────────────
+
+async def write_cost_snapshots(
+    db: AsyncSession,
+    engine: RecipeCostEngine,
+    recipe_ids: Iterable[int],
+    trigger_source: str,
+) -> int:
+    """
+    Cost recipe_ids with the (already loaded) engine and upsert today's
+    RecipeCostSnapshot rows in a single statement (one snapshot per recipe per
+    day). Recipes without a cost are skipped. Returns the number of rows written.
+    """
+    today = date.today()
+    now = datetime.utcnow()
+    costs = engine.cost_all()
+    rows = []
+    for rid in recipe_ids:
+        cost_data = costs.get(rid, {})
+        total_cost = cost_data.get("total_cost_recent")
+        cost_per_portion = cost_data.get("cost_per_portion")
+        if total_cost is None or cost_per_portion is None:
+            continue
+        rows.append({
+            "recipe_id": rid,
+            "cost_per_portion": Decimal(str(cost_per_portion)),
+            "total_cost": Decimal(str(total_cost)),
+            "snapshot_date": today,
+            "trigger_source": trigger_source,
+            "created_at": now,
+        })
+    if not rows:
+        return 0
+
+    stmt = pg_insert(RecipeCostSnapshot).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["recipe_id", "snapshot_date"],
+        set_={
+            "cost_per_portion": stmt.excluded.cost_per_portion,
+            "total_cost": stmt.excluded.total_cost,
+            "trigger_source": stmt.excluded.trigger_source,
+        },
+    )
+    await db.execute(stmt)
+    return len(rows)
+
+
+async def touch_recipes(db: AsyncSession, recipe_ids: Iterable[int]) -> None:
+    """Bump updated_at so menu staleness detection picks up content/price changes."""
+    ids = list(recipe_ids)
+    if ids:
+        await db.execute(
+            update(Recipe).where(Recipe.id.in_(ids)).values(updated_at=datetime.utcnow())
+        )
+
+
+async def write_change_logs(db: AsyncSession, entries: list[dict]) -> None:
+    """Bulk insert RecipeChangeLog rows (dicts of recipe_id, change_summary, user_id, source_invoice_id)."""
+    if entries:
+        await db.execute(insert(RecipeChangeLog), entries)
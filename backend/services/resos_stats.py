@@ -14,6 +14,7 @@ from sqlalchemy import select, and_, or_, func
 from models.resos import ResosBooking, ResosOpeningHour
 from models.settings import KitchenSettings
 from services.sambapos_api import SambaPOSClient
+from services.sambapos_facts import SambaPOSFactStore, get_sales_source
 
 logger = logging.getLogger(__name__)
 
@@ -32,20 +33,14 @@ class ResosStatsService:
         )
         return result.scalar_one()
 
-    async def _get_sambapos_client(self, settings: KitchenSettings) -> Optional[SambaPOSClient]:
-        """Create SambaPOS client if configured."""
+    async def _get_sambapos_client(self, settings: KitchenSettings) -> Optional[SambaPOSClient | SambaPOSFactStore]:
+        """SambaPOS sales source if configured (local order facts when synced, else live)."""
         if not all([settings.sambapos_db_host, settings.sambapos_db_name,
                    settings.sambapos_db_username, settings.sambapos_db_password]):
             logger.warning("SambaPOS not configured, skipping spend analysis")
             return None
 
-        return SambaPOSClient(
-            host=settings.sambapos_db_host,
-            port=settings.sambapos_db_port or 1433,
-            database=settings.sambapos_db_name,
-            username=settings.sambapos_db_username,
-            password=settings.sambapos_db_password
-        )
+        return await get_sales_source(self.db, settings)
 
     def _parse_gl_codes(self, gl_code_str: Optional[str]) -> list[str]:
         """Parse comma-separated GL codes from settings."""
@@ -1,21 +1,126 @@
 """
 SambaPOS MSSQL Database Client
 
-Connects to SambaPOS EPOS database to fetch menu categories and top sellers data.
+Connects to SambaPOS EPOS database to fetch menu items and sales data.
 """
+import json
 import logging
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Optional
 import aioodbc
 
+from services.sambapos_pool import sambapos_pools
+
 logger = logging.getLogger(__name__)
 
+# Order states that exclude an order from sales figures (matched as in OrderStates JSON)
+VOID_ORDER_STATES = ('"S":"Void"', '"S":"Canceled"')
+
+
+def parse_custom_tags(custom_tags: Optional[str]) -> dict[str, str]:
+    """
+    Parse a SambaPOS CustomTags / TicketTags value into {tag name: tag value}.
+
+    Format: [{"TN":"Kitchen Course","TV":"Starters"},{"TN":"NewBook GLA","TV":"3101"}]
+    The first value wins when a tag name repeats, matching the CHARINDEX parsing
+    used in the T-SQL queries.
+    """
+    if not custom_tags:
+        return {}
+    try:
+        tags = json.loads(custom_tags)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    result: dict[str, str] = {}
+    for tag in tags if isinstance(tags, list) else []:
+        if isinstance(tag, dict) and tag.get("TN") and tag["TN"] not in result:
+            result[tag["TN"]] = str(tag.get("TV") or "")
+    return result
+
+
+def is_voided_order(order_states: Optional[str]) -> bool:
+    """True if an order's OrderStates marks it Void or Canceled."""
+    return bool(order_states) and any(state in order_states for state in VOID_ORDER_STATES)
+
+
+def build_restaurant_spend_ticket(
+    ticket_id: int,
+    ticket_date,
+    closed_time: Optional[datetime],
+    practical_datetime: Optional[datetime],
+    ticket_tags: Optional[str],
+    table_name: Optional[str],
+    room_entity: Optional[str],
+    food_total: Decimal,
+    beverage_total: Decimal,
+    main_course_count: int,
+) -> dict:
+    """
+    Shape one ticket for the restaurant spend report (shared by the live query
+    and the local order fact table).
+
+    practical_datetime is the average food order time, which handles the
+    pre-dinner drinks scenario (bar tab opened before the booking time).
+    """
+    # Calculate practical ticket time from average food order timestamps
+    ticket_time = None
+    if practical_datetime:
+        ticket_time = practical_datetime.time()
+    elif closed_time:
+        # Fallback to ticket closed time if no food orders
+        ticket_time = closed_time.time()
+
+    # Extract booking ID from ticket tags
+    # Tag format: "BOOKING_ID - Guest Name" or similar
+    booking_id = None
+    # Placeholder for future implementation:
+    # if " - " in ticket_tags:
+    #     booking_id = ticket_tags.split(" - ")[0].strip()
+
+    # Parse "Covers" from ticket tags (JSON array format)
+    # Tags format: [{"TN":"Tag Name","TV":"Tag Value"}, ...]
+    covers = 0
+    if ticket_tags:
+        try:
+            covers = int(parse_custom_tags(ticket_tags).get("Covers") or 0)
+        except ValueError:
+            pass
+
+    # Fallback to main course count if covers tag is 0 or not found
+    if covers == 0 and main_course_count > 0:
+        covers = main_course_count
+
+    return {
+        "ticket_id": ticket_id,
+        "ticket_date": ticket_date,
+        "ticket_time": ticket_time,  # Practical time from avg food orders
+        "ticket_closed_time": closed_time,  # Actual closed time
+        "table_name": table_name,
+        "room_entity": room_entity,
+        "has_room_entity": bool(room_entity),
+        "ticket_tag": ticket_tags if ticket_tags else None,
+        "booking_id": booking_id,
+        "food_total": food_total,
+        "beverage_total": beverage_total,
+        "total_spend": food_total + beverage_total,
+        "estimated_covers": covers,  # Estimated covers from tags or main course count
+        "main_course_count": main_course_count  # For debugging/validation
+    }
+
 
 class SambaPOSClient:
     """Client for querying SambaPOS MSSQL database."""
 
-    def __init__(self, host: str, port: int, database: str, username: str, password: str):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        database: str,
+        username: str,
+        password: str,
+        kitchen_id: Optional[int] = None,
+    ):
         """
         Initialize SambaPOS client with connection parameters.
 
@@ -25,7 +130,9 @@ class SambaPOSClient:
             database: Database name (e.g., 'clean')
             username: SQL Server username
             password: SQL Server password
+            kitchen_id: Kitchen whose shared connection pool to use (see services/sambapos_pool.py)
         """
+        self.kitchen_id = kitchen_id
         self.host = host
         self.port = port
         self.database = database
@@ -61,6 +168,22 @@ class SambaPOSClient:
         # Log connection details (without password)
         logger.info(f"SambaPOS connection configured: host={host}, database={database}, user={username}")
 
+    @classmethod
+    def from_settings(cls, settings) -> "SambaPOSClient":
+        """Build a client from a kitchen's KitchenSettings row."""
+        return cls(
+            host=settings.sambapos_db_host,
+            port=settings.sambapos_db_port or 1433,
+            database=settings.sambapos_db_name,
+            username=settings.sambapos_db_username,
+            password=settings.sambapos_db_password,
+            kitchen_id=settings.kitchen_id
+        )
+
+    def _connection(self):
+        """Borrow a connection from the kitchen's shared pool."""
+        return sambapos_pools.connection(self.connection_string, self.kitchen_id)
+
     async def test_connection(self) -> dict:
         """
         Test database connectivity.
@@ -78,65 +201,13 @@ class SambaPOSClient:
             logger.error(f"SambaPOS connection test failed: {e}")
             return {"success": False, "message": str(e)}
 
-    async def get_categories(self) -> list[dict]:
-        """
-        Fetch all unique values from the 'Kitchen Course' product tag.
-
-        Returns:
-            List of dicts with 'id' and 'name' for each Kitchen Course value
-        """
-        # Query to get unique Kitchen Course tag values from MenuItems.CustomTags JSON
-        # CustomTags format: [{"TN":"Kitchen Course","TV":"Starters"},{"TN":"Kitchen Print","TV":"Y"}]
-        # Using CROSS APPLY to safely calculate positions before SUBSTRING
-        query = """
-            SELECT DISTINCT
-                ROW_NUMBER() OVER (ORDER BY KitchenCourse) as Id,
-                KitchenCourse as Name
-            FROM (
-                SELECT DISTINCT
-                    CASE
-                        WHEN tv.tv_start > 0 AND pos.tv_end > tv.tv_start
-                        THEN SUBSTRING(CustomTags, tv.tv_start, pos.tv_end - tv.tv_start)
-                        ELSE NULL
-                    END as KitchenCourse
-                FROM MenuItems
-                CROSS APPLY (
-                    SELECT CHARINDEX('"TN":"Kitchen Course"', CustomTags) as tn_pos
-                ) tn
-                CROSS APPLY (
-                    SELECT CASE WHEN tn.tn_pos > 0
-                                THEN CHARINDEX('"TV":"', CustomTags, tn.tn_pos) + 6
-                                ELSE 0 END as tv_start
-                ) tv
-                CROSS APPLY (
-                    SELECT CASE WHEN tv.tv_start > 6
-                                THEN CHARINDEX('"', CustomTags, tv.tv_start)
-                                ELSE 0 END as tv_end
-                ) pos
-                WHERE CustomTags LIKE '%"TN":"Kitchen Course"%'
-            ) sub
-            WHERE KitchenCourse IS NOT NULL AND KitchenCourse != ''
-            ORDER BY KitchenCourse
-        """
-        try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(query)
-                    rows = await cursor.fetchall()
-                    result = [{"id": int(row[0]), "name": row[1].strip()} for row in rows]
-                    logger.info(f"Found {len(result)} Kitchen Course categories: {[r['name'] for r in result]}")
-                    return result
-        except Exception as e:
-            logger.error(f"Failed to fetch SambaPOS Kitchen Course categories: {e}")
-            raise
-
     async def debug_menu_items(self) -> dict:
         """
         Debug method to explore MenuItems table structure and sample data.
         Returns column names and sample CustomTags values.
         """
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
                     # Get column names from MenuItems table
                     await cursor.execute("""
@@ -181,7 +252,7 @@ class SambaPOSClient:
         Used to identify correct column names for SQL queries.
         """
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
                     result = {}
 
@@ -203,35 +274,6 @@ class SambaPOSClient:
             logger.error(f"Debug table schema failed: {e}")
             raise
 
-    async def get_product_tag_groups(self) -> list[dict]:
-        """
-        Discover available product tag groups from the CustomTags field.
-
-        Returns:
-            List of unique tag group names found in CustomTags
-        """
-        query = """
-            SELECT DISTINCT
-                CASE
-                    WHEN CHARINDEX(':', value) > 0
-                    THEN LTRIM(RTRIM(LEFT(value, CHARINDEX(':', value) - 1)))
-                    ELSE NULL
-                END as TagGroup
-            FROM MenuItems
-            CROSS APPLY STRING_SPLIT(CustomTags, ',')
-            WHERE CustomTags IS NOT NULL AND CustomTags != ''
-            ORDER BY TagGroup
-        """
-        try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(query)
-                    rows = await cursor.fetchall()
-                    return [{"name": row[0]} for row in rows if row[0]]
-        except Exception as e:
-            logger.error(f"Failed to fetch SambaPOS tag groups: {e}")
-            raise
-
     async def get_top_sellers(
         self,
         from_date: date,
@@ -322,7 +364,7 @@ class SambaPOSClient:
         params = [from_date.isoformat(), to_date.isoformat()] + exclusion_params + categories
 
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute(query, params)
                     rows = await cursor.fetchall()
@@ -435,7 +477,7 @@ class SambaPOSClient:
         params = [from_date.isoformat(), to_date.isoformat()] + exclusion_params + categories
 
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute(query, params)
                     rows = await cursor.fetchall()
@@ -458,70 +500,26 @@ class SambaPOSClient:
             logger.error(f"Failed to fetch SambaPOS top sellers by revenue: {e}")
             raise
 
-    async def get_menu_items_with_portions(
-        self,
-        categories: list[str] | None = None
-    ) -> list[dict]:
+    async def get_menu_dimension(self) -> list[dict]:
         """
-        Fetch all menu items with their portion names, filtered by Kitchen Course categories.
-
-        Joins MenuItems → MenuItemPortions to get portion-level detail.
-        Used for the SambaPOS item picker in the DishEditor.
-
-        Args:
-            categories: Optional list of Kitchen Course values to filter by
+        Fetch every menu item with its raw CustomTags, portion names and whether it
+        appears on a POS screen menu. Tags are parsed by the caller
+        (services/sambapos_menu_cache.py) rather than with string functions here.
 
         Returns:
-            List of dicts with menu_item_name, portion_name, category
-        """
-        # Build optional category filter
-        cat_filter = ""
-        params = []
-        if categories:
-            cat_placeholders = ','.join(['?' for _ in categories])
-            cat_filter = f"WHERE KitchenCourse IN ({cat_placeholders})"
-            params = categories
-
-        query = f"""
-            SELECT
-                MenuItemName,
-                PortionName,
-                KitchenCourse,
-                MenuItemId
-            FROM (
-                SELECT
-                    mi.Name AS MenuItemName,
-                    mip.Name AS PortionName,
-                    mi.Id AS MenuItemId,
-                    CASE
-                        WHEN tv.tv_start > 0 AND pos.tv_end > tv.tv_start
-                        THEN SUBSTRING(mi.CustomTags, tv.tv_start, pos.tv_end - tv.tv_start)
-                        ELSE NULL
-                    END as KitchenCourse
-                FROM MenuItems mi
-                JOIN MenuItemPortions mip ON mip.MenuItemId = mi.Id
-                CROSS APPLY (
-                    SELECT CHARINDEX('"TN":"Kitchen Course"', mi.CustomTags) as tn_pos
-                ) tn
-                CROSS APPLY (
-                    SELECT CASE WHEN tn.tn_pos > 0
-                                THEN CHARINDEX('"TV":"', mi.CustomTags, tn.tn_pos) + 6
-                                ELSE 0 END as tv_start
-                ) tv
-                CROSS APPLY (
-                    SELECT CASE WHEN tv.tv_start > 6
-                                THEN CHARINDEX('"', mi.CustomTags, tv.tv_start)
-                                ELSE 0 END as tv_end
-                ) pos
-                WHERE mi.CustomTags LIKE '%"TN":"Kitchen Course"%'
-            ) sub
-            {cat_filter}
-            ORDER BY KitchenCourse, MenuItemName, PortionName
+            List of dicts with menu_item_id, name, group_code, custom_tags, portions, on_pos_menu
         """
-
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT Id, Name, GroupCode, CustomTags FROM MenuItems")
+                    item_rows = await cursor.fetchall()
+
+                    await cursor.execute("SELECT MenuItemId, Name FROM MenuItemPortions ORDER BY MenuItemId, Id")
+                    portions: dict[int, list[str]] = {}
+                    for row in await cursor.fetchall():
+                        portions.setdefault(row[0], []).append(row[1])
+
                     # Get menu item IDs that appear on a POS screen menu
                     pos_menu_item_ids: set[int] = set()
                     try:
@@ -532,28 +530,25 @@ class SambaPOSClient:
                             JOIN ScreenMenus sm ON sm.Id = smc.ScreenMenuId
                         """)
                         pos_menu_item_ids = {row[0] for row in await cursor.fetchall()}
-                        logger.info(f"SambaPOS screen menu items: {len(pos_menu_item_ids)} mapped to POS")
                     except Exception as e:
                         logger.warning(f"Could not query ScreenMenuItems (table may not exist): {e}")
 
-                    await cursor.execute(query, params)
-                    rows = await cursor.fetchall()
-
-                    results = []
-                    for row in rows:
-                        if row[0] and row[2]:  # must have name and category
-                            results.append({
-                                "menu_item_name": row[0],
-                                "portion_name": row[1] or "Normal",
-                                "category": row[2],
-                                "on_pos_menu": row[3] in pos_menu_item_ids
-                            })
-
-                    logger.info(f"SambaPOS menu items with portions: {len(results)} items")
+                    results = [
+                        {
+                            "menu_item_id": row[0],
+                            "name": row[1],
+                            "group_code": row[2],
+                            "custom_tags": row[3],
+                            "portions": portions.get(row[0], []),
+                            "on_pos_menu": row[0] in pos_menu_item_ids,
+                        }
+                        for row in item_rows
+                    ]
+                    logger.info(f"SambaPOS menu dimension: fetched {len(results)} menu items")
                     return results
 
         except Exception as e:
-            logger.error(f"Failed to fetch SambaPOS menu items with portions: {e}")
+            logger.error(f"Failed to fetch SambaPOS menu dimension: {e}")
             raise
 
     async def get_sales_breakdown(
@@ -639,7 +634,7 @@ class SambaPOSClient:
         params = [from_date.isoformat(), to_date.isoformat()] + exclusion_params + categories
 
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
                     await cursor.execute(query, params)
                     rows = await cursor.fetchall()
@@ -661,83 +656,114 @@ class SambaPOSClient:
             logger.error(f"Failed to fetch SambaPOS sales breakdown: {e}")
             raise
 
-    async def get_menu_group_codes(self) -> list[dict]:
+    async def get_changed_tickets(
+        self,
+        after_time: datetime,
+        after_id: int,
+        limit: int = 500
+    ) -> list[dict]:
         """
-        Fetch all distinct GroupCode values from MenuItems table.
-
-        GroupCode is used for categorizing menu items (e.g., 'Drinks', 'Extras').
-        Used for excluding entire groups from top sellers reports.
+        Fetch tickets changed since a (LastUpdateTime, Id) keyset position.
 
-        Returns:
-            List of dicts with 'name' for each group code
+        Used by the incremental order fact sync; results are ordered so the last
+        row's (last_update, ticket_id) is the next call's position.
         """
         query = """
-            SELECT DISTINCT GroupCode
-            FROM MenuItems
-            WHERE GroupCode IS NOT NULL AND GroupCode != ''
-            ORDER BY GroupCode
+            SELECT TOP (?)
+                t.Id,
+                t.Date,
+                t.LastUpdateTime,
+                t.IsClosed,
+                t.TicketTags,
+                (
+                    SELECT TOP 1 EntityName
+                    FROM TicketEntities te
+                    WHERE te.Ticket_Id = t.Id
+                    AND te.EntityTypeId = 2
+                ) as TableName,
+                (
+                    SELECT TOP 1 EntityName
+                    FROM TicketEntities te
+                    WHERE te.Ticket_Id = t.Id
+                    AND te.EntityTypeId = 3
+                ) as RoomEntity
+            FROM Tickets t
+            WHERE t.LastUpdateTime > ?
+               OR (t.LastUpdateTime = ? AND t.Id > ?)
+            ORDER BY t.LastUpdateTime, t.Id
         """
+
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute(query)
+                    await cursor.execute(query, [limit, after_time, after_time, after_id])
                     rows = await cursor.fetchall()
-                    result = [{"name": row[0].strip()} for row in rows]
-                    logger.info(f"Found {len(result)} MenuItems GroupCodes: {[r['name'] for r in result]}")
-                    return result
+                    return [
+                        {
+                            "ticket_id": row[0],
+                            "ticket_date": row[1],
+                            "last_update": row[2],
+                            "is_closed": bool(row[3]),
+                            "ticket_tags": row[4],
+                            "table_name": row[5],
+                            "room_entity": row[6],
+                        }
+                        for row in rows
+                    ]
         except Exception as e:
-            logger.error(f"Failed to fetch MenuItems GroupCodes: {e}")
+            logger.error(f"Failed to fetch changed SambaPOS tickets: {e}")
             raise
 
-    async def get_gl_codes(self) -> list[dict]:
+    async def get_ticket_orders(self, ticket_ids: list[int]) -> list[dict]:
         """
-        Fetch all unique GL codes from NewBook GLA custom tags.
-
-        NewBook GLA format in CustomTags: [{"TN":"NewBook GLA","TV":"3101"},...]
-
-        Returns:
-            List of dicts with 'code' for each unique GL code (sorted)
+        Fetch every order line on the given tickets. Menu item attributes
+        (course, GL code, group code) come from the cached menu dimension.
         """
-        query = """
-            SELECT DISTINCT
-                GLACode
-            FROM (
+        if not ticket_ids:
+            return []
+
+        results = []
+        # Stay well under the 2100 parameter limit per statement
+        for start in range(0, len(ticket_ids), 1000):
+            chunk = ticket_ids[start:start + 1000]
+            placeholders = ','.join(['?' for _ in chunk])
+            query = f"""
                 SELECT
-                    CASE
-                        WHEN tv.tv_start > 0 AND pos.tv_end > tv.tv_start
-                        THEN SUBSTRING(CustomTags, tv.tv_start, pos.tv_end - tv.tv_start)
-                        ELSE NULL
-                    END as GLACode
-                FROM MenuItems
-                CROSS APPLY (
-                    SELECT CHARINDEX('"TN":"NewBook GLA"', CustomTags) as gla_pos
-                ) gla
-                CROSS APPLY (
-                    SELECT CASE WHEN gla.gla_pos > 0
-                                THEN CHARINDEX('"TV":"', CustomTags, gla.gla_pos) + 6
-                                ELSE 0 END as tv_start
-                ) tv
-                CROSS APPLY (
-                    SELECT CASE WHEN tv.tv_start > 6
-                                THEN CHARINDEX('"', CustomTags, tv.tv_start)
-                                ELSE 0 END as tv_end
-                ) pos
-                WHERE CustomTags LIKE '%"TN":"NewBook GLA"%'
-            ) sub
-            WHERE GLACode IS NOT NULL AND GLACode != ''
-            ORDER BY GLACode
-        """
-        try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(query)
-                    rows = await cursor.fetchall()
-                    result = [{"code": row[0].strip()} for row in rows if row[0] and row[0].strip()]
-                    logger.info(f"Found {len(result)} unique GL codes from ProductTag: {[r['code'] for r in result][:10]}...")
-                    return result
-        except Exception as e:
-            logger.error(f"Failed to fetch GL codes from ProductTag: {e}")
-            raise
+                    o.Id,
+                    o.TicketId,
+                    o.MenuItemId,
+                    o.MenuItemName,
+                    o.PortionName,
+                    o.Quantity,
+                    o.Price,
+                    o.OrderStates,
+                    o.CreatedDateTime
+                FROM Orders o
+                WHERE o.TicketId IN ({placeholders})
+            """
+            try:
+                async with self._connection() as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(query, chunk)
+                        rows = await cursor.fetchall()
+            except Exception as e:
+                logger.error(f"Failed to fetch SambaPOS ticket orders: {e}")
+                raise
+
+            for row in rows:
+                results.append({
+                    "order_id": row[0],
+                    "ticket_id": row[1],
+                    "menu_item_id": row[2],
+                    "menu_item_name": row[3],
+                    "portion_name": row[4],
+                    "quantity": Decimal(str(row[5])) if row[5] is not None else Decimal("0"),
+                    "price": Decimal(str(row[6])) if row[6] is not None else Decimal("0"),
+                    "order_states": row[7],
+                    "created": row[8],
+                })
+
+        return results
 
     async def get_restaurant_spend(
         self,
@@ -1043,7 +1069,7 @@ class SambaPOSClient:
         params.extend(tracked_categories)  # Main query Kitchen Course categories
 
         try:
-            async with aioodbc.connect(dsn=self.connection_string) as conn:
+            async with self._connection() as conn:
                 async with conn.cursor() as cursor:
                     # Log the query for debugging
                     logger.info(f"Executing restaurant spend query with {len(params)} parameters")
@@ -1054,72 +1080,26 @@ class SambaPOSClient:
 
                     results = []
                     for row in rows:
-                        ticket_id = row[0]
-                        ticket_date = row[1]
-                        closed_time = row[2]  # t.LastUpdateTime (DATETIME)
                         avg_food_time_float = row[3]  # AvgFoodOrderTime (FLOAT or None)
-                        ticket_tags = row[4] if row[4] else ""
-                        table_name = row[5]
-                        room_entity = row[6]  # Room entity name if customer selected their room
-                        food_total = Decimal(str(row[7])) if row[7] else Decimal("0")
-                        beverage_total = Decimal(str(row[8])) if row[8] else Decimal("0")
-                        main_course_count = int(row[9]) if row[9] else 0
-                        total_spend = food_total + beverage_total
-
-                        # Calculate practical ticket time from average food order timestamps
-                        # Handles pre-dinner drinks scenario (bar tab before booking time)
-                        ticket_time = None
+                        practical_datetime = None
                         if avg_food_time_float:
                             # SQL AVG(CAST(datetime AS FLOAT)) returns days since 1900-01-01
                             # Convert back to datetime
                             base_date = datetime(1900, 1, 1)
                             practical_datetime = base_date + timedelta(days=float(avg_food_time_float))
-                            ticket_time = practical_datetime.time()
-                        elif closed_time:
-                            # Fallback to ticket closed time if no food orders
-                            ticket_time = closed_time.time() if closed_time else None
-
-                        # Extract booking ID from ticket tags
-                        # Tag format: "BOOKING_ID - Guest Name" or similar
-                        booking_id = None
-                        # Placeholder for future implementation:
-                        # if " - " in ticket_tags:
-                        #     booking_id = ticket_tags.split(" - ")[0].strip()
-
-                        # Parse "Covers" from ticket tags (JSON array format)
-                        # Tags format: [{"TN":"Tag Name","TV":"Tag Value"}, ...]
-                        covers = 0
-                        if ticket_tags:
-                            import json
-                            try:
-                                tags_list = json.loads(ticket_tags)
-                                for tag in tags_list:
-                                    if tag.get('TN') == 'Covers':
-                                        covers = int(tag.get('TV', 0))
-                                        break
-                            except (json.JSONDecodeError, ValueError, KeyError):
-                                pass
-
-                        # Fallback to main course count if covers tag is 0 or not found
-                        if covers == 0 and main_course_count > 0:
-                            covers = main_course_count
 
-                        results.append({
-                            "ticket_id": ticket_id,
-                            "ticket_date": ticket_date,
-                            "ticket_time": ticket_time,  # Practical time from avg food orders
-                            "ticket_closed_time": closed_time,  # Actual closed time
-                            "table_name": table_name,
-                            "room_entity": room_entity,
-                            "has_room_entity": bool(room_entity),
-                            "ticket_tag": ticket_tags if ticket_tags else None,
-                            "booking_id": booking_id,
-                            "food_total": food_total,
-                            "beverage_total": beverage_total,
-                            "total_spend": total_spend,
-                            "estimated_covers": covers,  # Estimated covers from tags or main course count
-                            "main_course_count": main_course_count  # For debugging/validation
-                        })
+                        results.append(build_restaurant_spend_ticket(
+                            ticket_id=row[0],
+                            ticket_date=row[1],
+                            closed_time=row[2],  # t.LastUpdateTime (DATETIME)
+                            practical_datetime=practical_datetime,
+                            ticket_tags=row[4] if row[4] else "",
+                            table_name=row[5],
+                            room_entity=row[6],  # Room entity name if customer selected their room
+                            food_total=Decimal(str(row[7])) if row[7] else Decimal("0"),
+                            beverage_total=Decimal(str(row[8])) if row[8] else Decimal("0"),
+                            main_course_count=int(row[9]) if row[9] else 0,
+                        ))
 
                     logger.info(f"SambaPOS restaurant spend: fetched {len(results)} tickets with table entities")
                     return results
@@ -0,0 +1,445 @@
+"""
+SambaPOS Order Fact Table
+
+Keeps a local copy of SambaPOS order lines in Postgres (sambapos_order_facts)
+so sales reports don't re-run the CustomTags string parsing on the till server
+for every request.
+
+- SambaPOSFactsSyncService pulls tickets changed since the last run, keyed on
+  (Tickets.LastUpdateTime, Tickets.Id), and replaces their order lines. Kitchen
+  Course, NewBook GLA and GroupCode come from the parsed menu item dimension
+  (services/sambapos_menu_cache.py).
+- SambaPOSFactStore answers the report queries (top sellers, sales breakdown,
+  restaurant spend) from the local table with the same signatures and return
+  shapes as SambaPOSClient.
+- get_sales_source() picks the fact store when the kitchen's sync is current,
+  and falls back to the live SambaPOSClient otherwise.
+
+Spot-check the restaurant spend query against the till server for one day:
+    python -m services.sambapos_facts 3 2026-10-10
+"""
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, and_, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from models.settings import KitchenSettings
+from models.sambapos import SambaPOSOrderFact, SambaPOSSyncState
+from services.sambapos_api import SambaPOSClient, is_voided_order, build_restaurant_spend_ticket
+from services.sambapos_menu_cache import MenuDimension, sambapos_menu_cache
+
+logger = logging.getLogger(__name__)
+
+# Tickets fetched per round trip to the till server
+TICKET_BATCH_SIZE = 500
+# How far back the first sync for a kitchen reaches
+INITIAL_BACKFILL_DAYS = 400
+# Reports fall back to the live query if the last successful sync is older than this
+FACTS_MAX_AGE = timedelta(minutes=30)
+
+
+def sambapos_configured(settings: Optional[KitchenSettings]) -> bool:
+    return bool(settings) and all([
+        settings.sambapos_db_host,
+        settings.sambapos_db_name,
+        settings.sambapos_db_username,
+        settings.sambapos_db_password,
+    ])
+
+
+class SambaPOSFactsSyncService:
+    """Incremental sync of SambaPOS order lines into sambapos_order_facts."""
+
+    def __init__(self, db: AsyncSession, kitchen_id: int):
+        self.db = db
+        self.kitchen_id = kitchen_id
+
+    async def _get_state(self) -> SambaPOSSyncState:
+        result = await self.db.execute(
+            select(SambaPOSSyncState).where(SambaPOSSyncState.kitchen_id == self.kitchen_id)
+        )
+        state = result.scalar_one_or_none()
+        if not state:
+            state = SambaPOSSyncState(kitchen_id=self.kitchen_id, facts_watermark_ticket_id=0)
+            self.db.add(state)
+            await self.db.flush()
+        return state
+
+    def _fact_rows(self, tickets: list[dict], orders: list[dict], menu: MenuDimension) -> list[dict]:
+        """Build fact rows for closed tickets, taking menu item tags from the dimension."""
+        tickets_by_id = {t["ticket_id"]: t for t in tickets if t["is_closed"]}
+        now = datetime.utcnow()
+
+        rows = []
+        for order in orders:
+            ticket = tickets_by_id.get(order["ticket_id"])
+            if not ticket:
+                continue
+
+            item = menu.by_id.get(order["menu_item_id"]) or {}
+            rows.append({
+                "kitchen_id": self.kitchen_id,
+                "order_id": order["order_id"],
+                "ticket_id": order["ticket_id"],
+                "menu_item_id": order["menu_item_id"],
+                "ticket_date": ticket["ticket_date"],
+                "ticket_last_update": ticket["last_update"],
+                "ticket_tags": ticket["ticket_tags"] or None,
+                "table_name": ticket["table_name"],
+                "room_entity": ticket["room_entity"],
+                "menu_item_name": order["menu_item_name"],
+                "portion_name": order["portion_name"],
+                "quantity": order["quantity"],
+                "price": order["price"],
+                "order_created": order["created"],
+                "is_voided": is_voided_order(order["order_states"]),
+                "group_code": item.get("group_code"),
+                "kitchen_course": item.get("kitchen_course"),
+                "gl_code": item.get("gl_code"),
+                "synced_at": now,
+            })
+        return rows
+
+    async def _apply_batch(self, tickets: list[dict], orders: list[dict], menu: MenuDimension) -> int:
+        """Replace the facts for a batch of changed tickets. Returns rows written."""
+        ticket_ids = [t["ticket_id"] for t in tickets]
+
+        # Drops orders that were removed, and whole tickets that were reopened
+        await self.db.execute(
+            delete(SambaPOSOrderFact).where(
+                SambaPOSOrderFact.kitchen_id == self.kitchen_id,
+                SambaPOSOrderFact.ticket_id.in_(ticket_ids)
+            )
+        )
+
+        rows = self._fact_rows(tickets, orders, menu)
+        if rows:
+            # Upsert rather than insert: an order moved from a ticket outside this
+            # batch still has its old row until that ticket is synced
+            stmt = insert(SambaPOSOrderFact)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_sambapos_order_facts_kitchen_order",
+                set_={
+                    col: stmt.excluded[col]
+                    for col in rows[0]
+                    if col not in ("kitchen_id", "order_id")
+                }
+            )
+            await self.db.execute(stmt, rows)
+        return len(rows)
+
+    async def sync(self) -> dict:
+        """
+        Pull every ticket changed since the stored watermark.
+
+        Commits after each batch so a long backfill makes progress even if it
+        is interrupted. Returns {"tickets": n, "orders": n, "batches": n}.
+        """
+        result = await self.db.execute(
+            select(KitchenSettings).where(KitchenSettings.kitchen_id == self.kitchen_id)
+        )
+        settings = result.scalar_one_or_none()
+        if not sambapos_configured(settings):
+            raise ValueError("SambaPOS database credentials not configured")
+
+        client = SambaPOSClient.from_settings(settings)
+        state = await self._get_state()
+        watermark = state.facts_watermark or (datetime.now() - timedelta(days=INITIAL_BACKFILL_DAYS))
+        watermark_id = state.facts_watermark_ticket_id or 0
+
+        totals = {"tickets": 0, "orders": 0, "batches": 0}
+        try:
+            menu = await sambapos_menu_cache.get(self.db, settings)
+            menu_refreshed = False
+
+            while True:
+                tickets = await client.get_changed_tickets(watermark, watermark_id, TICKET_BATCH_SIZE)
+                if not tickets:
+                    break
+
+                orders = await client.get_ticket_orders([t["ticket_id"] for t in tickets])
+
+                # Items added since the menu was cached: refresh it (once per run)
+                if not menu_refreshed and any(
+                    o["menu_item_id"] is not None and o["menu_item_id"] not in menu.by_id for o in orders
+                ):
+                    menu = await sambapos_menu_cache.get(self.db, settings, force_refresh=True)
+                    menu_refreshed = True
+
+                totals["orders"] += await self._apply_batch(tickets, orders, menu)
+                totals["tickets"] += len(tickets)
+                totals["batches"] += 1
+
+                watermark = tickets[-1]["last_update"]
+                watermark_id = tickets[-1]["ticket_id"]
+                state.facts_watermark = watermark
+                state.facts_watermark_ticket_id = watermark_id
+                await self.db.commit()
+
+                if len(tickets) < TICKET_BATCH_SIZE:
+                    break
+        except Exception as e:
+            await self.db.rollback()
+            state = await self._get_state()
+            state.last_error = str(e)[:2000]
+            await self.db.commit()
+            raise
+
+        state.facts_synced_at = datetime.utcnow()
+        state.tickets_synced = totals["tickets"]
+        state.last_error = None
+        await self.db.commit()
+
+        logger.info(
+            f"SambaPOS facts sync for kitchen {self.kitchen_id}: "
+            f"{totals['tickets']} tickets, {totals['orders']} orders in {totals['batches']} batches"
+        )
+        return totals
+
+
+class SambaPOSFactStore:
+    """Report queries over sambapos_order_facts (same interface as SambaPOSClient)."""
+
+    def __init__(self, db: AsyncSession, kitchen_id: int):
+        self.db = db
+        self.kitchen_id = kitchen_id
+
+    def _sales_filters(
+        self,
+        from_date: date,
+        to_date: date,
+        categories: list[str],
+        excluded_categories: list[str] | None
+    ) -> list:
+        F = SambaPOSOrderFact
+        filters = [
+            F.kitchen_id == self.kitchen_id,
+            F.ticket_date >= from_date,
+            F.ticket_date < to_date + timedelta(days=1),
+            F.is_voided == False,
+            F.kitchen_course.in_(categories),
+        ]
+        if excluded_categories:
+            filters.append(or_(F.group_code.is_(None), F.group_code.notin_(excluded_categories)))
+        return filters
+
+    async def _top_sellers(
+        self,
+        from_date: date,
+        to_date: date,
+        categories: list[str],
+        limit: int,
+        excluded_categories: list[str] | None,
+        order_by_revenue: bool
+    ) -> dict[str, list[dict]]:
+        if not categories:
+            return {}
+
+        F = SambaPOSOrderFact
+        total_qty = func.sum(F.quantity).label("total_qty")
+        total_revenue = func.sum(F.price * F.quantity).label("total_revenue")
+        result = await self.db.execute(
+            select(F.kitchen_course, F.menu_item_name, total_qty, total_revenue)
+            .where(*self._sales_filters(from_date, to_date, categories, excluded_categories))
+            .group_by(F.kitchen_course, F.menu_item_name)
+            .order_by(F.kitchen_course, (total_revenue if order_by_revenue else total_qty).desc())
+        )
+
+        results: dict[str, list[dict]] = {cat: [] for cat in categories}
+        for category, item_name, qty, revenue in result.all():
+            if category in results and len(results[category]) < limit:
+                results[category].append({
+                    "item_name": item_name,
+                    "qty": int(qty) if qty else 0,
+                    "revenue": Decimal(str(revenue)) if revenue else Decimal("0")
+                })
+        return results
+
+    async def get_top_sellers(
+        self,
+        from_date: date,
+        to_date: date,
+        categories: list[str],
+        limit: int = 10,
+        excluded_categories: list[str] | None = None
+    ) -> dict[str, list[dict]]:
+        """See SambaPOSClient.get_top_sellers."""
+        return await self._top_sellers(from_date, to_date, categories, limit, excluded_categories, False)
+
+    async def get_top_sellers_by_revenue(
+        self,
+        from_date: date,
+        to_date: date,
+        categories: list[str],
+        limit: int = 10,
+        excluded_categories: list[str] | None = None
+    ) -> dict[str, list[dict]]:
+        """See SambaPOSClient.get_top_sellers_by_revenue."""
+        return await self._top_sellers(from_date, to_date, categories, limit, excluded_categories, True)
+
+    async def get_sales_breakdown(
+        self,
+        from_date: date,
+        to_date: date,
+        categories: list[str],
+        excluded_categories: list[str] | None = None
+    ) -> list[dict]:
+        """See SambaPOSClient.get_sales_breakdown."""
+        if not categories:
+            return []
+
+        F = SambaPOSOrderFact
+        total_revenue = func.sum(F.price * F.quantity).label("total_revenue")
+        result = await self.db.execute(
+            select(F.kitchen_course, F.menu_item_name, F.portion_name, func.sum(F.quantity), total_revenue)
+            .where(*self._sales_filters(from_date, to_date, categories, excluded_categories))
+            .group_by(F.kitchen_course, F.menu_item_name, F.portion_name)
+            .order_by(F.kitchen_course, total_revenue.desc())
+        )
+
+        return [
+            {
+                "category": category,
+                "menu_item_name": item_name,
+                "portion_name": portion_name or "Normal",
+                "total_qty": int(qty) if qty else 0,
+                "total_revenue_gross": Decimal(str(revenue)) if revenue else Decimal("0"),
+            }
+            for category, item_name, portion_name, qty, revenue in result.all()
+        ]
+
+    async def get_restaurant_spend(
+        self,
+        from_date: date,
+        to_date: date,
+        tracked_categories: list[str],
+        food_gl_codes: list[str],
+        beverage_gl_codes: list[str]
+    ) -> list[dict]:
+        """See SambaPOSClient.get_restaurant_spend."""
+        if not tracked_categories:
+            logger.warning("get_restaurant_spend called with empty tracked_categories")
+            return []
+
+        if not food_gl_codes or not beverage_gl_codes:
+            raise ValueError("Food and Beverage GL codes must be configured in Settings > SambaPOS Integration")
+
+        F = SambaPOSOrderFact
+        line_total = F.price * F.quantity
+        is_food = and_(F.is_voided == False, F.gl_code.in_(food_gl_codes))
+        is_beverage = and_(F.is_voided == False, F.gl_code.in_(beverage_gl_codes))
+        is_tracked_course = and_(F.is_voided == False, F.kitchen_course.in_(tracked_categories))
+
+        result = await self.db.execute(
+            select(
+                F.ticket_id,
+                func.max(F.ticket_date),
+                func.max(F.ticket_last_update),
+                func.avg(func.extract("epoch", F.order_created)).filter(is_food),
+                func.max(F.ticket_tags),
+                func.max(F.table_name),
+                func.max(F.room_entity),
+                func.coalesce(func.sum(line_total).filter(is_food), 0),
+                func.coalesce(func.sum(line_total).filter(is_beverage), 0),
+                func.count().filter(is_tracked_course),
+            )
+            .where(
+                F.kitchen_id == self.kitchen_id,
+                F.ticket_date >= from_date,
+                F.ticket_date < to_date + timedelta(days=1),
+                F.table_name.isnot(None),
+            )
+            .group_by(F.ticket_id)
+            # Must have at least one tracked course item that wasn't voided
+            .having(func.count().filter(is_tracked_course) > 0)
+            .order_by(func.max(F.ticket_date), F.ticket_id)
+        )
+
+        results = []
+        for row in result.all():
+            practical_datetime = None
+            if row[3] is not None:
+                practical_datetime = datetime(1970, 1, 1) + timedelta(seconds=float(row[3]))
+
+            results.append(build_restaurant_spend_ticket(
+                ticket_id=row[0],
+                ticket_date=row[1],
+                closed_time=row[2],
+                practical_datetime=practical_datetime,
+                ticket_tags=row[4] or "",
+                table_name=row[5],
+                room_entity=row[6],
+                food_total=Decimal(str(row[7])),
+                beverage_total=Decimal(str(row[8])),
+                main_course_count=int(row[9]),
+            ))
+
+        logger.info(f"SambaPOS restaurant spend (local facts): {len(results)} tickets for {from_date} to {to_date}")
+        return results
+
+
+async def get_sales_source(db: AsyncSession, settings: KitchenSettings):
+    """
+    Return the object reports should query for SambaPOS sales: the local fact
+    store when this kitchen's sync is current, otherwise a live SambaPOSClient.
+    """
+    result = await db.execute(
+        select(SambaPOSSyncState.facts_synced_at).where(SambaPOSSyncState.kitchen_id == settings.kitchen_id)
+    )
+    synced_at = result.scalar_one_or_none()
+    if synced_at and datetime.utcnow() - synced_at <= FACTS_MAX_AGE:
+        return SambaPOSFactStore(db, settings.kitchen_id)
+    return SambaPOSClient.from_settings(settings)
+
+
+async def compare_restaurant_spend(kitchen_id: int, day: date) -> list[str]:
+    """
+    Spot-check SambaPOSFactStore.get_restaurant_spend against the live
+    SambaPOSClient query for one day. Returns the differences found.
+    """
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(KitchenSettings).where(KitchenSettings.kitchen_id == kitchen_id))
+        settings = result.scalar_one_or_none()
+        if not sambapos_configured(settings):
+            raise ValueError(f"SambaPOS is not configured for kitchen {kitchen_id}")
+
+        def split(value: Optional[str]) -> list[str]:
+            return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+        args = dict(
+            from_date=day,
+            to_date=day,
+            tracked_categories=split(settings.sambapos_tracked_categories),
+            food_gl_codes=split(settings.sambapos_food_gl_codes),
+            beverage_gl_codes=split(settings.sambapos_beverage_gl_codes),
+        )
+        local = await SambaPOSFactStore(db, kitchen_id).get_restaurant_spend(**args)
+        live = await SambaPOSClient.from_settings(settings).get_restaurant_spend(**args)
+
+    fields = ("table_name", "has_room_entity", "estimated_covers", "main_course_count", "food_total", "beverage_total")
+    local_by_id = {t["ticket_id"]: t for t in local}
+    live_by_id = {t["ticket_id"]: t for t in live}
+    differences = [f"ticket {i}: only in local facts" for i in sorted(local_by_id.keys() - live_by_id.keys())]
+    differences += [f"ticket {i}: only in live query" for i in sorted(live_by_id.keys() - local_by_id.keys())]
+    for ticket_id in sorted(local_by_id.keys() & live_by_id.keys()):
+        for field in fields:
+            a, b = local_by_id[ticket_id].get(field), live_by_id[ticket_id].get(field)
+            if a != b:
+                differences.append(f"ticket {ticket_id}: {field} local={a} live={b}")
+    return differences
+
+
+if __name__ == "__main__":
+    # python -m services.sambapos_facts <kitchen_id> <YYYY-MM-DD>
+    import asyncio
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    found = asyncio.run(compare_restaurant_spend(int(sys.argv[1]), date.fromisoformat(sys.argv[2])))
+    print("\n".join(found) if found else "Local facts match the live SambaPOS query")
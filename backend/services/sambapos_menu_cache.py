@@ -0,0 +1,227 @@
+"""
+SambaPOS Menu Item Dimension Cache
+
+MenuItems.CustomTags is a JSON string that the old settings-page queries
+picked apart with CHARINDEX/SUBSTRING on every load. Here the menu is fetched
+once, parsed in Python (id, name, group code, Kitchen Course, NewBook GLA,
+portions) and kept:
+
+- in memory per kitchen (MenuDimension), served until the TTL expires
+- in Postgres (sambapos_menu_items), so a restart doesn't hit the till server
+
+A kitchen's dimension is marked stale when a ticket refreshed over SignalR
+(services/signalr_listener.py) orders a menu item it doesn't know, or by
+editing its SambaPOS settings; the next read refreshes it. The sales facts sync
+refreshes it directly when a synced order has an unknown menu item id. If the
+till server can't be reached, the last stored copy is served.
+
+A refresh writes sambapos_menu_items in its own session, so a menu lookup never
+commits or rolls back the caller's pending work.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert
+
+from database import AsyncSessionLocal
+from models.settings import KitchenSettings
+from models.sambapos import SambaPOSMenuItem
+from services.sambapos_api import SambaPOSClient, parse_custom_tags
+
+logger = logging.getLogger(__name__)
+
+MENU_CACHE_TTL = timedelta(seconds=int(os.getenv("SAMBAPOS_MENU_CACHE_TTL_SECONDS", "900")))
+
+
+class MenuDimension:
+    """One kitchen's parsed menu items, with the lookups the settings pages need."""
+
+    def __init__(self, kitchen_id: int, items: list[dict], refreshed_at: datetime):
+        self.kitchen_id = kitchen_id
+        self.items = items
+        self.refreshed_at = refreshed_at
+        self.by_id: dict[int, dict] = {item["menu_item_id"]: item for item in items}
+        self.names: set[str] = {item["name"] for item in items if item["name"]}
+
+    def is_fresh(self) -> bool:
+        return datetime.utcnow() - self.refreshed_at < MENU_CACHE_TTL
+
+    def get_categories(self) -> list[dict]:
+        """Distinct Kitchen Course values (same shape as SambaPOSClient.get_categories)."""
+        names = sorted({
+            item["kitchen_course"].strip() for item in self.items
+            if item["kitchen_course"] and item["kitchen_course"].strip()
+        })
+        return [{"id": i, "name": name} for i, name in enumerate(names, start=1)]
+
+    def get_menu_items_with_portions(self, categories: list[str] | None = None) -> list[dict]:
+        """One row per menu item portion, optionally filtered by Kitchen Course."""
+        results = []
+        for item in self.items:
+            course = item["kitchen_course"]
+            if not item["name"] or not course or (categories and course not in categories):
+                continue
+            for portion in item["portions"] or []:
+                results.append({
+                    "menu_item_name": item["name"],
+                    "portion_name": portion or "Normal",
+                    "category": course,
+                    "on_pos_menu": item["on_pos_menu"],
+                })
+        results.sort(key=lambda r: (r["category"], r["menu_item_name"], r["portion_name"]))
+        return results
+
+    def get_menu_item_names(self, categories: list[str] | None = None) -> list[dict]:
+        """Distinct menu item names with their Kitchen Course, optionally filtered."""
+        pairs = {
+            (item["name"], item["kitchen_course"])
+            for item in self.items
+            if item["name"] and item["kitchen_course"]
+            and (not categories or item["kitchen_course"] in categories)
+        }
+        return [{"name": name, "category": course} for name, course in sorted(pairs, key=lambda p: (p[1], p[0]))]
+
+    def get_gl_codes(self) -> list[dict]:
+        """Distinct NewBook GLA codes (sorted)."""
+        codes = sorted({item["gl_code"].strip() for item in self.items if item["gl_code"] and item["gl_code"].strip()})
+        return [{"code": code} for code in codes]
+
+    def get_menu_group_codes(self) -> list[dict]:
+        """Distinct MenuItems.GroupCode values (sorted)."""
+        codes = sorted({item["group_code"].strip() for item in self.items if item["group_code"] and item["group_code"].strip()})
+        return [{"name": code} for code in codes]
+
+    def get_product_tag_groups(self) -> list[dict]:
+        """Distinct CustomTags tag names (sorted)."""
+        names = sorted({name for item in self.items for name in (item["tags"] or {})})
+        return [{"name": name} for name in names]
+
+
+def _parse_menu_item(raw: dict) -> dict:
+    tags = parse_custom_tags(raw["custom_tags"])
+    return {
+        "menu_item_id": raw["menu_item_id"],
+        "name": raw["name"] or "",
+        "group_code": raw["group_code"],
+        "kitchen_course": tags.get("Kitchen Course") or None,
+        "gl_code": tags.get("NewBook GLA") or None,
+        "tags": tags,
+        "portions": raw["portions"],
+        "on_pos_menu": raw["on_pos_menu"],
+    }
+
+
+class SambaPOSMenuCache:
+    """Per-kitchen menu dimensions (memory, then Postgres, then the till server)."""
+
+    def __init__(self):
+        self._dimensions: dict[int, MenuDimension] = {}
+        self._stale: set[int] = set()
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def _cached(self, kitchen_id: int) -> Optional[MenuDimension]:
+        dimension = self._dimensions.get(kitchen_id)
+        if dimension and kitchen_id not in self._stale and dimension.is_fresh():
+            return dimension
+        return None
+
+    async def get(
+        self,
+        db: AsyncSession,
+        settings: KitchenSettings,
+        force_refresh: bool = False
+    ) -> MenuDimension:
+        """Return the kitchen's menu dimension, refreshing it from SambaPOS if stale."""
+        kitchen_id = settings.kitchen_id
+        if not force_refresh and (dimension := self._cached(kitchen_id)):
+            return dimension
+
+        # One refresh per kitchen at a time; concurrent callers wait for it
+        async with self._locks.setdefault(kitchen_id, asyncio.Lock()):
+            if not force_refresh:
+                if dimension := self._cached(kitchen_id):
+                    return dimension
+                if kitchen_id not in self._stale:
+                    stored = await self._load_stored(db, kitchen_id)
+                    if stored and stored.is_fresh():
+                        self._dimensions[kitchen_id] = stored
+                        return stored
+
+            try:
+                dimension = await self._refresh(settings)
+            except Exception as e:
+                stored = self._dimensions.get(kitchen_id) or await self._load_stored(db, kitchen_id)
+                if not stored:
+                    raise
+                logger.warning(f"SambaPOS menu refresh failed for kitchen {kitchen_id}, serving cached copy: {e}")
+                return stored
+
+            self._dimensions[kitchen_id] = dimension
+            self._stale.discard(kitchen_id)
+            return dimension
+
+    def invalidate(self, kitchen_id: int) -> None:
+        """Mark a kitchen's menu as changed; the next read refreshes from SambaPOS."""
+        self._stale.add(kitchen_id)
+
+    def invalidate_if_unknown(self, kitchen_id: int, menu_item_names: set[str]) -> None:
+        """Mark a kitchen's menu stale if any ordered item isn't in its cached dimension."""
+        dimension = self._dimensions.get(kitchen_id)
+        if dimension is None or kitchen_id in self._stale:
+            return
+        unknown = menu_item_names - dimension.names
+        if unknown:
+            logger.info(
+                f"SambaPOS menu for kitchen {kitchen_id} is missing {len(unknown)} ordered item(s) "
+                f"(e.g. {sorted(unknown)[0]!r}), refreshing on next read"
+            )
+            self._stale.add(kitchen_id)
+
+    async def _load_stored(self, db: AsyncSession, kitchen_id: int) -> Optional[MenuDimension]:
+        result = await db.execute(
+            select(SambaPOSMenuItem)
+            .where(SambaPOSMenuItem.kitchen_id == kitchen_id)
+            .order_by(SambaPOSMenuItem.menu_item_id)
+        )
+        rows = result.scalars().all()
+        if not rows:
+            return None
+
+        items = [
+            {
+                "menu_item_id": row.menu_item_id,
+                "name": row.name,
+                "group_code": row.group_code,
+                "kitchen_course": row.kitchen_course,
+                "gl_code": row.gl_code,
+                "tags": row.tags or {},
+                "portions": row.portions or [],
+                "on_pos_menu": row.on_pos_menu,
+            }
+            for row in rows
+        ]
+        return MenuDimension(kitchen_id, items, min(row.refreshed_at for row in rows))
+
+    async def _refresh(self, settings: KitchenSettings) -> MenuDimension:
+        client = SambaPOSClient.from_settings(settings)
+        items = [_parse_menu_item(raw) for raw in await client.get_menu_dimension()]
+        refreshed_at = datetime.utcnow()
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(SambaPOSMenuItem).where(SambaPOSMenuItem.kitchen_id == settings.kitchen_id))
+            if items:
+                await db.execute(
+                    insert(SambaPOSMenuItem),
+                    [{**item, "kitchen_id": settings.kitchen_id, "refreshed_at": refreshed_at} for item in items]
+                )
+            await db.commit()
+
+        logger.info(f"SambaPOS menu dimension refreshed for kitchen {settings.kitchen_id}: {len(items)} items")
+        return MenuDimension(settings.kitchen_id, items, refreshed_at)
+
+
+sambapos_menu_cache = SambaPOSMenuCache()
@@ -0,0 +1,188 @@
+"""
+SambaPOS MSSQL Connection Pools
+
+Process-wide aioodbc pools, one per kitchen, shared by every SambaPOSClient so
+report pages don't pay a TDS handshake per query. A pool is rebuilt when the
+kitchen's connection string changes (settings edited) and dropped when the
+background health check finds it broken; the next query builds a fresh one.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aioodbc
+
+logger = logging.getLogger(__name__)
+
+POOL_MIN_SIZE = int(os.getenv("SAMBAPOS_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("SAMBAPOS_POOL_MAX_SIZE", "5"))
+POOL_RECYCLE_SECONDS = int(os.getenv("SAMBAPOS_POOL_RECYCLE_SECONDS", "1800"))
+ACQUIRE_TIMEOUT_SECONDS = 30
+
+# SQLSTATE classes that mean the connection itself is unusable
+_DISCONNECT_SQLSTATES = ("08", "HYT00", "HYT01")
+
+
+def _is_disconnect(error: Exception) -> bool:
+    sqlstate = error.args[0] if getattr(error, "args", None) else ""
+    return isinstance(sqlstate, str) and sqlstate.startswith(_DISCONNECT_SQLSTATES)
+
+
+class _KitchenPool:
+    """A kitchen's pool plus the counters reported by stats()."""
+
+    def __init__(self, dsn: str, pool):
+        self.dsn = dsn
+        self.pool = pool
+        self.created_at = time.time()
+        self.waiting = 0
+        self.acquires = 0
+        self.acquire_timeouts = 0
+        self.discarded_connections = 0
+        self.acquire_ms = deque(maxlen=200)
+        self.last_health_check: Optional[float] = None
+        self.last_health_ok: Optional[bool] = None
+
+    def stats(self) -> dict:
+        samples = sorted(self.acquire_ms)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else None
+        return {
+            "size": self.pool.size,
+            "free": self.pool.freesize,
+            "in_use": self.pool.size - self.pool.freesize,
+            "min_size": self.pool.minsize,
+            "max_size": self.pool.maxsize,
+            "waiting": self.waiting,
+            "acquires": self.acquires,
+            "acquire_timeouts": self.acquire_timeouts,
+            "discarded_connections": self.discarded_connections,
+            "acquire_ms_avg": round(sum(samples) / len(samples), 2) if samples else None,
+            "acquire_ms_p95": round(p95, 2) if p95 is not None else None,
+            "acquire_ms_max": round(samples[-1], 2) if samples else None,
+            "created_at": self.created_at,
+            "last_health_check": self.last_health_check,
+            "last_health_ok": self.last_health_ok,
+        }
+
+
+class SambaPOSPoolManager:
+    """Registry of per-kitchen pools (keyed by kitchen_id, or by DSN when no kitchen is given)."""
+
+    def __init__(self):
+        self._pools: dict = {}
+        self._lock = asyncio.Lock()
+
+    async def _get(self, key, dsn: str) -> _KitchenPool:
+        entry = self._pools.get(key)
+        if entry and entry.dsn == dsn:
+            return entry
+
+        async with self._lock:
+            entry = self._pools.get(key)
+            if entry and entry.dsn == dsn:
+                return entry
+            if entry:
+                logger.info(f"SambaPOS settings changed for {self._label(key)}, rebuilding connection pool")
+                self._close_entry(entry)
+
+            pool = await aioodbc.create_pool(
+                dsn=dsn,
+                minsize=POOL_MIN_SIZE,
+                maxsize=POOL_MAX_SIZE,
+                pool_recycle=POOL_RECYCLE_SECONDS,
+            )
+            entry = _KitchenPool(dsn, pool)
+            self._pools[key] = entry
+            logger.info(f"SambaPOS connection pool created for {self._label(key)} (max {POOL_MAX_SIZE})")
+            return entry
+
+    @asynccontextmanager
+    async def connection(self, dsn: str, kitchen_id: Optional[int] = None):
+        """Borrow a pooled connection for the given DSN."""
+        key = kitchen_id if kitchen_id is not None else dsn
+        entry = await self._get(key, dsn)
+
+        entry.waiting += 1
+        started = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(entry.pool.acquire(), timeout=ACQUIRE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            entry.acquire_timeouts += 1
+            raise
+        finally:
+            entry.waiting -= 1
+        entry.acquires += 1
+        entry.acquire_ms.append((time.perf_counter() - started) * 1000)
+
+        try:
+            yield conn
+        except Exception as e:
+            # Don't hand a dead connection back to the next caller
+            if _is_disconnect(e) and not conn.closed:
+                entry.discarded_connections += 1
+                await conn.close()
+            raise
+        finally:
+            await entry.pool.release(conn)
+
+    async def invalidate(self, kitchen_id: int) -> None:
+        """Drop a kitchen's pool (e.g. after its SambaPOS settings are edited)."""
+        async with self._lock:
+            entry = self._pools.pop(kitchen_id, None)
+        if entry:
+            self._close_entry(entry)
+            logger.info(f"SambaPOS connection pool closed for {self._label(kitchen_id)}")
+
+    async def health_check(self) -> None:
+        """Ping every pool; drop any that can't serve a query so it is rebuilt on next use."""
+        for key, entry in list(self._pools.items()):
+            entry.last_health_check = time.time()
+            try:
+                async with self.connection(entry.dsn, None if isinstance(key, str) else key) as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute("SELECT 1")
+                        await cursor.fetchone()
+                entry.last_health_ok = True
+            except Exception as e:
+                entry.last_health_ok = False
+                logger.warning(f"SambaPOS pool health check failed for {self._label(key)}, dropping pool: {e}")
+                async with self._lock:
+                    if self._pools.get(key) is entry:
+                        del self._pools[key]
+                self._close_entry(entry)
+
+    def stats(self, kitchen_id: Optional[int] = None) -> dict:
+        """Pool stats for one kitchen, or all pools keyed by label."""
+        if kitchen_id is not None:
+            entry = self._pools.get(kitchen_id)
+            return entry.stats() if entry else {}
+        return {self._label(key): entry.stats() for key, entry in self._pools.items()}
+
+    async def close_all(self) -> None:
+        async with self._lock:
+            entries = list(self._pools.values())
+            self._pools.clear()
+        for entry in entries:
+            entry.pool.close()
+            await entry.pool.wait_closed()
+
+    def _close_entry(self, entry: _KitchenPool) -> None:
+        # Connections still checked out are closed as they are released
+        entry.pool.close()
+        asyncio.create_task(entry.pool.wait_closed())
+
+    @staticmethod
+    def _label(key) -> str:
+        return f"kitchen {key}" if not isinstance(key, str) else "ad-hoc connection"
+
+
+sambapos_pools = SambaPOSPoolManager()
+
+
+async def run_sambapos_pool_health_check():
+    """Scheduler job: ping all open SambaPOS pools."""
+    await sambapos_pools.health_check()
@@ -9,50 +9,39 @@ KDS entries for real-time display.
 This solves the problem of tickets that close instantly (e.g. free breakfast
 for residents, bar orders paid immediately) not appearing in KDS polling.
 
+SambaPOS sends a burst of TICKET_REFRESH broadcasts for the same ticket while
+a waiter adds items, so refreshes are debounced per ticket
+(KDS_SIGNALR_DEBOUNCE_SECONDS, capped at KDS_SIGNALR_MAX_WAIT_SECONDS from the
+first refresh). When a ticket's window closes, every pending ticket is fetched
+in one batched GraphQL query; a ticket already being fetched waits for that
+fetch to finish rather than being fetched twice concurrently.
+
 SignalR 2.x Protocol:
 1. GET /signalr/negotiate - get connection token
 2. WS  /signalr/connect?transport=webSockets&connectionToken=... - WebSocket
 3. Messages arrive as JSON: {"C": "...", "M": [{...}]}
    - TICKET_REFRESH: {"H": "Default", "M": "update", "A": ["guid:<TICKET_REFRESH>ticketId"]}
+
+A refreshed ticket ordering a menu item the cached menu item dimension doesn't
+know marks that dimension stale (services/sambapos_menu_cache.py).
 """
 
 import asyncio
 import json
 import logging
+import os
 import urllib.parse
 from typing import Optional
-from datetime import datetime
 
 import httpx
 
-logger = logging.getLogger(__name__)
-
-
-class KDSEventBus:
-    """Simple pub/sub for notifying SSE subscribers of KDS events."""
-
-    def __init__(self):
-        self._subscribers: list[asyncio.Queue] = []
-
-    def subscribe(self) -> asyncio.Queue:
-        q: asyncio.Queue = asyncio.Queue()
-        self._subscribers.append(q)
-        return q
-
-    def unsubscribe(self, q: asyncio.Queue):
-        if q in self._subscribers:
-            self._subscribers.remove(q)
-
-    async def publish(self, event: dict):
-        for q in list(self._subscribers):
-            try:
-                q.put_nowait(event)
-            except asyncio.QueueFull:
-                pass
+from services.kds_events import kds_event_bus
 
+logger = logging.getLogger(__name__)
 
-# Global event bus - imported by kds.py for the SSE endpoint
-kds_event_bus = KDSEventBus()
+DEBOUNCE_SECONDS = float(os.getenv("KDS_SIGNALR_DEBOUNCE_SECONDS", "1.0"))
+MAX_WAIT_SECONDS = float(os.getenv("KDS_SIGNALR_MAX_WAIT_SECONDS", "5.0"))
+FETCH_BATCH_SIZE = int(os.getenv("KDS_SIGNALR_FETCH_BATCH_SIZE", "20"))
 
 
 class SignalRListener:
@@ -75,6 +64,22 @@ class SignalRListener:
         self.course_order = course_order
         self._running = False
         self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._client = None  # SambaPOSGraphQLClient, created on first fetch
+
+        # Debounce state: ticket -> fetch deadline / first refresh time (loop clock)
+        self._due: dict[int, float] = {}
+        self._first_seen: dict[int, float] = {}
+        # In-flight dedupe: ticket -> batch task currently fetching it
+        self._inflight: dict[int, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+
+        self.refreshes_received = 0
+        self.debounced = 0  # Refreshes merged into a fetch already pending for the ticket
+        self.batched = 0  # Ticket fetches that shared another ticket's GraphQL request
+        self.tickets_fetched = 0
+        self.batches_fetched = 0
+        self.fetch_errors = 0
 
     def _get_ws_base(self) -> str:
         """Convert HTTP URL to WS URL."""
@@ -169,75 +174,152 @@ class SignalRListener:
     async def _process_ticket_refresh(self, sambapos_ticket_id: int):
         """Handle a TICKET_REFRESH broadcast.
 
-        Fetches the specific ticket by ID from SambaPOS GraphQL and
-        persists it as a KDS entry. This captures instantly-closed tickets
-        (free breakfast, bar tabs) that never appear in getTickets(isClosed: false).
-
-        Always publishes an SSE event afterwards so the frontend refreshes.
+        Schedules the ticket to be fetched by ID from SambaPOS GraphQL and
+        persisted as a KDS entry once its debounce window closes. This captures
+        instantly-closed tickets (free breakfast, bar tabs) that never appear
+        in getTickets(isClosed: false).
         """
-        # Fetch and persist the ticket directly
+        # Next /kds/tickets poll re-reads the open ticket list from SambaPOS
+        from services.kds_snapshot import kds_snapshots
+        kds_snapshots.invalidate(self.kitchen_id)
+
+        self.refreshes_received += 1
+        if sambapos_ticket_id in self._due:
+            self.debounced += 1
+        now = asyncio.get_running_loop().time()
+        first_seen = self._first_seen.setdefault(sambapos_ticket_id, now)
+        # Each refresh pushes the fetch back, but never past MAX_WAIT from the first
+        self._due[sambapos_ticket_id] = min(now + DEBOUNCE_SECONDS, first_seen + MAX_WAIT_SECONDS)
+        self._wake.set()
+
+    async def _flush_loop(self):
+        """Fetch pending tickets as their debounce windows close."""
+        loop = asyncio.get_running_loop()
+        while self._running:
+            now = loop.time()
+            waiting = {tid: due for tid, due in self._due.items() if tid not in self._inflight}
+            if waiting and min(waiting.values()) <= now:
+                # One window closed: fetch everything pending with it
+                batch = list(waiting)[:FETCH_BATCH_SIZE]
+                self.batched += len(batch) - 1
+                for tid in batch:
+                    del self._due[tid]
+                    del self._first_seen[tid]
+                task = asyncio.create_task(self._fetch_batch(batch))
+                for tid in batch:
+                    self._inflight[tid] = task
+                task.add_done_callback(lambda _, batch=batch: self._batch_done(batch))
+                continue
+
+            timeout = min(waiting.values()) - now if waiting else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _batch_done(self, batch: list[int]):
+        for tid in batch:
+            self._inflight.pop(tid, None)
+        # Tickets refreshed again mid-fetch can go now
+        self._wake.set()
+
+    async def _fetch_batch(self, sambapos_ticket_ids: list[int]):
         try:
-            await self._fetch_and_persist_ticket(sambapos_ticket_id)
+            await self._fetch_and_persist_tickets(sambapos_ticket_ids)
         except Exception as e:
-            logger.warning(f"SignalR: Failed to fetch/persist ticket {sambapos_ticket_id}: {e}")
-
-        # Always notify SSE subscribers for instant frontend refresh
-        await kds_event_bus.publish({
-            "type": "ticket_refresh",
-            "sambapos_ticket_id": sambapos_ticket_id,
-            "timestamp": datetime.utcnow().isoformat(),
-        })
-        logger.info(f"SignalR: Published SSE event for ticket {sambapos_ticket_id}")
-
-    async def _fetch_and_persist_ticket(self, sambapos_ticket_id: int):
-        """Fetch a specific ticket from SambaPOS and create/update a KDS entry."""
+            self.fetch_errors += 1
+            logger.warning(f"SignalR: Failed to fetch/persist tickets {sambapos_ticket_ids}: {e}")
+            # Screens reload the ticket list instead
+            await kds_event_bus.publish({
+                "type": "resync",
+                "kitchen_id": self.kitchen_id,
+                "sambapos_ticket_ids": sambapos_ticket_ids,
+            })
+
+    async def _fetch_and_persist_tickets(self, sambapos_ticket_ids: list[int]):
+        """Fetch tickets from SambaPOS in one query and create/update their KDS entries."""
         from services.kds_graphql import SambaPOSGraphQLClient, transform_ticket_for_kds
-        from api.kds import get_or_create_kds_ticket
+        from api.kds import upsert_kds_tickets, publish_kds_events
         from database import AsyncSessionLocal
 
-        client = SambaPOSGraphQLClient(
-            server_url=self.base_url,
-            username=self.graphql_username,
-            password=self.graphql_password,
-            client_id=self.graphql_client_id,
-        )
+        if self._client is None:
+            # Long-lived so the /Token grant is reused across refreshes
+            self._client = SambaPOSGraphQLClient(
+                server_url=self.base_url,
+                username=self.graphql_username,
+                password=self.graphql_password,
+                client_id=self.graphql_client_id,
+            )
 
-        result = await client.get_ticket_by_id(sambapos_ticket_id)
+        result = await self._client.get_tickets_by_ids(sambapos_ticket_ids)
+        self.batches_fetched += 1
+        self.tickets_fetched += len(sambapos_ticket_ids)
 
         if "error" in result:
-            logger.warning(f"SignalR: get_ticket_by_id({sambapos_ticket_id}) error: {result['error']}")
-            return
-
-        ticket_data = result.get("data", {}).get("getTicket")
-        if not ticket_data:
-            logger.debug(f"SignalR: get_ticket_by_id({sambapos_ticket_id}) returned no data")
-            return
-
-        transformed = transform_ticket_for_kds(ticket_data)
-        if not transformed:
-            logger.debug(f"SignalR: Ticket {sambapos_ticket_id} has no kitchen orders, skipping")
+            raise RuntimeError(f"get_tickets_by_ids error: {result['error']}")
+
+        data = result.get("data") or {}
+        transformed_tickets = []
+        ordered_names: set[str] = set()
+        for sambapos_ticket_id in sambapos_ticket_ids:
+            ticket_data = data.get(f"t{sambapos_ticket_id}")
+            if not ticket_data:
+                logger.debug(f"SignalR: getTicket({sambapos_ticket_id}) returned no data")
+                continue
+            ordered_names.update(o["name"] for o in ticket_data.get("orders") or [] if o.get("name"))
+            transformed = transform_ticket_for_kds(ticket_data)
+            if not transformed:
+                logger.debug(f"SignalR: Ticket {sambapos_ticket_id} has no kitchen orders, skipping")
+                continue
+            transformed_tickets.append(transformed)
+
+        # An item the cached menu doesn't know means the menu changed since it was cached
+        from services.sambapos_menu_cache import sambapos_menu_cache
+        sambapos_menu_cache.invalidate_if_unknown(self.kitchen_id, ordered_names)
+
+        if not transformed_tickets:
             return
 
         async with AsyncSessionLocal() as db:
-            kds_ticket = await get_or_create_kds_ticket(
-                db, self.kitchen_id, transformed, self.course_order
+            kds_ids, events = await upsert_kds_tickets(
+                db, self.kitchen_id, transformed_tickets, self.course_order
             )
+            await db.commit()
             logger.info(
-                f"SignalR: Persisted ticket {sambapos_ticket_id} "
-                f"(KDS #{kds_ticket.id}, number={kds_ticket.ticket_number})"
+                f"SignalR: Persisted {len(kds_ids)} ticket(s) {sorted(kds_ids)} "
+                f"from {len(sambapos_ticket_ids)} refreshed, {len(events)} event(s)"
             )
 
+        await publish_kds_events(events)
+
+    def stats(self) -> dict:
+        return {
+            "refreshes_received": self.refreshes_received,
+            "debounced": self.debounced,
+            "batched": self.batched,
+            # GraphQL requests avoided versus one fetch per broadcast
+            "fetches_saved": self.debounced + self.batched,
+            "tickets_fetched": self.tickets_fetched,
+            "batches_fetched": self.batches_fetched,
+            "fetch_errors": self.fetch_errors,
+            "pending": len(self._due),
+            "in_flight": len(self._inflight),
+        }
+
     def start(self):
         """Start the listener as a background asyncio task."""
         self._running = True
         self._task = asyncio.create_task(self._listen_loop())
+        self._flush_task = asyncio.create_task(self._flush_loop())
         logger.info("SignalR: Listener started")
 
     def stop(self):
         """Stop the listener."""
         self._running = False
-        if self._task:
-            self._task.cancel()
+        for task in (self._task, self._flush_task, *self._inflight.values()):
+            if task:
+                task.cancel()
         logger.info("SignalR: Listener stopped")
 
 
@@ -294,3 +376,8 @@ async def stop_signalr_listener():
     if _listener:
         _listener.stop()
         _listener = None
+
+
+def get_signalr_stats() -> dict:
+    """Refresh/fetch counters of the running listener ({} if not running)."""
+    return _listener.stats() if _listener else {}
@@ -8,24 +8,17 @@ import logging
 from datetime import date, timedelta
 from typing import Optional, List
 from dataclasses import dataclass
-from sqlalchemy import select, and_, desc, func
+from sqlalchemy import select, and_, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.invoice import Invoice
 from models.line_item import LineItem
+from models.product_price_point import ProductPricePoint
+from services.price_history import product_point_conditions
 
 logger = logging.getLogger(__name__)
 
 
-def normalize_description(description: Optional[str]) -> Optional[str]:
-    """
-    Normalize description by taking only the first line.
-    """
-    if not description:
-        return description
-    return description.split('\n')[0].strip()
-
-
 @dataclass
 class StockStatusHistory:
     """Stock status history result for a line item."""
@@ -71,42 +64,24 @@ class StockHistoryService:
         """
         cutoff_date = date.today() - timedelta(days=lookback_days)
 
-        # Build conditions for matching product
+        # Match by product_code if available, otherwise by description, plus unit
+        P = ProductPricePoint
         conditions = [
-            Invoice.kitchen_id == self.kitchen_id,
-            LineItem.invoice_id == Invoice.id,
-            Invoice.supplier_id == supplier_id,
-            Invoice.invoice_date >= cutoff_date,
+            P.kitchen_id == self.kitchen_id,
+            P.supplier_id == supplier_id,
+            *product_point_conditions(product_code, description, unit),
+            P.invoice_date >= cutoff_date,
         ]
 
-        # Match by product_code if available, otherwise by description
-        if product_code:
-            conditions.append(LineItem.product_code == product_code)
-        else:
-            conditions.append(LineItem.product_code.is_(None))
-            if description:
-                # Normalize description to first line only for matching
-                normalized_desc = normalize_description(description)
-                # Match against first line of stored descriptions
-                conditions.append(
-                    func.split_part(LineItem.description, '\n', 1) == normalized_desc
-                )
-
-        # Match by unit - critical for products sold in different units
-        if unit:
-            conditions.append(LineItem.unit == unit)
-        else:
-            conditions.append(LineItem.unit.is_(None))
-
         # Exclude current invoice if provided
         if exclude_invoice_id:
-            conditions.append(Invoice.id != exclude_invoice_id)
+            conditions.append(P.invoice_id != exclude_invoice_id)
 
-        # Get all matching line items
+        # Get all matching price points
         result = await self.db.execute(
-            select(LineItem.is_non_stock, Invoice.invoice_date)
+            select(P.is_non_stock, P.invoice_date)
             .where(and_(*conditions))
-            .order_by(desc(Invoice.invoice_date))
+            .order_by(desc(P.invoice_date))
         )
         rows = result.fetchall()
 
@@ -0,0 +1,202 @@
+"""
+Supplier Index
+
+Per-kitchen lookup structures for ocr.parser.identify_supplier, which used to
+load every supplier and make three linear passes over names, aliases and
+keywords for each invoice (twice when the vendor name didn't match and the
+full OCR text was tried):
+
+- exact:    normalized name/alias -> supplier
+- contains: Aho-Corasick automaton over upper-cased names, aliases and
+            identifier_config keywords, so the text is scanned once
+- fuzzy:    inverted index of each name's/alias's significant words, so
+            fuzzy_match_score only runs for names sharing a word with the text
+            (or contained in it)
+
+Results match the linear passes (ties go to the lowest supplier id, a name
+before its aliases), except that empty names, aliases and keywords - or ones
+that normalize to nothing, like "&" - no longer match every text.
+
+The index is built once per kitchen and cached in-process. Each lookup checks a
+cheap fingerprint (count, max id, max updated_at) of the kitchen's suppliers,
+so creating, editing or deleting a supplier - in any worker - rebuilds it.
+
+Vendor texts resolved by the LLM fallback are remembered in
+supplier_vendor_matches, so the same vendor name never needs the LLM again.
+identify_supplier runs the fallback and writes the match in a session of its
+own, leaving the caller's transaction alone.
+"""
+import logging
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.supplier import Supplier
+from models.supplier_vendor_match import SupplierVendorMatch
+from services.pattern_automaton import PatternAutomaton
+
+logger = logging.getLogger(__name__)
+
+FUZZY_THRESHOLD = 0.6  # Minimum score to consider a fuzzy match
+# Longer text is the full OCR dump: too many words that could accidentally match
+FUZZY_MAX_TEXT_LENGTH = 500
+
+
+class SupplierIndex:
+    """Compiled supplier names, aliases and keywords for one kitchen."""
+
+    def __init__(self, suppliers: list[tuple]):
+        """suppliers: (id, name, aliases, identifier_config) rows ordered by id."""
+        from ocr.parser import normalize_text, get_words
+
+        self.supplier_ids: set[int] = set()
+        self.llm_choices: list[dict] = []  # [{id, name}] for the LLM fallback prompt
+        self._exact: dict[str, int] = {}
+
+        contains_rank: dict[str, int] = {}  # upper-cased pattern -> first supplier (by order)
+        contains_patterns: list[str] = []
+        self._contains_suppliers: list[int] = []
+
+        # Fuzzy candidates in evaluation order: each supplier's name, then its aliases
+        self._fuzzy_names: list[tuple[int, str]] = []
+        self._fuzzy_words: dict[str, list[int]] = {}
+        fuzzy_norms: list[str] = []
+        self._fuzzy_norm_entries: list[list[int]] = []
+        norm_index: dict[str, int] = {}
+
+        for supplier_id, name, aliases, identifier_config in suppliers:
+            self.supplier_ids.add(supplier_id)
+            self.llm_choices.append({"id": supplier_id, "name": name})
+            aliases = [a for a in (aliases or []) if a]
+            keywords = [k for k in (identifier_config or {}).get("keywords", []) if k]
+
+            for candidate in [name] + aliases:
+                self._exact.setdefault(normalize_text(candidate), supplier_id)
+
+            for pattern in [name] + aliases + keywords:
+                pattern = pattern.upper()
+                if pattern and pattern not in contains_rank:
+                    contains_rank[pattern] = len(contains_patterns)
+                    contains_patterns.append(pattern)
+                    self._contains_suppliers.append(supplier_id)
+
+            for candidate in [name] + aliases:
+                entry = len(self._fuzzy_names)
+                self._fuzzy_names.append((supplier_id, candidate))
+                # The words fuzzy_match_score compares: 4+ chars, else 3+ chars
+                words = {w for w in normalize_text(candidate).split() if len(w) >= 4} or get_words(candidate)
+                for word in words:
+                    self._fuzzy_words.setdefault(word, []).append(entry)
+                # ...and the whole normalized name contained in the text
+                norm = normalize_text(candidate)
+                if norm:
+                    if norm not in norm_index:
+                        norm_index[norm] = len(fuzzy_norms)
+                        fuzzy_norms.append(norm)
+                        self._fuzzy_norm_entries.append([])
+                    self._fuzzy_norm_entries[norm_index[norm]].append(entry)
+
+        # Patterns are numbered in supplier order, so the lowest match wins
+        self._contains = PatternAutomaton(contains_patterns) if contains_patterns else None
+        self._fuzzy_norms = PatternAutomaton(fuzzy_norms) if fuzzy_norms else None
+
+    def exact(self, text: str) -> Optional[int]:
+        from ocr.parser import normalize_text
+        return self._exact.get(normalize_text(text))
+
+    def contains(self, text: str) -> Optional[int]:
+        if not self._contains:
+            return None
+        found = self._contains.search(text.upper())
+        return self._contains_suppliers[min(found)] if found else None
+
+    def fuzzy(self, text: str) -> Optional[int]:
+        from ocr.parser import normalize_text, fuzzy_match_score
+
+        if len(text) > FUZZY_MAX_TEXT_LENGTH:
+            return None
+
+        text_norm = normalize_text(text)
+        candidates: set[int] = set()
+        for word in set(text_norm.split()):
+            candidates.update(self._fuzzy_words.get(word, ()))
+        if self._fuzzy_norms:
+            for norm in self._fuzzy_norms.search(text_norm):
+                candidates.update(self._fuzzy_norm_entries[norm])
+
+        best_match = None
+        best_score = 0.0
+        for entry in sorted(candidates):
+            supplier_id, candidate = self._fuzzy_names[entry]
+            score = fuzzy_match_score(candidate, text)
+            if score > best_score and score >= FUZZY_THRESHOLD:
+                best_score = score
+                best_match = supplier_id
+        return best_match
+
+
+# kitchen_id -> (fingerprint, index)
+_indexes: dict[int, tuple[tuple, SupplierIndex]] = {}
+
+
+async def get_supplier_index(db: AsyncSession, kitchen_id: int) -> SupplierIndex:
+    """The kitchen's supplier index, rebuilt only when its suppliers changed."""
+    result = await db.execute(
+        select(
+            func.count(Supplier.id),
+            func.max(Supplier.id),
+            func.max(Supplier.updated_at)
+        ).where(Supplier.kitchen_id == kitchen_id)
+    )
+    fingerprint = tuple(result.one())
+
+    cached = _indexes.get(kitchen_id)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    result = await db.execute(
+        select(Supplier.id, Supplier.name, Supplier.aliases, Supplier.identifier_config)
+        .where(Supplier.kitchen_id == kitchen_id)
+        .order_by(Supplier.id)
+    )
+    index = SupplierIndex([tuple(row) for row in result.all()])
+    _indexes[kitchen_id] = (fingerprint, index)
+    logger.info(f"Built supplier index for kitchen {kitchen_id}: {len(index.supplier_ids)} suppliers")
+    return index
+
+
+async def get_remembered_supplier(db: AsyncSession, kitchen_id: int, vendor_key: str) -> Optional[int]:
+    """Supplier an earlier LLM fallback resolved this vendor text to, if any."""
+    if not vendor_key:
+        return None
+    result = await db.execute(
+        select(SupplierVendorMatch.supplier_id).where(
+            SupplierVendorMatch.kitchen_id == kitchen_id,
+            SupplierVendorMatch.vendor_key == vendor_key[:500]
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+async def remember_supplier(
+    db: AsyncSession,
+    kitchen_id: int,
+    vendor_key: str,
+    supplier_id: int,
+    source: str = "llm"
+):
+    """Record a vendor text -> supplier resolution (replacing any earlier one); the caller commits."""
+    if not vendor_key:
+        return
+    stmt = insert(SupplierVendorMatch).values(
+        kitchen_id=kitchen_id,
+        vendor_key=vendor_key[:500],
+        supplier_id=supplier_id,
+        source=source
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        constraint="uq_supplier_vendor_matches_kitchen_key",
+        set_={"supplier_id": supplier_id, "source": source}
+    ))
@@ -36,6 +36,7 @@ interface GroupSummary {
 interface SearchResponse {
   items: InvoiceSearchItem[]
   total_count: number
+  total_is_estimate?: boolean
   grouped_by: string | null
   groups: GroupSummary[] | null
 }
@@ -351,7 +352,7 @@ export default function SearchInvoices() {
       {data && (
         <div>
           <p style={{ marginBottom: '12px', color: '#6b7280' }}>
-            Found {data.total_count} invoice{data.total_count !== 1 ? 's' : ''}
+            Found {data.total_count}{data.total_is_estimate ? '+' : ''} invoice{data.total_count !== 1 ? 's' : ''}
           </p>
 
           {groupBy && data.groups ? (
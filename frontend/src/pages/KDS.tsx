@@ -48,6 +48,12 @@ interface KDSTicket {
   is_bumped: boolean
 }
 
+type KDSEvent =
+  | { type: 'resync' }
+  | { type: 'ticket_added' | 'order_added' | 'ticket_updated'; ticket_id: number; ticket: KDSTicket }
+  | { type: 'course_state'; ticket_id: number; course_name: string; state: CourseState }
+  | { type: 'ticket_bumped' | 'ticket_closed'; ticket_id: number }
+
 interface CourseConfig {
   name: string
   prep_green: number
@@ -224,19 +230,64 @@ export default function KDS() {
     return () => clearInterval(interval)
   }, [])
 
-  // Subscribe to SSE for real-time updates from SignalR listener
+  // Subscribe to SSE ticket deltas (applied to the cached ticket list in place)
   useEffect(() => {
+    if (!token) return
     let es: EventSource | null = null
     let reconnectTimer: ReturnType<typeof setTimeout> | null = null
     let stopped = false
+    let lastEventId = ''
+
+    const resync = () => {
+      queryClient.invalidateQueries({ queryKey: ['kds-tickets'] })
+      queryClient.invalidateQueries({ queryKey: ['kds-bookings'] })
+    }
+
+    const applyEvent = (event: KDSEvent) => {
+      if (event.type === 'resync') {
+        resync()
+        return
+      }
+      queryClient.setQueryData<KDSTicket[]>(['kds-tickets'], (current = []) => {
+        switch (event.type) {
+          case 'ticket_added':
+          case 'order_added':
+          case 'ticket_updated': {
+            const exists = current.some((t) => t.id === event.ticket_id)
+            return exists
+              ? current.map((t) => (t.id === event.ticket_id ? event.ticket : t))
+              : [...current, event.ticket]
+          }
+          case 'course_state':
+            return current.map((t) =>
+              t.id === event.ticket_id
+                ? { ...t, course_states: { ...t.course_states, [event.course_name]: event.state } }
+                : t
+            )
+          case 'ticket_bumped':
+          case 'ticket_closed':
+            return current.filter((t) => t.id !== event.ticket_id)
+          default:
+            return current
+        }
+      })
+      // Booking stages follow course progress
+      queryClient.invalidateQueries({ queryKey: ['kds-bookings'] })
+    }
 
     const connect = () => {
       if (stopped) return
-      es = new EventSource('/api/kds/events')
-
-      es.onmessage = () => {
-        queryClient.invalidateQueries({ queryKey: ['kds-tickets'] })
-        queryClient.invalidateQueries({ queryKey: ['kds-bookings'] })
+      // A manual reconnect is a new EventSource, so pass the resume point explicitly
+      const resumeParam = lastEventId ? `&last_event_id=${lastEventId}` : ''
+      es = new EventSource(`/api/kds/events?token=${encodeURIComponent(token)}${resumeParam}`)
+
+      es.onmessage = (e: MessageEvent) => {
+        if (e.lastEventId) lastEventId = e.lastEventId
+        try {
+          applyEvent(JSON.parse(e.data))
+        } catch {
+          resync()
+        }
       }
 
       es.onerror = () => {
@@ -258,7 +309,7 @@ export default function KDS() {
       if (reconnectTimer) clearTimeout(reconnectTimer)
       if (es) es.close()
     }
-  }, [queryClient])
+  }, [queryClient, token])
 
   // Fetch recipe link for a KDS order item
   const showRecipeLink = useCallback(async (menuItemName: string) => {
@@ -32,6 +32,7 @@ interface SettingsData {
   ocr_clean_product_codes: boolean
   ocr_filter_subtotal_rows: boolean
   ocr_use_weight_as_quantity: boolean
+  azure_requests_per_minute: number
   // Cost distribution settings
   cost_distribution_max_days: number
   // LLM settings — LLM FEATURE
@@ -289,6 +290,7 @@ export default function Settings() {
   const [ocrCleanProductCodes, setOcrCleanProductCodes] = useState(false)
   const [ocrFilterSubtotalRows, setOcrFilterSubtotalRows] = useState(false)
   const [ocrUseWeightAsQuantity, setOcrUseWeightAsQuantity] = useState(false)
+  const [azureRequestsPerMinute, setAzureRequestsPerMinute] = useState(15)
 
   // Cost distribution settings
   const [costDistMaxDays, setCostDistMaxDays] = useState(90)
@@ -904,6 +906,7 @@ export default function Settings() {
       setOcrCleanProductCodes(settings.ocr_clean_product_codes || false)
       setOcrFilterSubtotalRows(settings.ocr_filter_subtotal_rows || false)
       setOcrUseWeightAsQuantity(settings.ocr_use_weight_as_quantity || false)
+      setAzureRequestsPerMinute(settings.azure_requests_per_minute || 15)
       // Cost distribution
       setCostDistMaxDays(settings.cost_distribution_max_days ?? 90)
       // LLM settings — LLM FEATURE
@@ -2509,6 +2512,7 @@ export default function Settings() {
       ocr_clean_product_codes: ocrCleanProductCodes,
       ocr_filter_subtotal_rows: ocrFilterSubtotalRows,
       ocr_use_weight_as_quantity: ocrUseWeightAsQuantity,
+      azure_requests_per_minute: azureRequestsPerMinute,
       cost_distribution_max_days: costDistMaxDays,
     }
     if (azureKey) {
@@ -3286,6 +3290,20 @@ export default function Settings() {
                 />
                 Use weight as quantity for KG items (when weight × price matches total)
               </label>
+
+              <label style={styles.label}>
+                Azure Requests per Minute
+                <input
+                  type="number"
+                  min="1"
+                  value={azureRequestsPerMinute}
+                  onChange={(e) => setAzureRequestsPerMinute(parseInt(e.target.value) || 15)}
+                  style={styles.input}
+                />
+                <span style={{ fontSize: '0.85rem', color: '#666' }}>
+                  OCR queue rate limit - match your Azure tier (Free F0 allows 20 per minute)
+                </span>
+              </label>
             </div>
 
             {/* Actions - outside blocks */}
@@ -7644,7 +7662,7 @@ export default function Settings() {
               <div style={styles.dataAction}>
                 <div>
                   <strong>Reprocess All Invoices</strong>
-                  <p style={styles.actionDesc}>Re-run OCR processing on all non-confirmed invoices.</p>
+                  <p style={styles.actionDesc}>Rebuild all non-confirmed invoices from their stored OCR data. Only invoices without it are sent to Azure again.</p>
                 </div>
                 <button
                   onClick={() => {